@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Runner - Bounded-memory batch processing of large MCD sets
+Description: Long batches in one process slowly grow: pythonnet proxies keep
+.NET objects alive until Python collects them, the CLR heap rarely shrinks,
+and throughput falls as the heaps grow. BatchRunner runs jobs in worker
+processes that release .NET objects after every job (see ClrBridge.release),
+collect both heaps on a schedule, and measure RSS, Python allocated blocks and
+the managed heap after every job. A worker retires itself once it has run
+--max-jobs jobs or its RSS or managed heap passes --max-rss-mb/--max-clr-mb,
+and a fresh worker takes its place, so memory stays bounded and throughput
+stays flat over 10,000-item runs. A worker that crashes fails only its
+current job and is replaced.
+
+Job kinds:
+    process    payload/rename/calculate pipeline with the MCD's payload sidecar (see MCDWatchFolder)
+    calculate  GenerateMCD parameter calculation only
+    validate   sanity rules on calculated MCDs (see MCDValidation), no .NET
+
+Outputs mirror the input layout below the deepest folder holding every input
+MCD, so same-named MCDs from different folders do not overwrite each other.
+
+Usage:
+    python BatchRunner.py process <folder> [--output DIR] [--workers 2] [--max-jobs 200] [--max-rss-mb 1500]
+    python BatchRunner.py validate <folder> --report batch_report.jsonl
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import queue
+import shutil
+import ctypes
+import argparse
+import multiprocessing
+
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+DEFAULT_MAX_JOBS = 200
+DEFAULT_GC_EVERY = 1
+POLL_INTERVAL_S = 0.5
+MAX_START_FAILURES = 3
+
+# --- Memory measurement ---
+
+def rss_bytes():
+    """Resident set size of this process in bytes (psutil when installed, else the OS directly)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    if sys.platform == "win32":
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb)
+        return counters.WorkingSetSize
+    # Peak rather than current RSS, but still catches growth (macOS reports bytes, others KiB)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def memory_sample():
+    """RSS bytes, Python allocated blocks and managed heap bytes (None until the CLR is loaded)."""
+    from ClrBridge import managed_heap_bytes
+    return {"rss": rss_bytes(), "py_blocks": sys.getallocatedblocks(), "clr": managed_heap_bytes()}
+
+# --- Job kinds ---
+
+def input_root(paths):
+    """Deepest folder holding every input MCD (None if they are on different drives)."""
+    try:
+        return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    except ValueError:
+        return None
+
+def output_folder(mcd_path, options):
+    """
+    The job's output folder: output_dir plus the MCD's folder relative to options["input_root"]
+    (or its whole path without the drive when there is no common root). Created if missing.
+    """
+    mcd_dir = os.path.dirname(os.path.abspath(mcd_path))
+    root = options.get("input_root")
+    if root:
+        relative = os.path.relpath(mcd_dir, root)
+    else:
+        drive, tail = os.path.splitdrive(mcd_dir)
+        relative = os.path.join(drive.strip(":\\/"), tail.lstrip("\\/"))
+    folder = os.path.normpath(os.path.join(options["output_dir"], relative))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def process_job(mcd_path, options):
+    """Runs the payload/rename/calculate pipeline on a copy of the MCD, with payloads from its sidecar."""
+    import MCDProcessing
+    from MCDWatchFolder import load_payloads, sidecar_path
+
+    payloads = load_payloads(sidecar_path(mcd_path))
+    output_dir = output_folder(mcd_path, options)
+    working = os.path.join(output_dir, os.path.basename(mcd_path))
+    shutil.copyfile(mcd_path, working)
+    mcd_name = os.path.splitext(os.path.basename(mcd_path))[0]
+    result = MCDProcessing.process_mcd_file(working, payloads, mcd_name, output_dir, backup=False)
+    if result["error"]:
+        raise RuntimeError(result["error"])
+    return {"output": result["calculated_mcd"], "warnings": len(result["warnings"]),
+            "violations": len(result.get("violations") or [])}
+
+def calculate_job(mcd_path, options):
+    """Calculates the parameters of one MCD."""
+    import MCDProcessing
+    from ClrBridge import release
+
+    mcd_name = os.path.splitext(os.path.basename(mcd_path))[0]
+    calculated, warnings, calculated_path = MCDProcessing.calculate_parameters(mcd_path, mcd_name,
+                                                                                output_folder(mcd_path, options))
+    release(calculated)
+    return {"output": calculated_path, "warnings": len(warnings)}
+
+_rules = {}
+
+def validate_job(mcd_path, options):
+    """Validates one calculated MCD against the sanity rules."""
+    import MCDValidation
+
+    # Rules are compiled once per worker
+    if options.get("rules") not in _rules:
+        _rules[options.get("rules")] = MCDValidation.load_rules(options.get("rules"))
+    violations = MCDValidation.validate_mcd(mcd_path, _rules[options.get("rules")])
+    return {"errors": MCDValidation.summarize(violations)["errors"], "violations": len(violations)}
+
+JOB_KINDS = {
+    "process": process_job,
+    "calculate": calculate_job,
+    "validate": validate_job,
+}
+
+# --- Worker process ---
+
+def recycle_reason(jobs_done, sample, limits):
+    """Returns why a worker should retire after this job, or None to keep going."""
+    if limits.get("max_jobs") and jobs_done >= limits["max_jobs"]:
+        return f"{jobs_done} jobs"
+    if limits.get("max_rss_mb") and sample["rss"] > limits["max_rss_mb"] * 2**20:
+        return f"RSS {sample['rss'] / 2**20:.0f} MB"
+    if limits.get("max_clr_mb") and sample["clr"] is not None and sample["clr"] > limits["max_clr_mb"] * 2**20:
+        return f"managed heap {sample['clr'] / 2**20:.0f} MB"
+    return None
+
+def _worker(worker_id, kind, options, limits, tasks, results):
+    """Worker process loop: one job at a time from tasks until told to stop or a recycle limit is reached."""
+    from ClrBridge import collect_managed
+
+    # Job output is reported through results; keep per-job pipeline prints off the console
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+    job = JOB_KINDS[kind]
+    jobs_done = 0
+    while True:
+        item = tasks.get()
+        if item is None:
+            results.put(("exit", worker_id, None))
+            return
+        index, path = item
+        results.put(("started", worker_id, index))
+        start = time.perf_counter()
+        try:
+            value, error = job(path, options), None
+        except Exception as e:
+            value, error = None, str(e)
+        elapsed = time.perf_counter() - start
+        jobs_done += 1
+        if jobs_done % limits.get("gc_every", DEFAULT_GC_EVERY) == 0:
+            gc.collect()
+            collect_managed()
+        sample = memory_sample()
+        results.put(("done", worker_id, {"index": index, "path": path, "ok": error is None, "error": error,
+                                         "result": value, "elapsed_s": elapsed, "worker": worker_id,
+                                         "worker_jobs": jobs_done, **sample}))
+        reason = recycle_reason(jobs_done, sample, limits)
+        if reason:
+            results.put(("recycle", worker_id, reason))
+            return
+
+# --- Parent ---
+
+class BatchRunner:
+    """
+    Runs a job kind over many files on recycling worker processes.
+
+    Args:
+        kind (str): Key of JOB_KINDS.
+        workers (int): Concurrent worker processes.
+        max_jobs (int): Jobs a worker runs before it is replaced (None: no limit).
+        max_rss_mb (float): RSS after which a worker is replaced (None: no limit).
+        max_clr_mb (float): Managed heap size after which a worker is replaced (None: no limit).
+        gc_every (int): Jobs between full Python and .NET collections in a worker.
+        options (dict): Passed to every job (output_dir, input_root, rules).
+    """
+    def __init__(self, kind, workers=DEFAULT_WORKERS, max_jobs=DEFAULT_MAX_JOBS, max_rss_mb=None, max_clr_mb=None,
+                 gc_every=DEFAULT_GC_EVERY, options=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}' (expected one of: {', '.join(JOB_KINDS)})")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.limits = {"max_jobs": max_jobs, "max_rss_mb": max_rss_mb, "max_clr_mb": max_clr_mb,
+                       "gc_every": max(1, gc_every)}
+        self.options = options or {}
+        self.context = multiprocessing.get_context("spawn")
+        self.recycled = 0
+        self.crashed = 0
+
+    def _start_worker(self, worker_id, tasks, results):
+        process = self.context.Process(target=_worker, daemon=True,
+                                       args=(worker_id, self.kind, self.options, self.limits, tasks, results))
+        process.start()
+        return process
+
+    def run(self, paths, on_result=None):
+        """
+        Runs every path and returns the per-job records in input order.
+
+        Args:
+            paths (list): Files to run the job on.
+            on_result (callable): Called with each record as it arrives.
+
+        Returns:
+            list: Records with ok/error/result, elapsed_s, finished_s (since the run started), worker,
+                and rss/py_blocks/clr after the job.
+        """
+        paths = list(paths)
+        if not paths:
+            return []
+        tasks = self.context.Queue()
+        results = self.context.Queue()
+        for item in enumerate(paths):
+            tasks.put(item)
+
+        records = [None] * len(paths)
+        processes = {}
+        in_flight = {}
+        next_id = 0
+        for _ in range(min(self.workers, len(paths))):
+            processes[next_id] = self._start_worker(next_id, tasks, results)
+            next_id += 1
+
+        finished = 0
+        start_failures = 0
+        start = time.perf_counter()
+
+        def record(entry):
+            nonlocal finished
+            entry["finished_s"] = time.perf_counter() - start
+            records[entry["index"]] = entry
+            finished += 1
+            if on_result:
+                on_result(entry)
+
+        def replace(worker_id):
+            nonlocal next_id
+            processes.pop(worker_id).join()
+            if finished < len(paths):
+                processes[next_id] = self._start_worker(next_id, tasks, results)
+                next_id += 1
+
+        def handle(message, worker_id, payload):
+            nonlocal start_failures
+            if message == "started":
+                in_flight[worker_id] = payload
+                start_failures = 0
+            elif message == "done":
+                in_flight.pop(worker_id, None)
+                record(payload)
+            elif message == "recycle" and worker_id in processes:
+                self.recycled += 1
+                replace(worker_id)
+
+        while finished < len(paths):
+            try:
+                handle(*results.get(timeout=POLL_INTERVAL_S))
+                continue
+            except queue.Empty:
+                pass
+            dead = [worker_id for worker_id, process in processes.items() if not process.is_alive()]
+            if not dead:
+                continue
+            # Read what the dead workers sent before exiting; a worker that retired normally is replaced there
+            try:
+                while True:
+                    handle(*results.get(timeout=POLL_INTERVAL_S))
+            except queue.Empty:
+                pass
+            for worker_id in dead:
+                if worker_id not in processes:
+                    continue
+                # Died without reporting: fail its current job and replace it
+                self.crashed += 1
+                index = in_flight.pop(worker_id, None)
+                if index is None:
+                    # Died before taking a job: a broken environment, not a bad input
+                    start_failures += 1
+                    if start_failures >= MAX_START_FAILURES * self.workers:
+                        for process in processes.values():
+                            process.kill()
+                        raise RuntimeError(f"Workers keep exiting on start-up (exit code "
+                                           f"{processes[worker_id].exitcode})")
+                else:
+                    record({"index": index, "path": paths[index], "ok": False, "result": None,
+                            "error": f"worker exited with code {processes[worker_id].exitcode}",
+                            "elapsed_s": None, "worker": worker_id, "worker_jobs": None, "rss": None,
+                            "py_blocks": None, "clr": None})
+                replace(worker_id)
+
+        for _ in processes:
+            tasks.put(None)
+        for process in processes.values():
+            process.join()
+        return records
+
+def summarize(records, windows=10):
+    """
+    Splits the run, in completion order, into windows and reports throughput and worker
+    memory per window, to confirm throughput stays flat over the run.
+
+    Returns:
+        list: One dict per window with first, jobs, failed, jobs_per_s (wall clock, including worker
+            start-up and recycling), mean_rss_mb and max_clr_mb.
+    """
+    records = sorted((entry for entry in records if entry is not None), key=lambda entry: entry["finished_s"])
+    size = max(1, -(-len(records) // windows))
+    summary = []
+    previous = 0.0
+    for start in range(0, len(records), size):
+        window = records[start:start + size]
+        span = window[-1]["finished_s"] - previous
+        previous = window[-1]["finished_s"]
+        rss = [entry["rss"] for entry in window if entry["rss"] is not None]
+        clr = [entry["clr"] for entry in window if entry["clr"] is not None]
+        summary.append({
+            "first": start, "jobs": len(window), "failed": sum(not entry["ok"] for entry in window),
+            "jobs_per_s": len(window) / span if span > 0 else None,
+            "mean_rss_mb": sum(rss) / len(rss) / 2**20 if rss else None,
+            "max_clr_mb": max(clr) / 2**20 if clr else None,
+        })
+    return summary
+
+def _collect_paths(paths, kind):
+    from MCDWatchFolder import sidecar_path
+
+    collected = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, file_names in os.walk(path):
+                collected.extend(os.path.join(dir_path, file_name) for file_name in sorted(file_names)
+                                 if file_name.lower().endswith(".mcd"))
+        else:
+            collected.append(path)
+    if kind == "process":
+        collected = [path for path in collected if os.path.exists(sidecar_path(path))]
+    return collected
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run a job over many MCDs on recycling worker processes.")
+    parser.add_argument("kind", choices=sorted(JOB_KINDS), help="Job to run on each MCD")
+    parser.add_argument("paths", nargs="+", help="MCD files or folders of MCDs")
+    parser.add_argument("--output", default="batch_output", help="Output folder for process/calculate")
+    parser.add_argument("--rules", help="Rule file for validate (default: built-in rules)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS, help="Jobs per worker before recycling (0: no limit)")
+    parser.add_argument("--max-rss-mb", type=float, help="Recycle a worker above this RSS")
+    parser.add_argument("--max-clr-mb", type=float, help="Recycle a worker above this managed heap size")
+    parser.add_argument("--gc-every", type=int, default=DEFAULT_GC_EVERY, help="Jobs between full collections")
+    parser.add_argument("--report", help="Write one JSON line per job to this file")
+    args = parser.parse_args()
+
+    paths = _collect_paths(args.paths, args.kind)
+    if not paths:
+        print("❌ No MCDs to run" + (" (process needs a payload sidecar per MCD)" if args.kind == "process" else ""))
+        return 1
+    output_dir = os.path.abspath(args.output)
+    if args.kind != "validate":
+        os.makedirs(output_dir, exist_ok=True)
+
+    runner = BatchRunner(args.kind, args.workers, args.max_jobs or None, args.max_rss_mb, args.max_clr_mb,
+                         args.gc_every, {"output_dir": output_dir, "input_root": input_root(paths),
+                                         "rules": args.rules})
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    progress_every = max(1, len(paths) // 20)
+
+    def on_result(entry):
+        if report:
+            report.write(json.dumps(entry) + "\n")
+        if not entry["ok"]:
+            print(f"❌ {os.path.basename(entry['path'])}: {entry['error']}")
+        done = on_result.count = getattr(on_result, "count", 0) + 1
+        if done % progress_every == 0 or done == len(paths):
+            print(f"📊 {done}/{len(paths)} done, worker RSS {(entry['rss'] or 0) / 2**20:.0f} MB")
+
+    print(f"🔧 Running {args.kind} on {len(paths)} MCDs with {runner.workers} workers")
+    start = time.perf_counter()
+    try:
+        records = runner.run(paths, on_result)
+    finally:
+        if report:
+            report.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'Jobs':>12}{'Failed':>8}{'Jobs/s':>10}{'RSS (MB)':>10}{'CLR (MB)':>10}")
+    for window in summarize(records):
+        span = f"{window['first'] + 1}-{window['first'] + window['jobs']}"
+        rate = f"{window['jobs_per_s']:.1f}" if window["jobs_per_s"] else "-"
+        rss = f"{window['mean_rss_mb']:.0f}" if window["mean_rss_mb"] else "-"
+        clr = f"{window['max_clr_mb']:.0f}" if window["max_clr_mb"] else "-"
+        print(f"{span:>12}{window['failed']:>8}{rate:>10}{rss:>10}{clr:>10}")
+    failed = sum(not entry["ok"] for entry in records)
+    print(f"\n⏱️ {len(records)} jobs in {elapsed:.1f} s ({len(records) / elapsed:.1f}/s), {failed} failed, "
+          f"{runner.recycled} workers recycled, {runner.crashed} crashed")
+    return 0 if failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calculation Cache - Persistent CalculateParameters results keyed by machine setup fingerprint
+Description: CalculateParameters derives the servo, feedforward and current loop
+parameters purely from the MachineSetupConfiguration (stage, drive, options,
+payload). Identical configurations repeat constantly on the line, so the
+calculated members (config/Parameters, config/AxesSettings, mcdInformation.xml
+and the MachineSetupData .NET rewrites) and warnings are stored in SQLite under
+a canonical hash of the configuration and re-applied to the input MCD on a hit.
+
+The fingerprint ignores element order within a record, ConfiguredOptions order,
+whitespace and number formatting ("10" == "10.0"), and leaves out display-only
+fields such as DisplayName, SerialNumber and the axis Name. A hit takes those
+fields from the input: in the cached MachineSetupData, and in config/Parameters,
+where the calculation copies the axis names (AxisName). The cache is
+size-bounded (least recently used entries are evicted) and is cleared when the
+Automation1 DLLs change.
+
+Usage:
+    python CalculationCache.py stats [--db .mcd_calc_cache.db]
+    python CalculationCache.py fingerprint "PRO165LM XY-No Load.mcd"
+    python CalculationCache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+
+import MCDXml
+from MCDArchive import MCDArchive
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mcd_calc_cache.db")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SCHEMA_VERSION = 1
+# 2: entries also hold the calculated MachineSetupData, so version 1 entries must not hit
+FINGERPRINT_VERSION = 2
+
+MACHINE_SETUP_MEMBER = "config/MachineSetupData"
+PARAMETERS_MEMBER = "config/Parameters"
+# Members of the input MCD that the calculation does not replace
+INPUT_MEMBERS = ("config/Names",)
+
+# Fields that do not affect the calculation: element tag ("*" for any) -> field names
+VOLATILE_FIELDS = {
+    "*": {"DisplayName", "SerialNumber", "WasAutoDetected"},
+    "AxisConfiguration": {"Name"},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    fingerprint TEXT PRIMARY KEY,
+    warnings TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    fingerprint TEXT NOT NULL REFERENCES entries(fingerprint) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (fingerprint, name)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+"""
+
+# --- Fingerprint ---
+
+def _canonical_text(text):
+    """Normalises leaf text: whitespace stripped, numbers and booleans in one spelling."""
+    text = (text or "").strip()
+    if text.lower() in ("true", "false"):
+        return text.lower()
+    try:
+        return repr(float(text))
+    except ValueError:
+        return text
+
+def canonicalize(element):
+    """
+    Returns a JSON-ready canonical form of a MachineSetupConfiguration element.
+    List containers keep their order (it is the axis/product index); record fields
+    and ConfiguredOptions are sorted.
+    """
+    children = list(element)
+    if not children:
+        return _canonical_text(element.text)
+
+    if element.tag == "ConfiguredOptions":
+        return sorted([_canonical_text(pair.findtext("Key")), _canonical_text(pair.findtext("Value"))]
+                      for pair in children)
+
+    tags = [child.tag for child in children]
+    if len(set(tags)) < len(tags):
+        # Repeated elements form a list, where order is meaningful
+        return [[child.tag, canonicalize(child)] for child in children]
+
+    volatile = VOLATILE_FIELDS["*"] | VOLATILE_FIELDS.get(element.tag, set())
+    return sorted([child.tag, canonicalize(child)] for child in children if child.tag not in volatile)
+
+def fingerprint_configuration(configuration):
+    """sha256 of a MachineSetupConfiguration element's canonical form."""
+    canonical = json.dumps([FINGERPRINT_VERSION, canonicalize(configuration)], separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def machine_setup(mcd):
+    """Returns the MachineSetupConfiguration element of an MCD (path or MCDArchive), or None."""
+    archive = mcd if isinstance(mcd, MCDArchive) else MCDArchive.open(mcd)
+    if MACHINE_SETUP_MEMBER not in archive:
+        return None
+    setup_root = MCDXml.fromstring(archive.read(MACHINE_SETUP_MEMBER))
+    return setup_root.find("./Data/Configuration/MachineSetupConfiguration")
+
+def fingerprint_mcd(mcd):
+    """
+    Fingerprints the machine setup of an MCD.
+
+    Args:
+        mcd (str | MCDArchive): MCD path or an opened archive.
+
+    Returns:
+        str: Hex fingerprint, or None if the MCD has no MachineSetupConfiguration.
+    """
+    configuration = machine_setup(mcd)
+    if configuration is None:
+        return None
+    return fingerprint_configuration(configuration)
+
+def axis_names(configuration):
+    """Returns {axis index: name} from a MachineSetupConfiguration element."""
+    names = {}
+    for axis in configuration.findall("./Axes/AxisConfiguration"):
+        index = axis.findtext("Index")
+        name = axis.findtext("Name")
+        if index is not None and name is not None:
+            names[index.strip()] = name.strip()
+    return names
+
+def volatile_fields(configuration):
+    """
+    Returns the volatile fields (see VOLATILE_FIELDS) of a MachineSetupConfiguration element.
+
+    Returns:
+        dict: Path -> text, where a path is a tuple of (tag, position among same-tag siblings)
+            steps below the configuration, so it also finds the field in the calculated setup.
+    """
+    fields = {}
+
+    def walk(element, path):
+        positions = {}
+        for child in element:
+            position = positions[child.tag] = positions.get(child.tag, -1) + 1
+            child_path = path + ((child.tag, position),)
+            if not len(child) and child.tag in VOLATILE_FIELDS["*"] | VOLATILE_FIELDS.get(element.tag, set()):
+                fields[child_path] = child.text
+            else:
+                walk(child, child_path)
+
+    walk(configuration, ())
+    return fields
+
+def apply_volatile_fields(machine_setup_data, fields):
+    """
+    Sets the volatile fields of a MachineSetupData member to the given values.
+
+    Args:
+        machine_setup_data (bytes): The member as stored in the MCD.
+        fields (dict): Path -> text, as returned by volatile_fields().
+
+    Returns:
+        bytes: The member, unchanged apart from those fields.
+    """
+    document = MCDXml.XmlDocument(machine_setup_data)
+    configuration = document.root.find("./Data/Configuration/MachineSetupConfiguration")
+    if configuration is None:
+        return machine_setup_data
+    for path, text in fields.items():
+        element = configuration
+        for tag, position in path:
+            matches = element.findall(tag)
+            element = matches[position] if position < len(matches) else None
+            if element is None:
+                break
+        if element is not None:
+            element.text = text
+    return document.serialize()
+
+def rename_axes(parameters, names):
+    """
+    Sets the AxisName parameters of a config/Parameters member to the given names.
+
+    Args:
+        parameters (bytes): The member as stored in the MCD.
+        names (dict): Axis index -> name, as returned by axis_names().
+
+    Returns:
+        bytes: The member, unchanged apart from the renamed axes.
+    """
+    document = MCDXml.XmlDocument(parameters)
+    for axis in MCDXml.AXES(document.root):
+        name = names.get(axis.get("Index"))
+        if name is None:
+            continue
+        for parameter in MCDXml.AXIS_PARAMETERS(axis):
+            if parameter.get("n") == "AxisName":
+                parameter.text = name
+    return document.serialize()
+
+def dll_version(dll_dir):
+    """
+    Identifies the installed Automation1 assemblies by name, size and modification time,
+    so replacing or upgrading them invalidates the cache.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(dll_dir):
+        for name in sorted(os.listdir(dll_dir)):
+            if name.lower().endswith(".dll"):
+                stat = os.stat(os.path.join(dll_dir, name))
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()
+
+# --- Cache ---
+
+class CalculationCache:
+    """
+    SQLite store of calculated MCD members keyed by machine setup fingerprint.
+
+    Args:
+        db_path (str): Cache database.
+        dll_version (str): Current Automation1 DLL identity (see dll_version()); entries
+            written under a different value are discarded on open.
+        max_bytes (int): Upper bound on stored (compressed) member bytes.
+    """
+    def __init__(self, db_path=DEFAULT_DB_PATH, dll_version=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        if dll_version is not None:
+            self._check_dll_version(dll_version)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _check_dll_version(self, version):
+        """Clears the cache if it was filled by different Automation1 DLLs."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'dll_version'").fetchone()
+        if row is not None and row["value"] != version:
+            print("⚠️ Automation1 DLLs changed - clearing the calculation cache")
+            self.clear()
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dll_version', ?)", (version,))
+
+    def clear(self):
+        """Removes every entry."""
+        with self.connection:
+            self.connection.execute("DELETE FROM entries")
+
+    def get(self, fingerprint):
+        """
+        Looks up a fingerprint.
+
+        Returns:
+            tuple: ({member name: bytes}, warnings list), or None on a miss.
+        """
+        row = self.connection.execute("SELECT warnings FROM entries WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        members = {name: zlib.decompress(data) for name, data in self.connection.execute(
+            "SELECT name, data FROM members WHERE fingerprint = ?", (fingerprint,))}
+        with self.connection:
+            self.connection.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE fingerprint = ?",
+                                    (time.time(), fingerprint))
+        return members, json.loads(row["warnings"])
+
+    def put(self, fingerprint, members, warnings):
+        """
+        Stores calculated members and warnings, then evicts least recently used entries over max_bytes.
+
+        Args:
+            fingerprint (str): Machine setup fingerprint of the input MCD.
+            members (dict): Member name -> uncompressed bytes.
+            warnings (list): Calculation warnings as strings.
+        """
+        compressed = {name: zlib.compress(data, 6) for name, data in members.items()}
+        size = sum(len(data) for data in compressed.values())
+        with self.connection:
+            self.connection.execute("DELETE FROM entries WHERE fingerprint = ?", (fingerprint,))
+            self.connection.execute(
+                "INSERT INTO entries (fingerprint, warnings, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, json.dumps([str(w) for w in warnings]), size,
+                 datetime.now().isoformat(timespec="seconds"), time.time()))
+            self.connection.executemany("INSERT INTO members (fingerprint, name, data) VALUES (?, ?, ?)",
+                                        [(fingerprint, name, data) for name, data in compressed.items()])
+        self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until the stored size is within max_bytes. Returns the count removed."""
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        with self.connection:
+            for row in self.connection.execute("SELECT fingerprint, size FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM entries WHERE fingerprint = ?", (row["fingerprint"],))
+                total -= row["size"]
+                removed += 1
+        return removed
+
+    def stats(self):
+        """Returns entry count, stored bytes, total hits and the byte limit."""
+        row = self.connection.execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits FROM entries"
+        ).fetchone()
+        return {"entries": row["entries"], "bytes": row["bytes"], "hits": row["hits"], "max_bytes": self.max_bytes}
+
+    # --- MCD level ---
+
+    def store_result(self, input_mcd, calculated_mcd, warnings):
+        """Records the members a calculation produced for input_mcd's machine setup. Returns the fingerprint."""
+        fingerprint = fingerprint_mcd(input_mcd)
+        if fingerprint is None:
+            return None
+        calculated = MCDArchive.open(calculated_mcd)
+        members = {name: calculated.read(name) for name in calculated.names() if name not in INPUT_MEMBERS}
+        self.put(fingerprint, members, warnings)
+        return fingerprint
+
+    def apply_cached(self, input_mcd, output_path):
+        """
+        Writes the calculated MCD for input_mcd from the cache, if its machine setup has been calculated before.
+        The input's Names member is kept and the cached calculated members replace the rest, with the
+        fields the fingerprint ignores (names, serial numbers, AxisName) taken from the input.
+
+        Returns:
+            list: The cached warnings on a hit, or None on a miss.
+        """
+        archive = MCDArchive.open(input_mcd)
+        configuration = machine_setup(archive)
+        cached = self.get(fingerprint_configuration(configuration)) if configuration is not None else None
+        if cached is None:
+            return None
+        members, warnings = cached
+        if MACHINE_SETUP_MEMBER in members:
+            members[MACHINE_SETUP_MEMBER] = apply_volatile_fields(members[MACHINE_SETUP_MEMBER],
+                                                                  volatile_fields(configuration))
+        if PARAMETERS_MEMBER in members:
+            members[PARAMETERS_MEMBER] = rename_axes(members[PARAMETERS_MEMBER], axis_names(configuration))
+        for name, data in members.items():
+            archive.replace(name, data)
+        archive.write(output_path)
+        return warnings
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Inspect or clear the CalculateParameters result cache.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Cache database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry count, size and hits")
+    subparsers.add_parser("clear", help="Remove every entry")
+    fingerprint_parser = subparsers.add_parser("fingerprint", help="Print the machine setup fingerprint of MCDs")
+    fingerprint_parser.add_argument("mcd", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "fingerprint":
+        for path in args.mcd:
+            print(f"{fingerprint_mcd(path) or '(no machine setup)'}  {path}")
+        return 0
+
+    with CalculationCache(args.db) as cache:
+        if args.command == "clear":
+            cache.clear()
+            print("✅ Calculation cache cleared")
+        else:
+            stats = cache.stats()
+            print(f"📊 {stats['entries']} entr{'y' if stats['entries'] == 1 else 'ies'}, "
+                  f"{stats['bytes'] / 1048576.0:.2f} of {stats['max_bytes'] / 1048576.0:.0f} MiB, {stats['hits']} hit(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
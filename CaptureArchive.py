@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Capture Archive - Chunked, memory-mapped on-disk store for collected axis signals
+Description: Encoder tuning captures (EncoderSineRaw, EncoderCosineRaw,
+VelocityCommand, ...) otherwise only live in memory until the fit is done. A
+capture archive is a directory holding a small JSON header (axes, signals,
+sample rate, DataCollectionFrequency, chunk list) and a series of .npy chunk
+files of shape (channels, samples), one channel per (axis, signal) pair.
+
+Chunks are written through np.lib.format.open_memmap while frames stream in,
+and the header is replaced atomically after every completed chunk, so an
+interrupted capture stays readable up to its last complete chunk. Reading maps
+the chunks with mmap_mode="r": signals come back as zero-copy views per chunk
+and only the ranges that are actually used get paged in. encoder_captures reads
+chunk by chunk and thins the samples it selects to max_samples per axis, so a
+refit holds at most 2 x max_samples samples per axis however long the capture.
+
+Usage:
+    python CaptureArchive.py info captures/x_axis.capture
+    python CaptureArchive.py refit captures/x_axis.capture [captures/y_axis.capture ...]
+    python CaptureArchive.py synthetic captures/demo.capture --axes 2 --frames 200
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+
+import numpy as np
+
+HEADER_NAME = "header.json"
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SAMPLES = 1 << 18
+# Most sine/cosine samples per axis handed to the ellipse fit (16 MiB per axis as float64)
+DEFAULT_MAX_FIT_SAMPLES = 1 << 20
+# DataCollectionFrequency members and their sample rates
+FREQUENCIES = {"Frequency1kHz": 1000, "Frequency10kHz": 10000, "Frequency20kHz": 20000,
+               "Frequency100kHz": 100000, "Frequency200kHz": 200000}
+
+def _channel_key(axis, signal):
+    return f"{axis}/{signal}"
+
+def _write_json_atomic(path, data):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+# --- Writing ---
+
+class CaptureWriter:
+    """
+    Streams frames into a capture archive.
+
+    Args:
+        path (str): Archive directory (created).
+        axes (list): Axes captured (names or indices).
+        signals (list): Signal names captured for every axis.
+        frequency (str): DataCollectionFrequency member name, e.g. "Frequency1kHz".
+        sample_rate_hz (float): Sample rate; derived from frequency when omitted.
+        chunk_samples (int): Samples per chunk file.
+        dtype: Sample type stored on disk.
+        metadata (dict): Extra JSON-serialisable header fields (controller, speed, ...).
+    """
+
+    def __init__(self, path, axes, signals, frequency="Frequency1kHz", sample_rate_hz=None,
+                 chunk_samples=DEFAULT_CHUNK_SAMPLES, dtype=np.float64, metadata=None):
+        if os.path.exists(os.path.join(path, HEADER_NAME)):
+            raise FileExistsError(f"A capture archive already exists at {path}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.channels = [(axis, signal) for axis in axes for signal in signals]
+        self.chunk_samples = chunk_samples
+        self.dtype = np.dtype(dtype)
+        self.header = {
+            "format_version": FORMAT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "axes": list(axes),
+            "signals": list(signals),
+            "channels": [_channel_key(axis, signal) for axis, signal in self.channels],
+            "data_collection_frequency": frequency,
+            "sample_rate_hz": sample_rate_hz if sample_rate_hz is not None else FREQUENCIES.get(frequency),
+            "dtype": self.dtype.str,
+            "chunk_samples": chunk_samples,
+            "samples": 0,
+            "complete": False,
+            "chunks": [],
+            "metadata": metadata or {},
+        }
+        self._chunk = None
+        self._filled = 0
+        _write_json_atomic(os.path.join(path, HEADER_NAME), self.header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _new_chunk(self):
+        name = f"chunk_{len(self.header['chunks']):05d}.npy"
+        self._chunk = np.lib.format.open_memmap(os.path.join(self.path, name), mode="w+", dtype=self.dtype,
+                                                shape=(len(self.channels), self.chunk_samples))
+        self.header["chunks"].append({"file": name, "samples": 0})
+        self._filled = 0
+
+    def _finish_chunk(self):
+        chunk_path = os.path.join(self.path, self.header["chunks"][-1]["file"])
+        if self._filled < self.chunk_samples:
+            # Trim a partial last chunk so the file holds only the captured samples
+            trimmed = np.array(self._chunk[:, :self._filled])
+            del self._chunk
+            with open(chunk_path + ".tmp", "wb") as f:
+                np.save(f, trimmed)
+            os.replace(chunk_path + ".tmp", chunk_path)
+        else:
+            self._chunk.flush()
+            del self._chunk
+        self._chunk = None
+        self.header["chunks"][-1]["samples"] = self._filled
+        _write_json_atomic(os.path.join(self.path, HEADER_NAME), self.header)
+
+    def append_block(self, block):
+        """Appends a (channels, n) array in channel order."""
+        block = np.asarray(block)
+        if block.shape[0] != len(self.channels):
+            raise ValueError(f"Expected {len(self.channels)} channels, got {block.shape[0]}")
+        offset = 0
+        while offset < block.shape[1]:
+            if self._chunk is None:
+                self._new_chunk()
+            take = min(block.shape[1] - offset, self.chunk_samples - self._filled)
+            self._chunk[:, self._filled:self._filled + take] = block[:, offset:offset + take]
+            self._filled += take
+            offset += take
+            self.header["samples"] += take
+            if self._filled == self.chunk_samples:
+                self._finish_chunk()
+
+    def append(self, frame):
+        """
+        Appends a frame in the EncoderStreaming format: {axis: {signal: samples}}.
+        Keys other than the archive's signals (e.g. target_speed) are ignored.
+        """
+        self.append_block(np.vstack([np.asarray(frame[axis][signal], dtype=self.dtype) for axis, signal in self.channels]))
+
+    def close(self):
+        """Finishes the last chunk and marks the archive complete."""
+        if self._chunk is not None:
+            self._finish_chunk()
+        self.header["complete"] = True
+        _write_json_atomic(os.path.join(self.path, HEADER_NAME), self.header)
+
+def record(frames, writer):
+    """Passes frames through unchanged while writing them to a CaptureWriter (e.g. around StreamingTuner.consume)."""
+    for frame in frames:
+        writer.append(frame)
+        yield frame
+
+# --- Reading ---
+
+class CaptureArchive:
+    """
+    Read-only, memory-mapped view of a capture archive.
+
+    Args:
+        path (str): Archive directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, HEADER_NAME), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        if self.header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported capture format {self.header.get('format_version')}")
+        self._index = {key: i for i, key in enumerate(self.header["channels"])}
+        self._maps = None
+
+    @property
+    def axes(self):
+        return self.header["axes"]
+
+    @property
+    def signals(self):
+        return self.header["signals"]
+
+    @property
+    def sample_rate_hz(self):
+        return self.header["sample_rate_hz"]
+
+    def __len__(self):
+        """Number of samples in complete chunks."""
+        return sum(chunk["samples"] for chunk in self.header["chunks"])
+
+    def _chunk_maps(self):
+        if self._maps is None:
+            self._maps = []
+            for chunk in self.header["chunks"]:
+                if not chunk["samples"]:
+                    continue
+                data = np.load(os.path.join(self.path, chunk["file"]), mmap_mode="r")
+                self._maps.append(data[:, :chunk["samples"]])
+        return self._maps
+
+    def channel(self, axis, signal):
+        """Row index of a channel."""
+        try:
+            return self._index[_channel_key(axis, signal)]
+        except KeyError:
+            raise KeyError(f"No signal {signal} for axis {axis} in {self.path}") from None
+
+    def chunks(self, axis, signal):
+        """Yields zero-copy views of one signal, chunk by chunk."""
+        row = self.channel(axis, signal)
+        for data in self._chunk_maps():
+            yield data[row]
+
+    def blocks(self, channels=None):
+        """Yields {(axis, signal): view} per chunk for the requested channels (all by default)."""
+        channels = channels or [tuple(key.split("/", 1)) for key in self.header["channels"]]
+        rows = [(key, self._index[_channel_key(*key)]) for key in channels]
+        for data in self._chunk_maps():
+            yield {key: data[row] for key, row in rows}
+
+    def read(self, axis, signal, start=0, stop=None):
+        """
+        Returns samples [start, stop) of one signal. A range inside one chunk is a zero-copy
+        view; a range spanning chunks is copied.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        position = 0
+        for view in self.chunks(axis, signal):
+            end = position + len(view)
+            if end > start and position < stop:
+                parts.append(view[max(start - position, 0):min(stop, end) - position])
+            position = end
+            if position >= stop:
+                break
+        if not parts:
+            return np.empty(0, dtype=np.dtype(self.header["dtype"]))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def frames(self, frame_samples=None):
+        """
+        Replays the archive as EncoderStreaming frames ({axis: {signal: samples}}), one per chunk
+        or per frame_samples samples.
+        """
+        step = frame_samples or self.header["chunk_samples"]
+        for data in self._chunk_maps():
+            for start in range(0, data.shape[1], step):
+                frame = {}
+                for axis in self.axes:
+                    frame[axis] = {signal: data[self.channel(axis, signal), start:start + step] for signal in self.signals}
+                yield frame
+
+def open_archives(paths):
+    """Opens several archives (e.g. a fleet-wide set of captures)."""
+    return [CaptureArchive(path) for path in paths]
+
+# --- Offline analysis ---
+
+def _peak_velocity(archive, axis, velocity_signal):
+    """The VelocityCommand sample of largest magnitude, found one chunk at a time (None if empty)."""
+    peak = None
+    for chunk in archive.chunks(axis, velocity_signal):
+        if len(chunk):
+            candidate = chunk[np.argmax(np.abs(chunk))]
+            if peak is None or abs(candidate) > abs(peak):
+                peak = candidate
+    return peak
+
+def _selected_indices(archive, axis, velocity_signal, peak):
+    """Yields, per chunk, the indices of the samples at the peak velocity (all samples when peak is None)."""
+    if peak is None:
+        for chunk in archive._chunk_maps():
+            yield np.arange(chunk.shape[1])
+        return
+    for chunk in archive.chunks(axis, velocity_signal):
+        yield np.flatnonzero(np.isclose(chunk, peak))
+
+def encoder_captures(archive, constant_velocity=True, max_samples=DEFAULT_MAX_FIT_SAMPLES):
+    """
+    {axis: (sine, cosine)} from an archive for EncoderBatchFit.calculate_gains. With
+    constant_velocity, samples are limited to where VelocityCommand is at its peak magnitude,
+    as EncoderTuning.gather_results does.
+
+    The signals are read one chunk at a time and only the selected samples are copied, evenly
+    thinned to at most max_samples per axis (None keeps them all). Memory is bounded by
+    2 x max_samples samples per axis plus one chunk, whatever the length of the capture.
+    """
+    from EncoderStreaming import SINE_SIGNAL, COSINE_SIGNAL, VELOCITY_SIGNAL
+
+    captures = {}
+    for axis in archive.axes:
+        peak = None
+        if constant_velocity and VELOCITY_SIGNAL in archive.signals:
+            peak = _peak_velocity(archive, axis, VELOCITY_SIGNAL)
+        selected = sum(len(indices) for indices in _selected_indices(archive, axis, VELOCITY_SIGNAL, peak))
+        stride = math.ceil(selected / max_samples) if max_samples and selected > max_samples else 1
+
+        sine_parts, cosine_parts = [], []
+        position = 0  # selected samples before this chunk, so the thinning is even across chunks
+        for sine, cosine, indices in zip(archive.chunks(axis, SINE_SIGNAL), archive.chunks(axis, COSINE_SIGNAL),
+                                         _selected_indices(archive, axis, VELOCITY_SIGNAL, peak)):
+            kept = indices[(position + np.arange(len(indices))) % stride == 0]
+            position += len(indices)
+            sine_parts.append(np.array(sine[kept]))
+            cosine_parts.append(np.array(cosine[kept]))
+        dtype = np.dtype(archive.header["dtype"])
+        captures[str(axis)] = (np.concatenate(sine_parts) if sine_parts else np.empty(0, dtype=dtype),
+                               np.concatenate(cosine_parts) if cosine_parts else np.empty(0, dtype=dtype))
+    return captures
+
+def write_synthetic(path, axes=2, frames=200, frame_samples=500, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """Writes an archive from EncoderStreaming's synthetic frames (for trying the offline tools)."""
+    from EncoderStreaming import synthetic_frames, SINE_SIGNAL, COSINE_SIGNAL
+
+    axis_names = [f"Axis{i}" for i in range(axes)]
+    with CaptureWriter(path, axis_names, [SINE_SIGNAL, COSINE_SIGNAL], chunk_samples=chunk_samples,
+                       metadata={"source": "synthetic"}) as writer:
+        for frame in synthetic_frames(axis_names, frame_samples, frames):
+            writer.append(frame)
+    return path
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Chunked, memory-mapped store for collected axis signals.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    info_parser = subparsers.add_parser("info", help="Show an archive's header")
+    info_parser.add_argument("path")
+    refit_parser = subparsers.add_parser("refit", help="Recalculate encoder gains from archived captures")
+    refit_parser.add_argument("paths", nargs="+")
+    refit_parser.add_argument("--max-samples", type=int, default=DEFAULT_MAX_FIT_SAMPLES,
+                              help="Most samples per axis used for the fit (0 for all)")
+    synthetic_parser = subparsers.add_parser("synthetic", help="Write an archive of synthetic encoder frames")
+    synthetic_parser.add_argument("path")
+    synthetic_parser.add_argument("--axes", type=int, default=2)
+    synthetic_parser.add_argument("--frames", type=int, default=200)
+    synthetic_parser.add_argument("--chunk-samples", type=int, default=DEFAULT_CHUNK_SAMPLES)
+    args = parser.parse_args()
+
+    if args.command == "info":
+        archive = CaptureArchive(args.path)
+        header = archive.header
+        state = "complete" if header["complete"] else "incomplete (interrupted capture)"
+        print(f"📊 {args.path}: {len(archive)} samples at {header['sample_rate_hz']} Hz "
+              f"({header['data_collection_frequency']}), {len(header['chunks'])} chunks, {state}")
+        print(f"   Axes: {', '.join(str(axis) for axis in header['axes'])}")
+        print(f"   Signals: {', '.join(header['signals'])}")
+        for key, value in header["metadata"].items():
+            print(f"   {key}: {value}")
+    elif args.command == "refit":
+        from EncoderBatchFit import calculate_gains
+
+        for archive in open_archives(args.paths):
+            start = time.perf_counter()
+            gains = calculate_gains(encoder_captures(archive, max_samples=args.max_samples or None))
+            print(f"✅ {archive.path} ({len(archive)} samples, {time.perf_counter() - start:.2f} s)")
+            for axis, values in gains.items():
+                print(f"   {axis}: " + ", ".join(f"{key} {value:.4f}" for key, value in values.items()))
+    elif args.command == "synthetic":
+        write_synthetic(args.path, args.axes, args.frames, chunk_samples=args.chunk_samples)
+        print(f"💾 Wrote {args.path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CLR Bridge - In-memory hand-off of MCDs and machine setup JSON to the Automation1 assemblies
+Description: The .NET interaction elsewhere goes through the filesystem and JSON
+strings (json.dump -> read -> JObject.Parse -> ConvertToMcd -> WriteToFile ->
+ReadFromFile). This bridge builds Newtonsoft JObject trees directly from Python
+dicts and loads/saves MachineControllerDefinition through
+ReadFromStream/WriteToStream on a System.IO.MemoryStream, so MCD bytes move
+between Python and .NET without temp files.
+
+Bytes are copied into and out of pinned .NET byte[] buffers with ctypes.memmove
+rather than element by element. release() and collect_managed() free .NET
+objects deterministically for long-running batches (see BatchRunner).
+
+Usage:
+    python ClrBridge.py benchmark [--repeat 10]
+"""
+
+import os
+import sys
+import json
+import time
+import ctypes
+import argparse
+import tempfile
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "Uncalculated_PRO165.mcd")
+SAMPLE_JSON = os.path.join(BASE_DIR, "Uncalculated_PRO165_converted.json")
+
+class ClrBridge:
+    """
+    Conversions between Python values and the Automation1/Newtonsoft .NET objects.
+
+    Args:
+        controller: An initialized GenerateMCD.AerotechController (its initialize() loads the assemblies).
+    """
+
+    def __init__(self, controller):
+        from System import Array, Byte, Int64, Double, Boolean, String
+        from System.IO import MemoryStream
+        from System.Collections.Generic import List
+        from System.Runtime.InteropServices import GCHandle, GCHandleType
+        from Newtonsoft.Json import Formatting
+        from Newtonsoft.Json.Linq import JObject, JArray, JValue
+
+        self.controller = controller
+        self._Array, self._Byte = Array, Byte
+        self._MemoryStream = MemoryStream
+        self._GCHandle, self._Pinned = GCHandle, GCHandleType.Pinned
+        self._List, self._String = List, String
+        # Formatting.None is not valid Python syntax
+        self._no_formatting = getattr(Formatting, "None")
+        self._JObject, self._JArray, self._JValue = JObject, JArray, JValue
+        # Explicit constructor overloads: a Python int would otherwise be ambiguous between long and double
+        self._jvalue_long = JValue.Overloads[Int64]
+        self._jvalue_double = JValue.Overloads[Double]
+        self._jvalue_bool = JValue.Overloads[Boolean]
+        self._jvalue_string = JValue.Overloads[String]
+
+        definition = controller.MachineControllerDefinition
+        converter = controller.McdFormatConverter
+        self._read_from_stream = definition.GetMethod("ReadFromStream")
+        self._write_to_stream = definition.GetMethod("WriteToStream")
+        self._convert_to_mcd = converter.GetMethod("ConvertToMcd")
+        self._convert_to_json = converter.GetMethod("ConvertToJson")
+        self._calculate = converter.GetMethod("CalculateParameters")
+
+    # --- Bytes ---
+
+    def to_net_bytes(self, data):
+        """Copies Python bytes into a new .NET byte[]."""
+        array = self._Array.CreateInstance(self._Byte, len(data))
+        if data:
+            handle = self._GCHandle.Alloc(array, self._Pinned)
+            try:
+                ctypes.memmove(handle.AddrOfPinnedObject().ToInt64(), bytes(data), len(data))
+            finally:
+                handle.Free()
+        return array
+
+    def from_net_bytes(self, array):
+        """Copies a .NET byte[] into Python bytes."""
+        length = array.Length
+        if not length:
+            return b""
+        handle = self._GCHandle.Alloc(array, self._Pinned)
+        try:
+            return ctypes.string_at(handle.AddrOfPinnedObject().ToInt64(), length)
+        finally:
+            handle.Free()
+
+    # --- JSON ---
+
+    def to_jtoken(self, value):
+        """Converts a Python JSON value (dict, list, str, int, float, bool, None) to a Newtonsoft JToken."""
+        if isinstance(value, dict):
+            jobject = self._JObject()
+            for key, item in value.items():
+                jobject[str(key)] = self.to_jtoken(item)
+            return jobject
+        if isinstance(value, (list, tuple)):
+            jarray = self._JArray()
+            for item in value:
+                jarray.Add(self.to_jtoken(item))
+            return jarray
+        if value is None:
+            return self._JValue.CreateNull()
+        if isinstance(value, bool):
+            return self._jvalue_bool(value)
+        if isinstance(value, int):
+            return self._jvalue_long(value)
+        if isinstance(value, float):
+            return self._jvalue_double(value)
+        return self._jvalue_string(str(value))
+
+    def to_jobject(self, data):
+        """Converts a machine setup dict to a JObject for ConvertToMcd."""
+        if not isinstance(data, dict):
+            raise TypeError("Machine setup JSON must be a dict")
+        return self.to_jtoken(data)
+
+    def from_jtoken(self, token):
+        """Converts a JToken back to Python values."""
+        return json.loads(token.ToString(self._no_formatting))
+
+    # --- MCDs ---
+
+    def new_warnings(self):
+        """Returns an empty List<string> for the converters' warnings argument."""
+        return self._List[self._String]()
+
+    def read_mcd(self, mcd_bytes):
+        """Loads MCD bytes into a MachineControllerDefinition via ReadFromStream."""
+        stream = self._MemoryStream(self.to_net_bytes(mcd_bytes), False)
+        try:
+            mcd_obj = self._read_from_stream.Invoke(None, [stream])
+        finally:
+            stream.Dispose()
+        if mcd_obj is None:
+            raise ValueError("ReadFromStream could not read the MCD")
+        return mcd_obj
+
+    def write_mcd(self, mcd_obj):
+        """Serialises a MachineControllerDefinition to MCD bytes via WriteToStream."""
+        stream = self._MemoryStream()
+        try:
+            self._write_to_stream.Invoke(mcd_obj, [stream])
+            return self.from_net_bytes(stream.ToArray())
+        finally:
+            stream.Dispose()
+
+    def convert_to_mcd(self, data):
+        """Machine setup dict -> (MachineControllerDefinition, warnings)."""
+        warnings = self.new_warnings()
+        mcd_obj = self._convert_to_mcd.Invoke(None, [self.to_jobject(data), warnings])
+        if mcd_obj is None:
+            raise ValueError("ConvertToMcd returned no MCD")
+        return mcd_obj, [str(warning) for warning in warnings]
+
+    def convert_to_json(self, mcd_obj):
+        """MachineControllerDefinition -> (machine setup dict, warnings)."""
+        warnings = self.new_warnings()
+        json_obj = self._convert_to_json.Invoke(None, [mcd_obj, warnings])
+        return self.from_jtoken(json_obj), [str(warning) for warning in warnings]
+
+    def calculate_parameters(self, mcd_obj):
+        """MachineControllerDefinition -> (calculated MachineControllerDefinition, warnings)."""
+        warnings = self.new_warnings()
+        calculated = self._calculate.Invoke(None, [mcd_obj, warnings])
+        return calculated, [str(warning) for warning in warnings]
+
+# --- Releasing .NET objects ---
+
+def clr_loaded():
+    """True once pythonnet has loaded the CLR in this process (never loads it)."""
+    return "clr" in sys.modules and "System" in sys.modules
+
+def release(*objects):
+    """
+    Deterministically releases .NET objects handed to Python: IDisposable objects are
+    disposed and collections (e.g. List<string> warnings, JObject trees) are cleared,
+    so their managed memory does not wait for Python to drop the proxies.
+    Python values and None are ignored.
+    """
+    for obj in objects:
+        if obj is None or isinstance(obj, (str, bytes, int, float, bool, list, dict, tuple)):
+            continue
+        try:
+            if hasattr(obj, "Dispose"):
+                obj.Dispose()
+            elif hasattr(obj, "Clear"):
+                obj.Clear()
+        except Exception:
+            # Already disposed or read-only; nothing more to release
+            pass
+
+def managed_heap_bytes():
+    """Bytes allocated on the managed heap, or None if the CLR is not loaded."""
+    if not clr_loaded():
+        return None
+    from System import GC
+    return int(GC.GetTotalMemory(False))
+
+def collect_managed():
+    """Runs a full blocking .NET collection including finalizers. Returns managed heap bytes afterwards (or None)."""
+    if not clr_loaded():
+        return None
+    from System import GC
+    GC.Collect()
+    GC.WaitForPendingFinalizers()
+    GC.Collect()
+    return int(GC.GetTotalMemory(False))
+
+def create_bridge(output_dir=BASE_DIR):
+    """Initializes a GenerateMCD controller (loading the CLR) and returns a ClrBridge on it."""
+    from GenerateMCD import AerotechController
+    import MCDProcessing
+
+    controller = AerotechController(output_dir, MCDProcessing.MS_DLL_PATH, MCDProcessing.CONFIG_MANAGER_PATH, None)
+    controller.initialize()
+    return ClrBridge(controller)
+
+# --- Benchmark ---
+
+def path_operations(bridge, work_dir, data, mcd_bytes):
+    """The file- and string-based flow used by test_MS / GenerateMCD, for comparison."""
+    controller = bridge.controller
+    definition = controller.MachineControllerDefinition
+    read_from_file = definition.GetMethod("ReadFromFile")
+    write_to_file = definition.GetMethod("WriteToFile")
+    convert_to_mcd = controller.McdFormatConverter.GetMethod("ConvertToMcd")
+    json_path = os.path.join(work_dir, "bench.json")
+    mcd_path = os.path.join(work_dir, "bench.mcd")
+
+    def json_to_mcd_bytes():
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        with open(json_path, "r", encoding="utf-8") as f:
+            jobject = controller.JObject.Parse(f.read())
+        mcd_obj = convert_to_mcd.Invoke(None, [jobject, bridge.new_warnings()])
+        write_to_file.Invoke(mcd_obj, [mcd_path])
+        with open(mcd_path, "rb") as f:
+            return f.read()
+
+    def bytes_to_mcd():
+        with open(mcd_path, "wb") as f:
+            f.write(mcd_bytes)
+        return read_from_file.Invoke(None, [mcd_path])
+
+    return {"json_to_mcd_bytes": json_to_mcd_bytes, "mcd_bytes_to_object": bytes_to_mcd}
+
+def bridge_operations(bridge, data, mcd_bytes):
+    """The same operations through the in-memory bridge."""
+    return {
+        "json_to_mcd_bytes": lambda: bridge.write_mcd(bridge.convert_to_mcd(data)[0]),
+        "mcd_bytes_to_object": lambda: bridge.read_mcd(mcd_bytes),
+    }
+
+def benchmark(bridge, repeat=10, json_path=SAMPLE_JSON, mcd_path=SAMPLE_MCD):
+    """
+    Times the path-based and bridge flows on the sample MCD/JSON.
+
+    Returns:
+        list: dicts with operation, flow ("path" or "bridge"), median_s and min_s.
+    """
+    with open(json_path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f)
+    with open(mcd_path, "rb") as f:
+        mcd_bytes = f.read()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        flows = (("path", path_operations(bridge, work_dir, data, mcd_bytes)),
+                 ("bridge", bridge_operations(bridge, data, mcd_bytes)))
+        for flow, operations in flows:
+            for operation, run in operations.items():
+                run()  # warm up JIT and type caches
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - start)
+                results.append({"operation": operation, "flow": flow,
+                                "median_s": statistics.median(timings), "min_s": min(timings)})
+    return results
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="In-memory .NET bridge for MCDs and machine setup JSON.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser("benchmark", help="Compare the path-based and in-memory flows")
+    bench_parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        bridge = create_bridge()
+    except Exception as e:
+        print(f"❌ Could not load the Automation1 assemblies: {e}")
+        return 1
+
+    if args.command == "benchmark":
+        results = benchmark(bridge, args.repeat)
+        print(f"{'Operation':<24}{'Flow':<10}{'Median ms':>12}{'Min ms':>12}")
+        print("-" * 58)
+        for result in results:
+            print(f"{result['operation']:<24}{result['flow']:<10}"
+                  f"{result['median_s'] * 1000:>12.2f}{result['min_s'] * 1000:>12.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controller Connection - Connects to an Automation1 controller and discovers its axes
+Description: Shared connection and axis discovery logic used by MCDPayloadUI and
+the offline tooling. Every function takes the Automation1 API module as `api`
+so the same code runs against `automation1` or the local ControllerSimulator.
+"""
+
+# Axis status bit that is set for real (non-virtual) connected axes
+CONNECTED_AXIS_STATUS_BIT = 13
+
+# Parameter name prefix -> API category; names matching none are "protection" or "motion"
+_CATEGORY_PREFIXES = (
+    ("AxisName", "identification"), ("ServoLoop", "servoloop"), ("CurrentLoop", "currentloop"),
+    ("Feedforward", "feedforward"), ("Home", "homing"), ("Joystick", "joystick"),
+    ("Primary", "feedback"), ("Feedback", "feedback"), ("Auxiliary", "feedback"),
+    ("CountsPerUnit", "units"), ("Units", "units"), ("Motor", "motor"),
+)
+PARAMETER_CATEGORIES = tuple(dict.fromkeys([category for _, category in _CATEGORY_PREFIXES]
+                                           + ["protection", "motion"]))
+
+def parameter_category(name):
+    """
+    Returns the API category attribute a parameter most likely lives under (e.g. servoloop for
+    ServoLoopGainK). The guess is by name; see PARAMETER_CATEGORIES for every category.
+    """
+    for prefix, category in _CATEGORY_PREFIXES:
+        if name.startswith(prefix):
+            return category
+    if name.endswith("Threshold") or name in ("FaultMask", "MaxCurrentClamp", "EndOfTravelLimitSetup"):
+        return "protection"
+    return "motion"
+
+def _connect_network(api, host=None):
+    """Connects over Hyperwire/Ethernet, to a specific host when one is given."""
+    return api.Controller.connect(host=host) if host else api.Controller.connect()
+
+def connect(api, connection_type="auto", confirm_usb=None, host=None):
+    """
+    Connects to and starts a controller.
+
+    Args:
+        api: The Automation1 API module (automation1 or ControllerSimulator).
+        connection_type (str): "auto", "usb" or "hyperwire".
+        confirm_usb (callable): In auto mode, called when Hyperwire fails; return True to try USB.
+        host (str): Controller address for Hyperwire/Ethernet connections (default: the local controller).
+
+    Returns:
+        The started controller.
+    """
+    if connection_type == "usb":
+        try:
+            controller = api.Controller.connect_usb()
+            controller.start()
+        except:
+            raise Exception('USB connection failed. Check connections and try again.')
+    elif connection_type == "hyperwire":
+        try:
+            controller = _connect_network(api, host)
+            controller.start()
+        except:
+            raise Exception('Hyperwire connection failed. Check Firmware version and try again.')
+    else:  # auto
+        try:
+            controller = _connect_network(api, host)
+            controller.start()
+        except:
+            if confirm_usb is not None and confirm_usb():
+                try:
+                    controller = api.Controller.connect_usb()
+                    controller.start()
+                except:
+                    raise Exception('USB connection failed. Check connections and try again.')
+            else:
+                raise Exception('Hyperwire connection failed. Check Firmware version and try again.')
+    return controller
+
+def probe_range(number_of_axes):
+    """Returns the axis indices probed for a controller reporting number_of_axes axes."""
+    return range(0, 11) if number_of_axes <= 12 else range(0, 32)
+
+def connected_axis_indices(controller, api, axis_indices):
+    """
+    Reads the status of several axes in one get_status_items round trip.
+
+    Returns:
+        list: The indices whose connected bit is set, in index order.
+    """
+    axis_indices = list(axis_indices)
+    status_item_configuration = api.StatusItemConfiguration()
+    for axis_index in axis_indices:
+        status_item_configuration.axis.add(api.AxisStatusItem.AxisStatus, axis_index)
+
+    result = controller.runtime.status.get_status_items(status_item_configuration)
+    connected = []
+    for axis_index in axis_indices:
+        axis_status = int(result.axis.get(api.AxisStatusItem.AxisStatus, axis_index).value)
+        if (axis_status & 1 << CONNECTED_AXIS_STATUS_BIT) > 0:
+            connected.append(axis_index)
+    return connected
+
+def discover_axes(controller, api):
+    """
+    Probes each axis status for the connected bit and reads the axis names.
+
+    Returns:
+        dict: Axis name -> axis index for every real (non-virtual) axis, in index order.
+    """
+    number_of_axes = controller.runtime.parameters.axes.count
+    return {controller.runtime.parameters.axes[axis_index].identification.axisname.value: axis_index
+            for axis_index in connected_axis_indices(controller, api, probe_range(number_of_axes))}
+
+def establish_connection(api, connection_type="auto", confirm_usb=None, host=None, topology_cache=None):
+    """
+    Connects to a controller and returns it with its non-virtual axes.
+    Falls back to a USB connection when no real axes are found (unless a specific host was asked for).
+
+    Args:
+        topology_cache (TopologyCache): Reuses the axis map from an earlier connection when it still holds.
+
+    Returns:
+        tuple: (controller, list of non-virtual axis names)
+    """
+    def discover(controller, connection):
+        if topology_cache is not None:
+            return topology_cache.discover(controller, api, connection)
+        return discover_axes(controller, api)
+
+    controller = connect(api, connection_type, confirm_usb, host)
+    connected_axes = discover(controller, host or connection_type)
+
+    if len(connected_axes) == 0 and not host:
+        # Try USB connection
+        controller = api.Controller.connect_usb()
+        connected_axes = discover(controller, "usb")
+
+    return controller, list(connected_axes.keys())
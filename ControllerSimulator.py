@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Controller Simulator - In-process stand-in for the Automation1 controller API
+Description: Implements the subset of the `automation1` module used by this
+project (Controller.connect/connect_usb/start, runtime.parameters.axes,
+runtime.status.get_status_items, StatusItemConfiguration, AxisStatusItem) plus
+batched parameter reads/writes (runtime.parameters.get_axis_parameter_values /
+set_axis_parameter_values, used by ParameterSync when available) so
+connection, axis discovery and batch flows can be measured and load-tested
+without hardware. The module can be used as a drop-in replacement:
+
+    import ControllerSimulator as a1
+    ControllerSimulator.configure(axis_count=32, connected_axes=range(8), latency_s=0.002)
+    controller = a1.Controller.connect()
+
+Axis count, which axes report the connected status bit (bit 13), axis names,
+parameter values and per-call latency/jitter are all configurable. Setting the
+MCD_CONTROLLER_SIMULATOR environment variable makes MCDPayloadUI use this module
+instead of `automation1`.
+"""
+
+import sys
+import time
+import random
+import zipfile
+import argparse
+import threading
+import statistics
+
+import MCDXml
+import SyntheticMCD
+from ControllerConnection import CONNECTED_AXIS_STATUS_BIT, establish_connection, parameter_category
+
+MAX_AXES = 32
+
+class SimulatorConfig:
+    """Configuration of the simulated controller."""
+    def __init__(self, axis_count=12, connected_axes=(0, 1), axis_names=None, controller_name="Simulated Controller",
+                 latency_s=0.0, jitter_s=0.0, hyperwire_available=True, usb_available=True, parameters=None, seed=0,
+                 max_batch_size=128):
+        """
+        Args:
+            axis_count (int): Number of axes reported by runtime.parameters.axes.count.
+            connected_axes (iterable): Axis indices that report the connected status bit.
+            axis_names (list): Axis names by index (defaults to X, Y, Z, ...).
+            controller_name (str): Value of controller.name.
+            latency_s (float): Base latency applied to every simulated controller round trip.
+            jitter_s (float): Maximum random latency added on top of latency_s.
+            hyperwire_available (bool): Whether Controller.connect() succeeds.
+            usb_available (bool): Whether Controller.connect_usb() succeeds.
+            parameters (dict): Axis index -> {parameter name: value}; defaults to the synthetic template.
+            seed (int): Seed for the jitter generator.
+            max_batch_size (int): Most parameters accepted by one batched read or write.
+        """
+        self.axis_count = axis_count
+        self.connected_axes = set(connected_axes)
+        self.axis_names = list(axis_names) if axis_names else [SyntheticMCD.axis_name(i) for i in range(axis_count)]
+        self.controller_name = controller_name
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.hyperwire_available = hyperwire_available
+        self.usb_available = usb_available
+        self.parameters = parameters
+        self.seed = seed
+        self.max_batch_size = max_batch_size
+
+    @classmethod
+    def from_mcd(cls, mcd_path, **kwargs):
+        """Builds a configuration whose axes, names and parameter values come from an MCD file."""
+        with zipfile.ZipFile(mcd_path, 'r') as mcd_zip:
+            root = MCDXml.fromstring(mcd_zip.read("config/Parameters"))
+        parameters = {}
+        for axis in MCDXml.AXES(root):
+            parameters[int(axis.get("Index"))] = {p.get("n"): p.text for p in MCDXml.AXIS_PARAMETERS(axis) if p.get("n")}
+        axis_count = max(kwargs.pop("axis_count", 1), max(parameters) + 1 if parameters else 1)
+        names = [parameters.get(i, {}).get("AxisName", SyntheticMCD.axis_name(i)) for i in range(axis_count)]
+        kwargs.setdefault("connected_axes", sorted(parameters))
+        return cls(axis_count=axis_count, axis_names=names, parameters=parameters, **kwargs)
+
+_config = SimulatorConfig()
+_host_configs = {}
+_config_lock = threading.Lock()
+
+def configure(**kwargs):
+    """Replaces the active simulator configuration and returns it."""
+    global _config
+    with _config_lock:
+        _config = kwargs.pop("config", None) or SimulatorConfig(**kwargs)
+    return _config
+
+def configure_host(host, **kwargs):
+    """Sets the configuration of the simulated controller at a network address (for multi-controller cells)."""
+    config = kwargs.pop("config", None) or SimulatorConfig(**kwargs)
+    with _config_lock:
+        _host_configs[host] = config
+    return config
+
+def get_config(host=None):
+    """Returns the configuration of the controller at host, or the active configuration."""
+    return _host_configs.get(host, _config)
+
+# --- API enumerations ---
+
+class AxisStatusItem:
+    """Axis status items available from get_status_items."""
+    AxisStatus = "AxisStatus"
+
+class RoundTripCounter:
+    """Counts simulated controller round trips, the latency spent on them and the payload bytes sent."""
+    def __init__(self):
+        self.calls = {}
+        self.simulated_time_s = 0.0
+        self.payload_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, name, delay, payload_bytes=0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.simulated_time_s += delay
+            self.payload_bytes += payload_bytes
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+# --- Status ---
+
+class _AxisStatusRequest:
+    """The `axis` collection of a StatusItemConfiguration."""
+    def __init__(self):
+        self.items = []
+
+    def add(self, item, axis_index):
+        self.items.append((item, axis_index))
+
+class StatusItemConfiguration:
+    """Selects which status items get_status_items returns."""
+    def __init__(self):
+        self.axis = _AxisStatusRequest()
+
+class _StatusValue:
+    def __init__(self, value):
+        self.value = value
+
+class _AxisStatusResults:
+    def __init__(self, values):
+        self._values = values
+
+    def get(self, item, axis_index):
+        return _StatusValue(self._values[(item, axis_index)])
+
+class _StatusItemResults:
+    def __init__(self, values):
+        self.axis = _AxisStatusResults(values)
+
+class _RuntimeStatus:
+    def __init__(self, controller):
+        self._controller = controller
+
+    def get_status_items(self, status_item_configuration):
+        """Returns all requested items in a single round trip."""
+        controller = self._controller
+        controller._round_trip("get_status_items")
+        values = {}
+        for item, axis_index in status_item_configuration.axis.items:
+            if not 0 <= axis_index < MAX_AXES:
+                raise IndexError(f"Axis index {axis_index} is out of range")
+            # Axes beyond axis_count behave like unconfigured virtual axes
+            connected = axis_index in controller.config.connected_axes
+            values[(item, axis_index)] = float(1 << CONNECTED_AXIS_STATUS_BIT) if connected else 0.0
+        return _StatusItemResults(values)
+
+# --- Parameters ---
+
+class _Parameter:
+    """A single axis parameter; every .value read or write is one controller round trip."""
+    def __init__(self, controller, store, name):
+        self._controller = controller
+        self._store = store
+        self._name = name
+
+    @property
+    def value(self):
+        self._controller._round_trip("parameter_read")
+        return self._store[self._name]
+
+    @value.setter
+    def value(self, new_value):
+        self._controller._round_trip("parameter_write", len(f"{self._name}={new_value}"))
+        self._store[self._name] = new_value
+
+class _ParameterCategory:
+    def __init__(self, controller, store, category):
+        self._controller = controller
+        self._store = store
+        self._category = category
+
+    def __getattr__(self, attribute):
+        for name in self._store:
+            if name.lower() == attribute and parameter_category(name) == self._category:
+                return _Parameter(self._controller, self._store, name)
+        raise AttributeError(f"No parameter '{attribute}' in category '{self._category}'")
+
+class _AxisParameters:
+    def __init__(self, controller, store):
+        self._controller = controller
+        self._store = store
+
+    def __getattr__(self, category):
+        if category.startswith("_"):
+            raise AttributeError(category)
+        return _ParameterCategory(self._controller, self._store, category)
+
+class _AxesParameters:
+    def __init__(self, controller):
+        self._controller = controller
+
+    @property
+    def count(self):
+        self._controller._round_trip("axes_count")
+        return self._controller.config.axis_count
+
+    def __getitem__(self, axis):
+        config = self._controller.config
+        index = config.axis_names.index(axis) if isinstance(axis, str) else axis
+        if not 0 <= index < config.axis_count:
+            raise IndexError(f"Axis index {index} is out of range")
+        return _AxisParameters(self._controller, self._controller._axis_store(index))
+
+class _RuntimeParameters:
+    def __init__(self, controller):
+        self._controller = controller
+        self.axes = _AxesParameters(controller)
+
+    def _check_batch(self, items):
+        config = self._controller.config
+        if len(items) > config.max_batch_size:
+            raise ValueError(f"Batch of {len(items)} parameters exceeds the limit of {config.max_batch_size}")
+        for item in items:
+            if not 0 <= item[0] < config.axis_count:
+                raise IndexError(f"Axis index {item[0]} is out of range")
+
+    def get_axis_parameter_values(self, requests):
+        """
+        Reads several axis parameters in one round trip.
+
+        Args:
+            requests (list): (axis index, parameter name) pairs.
+
+        Returns:
+            list: The values in request order.
+        """
+        self._check_batch(requests)
+        self._controller._round_trip("parameter_batch_read", sum(len(name) + 2 for _, name in requests))
+        return [self._controller._axis_store(axis)[name] for axis, name in requests]
+
+    def set_axis_parameter_values(self, values):
+        """
+        Writes several axis parameters in one round trip.
+
+        Args:
+            values (list): (axis index, parameter name, value) triples.
+        """
+        self._check_batch(values)
+        for axis, name, _ in values:
+            if name not in self._controller._axis_store(axis):
+                raise KeyError(f"Axis {axis} has no parameter '{name}'")
+        self._controller._round_trip("parameter_batch_write",
+                                     sum(len(f"{name}={value}") + 2 for _, name, value in values))
+        for axis, name, value in values:
+            self._controller._axis_store(axis)[name] = value
+
+class _Runtime:
+    def __init__(self, controller):
+        self.parameters = _RuntimeParameters(controller)
+        self.status = _RuntimeStatus(controller)
+
+# --- Controller ---
+
+class Controller:
+    """Simulated automation1.Controller."""
+    def __init__(self, config, connection):
+        self.config = config
+        self.connection = connection
+        self.name = config.controller_name
+        self.is_running = False
+        self.round_trips = RoundTripCounter()
+        self.runtime = _Runtime(self)
+        self._rng = random.Random(config.seed)
+        self._parameters = {}
+
+    @classmethod
+    def connect(cls, host="localhost", port=12200):
+        """Connects over Hyperwire/Ethernet."""
+        config = get_config(host)
+        controller = cls(config, "hyperwire")
+        controller._round_trip("connect")
+        if not config.hyperwire_available:
+            raise ConnectionError(f"Could not connect to the controller at {host}:{port}")
+        return controller
+
+    @classmethod
+    def connect_usb(cls):
+        """Connects over USB."""
+        config = get_config()
+        controller = cls(config, "usb")
+        controller._round_trip("connect_usb")
+        if not config.usb_available:
+            raise ConnectionError("Could not connect to the controller over USB")
+        return controller
+
+    def start(self):
+        self._round_trip("start")
+        self.is_running = True
+
+    def stop(self):
+        self._round_trip("stop")
+        self.is_running = False
+
+    def disconnect(self):
+        self.is_running = False
+
+    def _round_trip(self, name, payload_bytes=0):
+        """Sleeps for the configured latency plus jitter and records the call."""
+        delay = self.config.latency_s
+        if self.config.jitter_s:
+            delay += self._rng.uniform(0, self.config.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+        self.round_trips.record(name, delay, payload_bytes)
+
+    def _axis_store(self, index):
+        """Returns (creating on first use) the parameter values of an axis."""
+        if index not in self._parameters:
+            configured = (self.config.parameters or {}).get(index)
+            if configured is not None:
+                store = dict(configured)
+            else:
+                store = {name: value for _, name, value in SyntheticMCD.PARAMETER_TEMPLATE}
+            store["AxisName"] = self.config.axis_names[index]
+            self._parameters[index] = store
+        return self._parameters[index]
+
+# --- Load test ---
+
+def load_test(axis_counts=(4, 12, 32), connected=2, latency_s=0.002, jitter_s=0.001, iterations=5):
+    """
+    Times connect + axis discovery through ControllerConnection against the simulator.
+
+    Returns:
+        list of dict: One row per axis count with timing and round trip statistics.
+    """
+    rows = []
+    for axis_count in axis_counts:
+        configure(axis_count=axis_count, connected_axes=range(min(connected, axis_count)),
+                  latency_s=latency_s, jitter_s=jitter_s)
+        timings = []
+        round_trips = 0
+        axes = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            controller, axes = establish_connection(sys.modules[__name__], "hyperwire")
+            timings.append(time.perf_counter() - start)
+            round_trips = controller.round_trips.total
+        rows.append({
+            "axis_count": axis_count,
+            "axes_found": axes,
+            "median_s": statistics.median(timings),
+            "max_s": max(timings),
+            "round_trips": round_trips,
+        })
+    return rows
+
+def main():
+    """Command line entry point: runs the connection/discovery load test."""
+    parser = argparse.ArgumentParser(description="Load-test controller connection and axis discovery offline.")
+    parser.add_argument("--axis-counts", default="4,12,32", help="Comma separated axis counts to simulate")
+    parser.add_argument("--connected", type=int, default=2, help="Number of real (bit 13) axes")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Per-call latency in milliseconds")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="Maximum per-call jitter in milliseconds")
+    parser.add_argument("--iterations", type=int, default=5, help="Connections per axis count")
+    args = parser.parse_args()
+
+    axis_counts = [int(c) for c in args.axis_counts.split(",") if c.strip()]
+    rows = load_test(axis_counts, args.connected, args.latency_ms / 1000.0, args.jitter_ms / 1000.0, args.iterations)
+
+    print(f"{'Axes':>6}{'Found':>8}{'Round trips':>14}{'Median ms':>12}{'Max ms':>10}")
+    print("-" * 50)
+    for row in rows:
+        print(f"{row['axis_count']:>6}{len(row['axes_found']):>8}{row['round_trips']:>14}"
+              f"{row['median_s'] * 1000:>12.1f}{row['max_s'] * 1000:>10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
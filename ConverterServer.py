@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Converter Server - Resident .NET converter service with a pipelining client
+Description: Every script that uses the Automation1 converters starts CoreCLR,
+adds the Automation1/ConfigurationManager references and resolves
+McdFormatConverter and MachineControllerDefinition before doing any work. This
+server does that once and keeps the runtime warm, serving ConvertToMcd,
+CalculateParameters, ReadFromFile and ConvertToJson on MCD bytes and JSON text
+over multiprocessing.connection (localhost TCP by default, or a Unix domain socket).
+
+ConverterClient sends requests without waiting for each reply (up to `window`
+in flight), so batch tools pay one round trip per window rather than per file.
+
+The connection handshake uses a random per-user key, created on first use in
+~/.mcd_converter/authkey with mode 0600 (MCD_CONVERTER_HOME moves the folder,
+MCD_CONVERTER_AUTHKEY supplies the key directly), since requests are unpickled
+by the server. A server started by connect() logs to ~/.mcd_converter/server.log.
+
+Usage:
+    python ConverterServer.py serve [--address 127.0.0.1:47651 | --socket /tmp/mcd-converter.sock]
+    python ConverterServer.py ping
+    python ConverterServer.py json "Uncalculated_PRO165.mcd" "PRO165LM.mcd" [--output-dir out]
+    python ConverterServer.py mcd InterconnectedAxisExample.json output.mcd
+    python ConverterServer.py calculate "PRO165LM XY-No Load.mcd" calculated.mcd
+    python ConverterServer.py stop
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import secrets
+import argparse
+import tempfile
+import threading
+import subprocess
+from multiprocessing.connection import Listener, Client
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ADDRESS = ("127.0.0.1", 47651)
+KEY_FILE_NAME = "authkey"
+LOG_FILE_NAME = "server.log"
+DEFAULT_WINDOW = 8
+
+class ConverterError(Exception):
+    """Raised by ConverterClient when the server reports a failed request."""
+
+def parse_address(text):
+    """Parses "host:port" to a tuple; anything else is treated as a Unix socket path."""
+    if text is None:
+        text = os.environ.get("MCD_CONVERTER_ADDRESS")
+    if not text:
+        return DEFAULT_ADDRESS
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return (host or DEFAULT_ADDRESS[0], int(port))
+    return text
+
+def state_dir():
+    """Per-user folder for the key and server log (MCD_CONVERTER_HOME overrides ~/.mcd_converter)."""
+    return os.environ.get("MCD_CONVERTER_HOME") or os.path.join(os.path.expanduser("~"), ".mcd_converter")
+
+def _authkey():
+    """
+    Shared secret for the connection handshake: MCD_CONVERTER_AUTHKEY, or the per-user key file,
+    created with 32 random bytes on first use. Raises PermissionError if other users can read the file.
+    """
+    key = os.environ.get("MCD_CONVERTER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    directory = state_dir()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    path = os.path.join(directory, KEY_FILE_NAME)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.name == "posix" and os.stat(path).st_mode & 0o077:
+            raise PermissionError(f"{path} is readable by other users; run chmod 600 on it")
+        with open(path, "rb") as f:
+            return f.read()
+    key = secrets.token_bytes(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+# --- Server ---
+
+class ConverterService:
+    """Holds an initialized AerotechController and runs the .NET operations on bytes."""
+
+    def __init__(self, work_dir):
+        import ClrBridge
+
+        # MCDs and JSON go through the in-memory bridge; work_dir is only the controller's base_dir
+        self.bridge = ClrBridge.create_bridge(work_dir)
+
+        # The .NET converters are not documented as thread-safe; one request runs at a time
+        self._lock = threading.Lock()
+
+    def _from_json(self, json_data):
+        """Runs ConvertToMcd on JSON text or a dict. Returns (MCD object, warnings)."""
+        if isinstance(json_data, str):
+            json_data = json.loads(json_data)
+        return self.bridge.convert_to_mcd(json_data)
+
+    def handle(self, request):
+        """
+        Runs one request.
+
+        Returns:
+            dict: The result fields for the response (warnings included where the operation produces them).
+        """
+        op = request["op"]
+        if op == "ping":
+            return {"pid": os.getpid()}
+
+        bridge = self.bridge
+        with self._lock:
+            warnings = []
+            if op == "convert_to_mcd":
+                mcd_obj, warnings = self._from_json(request["json"])
+                result = {"mcd": bridge.write_mcd(mcd_obj)}
+            elif op == "calculate_parameters":
+                if "json" in request:
+                    mcd_obj, warnings = self._from_json(request["json"])
+                else:
+                    mcd_obj = bridge.read_mcd(request["mcd"])
+                calculated, calculation_warnings = bridge.calculate_parameters(mcd_obj)
+                result = {"mcd": bridge.write_mcd(calculated)}
+                warnings = warnings + calculation_warnings
+            elif op == "read_from_file":
+                mcd_obj = bridge.read_mcd(request["mcd"])
+                result = {"readable": True, "description": str(mcd_obj)}
+            elif op == "convert_to_json":
+                data, warnings = bridge.convert_to_json(bridge.read_mcd(request["mcd"]))
+                result = {"json": json.dumps(data, indent=2)}
+            else:
+                raise ValueError(f"Unknown operation: {op}")
+            result["warnings"] = warnings
+            return result
+
+class ConverterServer:
+    """Accepts client connections and answers their requests in order on each connection."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        self.address = address
+        self.authkey = authkey or _authkey()
+        self.stop_event = threading.Event()
+        self.service = None
+        self.listener = None
+
+    def _serve_connection(self, conn):
+        """
+        Reads requests continuously on one thread and answers them on another, so a
+        pipelining client never blocks sending while the server is blocked replying.
+        """
+        pending = queue.Queue()
+
+        def reader():
+            try:
+                while True:
+                    pending.put(conn.recv())
+            except (EOFError, OSError):
+                pending.put(None)
+
+        threading.Thread(target=reader, daemon=True).start()
+        try:
+            while True:
+                request = pending.get()
+                if request is None:
+                    break
+                start = time.perf_counter()
+                response = {"id": request.get("id")}
+                try:
+                    if request.get("op") == "shutdown":
+                        response.update(ok=True, result={})
+                        self.stop_event.set()
+                    else:
+                        response.update(ok=True, result=self.service.handle(request))
+                except Exception as e:
+                    response.update(ok=False, error=f"{type(e).__name__}: {e}")
+                response["elapsed_ms"] = (time.perf_counter() - start) * 1000
+                conn.send(response)
+                if self.stop_event.is_set():
+                    self._wake_listener()
+                    break
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _wake_listener(self):
+        """Connects to our own listener so serve_forever's blocking accept() returns and sees the stop."""
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        """Loads the .NET runtime, then serves until a shutdown request or Ctrl+C."""
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory(prefix="mcd-converter-") as work_dir:
+            self.service = ConverterService(work_dir)
+            print(f"✅ .NET runtime warm in {time.perf_counter() - start:.2f} s")
+
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)  # stale socket from a previous run
+            self.listener = Listener(self.address, authkey=self.authkey)
+            print(f"👀 Converter server listening on {self.address}")
+            try:
+                while not self.stop_event.is_set():
+                    try:
+                        conn = self.listener.accept()
+                    except Exception as e:
+                        print(f"⚠️ Rejected connection: {e}")
+                        continue
+                    if self.stop_event.is_set():
+                        conn.close()
+                        break
+                    threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                self.listener.close()
+        print("🛑 Converter server stopped")
+
+# --- Client ---
+
+def _read_bytes(mcd):
+    """Accepts MCD bytes or a path."""
+    if isinstance(mcd, (bytes, bytearray)):
+        return bytes(mcd)
+    with open(mcd, "rb") as f:
+        return f.read()
+
+class ConverterClient:
+    """
+    Thin client for ConverterServer.
+
+    Single calls return the operation's result dict and raise ConverterError on failure;
+    pipeline() streams many requests with up to `window` outstanding.
+    """
+
+    def __init__(self, address=None, authkey=None, window=DEFAULT_WINDOW):
+        self.address = parse_address(address) if not isinstance(address, tuple) else address
+        self.window = max(1, window)
+        self.conn = Client(self.address, authkey=authkey or _authkey())
+        self._next_id = 0
+
+    def close(self):
+        """Closes the connection."""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, op, fields):
+        """Sends one request and returns its id."""
+        self._next_id += 1
+        request = {"id": self._next_id, "op": op}
+        request.update(fields)
+        self.conn.send(request)
+        return self._next_id
+
+    def pipeline(self, requests):
+        """
+        Sends requests without waiting for each reply and yields the responses in order.
+
+        Args:
+            requests (iterable): (op, fields dict) pairs.
+
+        Yields:
+            dict: Responses with id, ok, result or error, and elapsed_ms (server-side time).
+        """
+        in_flight = 0
+        for op, fields in requests:
+            if in_flight >= self.window:
+                yield self.conn.recv()
+                in_flight -= 1
+            self._send(op, fields)
+            in_flight += 1
+        while in_flight:
+            yield self.conn.recv()
+            in_flight -= 1
+
+    def call(self, op, **fields):
+        """Runs one request and returns its result, raising ConverterError if it failed."""
+        response = next(self.pipeline([(op, fields)]))
+        if not response["ok"]:
+            raise ConverterError(response["error"])
+        return response["result"]
+
+    def ping(self):
+        """Returns the server's process id."""
+        return self.call("ping")["pid"]
+
+    def convert_to_mcd(self, json_data):
+        """JSON text or dict -> (non-calculated MCD bytes, warnings)."""
+        result = self.call("convert_to_mcd", json=json_data)
+        return result["mcd"], result["warnings"]
+
+    def calculate_parameters(self, mcd=None, json_data=None):
+        """MCD bytes/path, or machine setup JSON -> (calculated MCD bytes, warnings)."""
+        fields = {"json": json_data} if json_data is not None else {"mcd": _read_bytes(mcd)}
+        result = self.call("calculate_parameters", **fields)
+        return result["mcd"], result["warnings"]
+
+    def read_from_file(self, mcd):
+        """Checks that ReadFromFile accepts an MCD. Returns the .NET object's description."""
+        return self.call("read_from_file", mcd=_read_bytes(mcd))["description"]
+
+    def convert_to_json(self, mcd):
+        """MCD bytes/path -> (JSON text, warnings)."""
+        result = self.call("convert_to_json", mcd=_read_bytes(mcd))
+        return result["json"], result["warnings"]
+
+    def convert_many_to_json(self, mcds):
+        """Pipelined convert_to_json over many MCDs. Yields (JSON text or None, warnings or error)."""
+        requests = (("convert_to_json", {"mcd": _read_bytes(mcd)}) for mcd in mcds)
+        for response in self.pipeline(requests):
+            if response["ok"]:
+                yield response["result"]["json"], response["result"]["warnings"]
+            else:
+                yield None, response["error"]
+
+    def shutdown(self):
+        """Asks the server to exit."""
+        self.call("shutdown")
+
+def connect(address=None, start=True, timeout_s=60.0, window=DEFAULT_WINDOW):
+    """
+    Connects to a running server, optionally starting one in the background first.
+
+    Args:
+        address: "host:port", a socket path, or None for MCD_CONVERTER_ADDRESS / the default.
+        start (bool): Launch `ConverterServer.py serve` if nothing is listening.
+        timeout_s (float): How long to wait for a newly started server to warm up.
+
+    Returns:
+        ConverterClient
+    """
+    address = parse_address(address)
+    try:
+        return ConverterClient(address, window=window)
+    except (ConnectionRefusedError, FileNotFoundError):
+        if not start:
+            raise
+
+    address_arg = address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+    option = "--socket" if isinstance(address, str) else "--address"
+    _authkey()  # create the key before the server and client both look for it
+    log_path = os.path.join(state_dir(), LOG_FILE_NAME)
+    with open(log_path, "ab") as log:
+        log.write(f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S')} starting converter server on {address_arg}\n".encode())
+        log.flush()
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", option, address_arg],
+                                  cwd=CURRENT_DIR, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            return ConverterClient(address, window=window)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if server.poll() is not None:
+                raise RuntimeError(f"Converter server exited with code {server.returncode} during start-up; "
+                                   f"see {log_path}:\n{_log_tail(log_path)}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Converter server did not start on {address} within {timeout_s:.0f} s; "
+                                   f"see {log_path}")
+            time.sleep(0.25)
+
+def _log_tail(path, lines=10):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+# --- Command line ---
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Resident Automation1 converter server and client.")
+    parser.add_argument("--address", help="host:port (default 127.0.0.1:47651 or MCD_CONVERTER_ADDRESS)")
+    parser.add_argument("--socket", help="Unix domain socket path instead of TCP")
+    parser.add_argument("--no-start", action="store_true", help="Client commands: do not start a server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("serve", help="Run the server in the foreground")
+    subparsers.add_parser("ping", help="Check that a server is running")
+    subparsers.add_parser("stop", help="Shut the server down")
+    json_parser = subparsers.add_parser("json", help="MCD -> JSON (ConvertToJson)")
+    json_parser.add_argument("mcd", nargs="+")
+    json_parser.add_argument("--output-dir", help="Folder for <name>.json (default: next to each MCD)")
+    mcd_parser = subparsers.add_parser("mcd", help="JSON -> non-calculated MCD (ConvertToMcd)")
+    mcd_parser.add_argument("json")
+    mcd_parser.add_argument("output")
+    calc_parser = subparsers.add_parser("calculate", help="MCD -> calculated MCD (CalculateParameters)")
+    calc_parser.add_argument("mcd")
+    calc_parser.add_argument("output")
+    args = parser.parse_args()
+
+    address = args.socket or parse_address(args.address)
+
+    if args.command == "serve":
+        ConverterServer(address).serve_forever()
+        return 0
+
+    if args.command == "stop":
+        try:
+            with ConverterClient(address) as client:
+                client.shutdown()
+        except (ConnectionRefusedError, FileNotFoundError):
+            print("⚠️ No converter server is running")
+            return 1
+        print("✅ Converter server stopped")
+        return 0
+
+    start = time.perf_counter()
+    try:
+        client = connect(address, start=not args.no_start)
+    except (ConnectionRefusedError, FileNotFoundError, TimeoutError) as e:
+        print(f"❌ Could not reach the converter server: {e}")
+        return 1
+
+    with client:
+        try:
+            if args.command == "ping":
+                print(f"✅ Converter server running (pid {client.ping()})")
+
+            elif args.command == "json":
+                failures = 0
+                for mcd_path, (json_text, detail) in zip(args.mcd, client.convert_many_to_json(args.mcd)):
+                    if json_text is None:
+                        print(f"❌ {mcd_path}: {detail}")
+                        failures += 1
+                        continue
+                    folder = args.output_dir or os.path.dirname(os.path.abspath(mcd_path))
+                    output = os.path.join(folder, os.path.splitext(os.path.basename(mcd_path))[0] + ".json")
+                    with open(output, "w", encoding="utf-8") as f:
+                        f.write(json_text)
+                    print(f"✅ {output}")
+                if failures:
+                    return 1
+
+            elif args.command == "mcd":
+                with open(args.json, "r", encoding="utf-8-sig") as f:
+                    mcd_bytes, warnings = client.convert_to_mcd(f.read())
+                with open(args.output, "wb") as f:
+                    f.write(mcd_bytes)
+                print(f"✅ Non-calculated MCD written: {args.output}")
+                for warning in warnings:
+                    print(f"   ⚠️ {warning}")
+
+            elif args.command == "calculate":
+                mcd_bytes, warnings = client.calculate_parameters(args.mcd)
+                with open(args.output, "wb") as f:
+                    f.write(mcd_bytes)
+                print(f"✅ Calculated MCD written: {args.output}")
+                for warning in warnings:
+                    print(f"   ⚠️ {warning}")
+
+        except ConverterError as e:
+            print(f"❌ {e}")
+            return 1
+
+    print(f"⏱️ {time.perf_counter() - start:.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
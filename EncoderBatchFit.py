@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Encoder Batch Fit - Vectorised multi-axis ellipse fit and phase search for encoder tuning
+Description: EncoderTuning.calculate_final_gains fits one axis at a time: for
+every trial phase of a coarse scan (-30..30 deg in 1 deg steps) and a fine scan
+(+/-1 deg around the best coarse phase in 0.1 deg steps) it corrects the centred
+sine/cosine samples in Python lists and refits the ellipse through EllipseFit.Fit,
+then interpolates the zero crossing of Phi. This module computes the same
+SineGain / SineOffset(mV) / CosineGain / CosineOffset(mV) / Phase(degrees)
+quantities for all axes_to_tune at once:
+
+    - a closed-form direct least-squares conic fit (Fitzgibbon) over stacked,
+      zero-padded sample arrays, solved as one batch of 3x3 eigenproblems;
+    - the phase scans as (axes x phases) array operations. The direct conic fit
+      is equivariant under linear maps, so the ellipse of the corrected samples
+      is obtained by transforming the fitted conic with the correction matrix
+      instead of refitting the samples for every trial phase.
+
+Phi is the tilt (radians) of the ellipse axis nearest the sine axis; Width and
+Height are the semi-axes along and across it, as used for the gains.
+
+The Fitzgibbon fit is a different algorithm from Aerotech's EllipseFit.Fit (.NET),
+which EncoderTuning.fit_ellipse calls, and the two have not been compared on real
+captures: EncoderTuning ships only as bytecode and EllipseFit needs .NET. Results
+can differ from EncoderTuning where noise or harmonics make the fits disagree.
+reference_gains shares the conic fit, so it only checks the vectorised phase
+search; test_EncoderBatchFit.py checks the fit against the known offsets,
+amplitudes and phase error of synthetic captures.
+
+Usage:
+    python EncoderBatchFit.py benchmark [--axes 8] [--samples 10000] [--repeat 5]
+"""
+
+import sys
+import math
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+# Constants of EncoderTuning.calculate_final_gains
+IDEAL_LISSAJOUS_AMPLITUDE = 0.5
+MIN_GAIN = 0.4
+MAX_GAIN = 1.75
+COARSE_PHASES = np.arange(-30, 31, 1.0)
+# Fine scan: +/-1 deg around the best coarse phase in 0.1 deg steps
+FINE_OFFSETS = np.round(np.arange(-1.0, 1.1, 0.1), 1)
+UNWRAP_THRESHOLD = math.pi * 7.0 / 8.0
+
+# Inverse of the Fitzgibbon constraint matrix for the quadratic terms (4ac - b^2 = 1)
+_CONSTRAINT_INVERSE = np.array([[0.0, 0.0, 0.5], [0.0, -1.0, 0.0], [0.5, 0.0, 0.0]])
+
+# --- Stacking ---
+
+def stack_captures(captures):
+    """
+    Stacks per-axis captures of different lengths.
+
+    Args:
+        captures (list): (sine samples, cosine samples) per axis.
+
+    Returns:
+        tuple: (sine, cosine, mask) arrays of shape (axes, longest capture); mask is False in the padding.
+    """
+    length = max(len(sine) for sine, _ in captures)
+    sine = np.zeros((len(captures), length))
+    cosine = np.zeros((len(captures), length))
+    mask = np.zeros((len(captures), length), dtype=bool)
+    for i, (s, c) in enumerate(captures):
+        sine[i, :len(s)] = s
+        cosine[i, :len(c)] = c
+        mask[i, :len(s)] = True
+    return sine, cosine, mask
+
+# --- Conic fit ---
+
+def solve_scatter(scatter):
+    """
+    Solves the Fitzgibbon direct ellipse fit for stacked scatter matrices.
+
+    Args:
+        scatter (array): (axes, 6, 6) sums of D^T D over the design rows [x^2, xy, y^2, x, y, 1].
+
+    Returns:
+        array: (axes, 6) conic coefficients [a, b, c, d, e, f].
+    """
+    s1, s2, s3 = scatter[:, :3, :3], scatter[:, :3, 3:], scatter[:, 3:, 3:]
+    linear = -np.linalg.solve(s3, np.transpose(s2, (0, 2, 1)))
+    reduced = _CONSTRAINT_INVERSE @ (s1 + s2 @ linear)
+    _, vectors = np.linalg.eig(reduced)
+    vectors = np.real(vectors)
+    condition = 4 * vectors[:, 0, :] * vectors[:, 2, :] - vectors[:, 1, :] ** 2
+    if np.any(condition.max(axis=1) <= 0):
+        raise ValueError("No elliptical solution for at least one axis")
+    quadratic = vectors[np.arange(len(vectors)), :, np.argmax(condition, axis=1)]
+    return np.concatenate((quadratic, np.einsum("aij,aj->ai", linear, quadratic)), axis=1)
+
+def fit_conics(sine, cosine, mask=None):
+    """
+    Direct least-squares ellipse fit for every row of stacked sample arrays.
+
+    Returns:
+        array: (axes, 3, 3) symmetric conic matrices [[a, b/2, d/2], [b/2, c, e/2], [d/2, e/2, f]]
+        in signal units, normalised so the quadratic part is positive definite.
+    """
+    if mask is None:
+        mask = np.ones(sine.shape, dtype=bool)
+    weights = mask.astype(float)
+    counts = weights.sum(axis=1)
+    if np.any(counts < 6):
+        raise ValueError("Each axis needs at least 6 samples")
+
+    # Normalise per axis so the 4th-order sums stay well conditioned
+    mean_x = (sine * weights).sum(axis=1) / counts
+    mean_y = (cosine * weights).sum(axis=1) / counts
+    std_x = np.sqrt((((sine - mean_x[:, None]) ** 2) * weights).sum(axis=1) / counts)
+    std_y = np.sqrt((((cosine - mean_y[:, None]) ** 2) * weights).sum(axis=1) / counts)
+    scale = np.maximum(np.maximum(std_x, std_y), 1e-12)
+    u = (sine - mean_x[:, None]) / scale[:, None] * weights
+    v = (cosine - mean_y[:, None]) / scale[:, None] * weights
+
+    design = np.stack((u * u, u * v, v * v, u, v, weights), axis=2)
+    conics = _conic_matrices(solve_scatter(np.einsum("ani,anj->aij", design, design)))
+    # Undo the normalisation: x_norm = (x - mean) / scale
+    to_normalised = np.zeros((len(conics), 3, 3))
+    to_normalised[:, 0, 0] = 1 / scale
+    to_normalised[:, 1, 1] = 1 / scale
+    to_normalised[:, 0, 2] = -mean_x / scale
+    to_normalised[:, 1, 2] = -mean_y / scale
+    to_normalised[:, 2, 2] = 1
+    conics = np.transpose(to_normalised, (0, 2, 1)) @ conics @ to_normalised
+    return conics * np.sign(conics[:, 0, 0])[:, None, None]
+
+def _conic_matrices(coefficients):
+    a, b, c, d, e, f = np.moveaxis(coefficients, -1, 0)
+    return np.stack((np.stack((a, b / 2, d / 2), -1),
+                     np.stack((b / 2, c, e / 2), -1),
+                     np.stack((d / 2, e / 2, f), -1)), -2)
+
+def ellipse_geometry(conics):
+    """
+    Ellipse parameters of conic matrices (any leading shape).
+
+    Returns:
+        dict: CenterX, CenterY, Width, Height and Phi arrays (NaN where a conic is not a real ellipse).
+    """
+    a, b, c = conics[..., 0, 0], 2 * conics[..., 0, 1], conics[..., 1, 1]
+    d, e, f = 2 * conics[..., 0, 2], 2 * conics[..., 1, 2], conics[..., 2, 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        det = 4 * a * c - b * b
+        center_x = (b * e - 2 * c * d) / det
+        center_y = (b * d - 2 * a * e) / det
+        level = -(a * center_x ** 2 + b * center_x * center_y + c * center_y ** 2 + d * center_x + e * center_y + f)
+        # Tilt of the principal axis nearest the sine (x) axis, folded into (-pi/4, pi/4]
+        phi = 0.5 * np.arctan2(b, a - c)
+        phi = np.where(phi > math.pi / 4, phi - math.pi / 2, phi)
+        phi = np.where(phi <= -math.pi / 4, phi + math.pi / 2, phi)
+        cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+        along = a * cos_phi ** 2 + b * sin_phi * cos_phi + c * sin_phi ** 2
+        across = a * sin_phi ** 2 - b * sin_phi * cos_phi + c * cos_phi ** 2
+        width = np.sqrt(level / along)
+        height = np.sqrt(level / across)
+    valid = (det > 0) & (level / a > 0)
+    nan = np.nan
+    return {"CenterX": np.where(valid, center_x, nan), "CenterY": np.where(valid, center_y, nan),
+            "Width": np.where(valid, width, nan), "Height": np.where(valid, height, nan),
+            "Phi": np.where(valid, phi, nan)}
+
+# --- Phase search ---
+
+def correction_matrices(phases_deg):
+    """
+    The linear sine/cosine corrections of EncoderTuning._calculate_new_ellipse for each phase.
+
+    Returns:
+        array: (..., 3, 3) homogeneous matrices; NaN where the correction is undefined.
+    """
+    half = np.radians(np.asarray(phases_deg, dtype=float) / 2.0)
+    cos_2_half = np.cos(2.0 * half)
+    undefined = (np.abs(np.degrees(half) - 45.0) < 1e-9) | (np.abs(cos_2_half) < 1e-9)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c1 = np.where(undefined, np.nan, np.cos(half) / cos_2_half)
+        c2 = np.where(undefined, np.nan, -np.sin(half) / cos_2_half)
+    matrices = np.zeros(half.shape + (3, 3))
+    matrices[..., 0, 0] = c1
+    matrices[..., 0, 1] = c2
+    matrices[..., 1, 0] = c2
+    matrices[..., 1, 1] = c1
+    matrices[..., 2, 2] = 1.0
+    return matrices
+
+def corrected_phi(centered_conics, phases_deg):
+    """
+    Phi of the corrected ellipse for every axis and trial phase.
+
+    Args:
+        centered_conics (array): (axes, 3, 3) conics of the centred samples.
+        phases_deg (array): (axes, phases) trial phases.
+
+    Returns:
+        array: (axes, phases) Phi values.
+    """
+    inverse = np.linalg.inv(np.nan_to_num(correction_matrices(phases_deg), nan=1.0))
+    conics = np.swapaxes(inverse, -1, -2) @ centered_conics[:, None] @ inverse
+    phi = ellipse_geometry(conics)["Phi"]
+    return np.where(np.isnan(correction_matrices(phases_deg)[..., 0, 0]), np.nan, phi)
+
+def unwrap_arc_tan(phase_data, threshold=UNWRAP_THRESHOLD):
+    """Vectorised EncoderTuning._unwrap_arc_tan along the last axis."""
+    steps = np.diff(phase_data, axis=-1)
+    corrections = np.where(steps > threshold, -2 * math.pi, np.where(steps < -threshold, 2 * math.pi, 0.0))
+    shifted = np.concatenate((np.zeros(phase_data.shape[:-1] + (1,)), np.cumsum(corrections, axis=-1)), axis=-1)
+    return phase_data + shifted
+
+def search_phase(centered_conics):
+    """
+    Coarse-to-fine phase search for every axis, as in EncoderTuning.calculate_final_gains.
+
+    Returns:
+        tuple: (final phase corrections in degrees, bool array of axes where no zero crossover was found)
+    """
+    axes = len(centered_conics)
+    coarse = np.broadcast_to(COARSE_PHASES, (axes, len(COARSE_PHASES)))
+    coarse_phi = np.abs(corrected_phi(centered_conics, coarse))
+    best_coarse = COARSE_PHASES[np.nanargmin(coarse_phi, axis=1)]
+
+    fine = np.round(best_coarse[:, None] + FINE_OFFSETS[None, :], 1)
+    fine_phi = corrected_phi(centered_conics, fine)
+    unwrapped = unwrap_arc_tan(np.nan_to_num(fine_phi, nan=0.0))
+
+    signs = np.sign(unwrapped)
+    crossings = signs[:, :-1] != signs[:, 1:]
+    found = crossings.any(axis=1)
+    index = np.argmax(crossings, axis=1)
+    rows = np.arange(axes)
+    phi1, phi2 = unwrapped[rows, index], unwrapped[rows, index + 1]
+    phase1, phase2 = fine[rows, index], fine[rows, index + 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interpolated = phase1 - phi1 * (phase2 - phase1) / (phi2 - phi1)
+    best_fine = fine[rows, np.nanargmin(np.abs(fine_phi), axis=1)]
+    return np.where(found, interpolated, best_fine), ~found
+
+def calculate_gains(captures):
+    """
+    Encoder gains for several axes at once.
+
+    Args:
+        captures (dict): axis -> (EncoderSineRaw samples, EncoderCosineRaw samples).
+
+    Returns:
+        dict: axis -> {SineGain, SineOffset(mV), CosineGain, CosineOffset(mV), Phase(degrees)}.
+    """
+    axes = list(captures)
+    sine, cosine, mask = stack_captures([captures[axis] for axis in axes])
+    conics = fit_conics(sine, cosine, mask)
+    initial = ellipse_geometry(conics)
+
+    # Centre the conics on the initial ellipse, as the samples are centred before the phase search
+    translate = np.tile(np.eye(3), (len(axes), 1, 1))
+    translate[:, 0, 2] = initial["CenterX"]
+    translate[:, 1, 2] = initial["CenterY"]
+    centered = np.transpose(translate, (0, 2, 1)) @ conics @ translate
+
+    phases, _ = search_phase(centered)
+    final = corrected_geometry(centered, phases)
+    sine_gain = np.clip(IDEAL_LISSAJOUS_AMPLITUDE / final["Width"], MIN_GAIN, MAX_GAIN)
+    cosine_gain = np.clip(IDEAL_LISSAJOUS_AMPLITUDE / final["Height"], MIN_GAIN, MAX_GAIN)
+
+    results = {}
+    for i, axis in enumerate(axes):
+        results[axis] = {
+            "SineGain": float(sine_gain[i]),
+            "SineOffset(mV)": float(initial["CenterX"][i] * 1000.0),
+            "CosineGain": float(cosine_gain[i]),
+            "CosineOffset(mV)": float(initial["CenterY"][i] * 1000.0),
+            "Phase(degrees)": float(phases[i]),
+        }
+    return results
+
+def corrected_geometry(centered_conics, phases_deg):
+    """Ellipse geometry after applying one phase correction per axis."""
+    inverse = np.linalg.inv(np.nan_to_num(correction_matrices(phases_deg), nan=1.0))
+    return ellipse_geometry(np.swapaxes(inverse, -1, -2) @ centered_conics @ inverse)
+
+# --- Per-axis reference ---
+
+def reference_gains(sine, cosine):
+    """
+    One axis at a time with the structure of EncoderTuning.calculate_final_gains: the samples are
+    corrected and refitted for every trial phase. Used to check and benchmark calculate_gains;
+    it uses the same conic fit, so agreement says nothing about the fit itself.
+    """
+    sine = np.asarray(sine, dtype=float)
+    cosine = np.asarray(cosine, dtype=float)
+
+    def fit(s, c):
+        return {key: float(value[0]) for key, value in ellipse_geometry(fit_conics(s[None], c[None])).items()}
+
+    def new_ellipse(phase, s, c):
+        matrix = correction_matrices(phase)
+        if np.isnan(matrix[0, 0]):
+            return None
+        return fit(matrix[0, 0] * s + matrix[0, 1] * c, matrix[0, 0] * c + matrix[0, 1] * s)
+
+    initial = fit(sine, cosine)
+    centered_sine, centered_cosine = sine - initial["CenterX"], cosine - initial["CenterY"]
+
+    coarse = {}
+    for phase in range(-30, 31):
+        ellipse = new_ellipse(float(phase), centered_sine, centered_cosine)
+        if ellipse:
+            coarse[float(phase)] = ellipse["Phi"]
+    best_coarse = min(coarse, key=lambda p: abs(coarse[p]))
+
+    fine = {}
+    for phase_decimal in np.arange(best_coarse - 1.0, best_coarse + 1.1, 0.1):
+        phase = round(phase_decimal, 1)
+        ellipse = new_ellipse(phase, centered_sine, centered_cosine)
+        if ellipse:
+            fine[phase] = ellipse["Phi"]
+    phases = list(fine.keys())
+    phis = unwrap_arc_tan(np.array(list(fine.values())))
+
+    final_phase = None
+    for i in range(len(phis) - 1):
+        if np.sign(phis[i]) != np.sign(phis[i + 1]):
+            final_phase = phases[i] - phis[i] * (phases[i + 1] - phases[i]) / (phis[i + 1] - phis[i])
+            break
+    if final_phase is None:
+        final_phase = min(fine, key=lambda p: abs(fine[p]))
+
+    final = new_ellipse(final_phase, centered_sine, centered_cosine)
+    return {
+        "SineGain": max(MIN_GAIN, min(IDEAL_LISSAJOUS_AMPLITUDE / final["Width"], MAX_GAIN)),
+        "SineOffset(mV)": initial["CenterX"] * 1000.0,
+        "CosineGain": max(MIN_GAIN, min(IDEAL_LISSAJOUS_AMPLITUDE / final["Height"], MAX_GAIN)),
+        "CosineOffset(mV)": initial["CenterY"] * 1000.0,
+        "Phase(degrees)": float(final_phase),
+    }
+
+# --- Benchmark ---
+
+def lissajous_capture(samples, center_x, center_y, amplitude_x, amplitude_y, phase_deg,
+                      cycles_per_sample=0.013, noise=0.003, harmonic=0.01, rng=None):
+    """
+    A realistic raw sine/cosine capture at constant velocity: offsets, unequal amplitudes,
+    quadrature error, a small 3rd harmonic and measurement noise.
+    """
+    rng = rng or np.random.default_rng(0)
+    theta = 2 * math.pi * cycles_per_sample * np.arange(samples) + rng.uniform(0, 2 * math.pi)
+    shifted = theta + math.radians(phase_deg)
+    sine = center_x + amplitude_x * (np.sin(theta) + harmonic * np.sin(3 * theta)) + rng.normal(0, noise, samples)
+    cosine = center_y + amplitude_y * (np.cos(shifted) + harmonic * np.cos(3 * shifted)) + rng.normal(0, noise, samples)
+    return sine, cosine
+
+def benchmark_captures(axes=8, samples=10000, seed=0):
+    """Per-axis captures with varied errors and lengths (+/-20% around samples)."""
+    rng = np.random.default_rng(seed)
+    captures = {}
+    for i in range(axes):
+        captures[f"Axis{i}"] = lissajous_capture(
+            int(samples * rng.uniform(0.8, 1.2)), rng.uniform(-0.03, 0.03), rng.uniform(-0.03, 0.03),
+            rng.uniform(0.35, 0.6), rng.uniform(0.35, 0.6), rng.uniform(-8, 8),
+            cycles_per_sample=rng.uniform(0.005, 0.03), rng=rng)
+    return captures
+
+def benchmark(axes=8, samples=10000, repeat=5):
+    """
+    Times the batched engine against the per-axis reference on the same captures.
+
+    Returns:
+        dict: batch_s, per_axis_s (median over repeat), axes and the largest result difference.
+    """
+    captures = benchmark_captures(axes, samples)
+    batch_timings, reference_timings = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        batch = calculate_gains(captures)
+        batch_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        reference = {axis: reference_gains(*capture) for axis, capture in captures.items()}
+        reference_timings.append(time.perf_counter() - start)
+    difference = max(abs(batch[axis][key] - reference[axis][key]) for axis in captures for key in batch[axis])
+    return {"axes": axes, "batch_s": statistics.median(batch_timings),
+            "reference_s": statistics.median(reference_timings), "max_difference": difference,
+            "results": batch}
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Vectorised multi-axis encoder ellipse fit and phase search.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_parser = subparsers.add_parser("benchmark", help="Compare batched and per-axis fitting on synthetic captures")
+    bench_parser.add_argument("--axes", type=int, default=8)
+    bench_parser.add_argument("--samples", type=int, default=10000, help="Typical samples per capture")
+    bench_parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        result = benchmark(args.axes, args.samples, args.repeat)
+        axes = result["axes"]
+        print(f"{'Engine':<12}{'Total ms':>12}{'Per axis ms':>14}")
+        print("-" * 38)
+        print(f"{'per-axis':<12}{result['reference_s'] * 1000:>12.2f}{result['reference_s'] * 1000 / axes:>14.2f}")
+        print(f"{'batched':<12}{result['batch_s'] * 1000:>12.2f}{result['batch_s'] * 1000 / axes:>14.2f}")
+        print(f"📊 Speed-up {result['reference_s'] / result['batch_s']:.1f}x, "
+              f"largest difference between engines {result['max_difference']:.2e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Encoder Streaming - Continuous encoder data collection with an incremental ellipse fit
+Description: EncoderTuning collects EncoderSineRaw/EncoderCosineRaw in one
+fixed-size snapshot (DataCollectionMode.Snapshot) and fits the Lissajous ellipse
+afterwards. This module instead streams data-collection frames from a
+continuous collection into a pre-allocated NumPy ring buffer per axis and
+updates a conic fit as each frame arrives. The fit keeps only the 6x6 scatter
+matrix of the conic design, so memory does not grow with the length of the
+move, and collection stops as soon as the ellipse parameters stop changing.
+
+Frames are filtered to constant velocity (VelocityCommand at the target speed),
+as EncoderTuning.gather_results does. The ring buffer keeps the most recent
+samples for the phase search of EncoderTuning.calculate_final_gains.
+
+Usage:
+    python EncoderStreaming.py [--axes 4] [--tolerance 1e-4]    (runs on synthetic frames)
+    python EncoderStreaming.py --live X Y --target-speed 10 [--connection hyperwire]
+"""
+
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from EncoderBatchFit import solve_scatter
+
+# Signals collected per axis, as in EncoderTuning.data_config
+SINE_SIGNAL = "EncoderSineRaw"
+COSINE_SIGNAL = "EncoderCosineRaw"
+VELOCITY_SIGNAL = "VelocityCommand"
+
+# --- Ring buffer ---
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of multi-channel samples; the oldest samples are overwritten.
+
+    Args:
+        capacity (int): Samples kept per channel.
+        channels (int): Number of channels (e.g. 2 for sine and cosine).
+    """
+
+    def __init__(self, capacity, channels=2):
+        self.capacity = capacity
+        self.data = np.empty((channels, capacity))
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, block):
+        """Appends a (channels, n) block of samples."""
+        block = np.asarray(block, dtype=float)
+        n = block.shape[1]
+        if n >= self.capacity:
+            # Keep the last capacity samples at the slots they would have been written to
+            self.total += n
+            self.data[:, np.arange(self.total - self.capacity, self.total) % self.capacity] = block[:, -self.capacity:]
+            return
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[:, start:start + first] = block[:, :first]
+        self.data[:, :n - first] = block[:, first:]
+        self.total += n
+
+    def latest(self, n=None):
+        """Returns the most recent n samples (all buffered samples by default) in order, as a copy."""
+        count = len(self) if n is None else min(n, len(self))
+        end = self.total % self.capacity
+        indices = np.arange(end - count, end) % self.capacity
+        return self.data[:, indices]
+
+# --- Incremental ellipse fit ---
+
+class EllipseParameters:
+    """
+    Geometry of a sine/cosine Lissajous ellipse.
+
+    Attributes:
+        center_x, center_y: Offsets of the sine (x) and cosine (y) channels.
+        amplitude_x, amplitude_y: Half-extent of the ellipse along each channel.
+        phase_deg: Quadrature error between the channels (0 for a circle or axis-aligned ellipse).
+    """
+
+    def __init__(self, center_x, center_y, amplitude_x, amplitude_y, phase_deg):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.amplitude_x = amplitude_x
+        self.amplitude_y = amplitude_y
+        self.phase_deg = phase_deg
+
+    def as_dict(self):
+        return {"CenterX": self.center_x, "CenterY": self.center_y, "AmplitudeX": self.amplitude_x,
+                "AmplitudeY": self.amplitude_y, "Phase(degrees)": self.phase_deg}
+
+    def change_from(self, other):
+        """Largest change relative to the mean amplitude (phase compared in radians)."""
+        scale = max((self.amplitude_x + self.amplitude_y) / 2, 1e-12)
+        return max(abs(self.center_x - other.center_x) / scale, abs(self.center_y - other.center_y) / scale,
+                   abs(self.amplitude_x - other.amplitude_x) / scale, abs(self.amplitude_y - other.amplitude_y) / scale,
+                   abs(np.radians(self.phase_deg - other.phase_deg)))
+
+def conic_to_ellipse(conic):
+    """Converts conic coefficients (a, b, c, d, e, f) to EllipseParameters."""
+    # The conic is defined up to sign; make the quadratic form positive so the phase sign is meaningful
+    a, b, c, d, e, f = conic if conic[0] > 0 else -np.asarray(conic)
+    det = 4 * a * c - b * b
+    if det <= 0:
+        raise ValueError("Conic is not an ellipse")
+    center_x = (b * e - 2 * c * d) / det
+    center_y = (b * d - 2 * a * e) / det
+    # Value of the quadratic form on the ellipse once centred: a x^2 + b x y + c y^2 = level
+    level = -(a * center_x ** 2 + b * center_x * center_y + c * center_y ** 2 + d * center_x + e * center_y + f)
+    if level / a <= 0:
+        raise ValueError("Conic is an imaginary ellipse")
+    amplitude_x = np.sqrt(4 * c * level / det)
+    amplitude_y = np.sqrt(4 * a * level / det)
+    sin_phase = np.clip(b / (2 * np.sqrt(a * c)), -1.0, 1.0)
+    return EllipseParameters(float(center_x), float(center_y), float(amplitude_x), float(amplitude_y),
+                             float(np.degrees(np.arcsin(sin_phase))))
+
+class IncrementalEllipseFit:
+    """
+    Direct least-squares ellipse fit (Fitzgibbon) that accumulates the scatter matrix frame by frame.
+
+    Samples are shifted and scaled by the first frame before accumulating to keep the 4th-order
+    sums well conditioned.
+
+    Args:
+        tolerance (float): Relative parameter change below which a fit counts as stable.
+        patience (int): Consecutive stable fits required for convergence.
+        min_samples (int): Samples required before convergence is considered.
+    """
+
+    def __init__(self, tolerance=1e-4, patience=3, min_samples=2000):
+        self.tolerance = tolerance
+        self.patience = patience
+        self.min_samples = min_samples
+        self.scatter = np.zeros((6, 6))
+        self.samples = 0
+        self.stable_fits = 0
+        self.ellipse = None
+        self._shift = None
+        self._scale = None
+
+    @property
+    def converged(self):
+        return self.samples >= self.min_samples and self.stable_fits >= self.patience
+
+    def add(self, x, y):
+        """Adds samples and refits. Returns the current EllipseParameters (None until a fit is possible)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if not len(x):
+            return self.ellipse
+        if self._shift is None:
+            self._shift = (float(np.mean(x)), float(np.mean(y)))
+            self._scale = float(max(np.std(x), np.std(y), 1e-12))
+        u = (x - self._shift[0]) / self._scale
+        v = (y - self._shift[1]) / self._scale
+        design = np.column_stack((u * u, u * v, v * v, u, v, np.ones_like(u)))
+        self.scatter += design.T @ design
+        self.samples += len(x)
+        return self._refit()
+
+    def _refit(self):
+        if self.samples < 6:
+            return None
+        try:
+            ellipse = self._scaled(conic_to_ellipse(self._solve()))
+        except (np.linalg.LinAlgError, ValueError):
+            self.stable_fits = 0
+            return self.ellipse
+        if self.ellipse is not None and ellipse.change_from(self.ellipse) < self.tolerance:
+            self.stable_fits += 1
+        else:
+            self.stable_fits = 0
+        self.ellipse = ellipse
+        return ellipse
+
+    def _solve(self):
+        # Same solver as the batched offline fit, so the two cannot drift apart
+        return solve_scatter(self.scatter[None])[0]
+
+    def _scaled(self, ellipse):
+        """Maps an ellipse from the normalised fit coordinates back to signal units."""
+        return EllipseParameters(ellipse.center_x * self._scale + self._shift[0],
+                                 ellipse.center_y * self._scale + self._shift[1],
+                                 ellipse.amplitude_x * self._scale, ellipse.amplitude_y * self._scale,
+                                 ellipse.phase_deg)
+
+# --- Streaming tuner ---
+
+class StreamingTuner:
+    """
+    Per-axis ring buffers and incremental fits fed from data-collection frames.
+
+    Args:
+        axes (list): Axes being tuned.
+        capacity (int): Samples kept per axis in the ring buffer.
+        tolerance, patience, min_samples: Convergence settings for IncrementalEllipseFit.
+    """
+
+    def __init__(self, axes, capacity=20000, tolerance=1e-4, patience=3, min_samples=2000):
+        self.axes = list(axes)
+        self.buffers = {axis: RingBuffer(capacity) for axis in self.axes}
+        self.fits = {axis: IncrementalEllipseFit(tolerance, patience, min_samples) for axis in self.axes}
+        self.frames = {axis: 0 for axis in self.axes}
+
+    def feed(self, axis, sine, cosine, velocity=None, target_speed=None):
+        """
+        Adds one frame of samples for an axis. With velocity and target_speed, only
+        constant-velocity samples are used.
+
+        Returns:
+            EllipseParameters: The current fit for the axis.
+        """
+        sine = np.asarray(sine, dtype=float)
+        cosine = np.asarray(cosine, dtype=float)
+        if velocity is not None and target_speed is not None:
+            mask = np.isclose(np.asarray(velocity, dtype=float), target_speed)
+            sine, cosine = sine[mask], cosine[mask]
+        self.frames[axis] += 1
+        self.buffers[axis].extend(np.vstack((sine, cosine)))
+        return self.fits[axis].add(sine, cosine)
+
+    def converged(self, axis=None):
+        """Whether one axis (or every axis) has converged."""
+        if axis is not None:
+            return self.fits[axis].converged
+        return all(fit.converged for fit in self.fits.values())
+
+    def results(self):
+        """Returns {axis: {ellipse, samples, frames, converged, sine, cosine}} with the buffered raw samples."""
+        results = {}
+        for axis in self.axes:
+            fit = self.fits[axis]
+            sine, cosine = self.buffers[axis].latest()
+            results[axis] = {"ellipse": fit.ellipse, "samples": fit.samples, "frames": self.frames[axis],
+                             "converged": fit.converged, "sine": sine, "cosine": cosine}
+        return results
+
+    def consume(self, frames):
+        """
+        Feeds frames until every axis has converged or the stream ends.
+
+        Args:
+            frames (iterable): Yields {axis: {signal name: samples}} per frame.
+        """
+        for frame in frames:
+            for axis, signals in frame.items():
+                if axis in self.fits and not self.fits[axis].converged:
+                    velocity = signals.get(VELOCITY_SIGNAL)
+                    target = signals.get("target_speed")
+                    self.feed(axis, signals[SINE_SIGNAL], signals[COSINE_SIGNAL], velocity, target)
+            if self.converged():
+                return True
+        return self.converged()
+
+# --- Frame sources ---
+
+def controller_frames(controller, api, axes, target_speed, frame_points=500, poll_s=0.05):
+    """
+    Streams frames from a continuous data collection on a connected controller.
+
+    Collects the same signals as EncoderTuning.data_config. The caller starts the
+    move; collection stops when the generator is closed. Successive retrievals can
+    return points that were already yielded, so only points with a newer
+    DataCollectionSampleTime are passed on and polls with no new points are skipped.
+
+    Args:
+        controller: A started a1.Controller.
+        api: The automation1 module.
+        axes (list): Axes to collect.
+        target_speed (float): Constant speed of the move, used to filter the frames.
+        frame_points (int): Points retrieved per frame.
+        poll_s (float): Delay between retrievals.
+    """
+    config = api.DataCollectionConfiguration(frame_points, api.DataCollectionFrequency.Frequency1kHz)
+    config.system.add(api.SystemDataSignal.DataCollectionSampleTime)
+    for axis in axes:
+        for signal in (VELOCITY_SIGNAL, SINE_SIGNAL, COSINE_SIGNAL):
+            config.axis.add(getattr(api.AxisDataSignal, signal), axis)
+
+    data_collection = controller.runtime.data_collection
+    data_collection.start(api.DataCollectionMode.Continuous, config)
+    last_time = -np.inf
+    try:
+        while True:
+            results = data_collection.get_results(config, frame_points)
+            sample_time = np.array(results.system.get(api.SystemDataSignal.DataCollectionSampleTime).points, dtype=float)
+            fresh = sample_time > last_time
+            if fresh.any():
+                last_time = sample_time[fresh].max()
+                frame = {}
+                for axis in axes:
+                    signals = {signal: np.array(results.axis.get(getattr(api.AxisDataSignal, signal), axis).points)[fresh]
+                               for signal in (VELOCITY_SIGNAL, SINE_SIGNAL, COSINE_SIGNAL)}
+                    signals["target_speed"] = target_speed
+                    frame[axis] = signals
+                yield frame
+            time.sleep(poll_s)
+    finally:
+        data_collection.stop()
+
+def synthetic_frames(axes, frame_points=500, frames=200, noise=0.002, seed=0):
+    """
+    Yields simulated encoder frames with per-axis offset, gain and phase errors.
+    The true parameters are returned by synthetic_truth(axes, seed).
+    """
+    truth = synthetic_truth(axes, seed)
+    rng = np.random.default_rng(seed)
+    angle = {axis: 0.0 for axis in axes}
+    for _ in range(frames):
+        frame = {}
+        for axis in axes:
+            t = truth[axis]
+            theta = angle[axis] + np.arange(frame_points) * 0.05
+            angle[axis] = theta[-1] + 0.05
+            sine = t.center_x + t.amplitude_x * np.sin(theta) + rng.normal(0, noise, frame_points)
+            cosine = t.center_y + t.amplitude_y * np.cos(theta + np.radians(t.phase_deg)) + rng.normal(0, noise, frame_points)
+            frame[axis] = {SINE_SIGNAL: sine, COSINE_SIGNAL: cosine}
+        yield frame
+
+def synthetic_truth(axes, seed=0):
+    """The ellipse parameters used by synthetic_frames."""
+    rng = np.random.default_rng(seed + 1)
+    return {axis: EllipseParameters(rng.uniform(-0.05, 0.05), rng.uniform(-0.05, 0.05), rng.uniform(0.4, 0.6),
+                                    rng.uniform(0.4, 0.6), rng.uniform(-5, 5)) for axis in axes}
+
+def run_live(axes, target_speed, connection="auto", frame_points=500, capacity=20000, tolerance=1e-4):
+    """Fits the encoder ellipses of a connected controller while the user runs a constant-velocity move."""
+    import automation1 as a1
+    from ControllerConnection import connect
+
+    try:
+        controller = connect(a1, connection)
+    except Exception as e:
+        print(f"❌ Could not connect: {e}")
+        return 1
+
+    tuner = StreamingTuner(axes, capacity=capacity, tolerance=tolerance)
+    print(f"▶️ Collecting {', '.join(axes)}; start the move at {target_speed} now (Ctrl+C to stop)")
+    frames = controller_frames(controller, a1, axes, target_speed, frame_points)
+    try:
+        tuner.consume(frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frames.close()
+
+    for axis, result in tuner.results().items():
+        ellipse = result["ellipse"]
+        state = "✅ converged" if result["converged"] else "⚠️ not converged"
+        print(f"{axis}: {state} after {result['samples']} samples ({result['frames']} frames)")
+        if ellipse is not None:
+            print(f"   center ({ellipse.center_x:+.4f}, {ellipse.center_y:+.4f}), "
+                  f"amplitude ({ellipse.amplitude_x:.4f}, {ellipse.amplitude_y:.4f}), phase {ellipse.phase_deg:+.3f}°")
+    return 0 if tuner.converged() else 1
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run the streaming ellipse fit on synthetic encoder frames.")
+    parser.add_argument("--axes", type=int, default=2)
+    parser.add_argument("--frame-points", type=int, default=500)
+    parser.add_argument("--frames", type=int, default=200, help="Frames in the full (snapshot-length) move")
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--capacity", type=int, default=20000, help="Ring buffer samples per axis")
+    parser.add_argument("--live", nargs="+", metavar="AXIS",
+                        help="Stream these axes from a connected controller instead of synthetic frames")
+    parser.add_argument("--target-speed", type=float, help="Constant speed of the move started for --live")
+    parser.add_argument("--connection", choices=("auto", "usb", "hyperwire"), default="auto")
+    args = parser.parse_args()
+
+    if args.live:
+        if args.target_speed is None:
+            parser.error("--live needs --target-speed")
+        return run_live(args.live, args.target_speed, args.connection, args.frame_points, args.capacity, args.tolerance)
+
+    axes = [f"Axis{i}" for i in range(args.axes)]
+    truth = synthetic_truth(axes)
+    tuner = StreamingTuner(axes, capacity=args.capacity, tolerance=args.tolerance)
+    start = time.perf_counter()
+    tuner.consume(synthetic_frames(axes, args.frame_points, args.frames))
+    elapsed = time.perf_counter() - start
+
+    full_samples = args.frame_points * args.frames
+    print(f"⏱️ Streaming fit finished in {elapsed * 1000:.1f} ms")
+    for axis, result in tuner.results().items():
+        ellipse, expected = result["ellipse"], truth[axis]
+        state = "✅ converged" if result["converged"] else "⚠️ not converged"
+        print(f"{axis}: {state} after {result['samples']}/{full_samples} samples ({result['frames']} frames)")
+        print(f"   center ({ellipse.center_x:+.4f}, {ellipse.center_y:+.4f}) vs ({expected.center_x:+.4f}, {expected.center_y:+.4f}), "
+              f"amplitude ({ellipse.amplitude_x:.4f}, {ellipse.amplitude_y:.4f}) vs ({expected.amplitude_x:.4f}, {expected.amplitude_y:.4f}), "
+              f"phase {ellipse.phase_deg:+.3f}° vs {expected.phase_deg:+.3f}°")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fleet Archive - Compact base-plus-delta storage for large numbers of near-identical MCDs
+Description: Shipped MCDs of one product family differ only in a few ConfiguredOptions,
+the payload and some calculated gains. FleetArchive keeps one base MCD per
+family in a SQLite database and stores every unit as deltas against it:
+members identical to the base are references, config/Parameters is stored as
+the parameter values that differ from the base, and other changed members as
+line deltas. The zip container (headers, timestamps, central directory) is kept
+as a small compressed skeleton, so any unit's exact .mcd bytes can be rebuilt
+on demand. Parameter values live in indexed tables, so a parameter can be
+scanned across every unit without reconstructing any of them.
+
+A member's compressed bytes can only be rebuilt if zlib reproduces them at one
+of a few standard levels (MCDArchive, Python and zlib-based writers do). By
+default members from other deflate implementations, such as the .NET-written
+MCDs from GenerateMCD, keep their own compressed bytes: as the stored form of
+their content blob (shared with the family base, so a base costs no more than
+its file) or, when another stream already holds that content, verbatim. Units
+stay byte-exact, but such members get no deltas. With exact=False (add
+--redeflate) they are stored as content like any other member and re-deflated
+with zlib on extraction: member names, order, timestamps and contents are kept,
+but the compressed bytes and so the .mcd file itself differ from the original.
+Parameter scans work either way.
+
+Usage:
+    python FleetArchive.py [--db fleet_archive.db] add <folder or .mcd>... [--family NAME] [--redeflate]
+    python FleetArchive.py [--db fleet_archive.db] extract <unit> [-o out.mcd]
+    python FleetArchive.py [--db fleet_archive.db] param CurrentLoopGainK [">" 600] [--scope Axis]
+    python FleetArchive.py [--db fleet_archive.db] changes <unit>
+    python FleetArchive.py [--db fleet_archive.db] remove <unit>
+    python FleetArchive.py [--db fleet_archive.db] stats
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import difflib
+import hashlib
+import zipfile
+import argparse
+from datetime import datetime
+
+import MCDXml
+from MCDArchive import DEFAULT_LEVEL, STORED, DEFLATED, _LOCAL_HEADER, MCDMember, write_zip
+from FleetIndex import COMPARISON_OPERATORS, _to_number, _text
+
+DEFAULT_DB_PATH = "fleet_archive.db"
+SCHEMA_VERSION = 1
+PARAMETERS_MEMBER = "config/Parameters"
+# Deflate levels tried when checking whether a member's compressed bytes can be rebuilt:
+# zlib's default (MCDArchive, zipfile, .NET Optimal), best and fastest
+REBUILD_LEVELS = (DEFAULT_LEVEL, 9, 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    -- packed: 0 = data verbatim, 1 = zlib-compressed, 2 = an MCD member's raw deflate stream
+    sha256 TEXT PRIMARY KEY,
+    packed INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS families (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    base_unit TEXT NOT NULL,
+    template TEXT REFERENCES blobs(sha256)
+);
+CREATE TABLE IF NOT EXISTS family_members (
+    family_id INTEGER NOT NULL REFERENCES families(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    blob TEXT NOT NULL REFERENCES blobs(sha256),
+    PRIMARY KEY (family_id, name)
+);
+CREATE TABLE IF NOT EXISTS family_parameters (
+    family_id INTEGER NOT NULL REFERENCES families(id) ON DELETE CASCADE,
+    slot INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    scope_index INTEGER NOT NULL,
+    param_id INTEGER,
+    name TEXT NOT NULL,
+    value TEXT,
+    number REAL,
+    PRIMARY KEY (family_id, slot)
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    family_id INTEGER NOT NULL REFERENCES families(id),
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    skeleton BLOB NOT NULL,
+    own_parameters INTEGER NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unit_members (
+    unit_id INTEGER NOT NULL REFERENCES units(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    payload_offset INTEGER NOT NULL,
+    payload_size INTEGER NOT NULL,
+    compress_type INTEGER NOT NULL,
+    level INTEGER,
+    kind TEXT NOT NULL,
+    blob TEXT REFERENCES blobs(sha256),
+    PRIMARY KEY (unit_id, position)
+);
+CREATE TABLE IF NOT EXISTS unit_parameters (
+    unit_id INTEGER NOT NULL REFERENCES units(id) ON DELETE CASCADE,
+    slot INTEGER,
+    scope TEXT NOT NULL,
+    scope_index INTEGER NOT NULL,
+    param_id INTEGER,
+    name TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS idx_units_family ON units(family_id);
+CREATE INDEX IF NOT EXISTS idx_family_parameters_name ON family_parameters(name, scope);
+CREATE INDEX IF NOT EXISTS idx_unit_parameters_unit ON unit_parameters(unit_id, slot);
+CREATE INDEX IF NOT EXISTS idx_unit_parameters_name ON unit_parameters(name, scope);
+"""
+
+# --- Member kinds (unit_members.kind) ---
+# raw:        compressed bytes stored verbatim in blob
+# stream:     compressed bytes are the deflate stream blob's content is stored as (packed = 2)
+# base:       content identical to the family's member of the same name
+# delta:      line delta against the family member, in blob
+# full:       whole content in blob (no base member to diff against)
+# parameters: config/Parameters rebuilt from the family template and parameter values
+# A member of any other kind with a NULL level was re-deflated (exact=False): it is
+# compressed at DEFAULT_LEVEL and the zip container is rewritten around it.
+
+_SCOPE_OR_PARAMETER = re.compile(
+    r'<(System)\b|<(Axis|Task) Index="(-?\d+)"|(<P id="(\d*)" n="([^"]*)">)([^<]*)</P>')
+
+def family_key(contents):
+    """Default family name for an MCD: controller type, software version and the products it configures."""
+    controller_type = software_version = None
+    if "mcdInformation.xml" in contents:
+        info = MCDXml.fromstring(contents["mcdInformation.xml"])
+        controller_type = _text(info, "./Data/ControllerType")
+        software_version = _text(info, "./FileInformation/SoftwareVersion")
+    products = set()
+    if "config/MachineSetupData" in contents:
+        setup = MCDXml.fromstring(contents["config/MachineSetupData"])
+        for product in setup.iter():
+            if product.find("ConfiguredOptions") is not None:
+                products.add(_text(product, "Name") or "")
+    return " ".join([controller_type or "Unknown", software_version or "?", "+".join(sorted(products)) or "-"])
+
+def split_parameters(text):
+    """
+    Splits config/Parameters text into its fixed template and its parameter values.
+
+    Returns:
+        tuple: (segments, slots) where text == segments[0] + slots[0].value + segments[1] + ...
+        and slots are (scope, scope_index, param_id, name, value, number).
+    """
+    segments = []
+    slots = []
+    scope = None
+    position = 0
+    for match in _SCOPE_OR_PARAMETER.finditer(text):
+        if match.group(1):
+            scope = ("System", -1)
+        elif match.group(2):
+            scope = (match.group(2), int(match.group(3)))
+        elif scope is not None:
+            param_id, name, value = match.group(5), match.group(6), match.group(7)
+            segments.append(text[position:match.start(7)])
+            position = match.end(7)
+            slots.append(scope + (int(param_id) if param_id else None, name, value, _to_number(value)))
+    segments.append(text[position:])
+    return segments, slots
+
+def join_parameters(segments, values):
+    """Inverse of split_parameters."""
+    parts = [segments[0]]
+    for value, segment in zip(values, segments[1:]):
+        parts.append(value)
+        parts.append(segment)
+    return "".join(parts)
+
+def line_delta(base, data):
+    """
+    Encodes data as copies of base line ranges plus inserted lines.
+
+    Returns:
+        bytes: JSON list of [start, stop] copies and inserted strings (latin-1, so any bytes round trip).
+    """
+    base_lines = base.decode("latin-1").splitlines(keepends=True)
+    lines = data.decode("latin-1").splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(lines[j1:j2]))
+    return json.dumps(ops, separators=(",", ":")).encode("utf-8")
+
+def apply_line_delta(base, delta):
+    """Inverse of line_delta."""
+    base_lines = base.decode("latin-1").splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        parts.append(op if isinstance(op, str) else "".join(base_lines[op[0]:op[1]]))
+    return "".join(parts).encode("latin-1")
+
+def _deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def rebuild_level(data, raw):
+    """Returns the deflate level that reproduces raw from data exactly, or None."""
+    for level in REBUILD_LEVELS:
+        if _deflate(data, level) == raw:
+            return level
+    return None
+
+def _member_contents(mcd_bytes):
+    """[(name, compress type, uncompressed bytes)] in file order, for comparing re-deflated units."""
+    return [(member["name"], member["compress_type"], member["data"]) for member in read_layout(mcd_bytes)]
+
+def _rebuild_container(skeleton, members, payloads):
+    """
+    Writes a zip around payloads whose sizes differ from the original ones. The original
+    headers are read back from the skeleton with the payloads padded to their original sizes.
+    """
+    parts = []
+    position = 0
+    removed = 0
+    for member in members:
+        start = member["payload_offset"] - removed
+        parts += [skeleton[position:start], bytes(member["payload_size"])]
+        position = start
+        removed += member["payload_size"]
+    parts.append(skeleton[position:])
+    with zipfile.ZipFile(io.BytesIO(b"".join(parts)), "r") as mcd_zip:
+        infos = sorted(mcd_zip.infolist(), key=lambda info: info.header_offset)
+    output = io.BytesIO()
+    write_zip(output, [MCDMember(info.filename, info.date_time, info.compress_type, info.CRC, info.file_size,
+                                 raw=payload, external_attr=info.external_attr)
+                       for info, payload in zip(infos, payloads)])
+    return output.getvalue()
+
+def read_layout(mcd_bytes):
+    """
+    Locates every member's compressed payload in an .mcd.
+
+    Returns:
+        list: Dicts of name, offset, raw, compress_type and data (None if not stored or deflated),
+        ordered by offset.
+    """
+    members = []
+    with zipfile.ZipFile(io.BytesIO(mcd_bytes), "r") as mcd_zip:
+        for info in mcd_zip.infolist():
+            header = _LOCAL_HEADER.unpack_from(mcd_bytes, info.header_offset)
+            offset = info.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+            raw = mcd_bytes[offset:offset + info.compress_size]
+            data = None
+            if info.compress_type == STORED:
+                data = raw
+            elif info.compress_type == DEFLATED:
+                data = zlib.decompress(raw, -15)
+            members.append({"name": info.filename, "offset": offset, "raw": raw,
+                            "compress_type": info.compress_type, "data": data})
+    return sorted(members, key=lambda member: member["offset"])
+
+class FleetArchive:
+    """
+    SQLite-backed base-plus-delta archive of MCD files.
+
+    Args:
+        db_path (str): Archive database.
+        exact (bool): Keep units byte-exact by storing members zlib cannot reproduce verbatim;
+            False stores them as content and re-deflates them on extraction.
+    """
+    def __init__(self, db_path=DEFAULT_DB_PATH, exact=True):
+        self.db_path = db_path
+        self.exact = exact
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._family_cache = {}
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Blobs ---
+
+    def _put_blob(self, data, pack=True, stream=None):
+        """
+        Stores bytes once by content hash. Returns the hash.
+
+        Args:
+            data (bytes): Content.
+            pack (bool): zlib-compress the content when that makes it smaller.
+            stream (bytes): A raw deflate stream of data (an MCD member's payload) to store instead.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.connection.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (digest,)).fetchone() is None:
+            if stream is not None:
+                row = (digest, 2, stream)
+            else:
+                packed = zlib.compress(data, 9) if pack else data
+                use_packed = pack and len(packed) < len(data)
+                row = (digest, int(use_packed), packed if use_packed else data)
+            self.connection.execute("INSERT INTO blobs (sha256, packed, data) VALUES (?, ?, ?)", row)
+        return digest
+
+    def _blob_row(self, digest):
+        row = self.connection.execute("SELECT packed, data FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"Missing archive blob {digest}")
+        return row
+
+    def _get_blob(self, digest):
+        row = self._blob_row(digest)
+        if row["packed"] == 2:
+            return zlib.decompress(row["data"], -15)
+        return zlib.decompress(row["data"]) if row["packed"] else bytes(row["data"])
+
+    def _blob_stream(self, digest):
+        """The deflate stream a blob is stored as, or None if it is stored another way."""
+        row = self._blob_row(digest)
+        return bytes(row["data"]) if row["packed"] == 2 else None
+
+    # --- Families ---
+
+    def _family(self, family_id):
+        """Returns (base members {name: bytes}, template segments, base slot values) for a family."""
+        cached = self._family_cache.get(family_id)
+        if cached is None:
+            members = {row["name"]: self._get_blob(row["blob"]) for row in self.connection.execute(
+                "SELECT name, blob FROM family_members WHERE family_id = ?", (family_id,))}
+            row = self.connection.execute("SELECT template FROM families WHERE id = ?", (family_id,)).fetchone()
+            segments = json.loads(self._get_blob(row["template"])) if row["template"] else None
+            values = [row["value"] for row in self.connection.execute(
+                "SELECT value FROM family_parameters WHERE family_id = ? ORDER BY slot", (family_id,))]
+            cached = self._family_cache[family_id] = (members, segments, values)
+        return cached
+
+    def _create_family(self, name, base_unit, contents, streams):
+        """
+        Makes an MCD's member contents the base of a new family, keeping deflated members
+        as their original streams (see _put_blob). Returns the family id.
+        """
+        template = None
+        slots = []
+        parameters = contents.get(PARAMETERS_MEMBER)
+        if parameters is not None:
+            try:
+                segments, slots = split_parameters(parameters.decode("utf-8"))
+                template = self._put_blob(json.dumps(segments).encode("utf-8"))
+            except UnicodeDecodeError:
+                slots = []
+        cursor = self.connection.execute("INSERT INTO families (name, base_unit, template) VALUES (?, ?, ?)",
+                                         (name, base_unit, template))
+        family_id = cursor.lastrowid
+        self.connection.executemany("INSERT INTO family_members (family_id, name, blob) VALUES (?, ?, ?)",
+                                    [(family_id, member, self._put_blob(data, stream=streams.get(member)))
+                                     for member, data in contents.items()])
+        self.connection.executemany(
+            "INSERT INTO family_parameters (family_id, slot, scope, scope_index, param_id, name, value, number) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(family_id, slot) + parameter for slot, parameter in enumerate(slots)])
+        return family_id
+
+    def families(self):
+        """Returns every family with its base unit and unit count."""
+        return [dict(row) for row in self.connection.execute(
+            "SELECT f.name, f.base_unit, COUNT(u.id) AS units FROM families f "
+            "LEFT JOIN units u ON u.family_id = f.id GROUP BY f.id ORDER BY f.name")]
+
+    # --- Adding units ---
+
+    def add(self, name, mcd_bytes, family=None):
+        """
+        Stores one MCD as deltas against its family's base (the first unit of a family becomes its base).
+
+        Args:
+            name (str): Unit name (unique; adding an existing name replaces it).
+            mcd_bytes (bytes): The .mcd file contents.
+            family (str): Family name; derived from the MCD with family_key() if not given.
+
+        Returns:
+            dict: unit, family, size and stored (bytes added to the database for this unit).
+        """
+        layout = read_layout(mcd_bytes)
+        contents = {member["name"]: member["data"] for member in layout if member["data"] is not None}
+        family = family or family_key(contents)
+
+        try:
+            stored = self._add(name, mcd_bytes, layout, contents, family)
+        except BaseException:
+            # The transaction was rolled back, so a family created for this unit no longer exists
+            self._family_cache.clear()
+            raise
+        return {"unit": name, "family": family, "size": len(mcd_bytes), "stored": stored}
+
+    def _add(self, name, mcd_bytes, layout, contents, family):
+        """Stores a unit in one transaction. Returns the bytes added to the database."""
+        with self.connection:
+            self._remove(name)
+            before = self._stored_bytes()
+            row = self.connection.execute("SELECT id FROM families WHERE name = ?", (family,)).fetchone()
+            if row is not None:
+                family_id = row["id"]
+            else:
+                streams = {member["name"]: member["raw"] for member in layout if member["compress_type"] == DEFLATED}
+                family_id = self._create_family(family, name, contents, streams)
+            base_members, segments, base_values = self._family(family_id)
+
+            # --- Zip container: everything except the member payloads ---
+            skeleton = []
+            position = 0
+            for member in layout:
+                skeleton.append(mcd_bytes[position:member["offset"]])
+                position = member["offset"] + len(member["raw"])
+            skeleton.append(mcd_bytes[position:])
+
+            # --- Parameters: values that differ from the base, or the unit's own full set ---
+            own_parameters = True
+            parameter_rows = []
+            parameters = contents.get(PARAMETERS_MEMBER)
+            if parameters is not None:
+                try:
+                    unit_segments, slots = split_parameters(parameters.decode("utf-8"))
+                except UnicodeDecodeError:
+                    unit_segments, slots = None, []
+                if segments is not None and unit_segments == segments:
+                    own_parameters = False
+                    parameter_rows = [(slot,) + parameter for slot, parameter in enumerate(slots)
+                                      if parameter[4] != base_values[slot]]
+                else:
+                    parameter_rows = [(None,) + parameter for parameter in slots]
+
+            cursor = self.connection.execute(
+                "INSERT INTO units (name, family_id, size, sha256, skeleton, own_parameters, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, family_id, len(mcd_bytes), hashlib.sha256(mcd_bytes).hexdigest(),
+                 zlib.compress(b"".join(skeleton), 9), int(own_parameters),
+                 datetime.now().isoformat(timespec="seconds")))
+            unit_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO unit_parameters (unit_id, slot, scope, scope_index, param_id, name, value, number) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(unit_id,) + row for row in parameter_rows])
+
+            # --- Members ---
+            for position, member in enumerate(layout):
+                level = None
+                if member["compress_type"] == STORED:
+                    level = 0
+                elif member["compress_type"] == DEFLATED:
+                    level = rebuild_level(member["data"], member["raw"])
+                kind, blob = self._encode_member(member, level, base_members, own_parameters)
+                self.connection.execute(
+                    "INSERT INTO unit_members (unit_id, position, name, payload_offset, payload_size, compress_type, "
+                    "level, kind, blob) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (unit_id, position, member["name"], member["offset"], len(member["raw"]),
+                     member["compress_type"], level, kind, blob))
+
+            # Never keep a unit that would not come back byte for byte (member for member when re-deflated)
+            rebuilt = self.reconstruct(name)
+            if rebuilt != mcd_bytes and (self.exact or _member_contents(rebuilt) != _member_contents(mcd_bytes)):
+                raise ValueError(f"{name} could not be stored exactly")
+            return self._stored_bytes() - before
+
+    def _encode_member(self, member, level, base_members, own_parameters):
+        """Picks the smallest representation of one member. Returns (kind, blob hash or None)."""
+        if level is None and self.exact and member["data"] is not None:
+            # Let the member's own stream be the stored form of its content, unless another stream already is
+            digest = self._put_blob(member["data"], stream=member["raw"])
+            if self._blob_stream(digest) == member["raw"]:
+                return "stream", digest
+        if level is None and (self.exact or member["data"] is None):
+            return "raw", self._put_blob(member["raw"], pack=False)
+        data = member["data"]
+        base = base_members.get(member["name"])
+        if base == data:
+            return "base", None
+        if member["name"] == PARAMETERS_MEMBER and not own_parameters:
+            return "parameters", None
+        if base is None:
+            return "full", self._put_blob(data)
+        delta = line_delta(base, data)
+        if len(delta) < len(data):
+            return "delta", self._put_blob(delta)
+        return "full", self._put_blob(data)
+
+    def remove(self, name):
+        """Removes a unit (its family and base stay). Returns True if it existed."""
+        with self.connection:
+            return self._remove(name)
+
+    def _remove(self, name):
+        if self.connection.execute("DELETE FROM units WHERE name = ?", (name,)).rowcount == 0:
+            return False
+        self.connection.execute(
+            "DELETE FROM blobs WHERE sha256 NOT IN (SELECT blob FROM unit_members WHERE blob IS NOT NULL) "
+            "AND sha256 NOT IN (SELECT blob FROM family_members) "
+            "AND sha256 NOT IN (SELECT template FROM families WHERE template IS NOT NULL)")
+        return True
+
+    def add_file(self, path, name=None, family=None):
+        """Adds an .mcd file (named by its file name unless name is given)."""
+        with open(path, "rb") as f:
+            return self.add(name or os.path.basename(path), f.read(), family)
+
+    def add_folder(self, root, family=None, extension=".mcd"):
+        """
+        Adds every MCD under a folder, named by their paths relative to it.
+
+        Returns:
+            dict: Counts of added and failed files, total size and stored bytes, and elapsed_s.
+        """
+        start = time.perf_counter()
+        stats = {"added": 0, "failed": 0, "size": 0, "stored": 0}
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in sorted(file_names):
+                if not file_name.lower().endswith(extension):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    result = self.add_file(path, os.path.relpath(path, root).replace(os.sep, "/"), family)
+                except Exception as e:
+                    print(f"❌ {path}: {e}")
+                    stats["failed"] += 1
+                    continue
+                stats["added"] += 1
+                stats["size"] += result["size"]
+                stats["stored"] += result["stored"]
+        stats["elapsed_s"] = time.perf_counter() - start
+        return stats
+
+    def _stored_bytes(self):
+        """Approximate payload bytes held by the database."""
+        row = self.connection.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs) + "
+            "(SELECT COALESCE(SUM(LENGTH(skeleton)), 0) FROM units) + "
+            "(SELECT COUNT(*) FROM unit_parameters) * 16").fetchone()
+        return row[0]
+
+    # --- Reconstruction ---
+
+    def units(self, family=None):
+        """Returns unit names, optionally limited to one family."""
+        if family is None:
+            rows = self.connection.execute("SELECT name FROM units ORDER BY name")
+        else:
+            rows = self.connection.execute("SELECT u.name FROM units u JOIN families f ON f.id = u.family_id "
+                                           "WHERE f.name = ? ORDER BY u.name", (family,))
+        return [row["name"] for row in rows]
+
+    def reconstruct(self, name):
+        """Rebuilds a unit's exact .mcd bytes."""
+        unit = self.connection.execute("SELECT * FROM units WHERE name = ?", (name,)).fetchone()
+        if unit is None:
+            raise KeyError(f"No unit named '{name}' in the archive")
+        base_members, segments, base_values = self._family(unit["family_id"])
+        skeleton = zlib.decompress(unit["skeleton"])
+
+        members = self.connection.execute("SELECT * FROM unit_members WHERE unit_id = ? ORDER BY position",
+                                          (unit["id"],)).fetchall()
+        payloads = [self._member_payload(unit, member, base_members, segments, base_values) for member in members]
+        if any(member["level"] is None and member["kind"] not in ("raw", "stream") for member in members):
+            return _rebuild_container(skeleton, members, payloads)
+
+        parts = []
+        position = 0
+        removed = 0
+        for member, payload in zip(members, payloads):
+            start = member["payload_offset"] - removed
+            parts.append(skeleton[position:start])
+            position = start
+            removed += member["payload_size"]
+            parts.append(payload)
+        parts.append(skeleton[position:])
+        return b"".join(parts)
+
+    def _member_payload(self, unit, member, base_members, segments, base_values):
+        """Rebuilds the compressed bytes of one member."""
+        kind = member["kind"]
+        if kind == "raw":
+            return self._get_blob(member["blob"])
+        if kind == "stream":
+            return self._blob_stream(member["blob"])
+        if kind == "base":
+            data = base_members[member["name"]]
+        elif kind == "full":
+            data = self._get_blob(member["blob"])
+        elif kind == "delta":
+            data = apply_line_delta(base_members[member["name"]], self._get_blob(member["blob"]))
+        else:
+            values = list(base_values)
+            for row in self.connection.execute("SELECT slot, value FROM unit_parameters WHERE unit_id = ?",
+                                               (unit["id"],)):
+                values[row["slot"]] = row["value"]
+            data = join_parameters(segments, values).encode("utf-8")
+        if member["compress_type"] == STORED:
+            return data
+        return _deflate(data, DEFAULT_LEVEL if member["level"] is None else member["level"])
+
+    def extract(self, name, output_path):
+        """Writes a unit's .mcd to output_path and returns the path."""
+        with open(output_path, "wb") as f:
+            f.write(self.reconstruct(name))
+        return output_path
+
+    # --- Parameter scans (no reconstruction) ---
+
+    def parameter_values(self, name, scope="Axis", operator=None, value=None):
+        """
+        Returns a parameter's value in every unit, straight from the parameter tables.
+
+        Args:
+            name (str): Parameter name, e.g. "CurrentLoopGainK".
+            scope (str): "System", "Axis" or "Task".
+            operator (str): Optional comparison (one of COMPARISON_OPERATORS) to filter by.
+            value: Value compared against; numeric values compare numerically, anything else as text.
+
+        Returns:
+            list: Dicts of unit, family, scope_index, value.
+        """
+        condition = ""
+        params = [name, scope]
+        if operator is not None:
+            if operator not in COMPARISON_OPERATORS:
+                raise ValueError(f"Unsupported operator '{operator}', use one of {', '.join(COMPARISON_OPERATORS)}")
+            number = _to_number(value)
+            condition = f"WHERE {'number' if number is not None else 'value'} {operator} ?"
+            params.append(number if number is not None else str(value))
+        params = [name, scope] + params
+        return [dict(row) for row in self.connection.execute(
+            "SELECT unit, family, scope_index, value FROM ("
+            # Units sharing their family's template: base values with the unit's overrides
+            " SELECT u.name AS unit, f.name AS family, b.scope_index, "
+            " COALESCE(o.value, b.value) AS value, CASE WHEN o.unit_id IS NULL THEN b.number ELSE o.number END AS number"
+            " FROM family_parameters b JOIN units u ON u.family_id = b.family_id AND u.own_parameters = 0"
+            " JOIN families f ON f.id = u.family_id"
+            " LEFT JOIN unit_parameters o ON o.unit_id = u.id AND o.slot = b.slot"
+            " WHERE b.name = ? AND b.scope = ?"
+            " UNION ALL"
+            # Units with a differently shaped config/Parameters keep all their own values
+            " SELECT u.name, f.name, o.scope_index, o.value, o.number"
+            " FROM unit_parameters o JOIN units u ON u.id = o.unit_id AND u.own_parameters = 1"
+            " JOIN families f ON f.id = u.family_id"
+            " WHERE o.name = ? AND o.scope = ?"
+            f") {condition} ORDER BY unit, scope_index", params)]
+
+    def changed_parameters(self, name):
+        """Returns the parameters a unit changes relative to its family base (all of them if its layout differs)."""
+        return [dict(row) for row in self.connection.execute(
+            "SELECT o.scope, o.scope_index, o.name, b.value AS base_value, o.value FROM unit_parameters o "
+            "JOIN units u ON u.id = o.unit_id LEFT JOIN family_parameters b "
+            "ON b.family_id = u.family_id AND b.slot = o.slot WHERE u.name = ? ORDER BY o.scope, o.scope_index, o.slot",
+            (name,))]
+
+    def stats(self):
+        """Returns unit and family counts, total original size and bytes stored."""
+        row = self.connection.execute("SELECT COUNT(*) AS units, COALESCE(SUM(size), 0) AS size FROM units").fetchone()
+        families = self.connection.execute("SELECT COUNT(*) FROM families").fetchone()[0]
+        return {"units": row["units"], "families": families, "size": row["size"], "stored": self._stored_bytes()}
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Store MCDs as per-family bases plus per-unit deltas.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Archive database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Add MCD files or folders of MCDs")
+    add.add_argument("paths", nargs="+")
+    add.add_argument("--family", help="Family name (default: derived from each MCD)")
+    add.add_argument("--redeflate", action="store_true",
+                     help="Store members zlib cannot reproduce as content; extracted MCDs keep every member's "
+                          "content but are not byte-identical")
+    extract = commands.add_parser("extract", help="Rebuild a unit's .mcd")
+    extract.add_argument("unit")
+    extract.add_argument("-o", "--output", help="Output path (default: the unit's file name)")
+    param = commands.add_parser("param", help="Scan a parameter across all units")
+    param.add_argument("name")
+    param.add_argument("operator", nargs="?", choices=COMPARISON_OPERATORS)
+    param.add_argument("value", nargs="?")
+    param.add_argument("--scope", default="Axis", choices=["System", "Axis", "Task"])
+    changes = commands.add_parser("changes", help="List the parameters a unit changes from its family base")
+    changes.add_argument("unit")
+    remove = commands.add_parser("remove", help="Remove a unit")
+    remove.add_argument("unit")
+    commands.add_parser("stats", help="Show archive size and families")
+    args = parser.parse_args()
+
+    with FleetArchive(args.db, exact=not getattr(args, "redeflate", False)) as archive:
+        if args.command == "add":
+            for path in args.paths:
+                if os.path.isdir(path):
+                    stats = archive.add_folder(path, args.family)
+                    print(f"✅ Added {stats['added']} MCDs from {path} ({stats['failed']} failed): "
+                          f"{stats['size']} bytes stored as {stats['stored']} in {stats['elapsed_s']:.2f} s")
+                else:
+                    result = archive.add_file(path, family=args.family)
+                    print(f"✅ {result['unit']} [{result['family']}]: {result['size']} bytes stored as {result['stored']}")
+            return 0
+
+        if args.command == "extract":
+            try:
+                output = archive.extract(args.unit, args.output or os.path.basename(args.unit))
+            except KeyError as e:
+                print(f"❌ {e.args[0]}")
+                return 1
+            print(f"💾 {args.unit} written to {output}")
+            return 0
+
+        if args.command == "param":
+            if (args.operator is None) != (args.value is None):
+                parser.error("give both an operator and a value, or neither")
+            start = time.perf_counter()
+            rows = archive.parameter_values(args.name, args.scope, args.operator, args.value)
+            for row in rows:
+                print(f"{row['unit']}  {args.scope} {row['scope_index']}  {row['value']}")
+            print(f"\n{len(rows)} row(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return 0
+
+        if args.command == "changes":
+            rows = archive.changed_parameters(args.unit)
+            for row in rows:
+                print(f"{row['scope']} {row['scope_index']} {row['name']}: {row['base_value']} -> {row['value']}")
+            print(f"\n{len(rows)} changed parameter(s)")
+            return 0
+
+        if args.command == "remove":
+            if not archive.remove(args.unit):
+                print(f"❌ No unit named '{args.unit}' in the archive")
+                return 1
+            print(f"♻️ Removed {args.unit}")
+            return 0
+
+        stats = archive.stats()
+        print(f"📊 {stats['units']} units in {stats['families']} families: "
+              f"{stats['size']} bytes stored as {stats['stored']} ({stats['stored'] / max(stats['size'], 1):.1%})")
+        for family in archive.families():
+            print(f"   {family['name']}: {family['units']} units (base {family['base_unit']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fleet Index - SQLite index of MCD metadata and parameters across a directory tree
+Description: Walks a folder of shipped MCDs with a process pool and stores each
+file's software version, controller type, controller name, configured product
+options and every config/Parameters value in an indexed SQLite database.
+Re-scans are incremental: files whose size and mtime are unchanged are skipped,
+and changed files whose content hash still matches are not re-parsed. Fleet
+questions are then answered with indexed SQL instead of opening every MCD.
+
+Usage:
+    python FleetIndex.py scan <folder> [--db fleet_index.db] [--workers N]
+    python FleetIndex.py param CurrentLoopGainK ">" 600
+    python FleetIndex.py version 2.10.2.3124
+    python FleetIndex.py option "Bus Voltage" 160V
+    python FleetIndex.py sql "SELECT COUNT(*) FROM files"
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import MCDXml
+from MCDArchive import MCDArchive
+
+DEFAULT_DB_PATH = "fleet_index.db"
+SCHEMA_VERSION = 1
+# Files per worker task; keeps inter-process overhead low for folders of small MCDs
+CHUNK_SIZE = 16
+PARAMETER_AXES = MCDXml.Query(".//Parameters/Axes/Axis")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    indexed_at TEXT NOT NULL,
+    controller_type TEXT,
+    software_version TEXT,
+    controller_name TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS options (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    product TEXT,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    scope_index INTEGER NOT NULL,
+    axis_name TEXT,
+    param_id INTEGER,
+    name TEXT NOT NULL,
+    value TEXT,
+    number REAL
+);
+CREATE INDEX IF NOT EXISTS idx_files_version ON files(software_version);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(controller_name);
+CREATE INDEX IF NOT EXISTS idx_options_key ON options(key, value);
+CREATE INDEX IF NOT EXISTS idx_options_file ON options(file_id);
+CREATE INDEX IF NOT EXISTS idx_parameters_name_number ON parameters(name, number);
+CREATE INDEX IF NOT EXISTS idx_parameters_name_value ON parameters(name, value);
+CREATE INDEX IF NOT EXISTS idx_parameters_file ON parameters(file_id);
+"""
+
+COMPARISON_OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+
+def _to_number(value):
+    """Returns value as a float, or None if it is not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _text(root, path):
+    element = root.find(path)
+    return element.text.strip() if element is not None and element.text else None
+
+def extract_mcd_record(mcd_bytes):
+    """
+    Pulls the indexed fields out of an MCD.
+
+    Returns:
+        dict: controller_type, software_version, controller_name, options [(product, key, value)]
+        and parameters [(scope, scope_index, axis_name, param_id, name, value, number)].
+    """
+    archive = MCDArchive.from_bytes(mcd_bytes)
+    record = {"controller_type": None, "software_version": None, "controller_name": None,
+              "options": [], "parameters": []}
+
+    if "mcdInformation.xml" in archive:
+        info = MCDXml.fromstring(archive.read("mcdInformation.xml"))
+        record["software_version"] = _text(info, "./FileInformation/SoftwareVersion")
+        record["controller_type"] = _text(info, "./Data/ControllerType")
+
+    if "config/Names" in archive:
+        names = MCDXml.fromstring(archive.read("config/Names"))
+        record["controller_name"] = _text(names, ".//ControllerName")
+
+    if "config/MachineSetupData" in archive:
+        setup = MCDXml.fromstring(archive.read("config/MachineSetupData"))
+        for product in setup.iter():
+            options = product.find("ConfiguredOptions")
+            if options is None:
+                continue
+            product_name = _text(product, "Name")
+            for pair in options.findall("KeyValuePair"):
+                key = _text(pair, "Key")
+                if key:
+                    record["options"].append((product_name, key, _text(pair, "Value")))
+
+    if "config/Parameters" in archive:
+        parameters = MCDXml.fromstring(archive.read("config/Parameters"))
+        scopes = [("System", -1, parameters.find(".//Parameters/System"))]
+        scopes += [("Axis", int(axis.get("Index")), axis) for axis in PARAMETER_AXES(parameters)]
+        scopes += [("Task", int(task.get("Index")), task) for task in parameters.findall(".//Parameters/Tasks/Task")]
+        for scope, scope_index, element in scopes:
+            if element is None:
+                continue
+            entries = [(p.get("id"), p.get("n"), p.text) for p in MCDXml.AXIS_PARAMETERS(element) if p.get("n")]
+            axis_name = next((value for _, name, value in entries if name == "AxisName"), None) if scope == "Axis" else None
+            for param_id, name, value in entries:
+                record["parameters"].append((scope, scope_index, axis_name, int(param_id) if param_id else None,
+                                             name, value, _to_number(value)))
+    return record
+
+def _index_file(task):
+    """
+    Process pool worker: hashes a file and parses it unless its hash is unchanged.
+
+    Args:
+        task (tuple): (path, previously indexed sha256 or None)
+
+    Returns:
+        dict: path, size, mtime_ns, sha256 and either 'unchanged', 'record' or 'error'.
+    """
+    path, known_sha256 = task
+    result = {"path": path}
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        result.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=hashlib.sha256(data).hexdigest())
+        if result["sha256"] == known_sha256:
+            result["unchanged"] = True
+        else:
+            result["record"] = extract_mcd_record(data)
+    except Exception as e:
+        result.setdefault("size", 0)
+        result.setdefault("mtime_ns", 0)
+        result.setdefault("sha256", "")
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def _index_chunk(tasks):
+    return [_index_file(task) for task in tasks]
+
+class FleetIndex:
+    """SQLite-backed index of MCD metadata and parameters."""
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Scanning ---
+
+    def scan(self, root, workers=None, extension=".mcd"):
+        """
+        Indexes every MCD under root, re-parsing only new or changed files.
+
+        Args:
+            root (str): Folder to walk recursively.
+            workers (int): Worker processes (defaults to the CPU count).
+            extension (str): File extension to index.
+
+        Returns:
+            dict: Counts of added, updated, unchanged, removed and failed files plus elapsed_s.
+        """
+        start = time.perf_counter()
+        root = os.path.abspath(root)
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+        known = {row["path"]: row for row in self.connection.execute(
+            "SELECT path, size, mtime_ns, sha256 FROM files WHERE substr(path, 1, ?) = ?",
+            (len(os.path.join(root, "")), os.path.join(root, "")))}
+
+        tasks = []
+        seen = set()
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                if not file_name.lower().endswith(extension):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                seen.add(path)
+                row = known.get(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+                    stats["unchanged"] += 1
+                    continue
+                tasks.append((path, row["sha256"] if row is not None else None))
+
+        results = []
+        if tasks:
+            chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+            if len(chunks) == 1 or workers == 1:
+                for chunk in chunks:
+                    results.extend(_index_chunk(chunk))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for chunk_results in pool.map(_index_chunk, chunks):
+                        results.extend(chunk_results)
+
+        with self.connection:
+            for result in results:
+                self._store(result, known.get(result["path"]), stats)
+            removed = [path for path in known if path not in seen]
+            for path in removed:
+                self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            stats["removed"] = len(removed)
+
+        stats["elapsed_s"] = time.perf_counter() - start
+        return stats
+
+    def _store(self, result, previous, stats):
+        """Writes one worker result into the database."""
+        now = datetime.now().isoformat(timespec="seconds")
+        if result.get("unchanged"):
+            self.connection.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                                    (result["size"], result["mtime_ns"], result["path"]))
+            stats["unchanged"] += 1
+            return
+
+        if previous is not None:
+            self.connection.execute("DELETE FROM files WHERE path = ?", (result["path"],))
+        record = result.get("record") or {}
+        cursor = self.connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, sha256, indexed_at, controller_type, software_version, "
+            "controller_name, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (result["path"], result["size"], result["mtime_ns"], result["sha256"], now,
+             record.get("controller_type"), record.get("software_version"), record.get("controller_name"),
+             result.get("error")))
+        file_id = cursor.lastrowid
+        self.connection.executemany("INSERT INTO options (file_id, product, key, value) VALUES (?, ?, ?, ?)",
+                                    [(file_id,) + option for option in record.get("options", [])])
+        self.connection.executemany(
+            "INSERT INTO parameters (file_id, scope, scope_index, axis_name, param_id, name, value, number) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(file_id,) + parameter for parameter in record.get("parameters", [])])
+
+        if result.get("error"):
+            stats["failed"] += 1
+        elif previous is None:
+            stats["added"] += 1
+        else:
+            stats["updated"] += 1
+
+    # --- Queries ---
+
+    def query(self, sql, params=()):
+        """Runs arbitrary SQL against the index and returns the rows as dicts."""
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def files_where_parameter(self, name, operator, value, scope="Axis"):
+        """
+        Finds files where a parameter compares to a value, e.g. ("CurrentLoopGainK", ">", 600).
+        Numeric values compare numerically; anything else compares as text.
+
+        Returns:
+            list: Dicts of path, controller_name, software_version, scope_index, axis_name and value.
+        """
+        if operator not in COMPARISON_OPERATORS:
+            raise ValueError(f"Unsupported operator '{operator}', use one of {', '.join(COMPARISON_OPERATORS)}")
+        number = _to_number(value)
+        column = "p.number" if number is not None else "p.value"
+        return self.query(
+            "SELECT f.path, f.controller_name, f.software_version, p.scope_index, p.axis_name, p.value "
+            f"FROM parameters p JOIN files f ON f.id = p.file_id WHERE p.name = ? AND p.scope = ? AND {column} {operator} ? "
+            "ORDER BY f.path, p.scope_index",
+            (name, scope, number if number is not None else str(value)))
+
+    def files_with_software_version(self, version):
+        """Returns the files built with a given SoftwareVersion."""
+        return self.query("SELECT path, controller_name, controller_type, software_version FROM files "
+                          "WHERE software_version = ? ORDER BY path", (version,))
+
+    def files_with_option(self, key, value=None):
+        """Returns files whose products have a ConfiguredOptions key (optionally with a specific value)."""
+        sql = ("SELECT f.path, f.controller_name, o.product, o.key, o.value FROM options o "
+               "JOIN files f ON f.id = o.file_id WHERE o.key = ?")
+        params = [key]
+        if value is not None:
+            sql += " AND o.value = ?"
+            params.append(value)
+        return self.query(sql + " ORDER BY f.path", params)
+
+    def parameter_values(self, path, scope="Axis"):
+        """Returns {scope_index: {parameter name: value}} for one indexed file."""
+        values = {}
+        for row in self.connection.execute(
+                "SELECT p.scope_index, p.name, p.value FROM parameters p JOIN files f ON f.id = p.file_id "
+                "WHERE f.path = ? AND p.scope = ?", (os.path.abspath(path), scope)):
+            values.setdefault(row["scope_index"], {})[row["name"]] = row["value"]
+        return values
+
+def _print_rows(rows, elapsed_s):
+    if not rows:
+        print("No matches.")
+    for row in rows:
+        print("  ".join("" if v is None else str(v) for v in row.values()))
+    print(f"\n{len(rows)} row(s) in {elapsed_s * 1000:.1f} ms")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Index and query MCD files across a fleet.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Index database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="Index (or re-index) a folder of MCDs")
+    scan.add_argument("folder")
+    scan.add_argument("--workers", type=int, help="Worker processes")
+    param = commands.add_parser("param", help="Find files by parameter value")
+    param.add_argument("name")
+    param.add_argument("operator", choices=COMPARISON_OPERATORS)
+    param.add_argument("value")
+    param.add_argument("--scope", default="Axis", choices=["System", "Axis", "Task"])
+    version = commands.add_parser("version", help="Find files by SoftwareVersion")
+    version.add_argument("version")
+    option = commands.add_parser("option", help="Find files by ConfiguredOptions key/value")
+    option.add_argument("key")
+    option.add_argument("value", nargs="?")
+    sql = commands.add_parser("sql", help="Run a SQL query against the index")
+    sql.add_argument("statement")
+    args = parser.parse_args()
+
+    with FleetIndex(args.db) as index:
+        if args.command == "scan":
+            stats = index.scan(args.folder, args.workers)
+            print(f"✅ Indexed {args.folder}: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['unchanged']} unchanged, {stats['removed']} removed, {stats['failed']} failed "
+                  f"in {stats['elapsed_s']:.2f} s")
+            return 0
+
+        start = time.perf_counter()
+        if args.command == "param":
+            rows = index.files_where_parameter(args.name, args.operator, args.value, args.scope)
+        elif args.command == "version":
+            rows = index.files_with_software_version(args.version)
+        elif args.command == "option":
+            rows = index.files_with_option(args.key, args.value)
+        else:
+            rows = index.query(args.statement)
+        _print_rows(rows, time.perf_counter() - start)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
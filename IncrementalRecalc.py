@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Incremental Recalc - Per-axis parameter recalculation for multi-axis MCDs
+Description: Changing the payload of one axis of an XY (or 8- to 32-axis gantry)
+MCD normally recalculates the whole controller definition. This module
+fingerprints each axis's machine setup (its AxisConfiguration plus the matching
+MechanicalAxis/ElectricalAxis entries of the products) and compares them with
+the previous calculated MCD. Only the changed axes are put into a reduced MCD
+and calculated; their <Axis Index=...> blocks are spliced into the previous
+config/Parameters text, leaving every other axis byte-for-byte untouched.
+
+The previous MCD was written by the .NET calculation, which upgrades the machine
+setup schema (MotorWiringType, HexapodLogical, ... are added with default values).
+Fields the new MCD does not have are therefore left out of the previous MCD's
+fingerprints, and the output keeps the calculated setup with the new MCD's values.
+
+A full recalculation is used instead when anything outside the per-axis subtrees
+changed (product options, axis count) or the reduced result cannot be mapped back.
+
+Usage:
+    python IncrementalRecalc.py "PRO165LM XY-No Load.mcd" "PRO165LM XY Loaded.mcd" -o "PRO165LM XY Loaded.mcd"
+    python IncrementalRecalc.py new.mcd previous_calculated.mcd --dry-run
+"""
+
+import re
+import sys
+import copy
+import json
+import time
+import hashlib
+import argparse
+
+import MCDXml
+from MCDArchive import MCDArchive
+from CalculationCache import canonicalize, INPUT_MEMBERS
+
+MACHINE_SETUP_MEMBER = "config/MachineSetupData"
+PARAMETERS_MEMBER = "config/Parameters"
+
+_AXIS_BLOCK = re.compile(r'<Axis Index="(\d+)"\s*/>|<Axis Index="(\d+)">.*?</Axis>', re.DOTALL)
+
+# --- Per-axis fingerprints ---
+
+def _configuration(setup_root):
+    configuration = setup_root.find("./Data/Configuration/MachineSetupConfiguration")
+    if configuration is None:
+        raise ValueError("MachineSetupData has no MachineSetupConfiguration")
+    return configuration
+
+def _product_axes(configuration, products, product, axes, axis):
+    """Flattened (product, axes container, axis) triples in axis order."""
+    result = []
+    for product_element in configuration.findall(f"./{products}/{product}"):
+        container = product_element.find(axes)
+        if container is not None:
+            result.extend((product_element, container, axis_element) for axis_element in container.findall(axis))
+    return result
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def axis_fingerprints(setup_root):
+    """
+    Fingerprints the machine setup of an MCD per axis.
+
+    Returns:
+        tuple: (shared fingerprint, [per-axis fingerprints in axis order]). The shared part covers
+        everything outside the per-axis subtrees, e.g. product names and configured options.
+    """
+    configuration = _configuration(setup_root)
+    axis_configurations = configuration.findall("./Axes/AxisConfiguration")
+    mechanical = _product_axes(configuration, "MechanicalProducts", "MechanicalProduct", "MechanicalAxes", "MechanicalAxis")
+    electrical = _product_axes(configuration, "ElectricalProducts", "ElectricalProduct", "ElectricalAxes", "ElectricalAxis")
+
+    per_axis = []
+    for i, axis_configuration in enumerate(axis_configurations):
+        parts = [canonicalize(axis_configuration)]
+        for entries in (mechanical, electrical):
+            parts.append(canonicalize(entries[i][2]) if i < len(entries) else None)
+        per_axis.append(_digest(parts))
+
+    # The shared part is the configuration with every per-axis subtree removed
+    shared = copy.deepcopy(configuration)
+    for path in ("./Axes", "./MechanicalProducts/MechanicalProduct/MechanicalAxes",
+                 "./ElectricalProducts/ElectricalProduct/ElectricalAxes"):
+        for container in shared.findall(path):
+            for child in list(container):
+                container.remove(child)
+    counts = [len(axis_configurations), len(mechanical), len(electrical)]
+    return _digest([counts, canonicalize(shared)]), per_axis
+
+def _positioned(element):
+    """{(tag, position among same-tag siblings): child} for an element's children."""
+    positions = {}
+    children = {}
+    for child in element:
+        position = positions[child.tag] = positions.get(child.tag, -1) + 1
+        children[(child.tag, position)] = child
+    return children
+
+def _leaf_pairs(new, previous):
+    """
+    Matches the leaf fields of two MachineSetupConfiguration elements by tag and position.
+
+    Yields:
+        tuple: (parent in previous, new leaf or None, previous leaf or None). Subtrees present
+        on one side only are skipped; the fingerprints tell those apart.
+    """
+    new_children, previous_children = _positioned(new), _positioned(previous)
+    for key in list(new_children) + [key for key in previous_children if key not in new_children]:
+        new_child, previous_child = new_children.get(key), previous_children.get(key)
+        new_leaf = new_child is not None and not len(new_child)
+        previous_leaf = previous_child is not None and not len(previous_child)
+        if new_child is not None and previous_child is not None and not new_leaf and not previous_leaf:
+            yield from _leaf_pairs(new_child, previous_child)
+        elif (new_child is None or new_leaf) and (previous_child is None or previous_leaf):
+            yield previous, new_child, previous_child
+
+def align_machine_setup(previous_root, new_root):
+    """
+    Returns a copy of the previous MachineSetupData root without the leaf fields the new one lacks,
+    so the schema upgrade of a calculated MCD does not count as a change.
+    """
+    previous_root = copy.deepcopy(previous_root)
+    for parent, new_leaf, previous_leaf in _leaf_pairs(_configuration(new_root), _configuration(previous_root)):
+        if new_leaf is None:
+            parent.remove(previous_leaf)
+    return previous_root
+
+def overlay_machine_setup(previous_setup, new_root):
+    """
+    Writes the new MCD's field values into the previous (calculated) MachineSetupData.
+
+    Args:
+        previous_setup (bytes): The previous MCD's member.
+        new_root: The new MCD's MachineSetupData root.
+
+    Returns:
+        bytes: The calculated setup with the new values, or None if the new MCD has fields
+        the previous one lacks.
+    """
+    document = MCDXml.XmlDocument(previous_setup)
+    for _, new_leaf, previous_leaf in _leaf_pairs(_configuration(new_root), _configuration(document.root)):
+        if previous_leaf is None:
+            return None
+        if new_leaf is not None:
+            previous_leaf.text = new_leaf.text
+    return document.serialize()
+
+def changed_axes(new_mcd, previous_mcd):
+    """
+    Compares the per-axis machine setup of two MCDs. Fields only the previous MCD has
+    (added by the .NET calculation) are ignored.
+
+    Returns:
+        list: Indices of changed axes, or None if the shared setup or axis count differs
+        (a full recalculation is needed).
+    """
+    new_root = MCDXml.fromstring(new_mcd.read(MACHINE_SETUP_MEMBER))
+    previous_root = MCDXml.fromstring(previous_mcd.read(MACHINE_SETUP_MEMBER))
+    new_shared, new_axes = axis_fingerprints(new_root)
+    old_shared, old_axes = axis_fingerprints(align_machine_setup(previous_root, new_root))
+    if new_shared != old_shared or len(new_axes) != len(old_axes):
+        return None
+    return [i for i, (new, old) in enumerate(zip(new_axes, old_axes)) if new != old]
+
+# --- Reduced MCD ---
+
+def reduced_machine_setup(setup_root, keep):
+    """
+    Returns MachineSetupData bytes containing only the axes at the positions in keep.
+    Products left without axes are removed.
+    """
+    root = copy.deepcopy(setup_root)
+    configuration = _configuration(root)
+    keep = set(keep)
+
+    axes = configuration.find("./Axes")
+    for i, axis_configuration in enumerate(list(axes.findall("AxisConfiguration"))):
+        if i not in keep:
+            axes.remove(axis_configuration)
+
+    for products, product, axes_tag, axis_tag in (
+            ("MechanicalProducts", "MechanicalProduct", "MechanicalAxes", "MechanicalAxis"),
+            ("ElectricalProducts", "ElectricalProduct", "ElectricalAxes", "ElectricalAxis")):
+        for i, (_, container, axis_element) in enumerate(_product_axes(configuration, products, product, axes_tag, axis_tag)):
+            if i not in keep:
+                container.remove(axis_element)
+        products_element = configuration.find(products)
+        if products_element is not None:
+            for product_element in list(products_element.findall(product)):
+                container = product_element.find(axes_tag)
+                if container is not None and not list(container):
+                    products_element.remove(product_element)
+    return MCDXml.tostring(root)
+
+def axis_indices(setup_root):
+    """AxisConfiguration Index values in axis order."""
+    return [int(element.findtext("Index", str(i)))
+            for i, element in enumerate(_configuration(setup_root).findall("./Axes/AxisConfiguration"))]
+
+# --- Parameters merge ---
+
+def axis_blocks(parameters_text):
+    """Returns {axis index: block text} for the <Axis Index=...> blocks of a Parameters document."""
+    return {int(match.group(1) or match.group(2)): match.group(0) for match in _AXIS_BLOCK.finditer(parameters_text)}
+
+def merge_axis_blocks(parameters_text, replacements):
+    """
+    Replaces <Axis Index=...> blocks in a Parameters document, leaving the rest of the text untouched.
+
+    Args:
+        parameters_text (str): The previous config/Parameters document.
+        replacements (dict): Axis index -> new block text (with the target index).
+    """
+    def substitute(match):
+        index = int(match.group(1) or match.group(2))
+        return replacements.get(index, match.group(0))
+    missing = set(replacements) - set(axis_blocks(parameters_text))
+    if missing:
+        raise ValueError(f"Previous Parameters has no block for axis {sorted(missing)}")
+    return _AXIS_BLOCK.sub(substitute, parameters_text)
+
+def _reindex(block, index):
+    return re.sub(r'^<Axis Index="\d+"', f'<Axis Index="{index}"', block)
+
+def map_reduced_blocks(reduced_blocks, changed_indices):
+    """
+    Maps the Axis blocks of a reduced calculation back to the original axis indices.
+    The calculation either keeps the original Index values or numbers the reduced axes from 0.
+    """
+    if set(changed_indices) <= set(reduced_blocks):
+        return {index: reduced_blocks[index] for index in changed_indices}
+    if len(reduced_blocks) == len(changed_indices):
+        ordered = [reduced_blocks[index] for index in sorted(reduced_blocks)]
+        return {index: _reindex(block, index) for index, block in zip(sorted(changed_indices), ordered)}
+    raise ValueError("Reduced calculation returned an unexpected set of axes")
+
+# --- Recalculation ---
+
+def dotnet_calculator(mcd_bytes):
+    """Calculates MCD bytes in memory with a pooled GenerateMCD controller. Returns (MCD bytes, warnings)."""
+    import MCDProcessing
+    from ClrBridge import ClrBridge
+
+    with MCDProcessing.pooled_converter() as controller:
+        bridge = ClrBridge(controller)
+        calculated, warnings = bridge.calculate_parameters(bridge.read_mcd(mcd_bytes))
+        return bridge.write_mcd(calculated), warnings
+
+def _decode(data):
+    return data.decode("utf-8-sig")
+
+def recalculate(new_mcd_path, previous_calculated_path, output_path, calculator=dotnet_calculator):
+    """
+    Recalculates only the axes whose machine setup changed since previous_calculated_path.
+
+    Args:
+        new_mcd_path (str): Modified (uncalculated) MCD.
+        previous_calculated_path (str): Earlier calculated MCD for the same machine.
+        output_path (str): Where the calculated MCD is written (may be previous_calculated_path).
+        calculator (callable): MCD bytes -> (calculated MCD bytes, warnings).
+
+    Returns:
+        dict: mode ("incremental", "unchanged" or "full"), changed_axes, total_axes, warnings and elapsed_s.
+    """
+    start = time.perf_counter()
+    new_archive = MCDArchive.open(new_mcd_path)
+    previous = MCDArchive.open(previous_calculated_path)
+    setup_root = MCDXml.fromstring(new_archive.read(MACHINE_SETUP_MEMBER))
+    total_axes = len(axis_indices(setup_root))
+
+    changed = changed_axes(new_archive, previous) if PARAMETERS_MEMBER in previous else None
+    warnings = []
+
+    if changed is None:
+        mode = "full"
+        calculated_bytes, warnings = calculator(new_archive.to_bytes())
+        calculated = MCDArchive.from_bytes(calculated_bytes)
+        members = {name: calculated.read(name) for name in calculated.names() if name not in INPUT_MEMBERS}
+    else:
+        members = {name: previous.read(name) for name in previous.names() if name not in INPUT_MEMBERS}
+        # The previous setup has the old payloads: keep its calculated schema with the new values
+        overlaid = overlay_machine_setup(previous.read(MACHINE_SETUP_MEMBER), setup_root)
+        if overlaid is None:
+            del members[MACHINE_SETUP_MEMBER]
+        else:
+            members[MACHINE_SETUP_MEMBER] = overlaid
+        if not changed:
+            mode = "unchanged"
+        else:
+            mode = "incremental"
+            indices = axis_indices(setup_root)
+            changed_indices = [indices[i] for i in changed]
+
+            reduced = MCDArchive.from_bytes(new_archive.to_bytes())
+            reduced.replace(MACHINE_SETUP_MEMBER, reduced_machine_setup(setup_root, changed))
+            calculated_bytes, warnings = calculator(reduced.to_bytes())
+            calculated = MCDArchive.from_bytes(calculated_bytes)
+
+            replacements = map_reduced_blocks(axis_blocks(_decode(calculated.read(PARAMETERS_MEMBER))), changed_indices)
+            previous_text = _decode(previous.read(PARAMETERS_MEMBER))
+            merged = merge_axis_blocks(previous_text, replacements)
+            members[PARAMETERS_MEMBER] = b"\xef\xbb\xbf" + merged.encode("utf-8")
+
+    for name, data in members.items():
+        new_archive.replace(name, data)
+    new_archive.write(output_path)
+
+    return {
+        "mode": mode,
+        "changed_axes": list(range(total_axes)) if changed is None else changed,
+        "total_axes": total_axes,
+        "warnings": [str(warning) for warning in warnings],
+        "elapsed_s": time.perf_counter() - start,
+    }
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Recalculate only the axes whose machine setup changed.")
+    parser.add_argument("mcd", help="Modified MCD")
+    parser.add_argument("previous", help="Previous calculated MCD for the same machine")
+    parser.add_argument("-o", "--output", help="Output path (default: overwrite the previous calculated MCD)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which axes changed")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        changed = changed_axes(MCDArchive.open(args.mcd), MCDArchive.open(args.previous))
+        if changed is None:
+            print("⚠️ Shared machine setup or axis count changed - a full recalculation is needed")
+        elif not changed:
+            print("✅ No axis changed")
+        else:
+            print(f"🔧 Changed axes (by position): {changed}")
+        return 0
+
+    try:
+        result = recalculate(args.mcd, args.previous, args.output or args.previous)
+    except Exception as e:
+        print(f"❌ Recalculation failed: {e}")
+        return 1
+    print(f"✅ {result['mode'].title()} recalculation of {len(result['changed_axes'])}/{result['total_axes']} "
+          f"axes in {result['elapsed_s']:.2f} s")
+    for warning in result["warnings"]:
+        print(f"   ⚠️ {warning}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
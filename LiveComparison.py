@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live Comparison - Compares a connected controller's axis parameters with an MCD
+Description: Pulls a snapshot of every axis parameter named in an MCD's
+config/Parameters from a connected a1.Controller in bulk (batched reads where
+the API offers them, see ParameterSync) into a ParameterTable, and diffs it
+against the MCD in one vectorised pass with numeric tolerances. Results can be
+shown in MCDComparison's ComparisonDialog or checked in a headless loop on a
+fixed interval.
+
+Usage:
+    python LiveComparison.py "PRO165LM XY-No Load.mcd" --show
+    python LiveComparison.py "PRO165LM XY-No Load.mcd" --watch 5 --simulate-from "PRO165LM XY-No Load.mcd"
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from ParameterSync import ParameterSync
+from ParameterTable import ParameterTable, diff, summarize
+from ControllerConnection import connect
+
+class LiveComparison:
+    """
+    Snapshots a controller and compares it with a reference MCD.
+
+    Args:
+        controller: A started a1.Controller (or ControllerSimulator.Controller).
+        reference (str or ParameterTable): The MCD (or its parsed table) the machine should match.
+        rel_tol (float): Relative tolerance for numeric values.
+        abs_tol (float): Absolute tolerance for numeric values.
+    """
+
+    def __init__(self, controller, reference, rel_tol=1e-9, abs_tol=1e-12):
+        self.controller = controller
+        self.reference = reference if isinstance(reference, ParameterTable) else ParameterTable.from_mcd(reference)
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.reader = ParameterSync(controller)
+        # Only axes the controller has can be read; the rest show up as "File 1 Only"
+        axis_count = controller.runtime.parameters.axes.count
+        self._requested = self.reference.select_axes(range(axis_count))
+
+    def snapshot(self):
+        """Reads the current controller values of every reference parameter. Returns a ParameterTable."""
+        requests = list(zip(self._requested.axis.tolist(), self._requested.names.tolist()))
+        return self._requested.with_values(self.reader.read_known(requests))
+
+    def compare(self, snapshot=None):
+        """
+        Diffs a snapshot (taken now if not given) against the reference.
+
+        Returns:
+            dict: counts by status, the differing rows, elapsed_s and round_trips used.
+        """
+        start = time.perf_counter()
+        self.reader.round_trips = 0
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        differences = diff(self.reference, snapshot, self.rel_tol, self.abs_tol, include_matches=False)
+        counts = summarize(differences)
+        counts["Match"] = len(self.reference) - len(differences)
+        return {"counts": counts, "differences": differences, "snapshot": snapshot,
+                "elapsed_s": time.perf_counter() - start, "round_trips": self.reader.round_trips}
+
+    def rows(self, snapshot=None):
+        """Full comparison rows (for ComparisonDialog)."""
+        return diff(self.reference, snapshot if snapshot is not None else self.snapshot(), self.rel_tol, self.abs_tol)
+
+    def watch(self, interval_s, count=None, on_result=None):
+        """
+        Compares on a fixed interval until count passes have run (forever if None).
+
+        Args:
+            interval_s (float): Seconds between the start of each pass.
+            count (int): Number of passes.
+            on_result (callable): Called with each compare() result; defaults to print_result.
+        """
+        on_result = on_result or print_result
+        passes = 0
+        while count is None or passes < count:
+            started = time.monotonic()
+            on_result(self.compare())
+            passes += 1
+            if count is not None and passes >= count:
+                break
+            time.sleep(max(0.0, interval_s - (time.monotonic() - started)))
+
+def print_result(result):
+    """Prints one comparison pass."""
+    differing = len(result["differences"])
+    stamp = time.strftime("%H:%M:%S")
+    if differing:
+        print(f"⚠️ [{stamp}] {differing} parameters differ from the MCD "
+              f"({result['elapsed_s'] * 1000:.0f} ms, {result['round_trips']} round trips)")
+        for row in result["differences"]:
+            print(f"   {row['axis']} {row['name']}: MCD {row['value1']} / controller {row['value2']} ({row['status']})")
+    else:
+        print(f"✅ [{stamp}] Controller matches the MCD "
+              f"({result['elapsed_s'] * 1000:.0f} ms, {result['round_trips']} round trips)")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Compare a connected controller's axis parameters with an MCD.")
+    parser.add_argument("mcd", help="Reference MCD")
+    parser.add_argument("--connection", choices=("auto", "usb", "hyperwire"), default="auto")
+    parser.add_argument("--rel-tol", type=float, default=1e-9, help="Relative tolerance for numeric values")
+    parser.add_argument("--abs-tol", type=float, default=1e-12, help="Absolute tolerance for numeric values")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Compare repeatedly on this interval")
+    parser.add_argument("--count", type=int, help="Number of passes in watch mode (default: until interrupted)")
+    parser.add_argument("--show", action="store_true", help="Show the results in the comparison window")
+    parser.add_argument("--simulate-from", metavar="MCD",
+                        help="Use the controller simulator, loaded with the parameters of this MCD")
+    args = parser.parse_args()
+
+    if args.simulate_from or os.environ.get("MCD_CONTROLLER_SIMULATOR"):
+        import ControllerSimulator as a1
+        if args.simulate_from:
+            a1.configure(config=a1.SimulatorConfig.from_mcd(args.simulate_from))
+    else:
+        import automation1 as a1
+
+    try:
+        controller = connect(a1, args.connection)
+        live = LiveComparison(controller, args.mcd, args.rel_tol, args.abs_tol)
+    except Exception as e:
+        print(f"❌ Could not start the comparison: {e}")
+        return 1
+
+    if args.show:
+        import tkinter as tk
+        from MCDComparison import MCDComparison
+
+        root = tk.Tk()
+        root.withdraw()
+        MCDComparison(window=root).compare_with_controller(live, os.path.basename(args.mcd))
+        root.destroy()
+        return 0
+
+    if args.watch:
+        try:
+            live.watch(args.watch, args.count)
+        except KeyboardInterrupt:
+            print("Stopped.")
+        return 0
+
+    result = live.compare()
+    print_result(result)
+    return 1 if result["differences"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
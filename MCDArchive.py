@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Archive - In-memory MCD reader and parallel, configurable-compression writer
+Description: An .mcd file is a zip archive of XML members (mcdInformation.xml,
+config/Parameters, config/MachineSetupData, ...). MCDArchive loads the archive
+keeping each member's raw compressed bytes, so members that are not modified
+are copied through verbatim instead of being recompressed. Modified ("dirty")
+members are compressed in parallel on a thread pool (zlib releases the GIL),
+with a selectable deflate level or STORED for scratch intermediates. Output is
+a plain PKZIP archive readable by MachineControllerDefinition.ReadFromFile.
+"""
+
+import os
+import io
+import zlib
+import time
+import shutil
+import struct
+import zipfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LEVEL = 6
+STORED = zipfile.ZIP_STORED
+DEFLATED = zipfile.ZIP_DEFLATED
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<4sHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<4sHHHHIIH")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_SIGNATURE = b"PK\x01\x02"
+_END_SIGNATURE = b"PK\x05\x06"
+_UTF8_FLAG = 0x800
+_ZIP_VERSION = 20
+
+def _read_umask():
+    # os.umask can only be read by setting it, so do it once, before any worker threads create files
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+_UMASK = _read_umask()
+
+class MCDMember:
+    """A single archive member: its name, timestamp and data in raw and/or uncompressed form."""
+    def __init__(self, name, date_time, compress_type, crc, file_size, raw=None, data=None, external_attr=0):
+        self.name = name
+        self.date_time = date_time
+        self.compress_type = compress_type
+        self.crc = crc
+        self.file_size = file_size
+        self.raw = raw
+        self.data = data
+        self.external_attr = external_attr
+        self.dirty = raw is None
+
+    def read(self):
+        """Returns the uncompressed member data, inflating it on first access."""
+        if self.data is None:
+            if self.compress_type == STORED:
+                self.data = self.raw
+            else:
+                self.data = zlib.decompress(self.raw, -15)
+        return self.data
+
+class MCDArchive:
+    """An .mcd archive held in memory for editing and rewriting."""
+    def __init__(self, members=None):
+        self.members = list(members or [])
+
+    @classmethod
+    def open(cls, mcd_path):
+        """Loads every member of an .mcd file with its raw compressed bytes."""
+        with open(mcd_path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def from_bytes(cls, mcd_bytes):
+        """Loads an archive from .mcd bytes."""
+        members = []
+        with zipfile.ZipFile(io.BytesIO(mcd_bytes), "r") as mcd_zip:
+            for info in mcd_zip.infolist():
+                if info.compress_type not in (STORED, DEFLATED):
+                    # Unusual compression: fall back to zipfile and treat the member as dirty
+                    members.append(MCDMember(info.filename, info.date_time, DEFLATED, info.CRC, info.file_size,
+                                             data=mcd_zip.read(info), external_attr=info.external_attr))
+                    continue
+                header = _LOCAL_HEADER.unpack_from(mcd_bytes, info.header_offset)
+                start = info.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+                raw = mcd_bytes[start:start + info.compress_size]
+                members.append(MCDMember(info.filename, info.date_time, info.compress_type, info.CRC,
+                                         info.file_size, raw=raw, external_attr=info.external_attr))
+        return cls(members)
+
+    def names(self):
+        """Returns the member names in archive order."""
+        return [member.name for member in self.members]
+
+    def get(self, name):
+        """Returns the named member, or None."""
+        for member in self.members:
+            if member.name == name:
+                return member
+        return None
+
+    def read(self, name):
+        """Returns the uncompressed data of the named member."""
+        member = self.get(name)
+        if member is None:
+            raise KeyError(f"There is no item named '{name}' in the archive")
+        return member.read()
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def replace(self, name, data):
+        """Replaces (or appends) a member's data and marks it dirty."""
+        member = self.get(name)
+        if member is None:
+            member = MCDMember(name, None, DEFLATED, 0, 0)
+            self.members.append(member)
+        member.data = data
+        member.raw = None
+        member.crc = zlib.crc32(data)
+        member.file_size = len(data)
+        member.date_time = time.localtime()[:6]
+        member.dirty = True
+
+    def remove(self, name):
+        """Removes a member if present."""
+        self.members = [member for member in self.members if member.name != name]
+
+    def to_bytes(self, level=DEFAULT_LEVEL, compress_type=DEFLATED, recompress_all=False, workers=None):
+        """Serialises the archive to bytes. See write() for the arguments."""
+        buffer = io.BytesIO()
+        self._write_to(buffer, level, compress_type, recompress_all, workers)
+        return buffer.getvalue()
+
+    def write(self, mcd_path, level=DEFAULT_LEVEL, compress_type=DEFLATED, recompress_all=False, workers=None):
+        """
+        Writes the archive to disk, replacing the destination atomically.
+
+        Args:
+            mcd_path (str): Destination .mcd path (may be the file the archive was opened from).
+            level (int): Deflate level 0-9 for compressed members.
+            compress_type (int): DEFLATED, or STORED for fast uncompressed scratch files.
+            recompress_all (bool): Recompress clean members too (e.g. to change level or go STORED).
+            workers (int): Compression threads (defaults to one per dirty member, up to the CPU count).
+        """
+        directory = os.path.dirname(os.path.abspath(mcd_path))
+        fd, temp_path = tempfile.mkstemp(prefix=".mcd_write_", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._write_to(f, level, compress_type, recompress_all, workers)
+            # mkstemp creates the file 0600; keep the destination's permissions, or the umask default for new files
+            if os.path.exists(mcd_path):
+                shutil.copymode(mcd_path, temp_path)
+            else:
+                os.chmod(temp_path, 0o666 & ~_UMASK)
+            os.replace(temp_path, mcd_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return mcd_path
+
+    def _write_to(self, f, level, compress_type, recompress_all, workers):
+        """Compresses dirty members in parallel and writes the zip structure."""
+        pending = [m for m in self.members if m.dirty or recompress_all or m.raw is None]
+        if recompress_all:
+            for member in pending:
+                member.read()
+
+        def compress(member):
+            data = member.data
+            if compress_type == STORED:
+                return STORED, data
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            return DEFLATED, compressor.compress(data) + compressor.flush()
+
+        if workers is None:
+            workers = min(len(pending), os.cpu_count() or 1)
+        if len(pending) > 1 and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                compressed = list(pool.map(compress, pending))
+        else:
+            compressed = [compress(member) for member in pending]
+
+        for member, (member_type, raw) in zip(pending, compressed):
+            member.compress_type = member_type
+            member.raw = raw
+            member.crc = zlib.crc32(member.data)
+            member.file_size = len(member.data)
+            member.dirty = False
+
+        write_zip(f, self.members)
+
+def _dos_time(date_time):
+    """Packs a (year, month, day, hour, minute, second) tuple into DOS date and time fields."""
+    year, month, day, hour, minute, second = date_time
+    year = max(year, 1980)
+    return ((year - 1980) << 9 | month << 5 | day), (hour << 11 | minute << 5 | second // 2)
+
+def write_zip(f, members):
+    """Writes members whose raw compressed bytes are already known as a PKZIP archive."""
+    central = []
+    offset = 0
+    for member in members:
+        name = member.name.encode("utf-8")
+        flags = _UTF8_FLAG if not member.name.isascii() else 0
+        dos_date, dos_time = _dos_time(member.date_time)
+        if len(member.raw) > 0xFFFFFFFF or member.file_size > 0xFFFFFFFF:
+            raise ValueError(f"Member {member.name} is too large for an MCD archive")
+        header = _LOCAL_HEADER.pack(_LOCAL_SIGNATURE, _ZIP_VERSION, flags, member.compress_type, dos_time, dos_date,
+                                    member.crc, len(member.raw), member.file_size, len(name), 0)
+        f.write(header)
+        f.write(name)
+        f.write(member.raw)
+        central.append(_CENTRAL_HEADER.pack(_CENTRAL_SIGNATURE, _ZIP_VERSION, _ZIP_VERSION, flags, member.compress_type,
+                                            dos_time, dos_date, member.crc, len(member.raw), member.file_size,
+                                            len(name), 0, 0, 0, 0, member.external_attr, offset) + name)
+        offset += len(header) + len(name) + len(member.raw)
+
+    central_data = b"".join(central)
+    f.write(central_data)
+    f.write(_END_RECORD.pack(_END_SIGNATURE, 0, 0, len(members), len(members), len(central_data), offset, 0))
+
+def read_members(mcd_path):
+    """Returns {member name: uncompressed bytes} for every member of an .mcd file."""
+    archive = MCDArchive.open(mcd_path)
+    return {member.name: member.read() for member in archive.members}
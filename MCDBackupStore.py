@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Backup Store - Versioned, deduplicating backups of MCD files
+Description: Replaces full "-backup.mcd" copies with a content-addressed store.
+Each archive member is stored once under the SHA-256 of its uncompressed content,
+so unchanged members (HyperWireCard, AxesSettings, ...) are shared by every
+version. A backup writes a small JSON manifest plus any members not already in
+the store. Any version can be restored as an .mcd with identical members.
+
+Layout (next to the MCD by default):
+    .mcd_backups/objects/ab/abcdef...        one byte compress type + raw member bytes
+    .mcd_backups/manifests/<MCD name>-<path hash>/<version>.json
+
+Manifests are kept per MCD path (the file name plus a hash of its absolute path),
+so MCDs with the same name in different folders can share one --store without
+their versions mixing. Objects are shared by every MCD in the store.
+
+Usage:
+    python MCDBackupStore.py list "PRO165LM XY-No Load.mcd"
+    python MCDBackupStore.py restore "PRO165LM XY-No Load.mcd" [--version ID] --output path.mcd
+    python MCDBackupStore.py restore "PRO165LM XY-No Load.mcd" [--version ID] --in-place
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+
+from MCDArchive import MCDArchive, MCDMember
+
+STORE_DIR_NAME = ".mcd_backups"
+
+def _atomic_write(path, data):
+    """Writes bytes to path via a temporary file so readers never see partial data."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class MCDBackupStore:
+    """Content-addressed backup store for MCD files."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.manifests_dir = os.path.join(self.root, "manifests")
+
+    @classmethod
+    def for_mcd(cls, mcd_path):
+        """Returns the default store, kept in a .mcd_backups folder beside the MCD."""
+        return cls(os.path.join(os.path.dirname(os.path.abspath(mcd_path)), STORE_DIR_NAME))
+
+    # --- Objects ---
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def has_object(self, digest):
+        """Returns True if a member with this content hash is already stored."""
+        return os.path.exists(self._object_path(digest))
+
+    def _put_object(self, digest, member):
+        """Stores a member's raw bytes if not already present. Returns the bytes written."""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return 0
+        data = bytes([member.compress_type]) + member.raw
+        _atomic_write(path, data)
+        return len(data)
+
+    def _get_object(self, digest):
+        """Returns (compress_type, raw bytes) for a stored member."""
+        with open(self._object_path(digest), "rb") as f:
+            data = f.read()
+        return data[0], data[1:]
+
+    # --- Versions ---
+
+    def _manifest_dir(self, mcd_path):
+        source = os.path.normcase(os.path.abspath(mcd_path))
+        key = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.manifests_dir, f"{os.path.basename(source)}-{key}")
+
+    def backup(self, mcd_path, label=None):
+        """
+        Records a new version of an MCD file.
+
+        Args:
+            mcd_path (str): The MCD to back up.
+            label (str): Optional note stored in the manifest (e.g. "before payload update").
+
+        Returns:
+            dict: The manifest, with 'new_objects' and 'bytes_written' describing the cost of this backup.
+        """
+        archive = MCDArchive.open(mcd_path)
+        new_objects = 0
+        bytes_written = 0
+        members = []
+
+        if any(member.raw is None for member in archive.members):
+            # Members MCDArchive could not keep raw (unusual compression) are re-deflated first
+            archive.to_bytes()
+
+        for member in archive.members:
+            digest = hashlib.sha256(member.read()).hexdigest()
+            written = self._put_object(digest, member)
+            if written:
+                new_objects += 1
+                bytes_written += written
+            members.append({
+                "name": member.name,
+                "sha256": digest,
+                "crc": member.crc,
+                "file_size": member.file_size,
+                "date_time": list(member.date_time),
+                "external_attr": member.external_attr,
+            })
+
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        manifest = {
+            "version": version,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "source": os.path.abspath(mcd_path),
+            "label": label,
+            "members": members,
+        }
+        data = json.dumps(manifest, indent=2).encode("utf-8")
+        _atomic_write(os.path.join(self._manifest_dir(mcd_path), f"{version}.json"), data)
+
+        manifest["new_objects"] = new_objects
+        manifest["bytes_written"] = bytes_written + len(data)
+        return manifest
+
+    def versions(self, mcd_path):
+        """Returns the manifests recorded for an MCD path, oldest first."""
+        manifest_dir = self._manifest_dir(mcd_path)
+        if not os.path.isdir(manifest_dir):
+            return []
+        manifests = []
+        for file_name in sorted(os.listdir(manifest_dir)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(manifest_dir, file_name), "r", encoding="utf-8") as f:
+                    manifests.append(json.load(f))
+        return manifests
+
+    def load_version(self, mcd_path, version=None):
+        """Returns the manifest for a version (the latest if version is None)."""
+        manifests = self.versions(mcd_path)
+        if not manifests:
+            raise FileNotFoundError(f"No backups recorded for {mcd_path}")
+        if version is None:
+            return manifests[-1]
+        for manifest in manifests:
+            if manifest["version"] == version:
+                return manifest
+        raise KeyError(f"Backup version {version} not found for {mcd_path}")
+
+    def restore(self, mcd_path, version=None, output_path=None):
+        """
+        Rebuilds an MCD file from a recorded version.
+
+        Args:
+            mcd_path (str): Path of the MCD the backup was taken from.
+            version (str): Version id to restore; defaults to the latest.
+            output_path (str): Where to write the MCD; defaults to the original source path.
+
+        Returns:
+            str: The path of the restored MCD.
+        """
+        manifest = self.load_version(mcd_path, version)
+        members = []
+        for entry in manifest["members"]:
+            compress_type, raw = self._get_object(entry["sha256"])
+            members.append(MCDMember(entry["name"], tuple(entry["date_time"]), compress_type, entry["crc"],
+                                     entry["file_size"], raw=raw, external_attr=entry["external_attr"]))
+        return MCDArchive(members).write(output_path or manifest["source"])
+
+    def stats(self):
+        """Returns the object count and total bytes held by the store."""
+        count = 0
+        total = 0
+        for dir_path, _, file_names in os.walk(self.objects_dir):
+            for file_name in file_names:
+                count += 1
+                total += os.path.getsize(os.path.join(dir_path, file_name))
+        return {"objects": count, "bytes": total}
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="List or restore versioned MCD backups.")
+    parser.add_argument("command", choices=["list", "restore", "backup"])
+    parser.add_argument("mcd", help="MCD file the backups belong to")
+    parser.add_argument("--version", help="Version id to restore (default: latest)")
+    parser.add_argument("--output", help="Restore destination")
+    parser.add_argument("--in-place", action="store_true", help="Restore over the original MCD")
+    parser.add_argument("--store", help="Backup store folder (default: .mcd_backups beside the MCD)")
+    args = parser.parse_args()
+    if args.command == "restore" and not args.output and not args.in_place:
+        parser.error("restore needs --output PATH, or --in-place to overwrite the original MCD")
+    if args.output and args.in_place:
+        parser.error("--output and --in-place are mutually exclusive")
+
+    store = MCDBackupStore(args.store) if args.store else MCDBackupStore.for_mcd(args.mcd)
+
+    if args.command == "backup":
+        manifest = store.backup(args.mcd)
+        print(f"💾 Backup {manifest['version']}: {manifest['new_objects']} new member(s), {manifest['bytes_written']} bytes")
+    elif args.command == "list":
+        manifests = store.versions(args.mcd)
+        if not manifests:
+            print(f"No backups recorded for {args.mcd}")
+        for manifest in manifests:
+            label = f"  {manifest['label']}" if manifest.get("label") else ""
+            print(f"{manifest['version']}  {manifest['created']}  {len(manifest['members'])} members{label}")
+    else:
+        path = store.restore(args.mcd, args.version, args.output)
+        print(f"✅ Restored: {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Benchmark Suite - Times the MCD tooling across synthetic file sizes
+Description: Generates synthetic MCDs (see SyntheticMCD) from 1 to 32 axes and
+times the core MCD operations on each size, reporting median/min wall time and
+peak Python memory. Results can be saved as a baseline and later runs are
+compared against it so performance regressions are caught. benchmarks/baseline.json
+holds the committed reference; refresh it with --save-baseline when the
+benchmark machine changes.
+
+Usage:
+    python MCDBenchmark.py                       # run and compare against the baseline
+    python MCDBenchmark.py --save-baseline --repeat 20   # run and store the results as the new baseline
+    python MCDBenchmark.py --sizes 1,8,32 --params 500
+    python MCDBenchmark.py --suite writer --sizes 32 --params 2000   # write throughput per compression level
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import SyntheticMCD
+import MCDProcessing
+from MCDArchive import MCDArchive, STORED, DEFLATED
+from MCDComparison import MCDComparison
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+DEFAULT_SIZES = (1, 2, 4, 8, 16, 32)
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are treated as timer noise rather than regressions
+NOISE_FLOOR_S = 0.0005
+
+def time_operation(run, prepare=None, repeat=5):
+    """
+    Times a callable and measures its peak Python memory.
+
+    Args:
+        run (callable): The operation to time; receives the values returned by prepare().
+        prepare (callable): Optional untimed setup run before every iteration.
+        repeat (int): Number of timed iterations.
+
+    Returns:
+        dict: median_s, min_s and peak_kib for the operation.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = prepare() if prepare else ()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run(*args)
+            timings.append(time.perf_counter() - start)
+
+    # Memory is measured on a separate run since tracing skews the timings
+    args = prepare() if prepare else ()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "peak_kib": peak / 1024.0,
+    }
+
+def run_core_suite(workdir, sizes, params_per_axis, repeat):
+    """Benchmarks parse_parameters, compare_mcd_files, modify_mcd_payloads and modify_controller_name."""
+    comparison = MCDComparison(window=None)
+    results = []
+
+    for axes in sizes:
+        size_dir = os.path.join(workdir, f"{axes}axes")
+        os.makedirs(size_dir, exist_ok=True)
+        pristine = SyntheticMCD.generate_mcd(
+            os.path.join(size_dir, "pristine.mcd"), axes=axes, params_per_axis=params_per_axis, seed=0)
+        other = SyntheticMCD.generate_mcd(
+            os.path.join(size_dir, "other.mcd"), axes=axes, params_per_axis=params_per_axis, seed=1)
+        working = os.path.join(size_dir, "working.mcd")
+
+        extract_dir = os.path.join(size_dir, "extracted")
+        comparison.extract_mcd(pristine, extract_dir)
+        parameters_path = os.path.join(extract_dir, "config", "Parameters")
+
+        def fresh_copy():
+            shutil.copyfile(pristine, working)
+            return (working,)
+
+        operations = [
+            ("parse_parameters", lambda: comparison.parse_parameters(parameters_path), None),
+            # compare_mcd_files itself is dialog driven, so its non-interactive core is timed
+            ("compare_mcd_files", lambda: comparison.compare_files(
+                pristine, other, os.path.join(size_dir, "cmp1"), os.path.join(size_dir, "cmp2")), None),
+        ]
+        # The headless functions MCDPayloadUI's methods delegate to
+        payloads = {SyntheticMCD.axis_name(i): 1.5 for i in range(axes)}
+        operations.append(("modify_mcd_payloads",
+                           lambda path: MCDProcessing.modify_mcd_payloads(path, payloads), fresh_copy))
+        operations.append(("modify_controller_name",
+                           lambda path: MCDProcessing.modify_controller_name(path, "Loaded"), fresh_copy))
+
+        for name, run, prepare in operations:
+            stats = time_operation(run, prepare, repeat)
+            results.append(dict(suite="core", operation=name, axes=axes, params=params_per_axis, **stats))
+    return results
+
+# (operation name, compress_type, level, workers) combinations timed by the writer suite
+WRITER_CONFIGURATIONS = (
+    ("write_stored", STORED, 0, None),
+    ("write_deflate1", DEFLATED, 1, None),
+    ("write_deflate6", DEFLATED, 6, None),
+    ("write_deflate6_serial", DEFLATED, 6, 1),
+    ("write_deflate9", DEFLATED, 9, None),
+)
+
+def run_writer_suite(workdir, sizes, params_per_axis, repeat):
+    """Benchmarks MCDArchive write throughput across compression levels with every member dirty."""
+    results = []
+    for axes in sizes:
+        os.makedirs(workdir, exist_ok=True)
+        source = SyntheticMCD.generate_mcd(
+            os.path.join(workdir, f"{axes}axes.mcd"), axes=axes, params_per_axis=params_per_axis, seed=0)
+        output = os.path.join(workdir, f"{axes}axes_out.mcd")
+        payload = {member.name: member.read() for member in MCDArchive.open(source).members}
+        total_bytes = sum(len(data) for data in payload.values())
+
+        def dirty_archive():
+            archive = MCDArchive.open(source)
+            for name, data in payload.items():
+                archive.replace(name, data)
+            return (archive,)
+
+        operations = [
+            (name, lambda archive, t=compress_type, l=level, w=workers: archive.write(output, level=l, compress_type=t, workers=w),
+             dirty_archive)
+            for name, compress_type, level, workers in WRITER_CONFIGURATIONS
+        ]
+        # A single-member edit, where the clean members are copied through without recompression
+        operations.append(("rewrite_one_member", lambda archive: archive.write(output),
+                           lambda: (_with_one_dirty_member(source),)))
+
+        for name, run, prepare in operations:
+            stats = time_operation(run, prepare, repeat)
+            stats["mib_per_s"] = total_bytes / 1048576.0 / stats["median_s"] if stats["median_s"] else 0.0
+            results.append(dict(suite="writer", operation=name, axes=axes, params=params_per_axis, **stats))
+    return results
+
+def _with_one_dirty_member(mcd_path):
+    """Opens an archive and marks only config/Names as modified."""
+    archive = MCDArchive.open(mcd_path)
+    archive.replace("config/Names", archive.read("config/Names"))
+    return archive
+
+SUITES = {
+    "core": run_core_suite,
+    "writer": run_writer_suite,
+}
+
+def result_key(result):
+    """Returns the baseline lookup key for a result row."""
+    return f"{result['suite']}/{result['operation']}/{result['axes']}x{result['params']}"
+
+def load_baseline(path):
+    """Loads a baseline file, returning an empty mapping if none exists."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("results", {})
+
+def save_baseline(path, results):
+    """Writes results as the new baseline."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "results": {result_key(r): {k: r[k] for k in ("median_s", "min_s", "peak_kib")} for r in results},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Returns (result, baseline_entry) pairs whose fastest run regressed beyond the tolerance.
+    The minimum is compared rather than the median, since it is far less sensitive to other load on the machine.
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result_key(result))
+        if not reference:
+            continue
+        limit = reference["min_s"] * (1.0 + tolerance)
+        if result["min_s"] > limit and result["min_s"] - reference["min_s"] > NOISE_FLOOR_S:
+            regressions.append((result, reference))
+    return regressions
+
+def print_results(results, baseline):
+    """Prints a results table with the change against the baseline where available."""
+    print(f"{'Operation':<32}{'Axes':>6}{'Params':>8}{'Median ms':>12}{'Min ms':>10}{'Peak KiB':>11}{'MiB/s':>9}{'vs base':>10}")
+    print("-" * 98)
+    for r in results:
+        reference = baseline.get(result_key(r))
+        change = f"{(r['min_s'] / reference['min_s'] - 1) * 100:+.0f}%" if reference and reference["min_s"] else "-"
+        throughput = f"{r['mib_per_s']:.1f}" if "mib_per_s" in r else "-"
+        print(f"{r['suite'] + '/' + r['operation']:<32}{r['axes']:>6}{r['params']:>8}"
+              f"{r['median_s'] * 1000:>12.2f}{r['min_s'] * 1000:>10.2f}{r['peak_kib']:>11.0f}{throughput:>9}{change:>10}")
+
+def run_benchmarks(suites, sizes, params_per_axis, repeat):
+    """Runs the selected suites in a scratch directory and returns all result rows."""
+    workdir = tempfile.mkdtemp(prefix="mcd_bench_")
+    try:
+        results = []
+        for suite in suites:
+            print(f"\n⏱️ Running '{suite}' suite...")
+            results.extend(SUITES[suite](os.path.join(workdir, suite), sizes, params_per_axis, repeat))
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark MCD operations on synthetic files.")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Suite(s) to run (default: all)")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma separated axis counts")
+    parser.add_argument("--params", type=int, default=len(SyntheticMCD.PARAMETER_TEMPLATE), help="Parameters per axis")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per operation")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file path")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    suites = args.suite or list(SUITES)
+    results = run_benchmarks(suites, sizes, args.params, args.repeat)
+
+    baseline = load_baseline(args.baseline)
+    print()
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\n💾 Baseline saved: {args.baseline}")
+        return 0
+
+    if not baseline:
+        print("\nNo baseline found. Run with --save-baseline to create one.")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for result, reference in regressions:
+            print(f"   - {result_key(result)}: {reference['min_s'] * 1000:.2f} ms → {result['min_s'] * 1000:.2f} ms")
+        return 1
+
+    print("\n✅ No regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
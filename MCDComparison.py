@@ -1,10 +1,13 @@
 import zipfile
 import os
-import xml.etree.ElementTree as ET
 import shutil
 import tkinter as tk
 from tkinter import filedialog, ttk
 
+import MCDXml
+
+ALL_PARAMETERS = MCDXml.Query(".//P")
+
 class MCDComparison():
     """
     A class to compare the parameters of two .mcd files for all axes.
@@ -24,18 +27,17 @@ class MCDComparison():
     def parse_parameters(self, xml_path):
         """Parses the XML parameters file, processing all axes present."""
         try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
+            root = MCDXml.parse(xml_path)
             all_axes_params = {}
             
             # Find all axes in the file
-            axes = root.findall(".//Axes/Axis")
+            axes = MCDXml.AXES(root)
             
             for axis in axes:
                 axis_index = axis.get("Index")
                 if axis_index is not None:
                     axis_params = {}
-                    for param in axis.findall(".//P"):
+                    for param in ALL_PARAMETERS(axis):
                         name = param.get("n")
                         value = param.text
                         if name and value is not None:
@@ -43,7 +45,7 @@ class MCDComparison():
                     all_axes_params[f"Axis {axis_index}"] = axis_params
             
             return all_axes_params
-        except (ET.ParseError, FileNotFoundError):
+        except (*MCDXml.ParseError, FileNotFoundError):
             return {} # Return empty dict if file is missing or corrupt
 
     def select_files(self):
@@ -62,16 +64,43 @@ class MCDComparison():
             
         return file_1, file_2
 
-    def compare_mcd_files(self):
-        """Orchestrates the comparison and displays the results in a new window."""
-        mcd_file1, mcd_file2 = self.select_files()
-        if not mcd_file1 or not mcd_file2:
-            print("File selection cancelled. Comparison aborted.")
-            return
-        
-        extract_path1 = "extracted_mcd1"
-        extract_path2 = "extracted_mcd2"
+    def build_comparison_data(self, params1, params2):
+        """Builds the row-by-row comparison of two parsed parameter sets."""
+        full_comparison_data = []
+        all_axes = sorted(set(params1.keys()) | set(params2.keys()))
+
+        for axis_name in all_axes:
+            axis_params1 = params1.get(axis_name, {})
+            axis_params2 = params2.get(axis_name, {})
+            
+            all_param_names = sorted(set(axis_params1.keys()) | set(axis_params2.keys()))
+
+            for name in all_param_names:
+                if name == "AxisName": continue # Skip axis name
 
+                val1 = axis_params1.get(name)
+                val2 = axis_params2.get(name)
+                
+                if val1 is not None and val2 is not None:
+                    status = "Match" if val1 == val2 else "Different"
+                elif val1 is not None:
+                    status = "File 1 Only"
+                    val2 = "N/A"
+                else:
+                    status = "File 2 Only"
+                    val1 = "N/A"
+                
+                full_comparison_data.append({
+                    "axis": axis_name,
+                    "name": name,
+                    "value1": val1,
+                    "value2": val2,
+                    "status": status
+                })
+        return full_comparison_data
+
+    def compare_files(self, mcd_file1, mcd_file2, extract_path1="extracted_mcd1", extract_path2="extracted_mcd2"):
+        """Extracts, parses and compares two .mcd files without any user interaction."""
         try:
             # Extract and parse both files
             self.extract_mcd(mcd_file1, extract_path1)
@@ -80,56 +109,54 @@ class MCDComparison():
             params1 = self.parse_parameters(os.path.join(extract_path1, "config", "Parameters"))
             params2 = self.parse_parameters(os.path.join(extract_path2, "config", "Parameters"))
 
-            # --- Generate Full Comparison Data ---
-            full_comparison_data = []
-            all_axes = sorted(set(params1.keys()) | set(params2.keys()))
-
-            for axis_name in all_axes:
-                axis_params1 = params1.get(axis_name, {})
-                axis_params2 = params2.get(axis_name, {})
-                
-                all_param_names = sorted(set(axis_params1.keys()) | set(axis_params2.keys()))
-
-                for name in all_param_names:
-                    if name == "AxisName": continue # Skip axis name
-
-                    val1 = axis_params1.get(name)
-                    val2 = axis_params2.get(name)
-                    
-                    if val1 is not None and val2 is not None:
-                        status = "Match" if val1 == val2 else "Different"
-                    elif val1 is not None:
-                        status = "File 1 Only"
-                        val2 = "N/A"
-                    else:
-                        status = "File 2 Only"
-                        val1 = "N/A"
-                    
-                    full_comparison_data.append({
-                        "axis": axis_name,
-                        "name": name,
-                        "value1": val1,
-                        "value2": val2,
-                        "status": status
-                    })
-            
-            # --- Display Results in GUI ---
-            if full_comparison_data:
-                dialog = ComparisonDialog(
-                    self.window, 
-                    full_comparison_data,
-                    os.path.basename(mcd_file1),
-                    os.path.basename(mcd_file2)
-                )
-                self.window.wait_window(dialog)
-            else:
-                print("No parameters found in either file.")
-
+            return self.build_comparison_data(params1, params2)
         finally:
             # --- Cleanup ---
             shutil.rmtree(extract_path1, ignore_errors=True)
             shutil.rmtree(extract_path2, ignore_errors=True)
-            print("Cleanup complete.")
+
+    def compare_mcd_files(self):
+        """Orchestrates the comparison and displays the results in a new window."""
+        mcd_file1, mcd_file2 = self.select_files()
+        if not mcd_file1 or not mcd_file2:
+            print("File selection cancelled. Comparison aborted.")
+            return
+        
+        # --- Generate Full Comparison Data ---
+        full_comparison_data = self.compare_files(mcd_file1, mcd_file2)
+        print("Cleanup complete.")
+        
+        # --- Display Results in GUI ---
+        if full_comparison_data:
+            dialog = ComparisonDialog(
+                self.window, 
+                full_comparison_data,
+                os.path.basename(mcd_file1),
+                os.path.basename(mcd_file2)
+            )
+            self.window.wait_window(dialog)
+        else:
+            print("No parameters found in either file.")
+
+    def compare_with_controller(self, live_comparison, mcd_name):
+        """
+        Compares a connected controller with an MCD and displays the results.
+
+        Args:
+            live_comparison: A LiveComparison for the controller and reference MCD.
+            mcd_name (str): Name shown for the MCD column.
+        """
+        full_comparison_data = live_comparison.rows()
+        if full_comparison_data:
+            dialog = ComparisonDialog(
+                self.window,
+                full_comparison_data,
+                mcd_name,
+                f"Controller ({live_comparison.controller.name})"
+            )
+            self.window.wait_window(dialog)
+        else:
+            print("No parameters found in the MCD.")
 
 class ComparisonDialog(tk.Toplevel):
     """A dialog window to display a side-by-side comparison of parameters."""
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD JSON Reader - Pure-Python MCD to machine setup JSON conversion
+Description: Produces the same JSON structure as McdFormatConverter.ConvertToJson
+(see Uncalculated_PRO165_converted.json) straight from config/MachineSetupData,
+without starting pythonnet/CoreCLR or loading the Automation1 assemblies.
+
+The .NET model is typed while the XML is not, so values are typed with
+FIELD_TYPES (taken from the property types in
+Aerotech.Automation1.Applications.Interfaces.dll plus fields seen in converter
+output), falling back to bool/number/string inference for unknown fields.
+Polymorphic slots such as <Stage><LinearStageComponent> can keep the concrete
+component name under "$type" (type_hints=True, --type-hints) so MCDJsonWriter
+can rebuild the XML; the .NET converter does not emit it, so it is left out by default.
+
+Usage:
+    python MCDJsonReader.py "Uncalculated_PRO165.mcd" [output.json] [--type-hints]
+    python MCDJsonReader.py "Uncalculated_PRO165.mcd" --validate Uncalculated_PRO165_converted.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+import MCDXml
+from MCDArchive import MCDArchive
+
+MACHINE_SETUP_MEMBER = "config/MachineSetupData"
+INFORMATION_MEMBER = "mcdInformation.xml"
+TYPE_KEY = "$type"
+
+# Container element -> item element; these become JSON lists
+LIST_ELEMENTS = {
+    "ElectricalProducts": "ElectricalProduct",
+    "ElectricalAxes": "ElectricalAxis",
+    "MechanicalProducts": "MechanicalProduct",
+    "MechanicalAxes": "MechanicalAxis",
+    "Axes": "AxisConfiguration",
+}
+
+# XML element name -> JSON property name where the two differ
+RENAMED_ELEMENTS = {
+    "DriveComponent": "Drive",
+}
+
+# JSON property order where the .NET model differs from the XML element order
+KEY_ORDER = {
+    "AxisConfiguration": ["Name", "Index", "MechanicalAxis", "ElectricalAxis", "Units", "FeedbackDeviceConnectionSetup"],
+}
+
+# Fields present in the XML but not serialised to JSON by the .NET converter:
+# element -> {field: (preceding field, default XML text)} so MCDJsonWriter can restore them
+OMITTED_FIELDS = {
+    "DriveComponent": {"SupportsGalvoInterface": ("SupportsClockDirection", "false")},
+}
+
+DOUBLE = "double"
+INT = "int"
+BOOL = "bool"
+STRING = "string"
+
+FIELD_TYPES = {
+    # IDriveComponent and converter-only drive fields
+    "BusVoltage": DOUBLE, "PeakCurrent": DOUBLE, "ContinuousCurrent": DOUBLE,
+    "PrimaryFbkMaxMultiplier": INT, "AuxiliaryFbkMaxMultiplier": INT,
+    "CurrentLoopAmplifierDelay": DOUBLE, "CurrentLoopAmplifierGain": DOUBLE,
+    "CurrentLoopLowPassFilterResistance": DOUBLE, "CurrentLoopLowPassFilterCapacitance": DOUBLE,
+    "CurrentLoopAmplifierRolloffFilterResistance": DOUBLE, "CurrentLoopAmplifierRolloffFilterCapacitance": DOUBLE,
+    "BusOvervoltageThreshold": STRING,
+    # IElectricalAxis / IAxisConfiguration
+    "HyperWireCommunicationChannel": INT, "Index": INT, "Channel": INT,
+    # IFeedbackComponent
+    "Resolution": DOUBLE, "MultiplicationFactor": DOUBLE, "MicrostepsPerStep": INT, "AbsoluteEncoderBits": INT,
+    "EnDatEncoderTurns": INT, "BissEncoderTurns": INT, "AbsoluteEncoderIncrementalResolution": DOUBLE,
+    # IServoLoopComponent / ICurrentLoopComponent
+    "PhaseMargin": DOUBLE, "CrossoverFrequency": DOUBLE,
+    # IGantryLogicalComponent
+    "Encoder1Separation": DOUBLE, "Encoder2Separation": DOUBLE, "Motor1Separation": DOUBLE,
+    "Motor2Separation": DOUBLE, "SeparationThreshold": DOUBLE, "MovingMass": DOUBLE,
+    "RotationalInertia": DOUBLE, "PositionErrorThreshold": DOUBLE,
+    # IMechanicalAxis / IUnitsComponent
+    "NominalTravel": DOUBLE, "WorkPointDiameter": DOUBLE, "ScaleFactor": DOUBLE,
+    # Strings that are empty rather than null when blank
+    "Name": STRING, "DisplayName": STRING, "SerialNumber": STRING, "ForceUnitsName": STRING,
+}
+
+_INT_NAME_PATTERN = re.compile(r'(Count|Index|Bits|Turns|Channel)$')
+_NUMBER_PATTERN = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+def convert_value(name, text):
+    """Types a leaf element's text the way the .NET model would serialise it."""
+    field_type = FIELD_TYPES.get(name)
+    if text is None or text == "":
+        return "" if field_type == STRING else None
+    if field_type == STRING:
+        return text
+    if field_type == DOUBLE:
+        return float(text)
+    if field_type == INT:
+        return int(text)
+    if field_type == BOOL or text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    if _NUMBER_PATTERN.match(text):
+        if _INT_NAME_PATTERN.search(name) and re.match(r'^[+-]?\d+$', text):
+            return int(text)
+        return float(text)
+    return text
+
+def _configured_options(element):
+    """Converts ConfiguredOptions KeyValuePairs to a dict."""
+    options = {}
+    for pair in element.findall("KeyValuePair"):
+        options[pair.findtext("Key", "")] = pair.findtext("Value", "")
+    return options
+
+def _is_polymorphic_slot(element):
+    """True for slots like <Stage><LinearStageComponent>...</LinearStageComponent></Stage>."""
+    children = list(element)
+    return len(children) == 1 and children[0].tag.endswith("Component") and not element.tag.endswith("Component")
+
+def convert_element(element):
+    """
+    Converts a MachineSetupConfiguration element (or any part of it) to its JSON form,
+    with "$type" hints on polymorphic slots (see strip_types).
+    """
+    tag = element.tag
+    children = list(element)
+
+    if tag in LIST_ELEMENTS:
+        return [convert_element(child) for child in children]
+    if tag == "ConfiguredOptions":
+        return _configured_options(element)
+    if not children:
+        return convert_value(tag, element.text.strip() if element.text else element.text)
+    if _is_polymorphic_slot(element):
+        component = children[0]
+        result = {TYPE_KEY: component.tag}
+        result.update(convert_element(component))
+        return result
+
+    omitted = OMITTED_FIELDS.get(tag, ())
+    result = {}
+    for child in children:
+        if child.tag in omitted:
+            continue
+        result[RENAMED_ELEMENTS.get(child.tag, child.tag)] = convert_element(child)
+
+    order = KEY_ORDER.get(tag)
+    if order:
+        result = {key: result[key] for key in order if key in result} | \
+                 {key: value for key, value in result.items() if key not in order}
+    return result
+
+def _machine_setup_configuration(setup_root, section="Configuration"):
+    """Returns the embedded MachineSetupConfiguration element of MachineSetupData."""
+    container = setup_root.find(f"./Data/{section}")
+    if container is None:
+        return None
+    configuration = container.find("MachineSetupConfiguration")
+    if configuration is None and container.text and container.text.strip():
+        # Older files embed the configuration as an escaped XML string
+        configuration = MCDXml.fromstring(container.text.strip().encode("utf-8"))
+    return configuration
+
+def strip_types(value):
+    """Removes the "$type" hints, which the .NET converter does not emit."""
+    if isinstance(value, dict):
+        return {k: strip_types(v) for k, v in value.items() if k != TYPE_KEY}
+    if isinstance(value, list):
+        return [strip_types(v) for v in value]
+    return value
+
+def mcd_to_json(mcd, automation1_version=None, section="Configuration", type_hints=False):
+    """
+    Converts an MCD to the machine setup JSON structure.
+
+    Args:
+        mcd (str | MCDArchive): MCD path or an already opened archive.
+        automation1_version (str): Value for VersionInformation.Automation1Version. The .NET
+            converter writes its own version here; defaults to the MCD's SoftwareVersion.
+        section (str): "Configuration" or "PendingConfiguration".
+        type_hints (bool): Keep the "$type" hints MCDJsonWriter needs to rebuild polymorphic slots.
+
+    Returns:
+        dict: JSON-ready machine setup data.
+    """
+    archive = mcd if isinstance(mcd, MCDArchive) else MCDArchive.open(mcd)
+    if MACHINE_SETUP_MEMBER not in archive:
+        raise ValueError("MCD has no config/MachineSetupData")
+
+    setup_root = MCDXml.fromstring(archive.read(MACHINE_SETUP_MEMBER))
+    configuration = _machine_setup_configuration(setup_root, section)
+    converted = convert_element(configuration) if configuration is not None else {}
+    if not type_hints:
+        converted = strip_types(converted)
+
+    controller_type = None
+    software_version = None
+    if INFORMATION_MEMBER in archive:
+        information = MCDXml.fromstring(archive.read(INFORMATION_MEMBER))
+        controller_type = information.findtext("./Data/ControllerType")
+        software_version = information.findtext("./FileInformation/SoftwareVersion")
+
+    return {
+        "MechanicalProducts": converted.get("MechanicalProducts", []),
+        "ElectricalProducts": converted.get("ElectricalProducts", []),
+        "InterconnectedAxes": converted.get("Axes", []),
+        "Parameters": [],
+        "VersionInformation": {
+            "MachineSetupDataVersion": setup_root.findtext("./FileInformation/SoftwareVersion"),
+            "Automation1Version": automation1_version or software_version,
+        },
+        "ControllerType": controller_type,
+    }
+
+def convert_to_json(mcd_path, output_path, automation1_version=None, type_hints=False):
+    """Writes the JSON for an MCD, formatted like the .NET converter output. Returns output_path."""
+    data = mcd_to_json(mcd_path, automation1_version, type_hints=type_hints)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return output_path
+
+# Keys whose values describe the converting software rather than the MCD
+IGNORED_VALIDATION_KEYS = {"VersionInformation.Automation1Version"}
+
+def diff_json(ours, reference, path=""):
+    """
+    Compares two JSON values, treating 10 and 10.0 as different (the .NET types matter).
+
+    Returns:
+        list: (path, ours, reference) tuples for every difference.
+    """
+    if path in IGNORED_VALIDATION_KEYS:
+        return []
+    if isinstance(ours, dict) and isinstance(reference, dict):
+        differences = []
+        for key in list(reference) + [k for k in ours if k not in reference]:
+            differences += diff_json(ours.get(key, "<missing>"), reference.get(key, "<missing>"),
+                                     f"{path}.{key}" if path else key)
+        return differences
+    if isinstance(ours, list) and isinstance(reference, list):
+        if len(ours) != len(reference):
+            return [(path, f"{len(ours)} items", f"{len(reference)} items")]
+        differences = []
+        for i, (a, b) in enumerate(zip(ours, reference)):
+            differences += diff_json(a, b, f"{path}[{i}]")
+        return differences
+    if type(ours) is not type(reference) or ours != reference:
+        return [(path, ours, reference)]
+    return []
+
+def validate(mcd_path, reference_json_path):
+    """Converts an MCD and compares it with .NET converter output. Returns the differences."""
+    with open(reference_json_path, "r", encoding="utf-8-sig") as f:
+        reference = json.load(f)
+    return diff_json(mcd_to_json(mcd_path), reference)
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Convert an MCD to machine setup JSON without .NET.")
+    parser.add_argument("mcd", help="MCD file")
+    parser.add_argument("output", nargs="?", help="Output JSON (default: <mcd>_converted.json)")
+    parser.add_argument("--validate", metavar="REFERENCE_JSON", help="Compare against .NET ConvertToJson output")
+    parser.add_argument("--automation1-version", help="Value written to VersionInformation.Automation1Version")
+    parser.add_argument("--type-hints", action="store_true", help='Keep "$type" hints for MCDJsonWriter')
+    args = parser.parse_args()
+
+    if args.validate:
+        differences = validate(args.mcd, args.validate)
+        if differences:
+            print(f"❌ {len(differences)} difference(s) from {args.validate}:")
+            for path, ours, reference in differences:
+                print(f"   - {path}: {ours!r} != {reference!r}")
+            return 1
+        print(f"✅ {os.path.basename(args.mcd)} matches {os.path.basename(args.validate)}")
+        return 0
+
+    output = args.output or os.path.splitext(args.mcd)[0] + "_converted.json"
+    start = time.perf_counter()
+    convert_to_json(args.mcd, output, args.automation1_version, args.type_hints)
+    print(f"✅ JSON written: {output} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD JSON Writer - Pure-Python writer for non-calculated MCDs from machine setup JSON
+Description: Packages a machine setup JSON document (the structure used by
+InterconnectedAxisExample.json and produced by ConvertToJson, or by MCDJsonReader
+with "$type" hints for polymorphic slots)
+into a non-calculated MCD like Uncalculated_PRO165.mcd, without the
+McdFormatConverter.ConvertToMcd + WriteToFile round trip through the CLR.
+
+The archive holds mcdInformation.xml, config/Names, config/MachineSetupData with
+the embedded MachineSetupConfiguration, and an empty config/Parameters, written
+the way Automation1 writes them (UTF-8 with BOM, CRLF, .NET number formatting).
+Every file written is read back with MCDJsonReader and compared with the input;
+verify_with_dotnet() additionally checks it with MachineControllerDefinition.ReadFromFile
+where pythonnet and the Automation1 assemblies are available.
+
+Usage:
+    python MCDJsonWriter.py InterconnectedAxisExample.json output.mcd [--name "Controller Name"]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+from xml.sax.saxutils import escape
+
+from MCDArchive import MCDArchive
+import MCDJsonReader
+from MCDJsonReader import LIST_ELEMENTS, RENAMED_ELEMENTS, OMITTED_FIELDS, TYPE_KEY
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8" standalone="yes"?>'
+DEFAULT_SOFTWARE_VERSION = "2.11.0.3193"
+
+# XML element order where it differs from the JSON property order
+XML_KEY_ORDER = {
+    "AxisConfiguration": ["Index", "MechanicalAxis", "ElectricalAxis", "Units", "Name", "FeedbackDeviceConnectionSetup"],
+}
+
+_JSON_TO_ELEMENT = {json_name: element for element, json_name in RENAMED_ELEMENTS.items()}
+_TOP_LEVEL_LISTS = (("ElectricalProducts", "ElectricalProducts"), ("MechanicalProducts", "MechanicalProducts"),
+                    ("Axes", "InterconnectedAxes"))
+
+# --- Lenient JSON ---
+
+def _strip_json_extensions(text):
+    """Removes // and /* */ comments and trailing commas outside of strings."""
+    result = []
+    i = 0
+    length = len(text)
+    while i < length:
+        char = text[i]
+        if char == '"':
+            end = i + 1
+            while end < length and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            result.append(text[i:end + 1])
+            i = end + 1
+        elif text.startswith("//", i):
+            i = text.find("\n", i)
+            i = length if i == -1 else i
+        elif text.startswith("/*", i):
+            i = text.find("*/", i + 2)
+            i = length if i == -1 else i + 2
+        elif char == ",":
+            following = re.match(r'\s*(//[^\n]*\n\s*|/\*.*?\*/\s*)*([\]}])', text[i + 1:], re.DOTALL)
+            if not following:
+                result.append(char)
+            i += 1
+        else:
+            result.append(char)
+            i += 1
+    return "".join(result)
+
+def load_json_lenient(path):
+    """Loads hand-edited JSON, tolerating a BOM, comments and trailing commas (e.g. InterconnectedAxisExample.json)."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_strip_json_extensions(text))
+
+# --- XML serialisation ---
+
+def format_value(value):
+    """Formats a JSON scalar the way the .NET XmlSerializer writes it."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        return repr(value).replace("e", "E")
+    return str(value)
+
+def _element(tag, value, pad, lines):
+    """Appends the XML lines for one JSON property."""
+    if value is None or value == "" or (isinstance(value, (list, dict)) and not value):
+        lines.append(f"{pad}<{tag} />")
+        return
+
+    if tag == "ConfiguredOptions":
+        lines.append(f"{pad}<{tag}>")
+        for key, option in value.items():
+            lines.append(f"{pad}  <KeyValuePair>")
+            _element("Key", key, pad + "    ", lines)
+            _element("Value", option, pad + "    ", lines)
+            lines.append(f"{pad}  </KeyValuePair>")
+        lines.append(f"{pad}</{tag}>")
+    elif isinstance(value, list):
+        item_tag = LIST_ELEMENTS.get(tag, tag.rstrip("s"))
+        lines.append(f"{pad}<{tag}>")
+        for item in value:
+            _element(item_tag, item, pad + "  ", lines)
+        lines.append(f"{pad}</{tag}>")
+    elif isinstance(value, dict):
+        if TYPE_KEY in value:
+            # Polymorphic slot: <Stage><LinearStageComponent>...</LinearStageComponent></Stage>
+            lines.append(f"{pad}<{tag}>")
+            component = {k: v for k, v in value.items() if k != TYPE_KEY}
+            _element(value[TYPE_KEY], component, pad + "  ", lines)
+            lines.append(f"{pad}</{tag}>")
+            return
+        lines.append(f"{pad}<{tag}>")
+        for child_tag, child_value in _ordered_children(tag, value):
+            _element(child_tag, child_value, pad + "  ", lines)
+        lines.append(f"{pad}</{tag}>")
+    else:
+        lines.append(f"{pad}<{tag}>{escape(format_value(value))}</{tag}>")
+
+def _ordered_children(tag, value):
+    """Returns (element name, value) pairs in XML order, restoring fields the JSON omits."""
+    items = [(_JSON_TO_ELEMENT.get(key, key), child) for key, child in value.items()]
+    order = XML_KEY_ORDER.get(tag)
+    if order:
+        items = sorted(items, key=lambda item: order.index(item[0]) if item[0] in order else len(order))
+    for field, (preceding, default) in OMITTED_FIELDS.get(tag, {}).items():
+        names = [name for name, _ in items]
+        if field not in names and preceding in names:
+            items.insert(names.index(preceding) + 1, (field, default))
+    return items
+
+def build_machine_setup_configuration(data):
+    """Builds the embedded MachineSetupConfiguration document from machine setup JSON."""
+    lines = ["<MachineSetupConfiguration>"]
+    for tag, key in _TOP_LEVEL_LISTS:
+        _element(tag, data.get(key) or [], "  ", lines)
+    lines.append("</MachineSetupConfiguration>")
+    return "\n".join(lines)
+
+def _document(schema_version, software_version, data_lines, indent):
+    """Wraps Data body lines in the File/FileInformation envelope."""
+    return "\n".join([
+        XML_DECLARATION,
+        f'<File SchemaVersion="{schema_version}">',
+        f"{indent}<FileInformation>",
+        f"{indent}{indent}<SoftwareVersion>{software_version}</SoftwareVersion>",
+        f"{indent}{indent}<OldestCompatibleSoftwareVersion>1.0.0.0</OldestCompatibleSoftwareVersion>",
+        f"{indent}</FileInformation>",
+        f"{indent}<Data>",
+    ] + data_lines + [
+        f"{indent}</Data>",
+        "</File>",
+    ])
+
+def _encode(text):
+    """UTF-8 with BOM and CRLF line endings, as Automation1 writes MCD members."""
+    return b"\xef\xbb\xbf" + text.replace("\n", "\r\n").encode("utf-8")
+
+def build_members(data, controller_name=None):
+    """
+    Builds the non-calculated MCD members for machine setup JSON.
+
+    Returns:
+        list: (member name, bytes) in archive order.
+    """
+    versions = data.get("VersionInformation") or {}
+    software_version = versions.get("Automation1Version") or DEFAULT_SOFTWARE_VERSION
+    setup_version = versions.get("MachineSetupDataVersion") or software_version
+    controller_type = data.get("ControllerType") or "DriveBased"
+
+    members = [("mcdInformation.xml", _document("1.0.0.0", software_version,
+                                                [f"\t\t<ControllerType>{escape(controller_type)}</ControllerType>"], "\t"))]
+    if controller_name:
+        members.append(("config/Names", _document("1.0.0.0", software_version,
+                                                  [f"\t\t<ControllerName>{escape(controller_name)}</ControllerName>"], "\t")))
+    members.append(("config/MachineSetupData", _document("1.0", setup_version, [
+        "    <Configuration>",
+        build_machine_setup_configuration(data) + "</Configuration>",
+        "    <PendingConfiguration />",
+        "    <IsMachineSetupComplete>false</IsMachineSetupComplete>",
+    ], "  ")))
+    members.append(("config/Parameters", _document("1.0.0.0", software_version, [
+        "\t\t<Parameters>", "\t\t\t<System />", "\t\t\t<Axes />", "\t\t\t<Tasks />", "\t\t</Parameters>",
+    ], "\t")))
+    return [(name, _encode(text)) for name, text in members]
+
+# --- Verification ---
+
+def verify_round_trip(data, mcd_path):
+    """Reads a written MCD back with MCDJsonReader and returns differences from the source JSON."""
+    expected = json.loads(json.dumps(data))
+    expected.setdefault("Parameters", [])
+    actual = MCDJsonReader.mcd_to_json(mcd_path, automation1_version=(data.get("VersionInformation") or {}).get("Automation1Version"),
+                                       type_hints=True)
+    return MCDJsonReader.diff_json(_normalise(actual), _normalise(expected))
+
+def _normalise(value):
+    """Makes JSON comparable across the lenient input form: numbers as floats, omitted keys ignored."""
+    if isinstance(value, dict):
+        return {k: _normalise(v) for k, v in value.items() if k not in ("Parameters",)}
+    if isinstance(value, list):
+        return [_normalise(v) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if value == "":
+        return None
+    return value
+
+def verify_with_dotnet(mcd_path, controller):
+    """
+    Checks a written MCD with the .NET reader.
+
+    Args:
+        mcd_path (str): MCD written by write_mcd.
+        controller: An initialized GenerateMCD.AerotechController.
+
+    Returns:
+        list: Differences between the .NET JSON for the file and MCDJsonReader's JSON.
+    """
+    read_from_file = controller.MachineControllerDefinition.GetMethod("ReadFromFile")
+    if read_from_file.Invoke(None, [mcd_path]) is None:
+        return [("ReadFromFile", None, "MCD object")]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dotnet_json = os.path.join(temp_dir, "dotnet.json")
+        controller.convert_to_json(mcd_path, dotnet_json)
+        return MCDJsonReader.validate(mcd_path, dotnet_json)
+
+def write_mcd(data, output_path, controller_name=None, verify=True):
+    """
+    Writes a non-calculated MCD from machine setup JSON.
+
+    Args:
+        data (dict | str): Machine setup JSON, or a path to a JSON file.
+        output_path (str): Destination .mcd path.
+        controller_name (str): Optional name for config/Names.
+        verify (bool): Read the file back and raise ValueError if it does not match the JSON.
+
+    Returns:
+        str: output_path
+    """
+    if isinstance(data, str):
+        data = load_json_lenient(data)
+    archive = MCDArchive()
+    for name, content in build_members(data, controller_name):
+        archive.replace(name, content)
+    archive.write(output_path)
+
+    if verify:
+        differences = verify_round_trip(data, output_path)
+        if differences:
+            details = "; ".join(f"{path}: {ours!r} != {expected!r}" for path, ours, expected in differences[:5])
+            raise ValueError(f"Round trip verification failed for {output_path}: {details}")
+    return output_path
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Write a non-calculated MCD from machine setup JSON without .NET.")
+    parser.add_argument("json", help="Machine setup JSON (trailing commas and comments allowed)")
+    parser.add_argument("output", help="Output .mcd path")
+    parser.add_argument("--name", help="Controller name written to config/Names")
+    parser.add_argument("--no-verify", action="store_true", help="Skip the read-back verification")
+    args = parser.parse_args()
+
+    try:
+        write_mcd(args.json, args.output, args.name, verify=not args.no_verify)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Non-calculated MCD written: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,18 @@
 MCD Payload UI - Simple interface for modifying MCD payload values
 Created by: Assistant
 Description: UI for selecting MCD file, connecting to controller, and modifying payloads
+
+Only tkinter is imported before the window appears. The controller API and the
+processing modules load on a background thread after the first frame, then the
+.NET assemblies are pre-warmed while the operator browses for an MCD; the status
+line under the output shows what is ready.
 """
 
+import time
+
+# Start of the time-to-interactive / time-to-first-result measurements
+APP_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import tkinter.font as tkFont
@@ -14,14 +24,25 @@ import queue
 import sys
 import os
 from datetime import datetime
-import tempfile
-import zipfile
-import xml.etree.ElementTree as ET
-import shutil
 
-# Import required modules
-import automation1 as a1
-from GenerateMCD import AerotechController
+from MCDArchive import DEFAULT_LEVEL
+from SessionManager import SessionManager, open_dashboard, session_output
+
+def load_controller_modules():
+    """
+    Imports the controller API and connection logic. Called on a background thread
+    so the window does not wait for automation1.
+
+    Returns:
+        tuple: (automation1 or ControllerSimulator module, establish_connection)
+    """
+    if os.environ.get("MCD_CONTROLLER_SIMULATOR"):
+        # Offline mode: use the local controller simulator instead of real hardware
+        import ControllerSimulator as a1
+    else:
+        import automation1 as a1
+    from ControllerConnection import establish_connection
+    return a1, establish_connection
 
 class RedirectText:
     """Redirect stdout to a text widget"""
@@ -46,11 +67,20 @@ class MCDPayloadUI:
         
         # Initialize variables
         self.controller = None
+        self.session_manager = None
         self.available_axes = []
         self.mcd_path = None
         self.mcd_name = None
         self.payload_vars = {}
         
+        # Background-loaded dependencies and readiness
+        self.a1 = None
+        self.establish_connection = None
+        self.controller_modules_ready = False
+        self.calculation_ready = False
+        self.time_to_interactive = None
+        self.first_result_reported = False
+        
         # Add stop event for thread control
         self.stop_event = threading.Event()
         self.process_thread = None
@@ -68,6 +98,9 @@ class MCDPayloadUI:
         # Start queue monitoring
         self.monitor_output()
         
+        # Load heavy dependencies once the first frame has been drawn
+        self.root.after_idle(self.on_first_frame)
+        
     def setup_styles(self):
         """Configure ttk styles with Aerotech brand guidelines"""
         style = ttk.Style()
@@ -172,6 +205,11 @@ class MCDPayloadUI:
         self.control_frame.pack(fill='x', padx=20, pady=(0, 20))
         self.control_frame.pack_propagate(False)
         
+        # Readiness indicator for the background-loaded dependencies
+        self.readiness_label = tk.Label(self.control_frame, text="⏳ Loading controller libraries...",
+                                        font=('Source Sans Pro', 10), fg=BRAND_GREY_1, bg='white', anchor='w')
+        self.readiness_label.pack(fill='x', pady=(10, 0))
+        
     def setup_content(self):
         """Setup the main content area"""
         # MCD File Selection
@@ -228,7 +266,8 @@ class MCDPayloadUI:
         
         # Connect button
         self.connect_btn = ttk.Button(conn_frame, text="Connect to Controller", 
-                                     style='Action.TButton', command=self.connect_controller)
+                                     style='Action.TButton', command=self.connect_controller,
+                                     state='disabled')
         self.connect_btn.pack(pady=10)
         
         # Available axes display
@@ -264,6 +303,12 @@ class MCDPayloadUI:
                                   style='Nav.TButton', command=self.test_output)
         self.test_btn.pack(pady=5)
         
+        # Several controllers of a cell at once
+        self.session_btn = ttk.Button(self.content_frame, text="Multi-Controller Session",
+                                     style='Nav.TButton', command=self.open_session_dashboard,
+                                     state='disabled')
+        self.session_btn.pack(pady=5)
+        
         # Progress display
         progress_frame = tk.LabelFrame(self.content_frame, text="Process Output", 
                                       font=('Source Sans Pro', 10, 'bold'),
@@ -282,6 +327,49 @@ class MCDPayloadUI:
         self.output_text.insert(tk.END, "Ready to process MCD files...\n\n")
         self.output_text.see(tk.END)
         
+    def on_first_frame(self):
+        """Records time-to-interactive and starts loading dependencies in the background"""
+        self.time_to_interactive = time.perf_counter() - APP_START
+        self.output_queue.put(f"⏱️ Time to interactive: {self.time_to_interactive:.2f} s\n")
+        threading.Thread(target=self.load_dependencies, daemon=True).start()
+    
+    def load_dependencies(self):
+        """Background thread: loads the controller API, then pre-warms the .NET calculation engine"""
+        start = time.perf_counter()
+        try:
+            self.a1, self.establish_connection = load_controller_modules()
+            import MCDProcessing
+        except Exception as e:
+            self.root.after(0, lambda e=e: self.set_readiness(f"❌ Controller libraries failed to load: {e}"))
+            return
+        self.controller_modules_ready = True
+        self.output_queue.put(f"📥 Controller libraries loaded in {time.perf_counter() - start:.2f} s\n")
+        self.root.after(0, self.controller_modules_loaded)
+        
+        # The CLR and Automation1 assemblies load while the operator browses for an MCD
+        start = time.perf_counter()
+        try:
+            MCDProcessing.prewarm_converter()
+        except Exception as e:
+            self.output_queue.put(f"⚠️ .NET pre-warm failed, calculation will retry when processing: {e}\n")
+            self.root.after(0, lambda: self.set_readiness("⚠️ Controller ready - calculation engine not pre-loaded"))
+            return
+        self.calculation_ready = True
+        self.output_queue.put(f"📥 .NET calculation engine ready in {time.perf_counter() - start:.2f} s\n")
+        self.root.after(0, lambda: self.set_readiness("✅ Ready - controller and calculation engine loaded"))
+    
+    def controller_modules_loaded(self):
+        """Enables the controller connection once its libraries are loaded"""
+        if not self.controller:
+            self.connect_btn.config(state='normal')
+        self.session_btn.config(state='normal')
+        if not self.calculation_ready:
+            self.set_readiness("⏳ Controller ready - loading .NET calculation engine...")
+    
+    def set_readiness(self, text):
+        """Updates the readiness indicator"""
+        self.readiness_label.config(text=text)
+    
     def test_output(self):
         """Test the output redirection to verify it's working"""
         print("🧪 Testing output redirection...")
@@ -291,6 +379,18 @@ class MCDPayloadUI:
         print(f"📊 Available axes: {self.available_axes}")
         print("=" * 50)
     
+    def open_session_dashboard(self):
+        """Opens the multi-controller dashboard; sessions outlive the window until the app closes"""
+        if self.session_manager is None:
+            output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cell_output")
+            try:
+                from TopologyCache import shared_cache
+                topology_cache = shared_cache()
+            except Exception:
+                topology_cache = None
+            self.session_manager = SessionManager(self.a1, output_dir, topology_cache=topology_cache)
+        open_dashboard(self.root, self.session_manager)
+    
     def browse_mcd_file(self):
         """Browse for MCD file"""
         file_path = filedialog.askopenfilename(
@@ -332,86 +432,17 @@ class MCDPayloadUI:
     
     def _establish_controller_connection(self, connection_type="auto"):
         """Establish connection to controller using the specified connection type"""
-        if connection_type == "usb":
-            try:
-                controller = a1.Controller.connect_usb()
-                controller.start()
-            except:
-                raise Exception('USB connection failed. Check connections and try again.')
-        elif connection_type == "hyperwire":
-            try:
-                controller = a1.Controller.connect()
-                controller.start()
-            except:
-                raise Exception('Hyperwire connection failed. Check Firmware version and try again.')
-        else:  # auto
-            try:
-                controller = a1.Controller.connect()
-                controller.start()
-            except:
-                if messagebox.askyesno('Could Not Connect To Hyperwire', 'Is this an iDrive?'):
-                    try:
-                        controller = a1.Controller.connect_usb()
-                        controller.start()
-                    except:
-                        raise Exception('USB connection failed. Check connections and try again.')
-                else:
-                    raise Exception('Hyperwire connection failed. Check Firmware version and try again.')
-        
-        connected_axes = {}
-        non_virtual_axes = []
-        
-        number_of_axes = controller.runtime.parameters.axes.count
-        
-        if number_of_axes <= 12:
-            for axis_index in range(0, 11):
-                status_item_configuration = a1.StatusItemConfiguration()
-                status_item_configuration.axis.add(a1.AxisStatusItem.AxisStatus, axis_index)
-                
-                result = controller.runtime.status.get_status_items(status_item_configuration)
-                axis_status = int(result.axis.get(a1.AxisStatusItem.AxisStatus, axis_index).value)
-                if (axis_status & 1 << 13) > 0:
-                    connected_axes[controller.runtime.parameters.axes[axis_index].identification.axisname.value] = axis_index
-            for key, value in connected_axes.items():
-                non_virtual_axes.append(key)
-        else:
-            for axis_index in range(0, 32):
-                status_item_configuration = a1.StatusItemConfiguration()
-                status_item_configuration.axis.add(a1.AxisStatusItem.AxisStatus, axis_index)
-                result = controller.runtime.status.get_status_items(status_item_configuration)
-                axis_status = int(result.axis.get(a1.AxisStatusItem.AxisStatus, axis_index).value)
-                if (axis_status & 1 << 13) > 0:
-                    connected_axes[controller.runtime.parameters.axes[axis_index].identification.axisname.value] = axis_index
-            for key, value in connected_axes.items():
-                non_virtual_axes.append(key)
-        
-        if len(non_virtual_axes) == 0:
-            # Try USB connection
-            controller = a1.Controller.connect_usb()
-            number_of_axes = controller.runtime.parameters.axes.count
-            if number_of_axes <= 12:
-                for axis_index in range(0, 11):
-                    status_item_configuration = a1.StatusItemConfiguration()
-                    status_item_configuration.axis.add(a1.AxisStatusItem.AxisStatus, axis_index)
-                    
-                    result = controller.runtime.status.get_status_items(status_item_configuration)
-                    axis_status = int(result.axis.get(a1.AxisStatusItem.AxisStatus, axis_index).value)
-                    if (axis_status & 1 << 13) > 0:
-                        connected_axes[controller.runtime.parameters.axes[axis_index].identification.axisname.value] = axis_index
-                for key, value in connected_axes.items():
-                    non_virtual_axes.append(key)
-            else:
-                for axis_index in range(0, 32):
-                    status_item_configuration = a1.StatusItemConfiguration()
-                    status_item_configuration.axis.add(a1.AxisStatusItem.AxisStatus, axis_index)
-                    result = controller.runtime.status.get_status_items(status_item_configuration)
-                    axis_status = int(result.axis.get(a1.AxisStatusItem.AxisStatus, axis_index).value)
-                    if (axis_status & 1 << 13) > 0:
-                        connected_axes[controller.runtime.parameters.axes[axis_index].identification.axisname.value] = axis_index
-                for key, value in connected_axes.items():
-                    non_virtual_axes.append(key)
-        
-        return controller, non_virtual_axes
+        def confirm_usb():
+            return messagebox.askyesno('Could Not Connect To Hyperwire', 'Is this an iDrive?')
+        
+        # Reconnecting to a known controller reuses its axis map after one status check
+        try:
+            from TopologyCache import shared_cache
+            topology_cache = shared_cache()
+        except Exception as e:
+            print(f"⚠️ Topology cache unavailable, running full axis discovery: {e}")
+            topology_cache = None
+        return self.establish_connection(self.a1, connection_type, confirm_usb, topology_cache=topology_cache)
     
     def connection_success(self):
         """Handle successful connection"""
@@ -462,138 +493,18 @@ class MCDPayloadUI:
                 
                 ttk.Label(frame, text="kg", style='Subtitle.TLabel').pack(side='left')
     
-    def modify_mcd_payloads(self, mcd_path, payload_values):
+    def modify_mcd_payloads(self, mcd_path, payload_values, level=DEFAULT_LEVEL):
         """
-        Unpack the MCD, update LoadMass/LoadInertia in config/MachineSetupData for each axis in payload_values.
+        Update LoadMass/LoadInertia in config/MachineSetupData for each axis in payload_values.
         Only updates if payload is nonzero.
         """
-        temp_dir = tempfile.mkdtemp(prefix="mcd_extract_")
-        try:
-            # Extract the MCD
-            with zipfile.ZipFile(mcd_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            msd_path = os.path.join(temp_dir, "config", "MachineSetupData")
-            if not os.path.exists(msd_path):
-                print("❌ MachineSetupData not found in MCD")
-                return None
-
-            tree = ET.parse(msd_path)
-            root = tree.getroot()
-
-            # Find all Stage components in order
-            stages = []
-            for mech_axis in root.findall(".//MachineSetupConfiguration/MechanicalProducts/MechanicalProduct/MechanicalAxes/MechanicalAxis"):
-                stage = mech_axis.find("./Stage/LinearStageComponent")
-                if stage is None:
-                    stage = mech_axis.find("./Stage/RotaryStageComponent")
-                if stage is not None:
-                    stages.append(stage)
-
-            # Get payload values in order
-            payload_keys = list(payload_values.keys())
-            payload_vals = [payload_values[k] for k in payload_keys if float(payload_values[k]) != 0]
-
-            if not payload_vals:
-                print("No nonzero payloads to update.")
-                return None
-
-            # Update stages in order
-            updated = False
-            for i, payload in enumerate(payload_vals):
-                if i >= len(stages):
-                    break
-                stage = stages[i]
-                # Try LoadMass first, then LoadInertia
-                load_mass = stage.find("LoadMass")
-                load_inertia = stage.find("LoadInertia")
-                if load_mass is not None:
-                    load_mass.text = str(payload)
-                    updated = True
-                elif load_inertia is not None:
-                    load_inertia.text = str(payload)
-                    updated = True
-
-            if not updated:
-                print("No LoadMass or LoadInertia fields updated.")
-                return None
-
-            # Save the modified MachineSetupData
-            tree.write(msd_path, encoding='utf-8', xml_declaration=True)
-
-            # Repack the MCD
-            with zipfile.ZipFile(mcd_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                for root_dir, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root_dir, file)
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        new_zip.write(file_path, arcname)
-            print(f"✅ Payloads updated and new MCD saved as: {mcd_path}")
-            return mcd_path
-
-        except Exception as e:
-            print(f"❌ Error modifying MCD payloads: {e}")
-            return None
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        import MCDProcessing
+        return MCDProcessing.modify_mcd_payloads(mcd_path, payload_values, level)
     
-    def modify_controller_name(self, mcd_path, mode="Loaded"):
+    def modify_controller_name(self, mcd_path, mode="Loaded", level=DEFAULT_LEVEL):
         """Modify the controller name in the MCD file"""
-        import re
-        
-        temp_dir = tempfile.mkdtemp(prefix="mcd_extract_")
-        try:
-            # Extract the MCD
-            with zipfile.ZipFile(mcd_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            name_path = os.path.join(temp_dir, "config", "Names")
-            if os.path.exists(name_path):
-                name_tree = ET.parse(name_path)
-                name_root = name_tree.getroot()
-
-                # Find the ControllerName element
-                controller_name_elem = name_root.find(".//ControllerName")
-                if controller_name_elem is not None and controller_name_elem.text:
-                    current_name = controller_name_elem.text.strip()
-                    if mode.lower() == "no load":
-                        # If "No Load" not present, add it
-                        if re.search(r'no[\s\-]*load', current_name, flags=re.IGNORECASE):
-                            new_text = current_name
-                        else:
-                            new_text = current_name + " No Load"
-                    else:  # mode == "Loaded"
-                        # Replace any "No Load" with "Loaded", or add "Loaded" if not present
-                        new_text = re.sub(r'[\s\-]*no[\s\-]*load[\s\-]*', ' Loaded', current_name, flags=re.IGNORECASE)
-                        if 'Loaded' not in new_text:
-                            new_text = new_text.strip() + ' Loaded'
-                    controller_name_elem.text = new_text.strip()
-                    
-                    # Save the modified Names file
-                    name_tree.write(name_path, encoding='utf-8', xml_declaration=True)
-
-                    # Repack the MCD
-                    with zipfile.ZipFile(mcd_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                        for root_dir, dirs, files in os.walk(temp_dir):
-                            for file in files:
-                                file_path = os.path.join(root_dir, file)
-                                arcname = os.path.relpath(file_path, temp_dir)
-                                new_zip.write(file_path, arcname)
-                    
-                    print(f"✅ Controller name updated: '{current_name}' → '{new_text}'")
-                    return mcd_path
-                else:
-                    print("⚠️ ControllerName element not found in Names file")
-                    return None
-            else:
-                print("⚠️ Names file not found in MCD")
-                return None
-
-        except Exception as e:
-            print(f"❌ Error modifying controller name: {e}")
-            return None
-        finally:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        import MCDProcessing
+        return MCDProcessing.modify_controller_name(mcd_path, mode, level)
     
     def process_mcd(self):
         """Process the MCD file with payload modifications"""
@@ -618,84 +529,37 @@ class MCDPayloadUI:
         self.output_text.delete(1.0, tk.END)
         
         def process_thread():
+            import MCDProcessing
+            start = time.perf_counter()
+            # Route this thread's output to our text widget (other threads, e.g. cell sessions, keep theirs)
+            output = session_output()
             try:
-                # Redirect stdout to our text widget
-                old_stdout = sys.stdout
-                sys.stdout = self.redirect_text
+                output.bind(self.redirect_text)
                 
                 print("🚀 Starting MCD payload modification process...")
                 print(f"📁 MCD File: {self.mcd_path}")
                 print(f"🎯 Payload Values: {payload_values}")
                 print()
                 
-                # Step 1: Create backup of original MCD
-                backup_path = self.mcd_path.replace('.mcd', '-backup.mcd')
-                shutil.copy2(self.mcd_path, backup_path)
-                print(f"💾 Backup created: {backup_path}")
-                
-                # Step 2: Modify MCD with payload values
-                print("\n🔧 Modifying MCD payloads...")
-                modified_mcd = self.modify_mcd_payloads(self.mcd_path, payload_values)
-                
-                if not modified_mcd:
-                    print("❌ Failed to modify MCD payloads")
+                # Re-processing the same machine only recalculates the axes whose payload changed
+                result = MCDProcessing.process_mcd_file(self.mcd_path, payload_values, self.mcd_name,
+                                                        incremental=True)
+                if not result["modified_mcd"]:
                     return
                 
-                # Step 3: Update controller name from "No Load" to "Loaded"
-                print("\n📝 Updating controller name from 'No Load' to 'Loaded'...")
-                try:
-                    updated_mcd = self.modify_controller_name(modified_mcd, "Loaded")
-                    if updated_mcd:
-                        print("✅ Controller name updated successfully")
-                        modified_mcd = updated_mcd
-                    else:
-                        print("⚠️ Could not update controller name, continuing with original")
-                except Exception as e:
-                    print(f"⚠️ Error updating controller name: {e}")
-                    print("Continuing with original MCD...")
-                
-                # Step 4: Calculate parameters using GenerateMCD
-                print("\n🧮 Calculating parameters...")
-                try:
-                    CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
-                    MS_DLL_PATH = os.path.join(CURRENT_DIR, "extern", "Automation1")
-                    CONFIG_MANAGER_PATH = os.path.join(CURRENT_DIR, "System.Configuration.ConfigurationManager.8.0.0", "lib", "netstandard2.0")
-
-                    # Update MCD name to reflect "Loaded" state
-                    loaded_mcd_name = self.mcd_name.replace(" No Load", "").replace(" NoLoad", "").replace("No Load", "").replace("NoLoad", "")
-                    loaded_mcd_name = loaded_mcd_name.strip() + " Loaded"
-                    print(f"📝 Using MCD name: {loaded_mcd_name}")
-
-                    # Create AerotechController instance with updated name
-                    mcd_converter = AerotechController(CURRENT_DIR, MS_DLL_PATH, CONFIG_MANAGER_PATH, loaded_mcd_name)
-                    mcd_converter.initialize()
-
-                    read_from_file = mcd_converter.MachineControllerDefinition.GetMethod("ReadFromFile")
-                    mcd_obj = read_from_file.Invoke(None, [modified_mcd])
-
-                    # Call calculate_from_current_mcd
-                    calculated_mcd, warnings = mcd_converter.calculate_from_current_mcd(mcd_obj)
-                    
-                    if warnings:
-                        print("⚠️ Warnings during calculation:")
-                        for warning in warnings:
-                            print(f"   - {warning}")
-                    
-                    print("✅ Parameter calculation completed successfully!")
-                    
-                except Exception as e:
-                    print(f"❌ Error during parameter calculation: {e}")
-                    import traceback
-                    print(traceback.format_exc())
-                
                 print("\n🎉 MCD payload modification process completed!")
+                print(f"⏱️ Processing time: {time.perf_counter() - start:.2f} s")
+                if not self.first_result_reported and result["calculated_mcd"]:
+                    self.first_result_reported = True
+                    print(f"⏱️ Time to first result: {time.perf_counter() - APP_START:.2f} s since start-up "
+                          f"(interactive after {self.time_to_interactive:.2f} s)")
                 
             except Exception as e:
                 print(f"❌ Error during process: {e}")
                 import traceback
                 print(traceback.format_exc())
             finally:
-                sys.stdout = old_stdout
+                output.bind(None)
                 self.root.after(0, self.process_finished)
         
         threading.Thread(target=process_thread, daemon=True).start()
@@ -744,6 +608,9 @@ def main():
     def on_closing():
         if messagebox.askokcancel("Quit", "Do you want to quit MCD Payload Modifier?"):
             root.destroy()
+            if app.session_manager is not None:
+                # Let running cell jobs finish writing their MCDs, then disconnect
+                app.session_manager.close()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Processing - Headless payload, rename and calculate pipeline for No Load MCDs
+Description: The processing steps behind MCDPayloadUI's "Process MCD" button,
+usable without a window (MCDWatchFolder, scripts). The payload and controller
+name edits are pure Python; the parameter calculation step imports GenerateMCD
+(pythonnet + Automation1 DLLs) only when it runs, and keeps one initialized
+converter for reuse so the CLR is loaded once per process (see prewarm_converter).
+The Automation1 converters are not documented as thread-safe, so .NET work is
+serialised: only one thread at a time holds a converter (see pooled_converter),
+while the pure-Python steps of concurrent jobs still overlap.
+"""
+
+import os
+import re
+import threading
+import contextlib
+
+import MCDXml
+from MCDXml import XmlDocument
+from MCDArchive import MCDArchive, DEFAULT_LEVEL
+from MCDBackupStore import MCDBackupStore
+from CalculationCache import CalculationCache, dll_version
+from ClrBridge import release
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MS_DLL_PATH = os.path.join(CURRENT_DIR, "extern", "Automation1")
+CONFIG_MANAGER_PATH = os.path.join(CURRENT_DIR, "System.Configuration.ConfigurationManager.8.0.0", "lib", "netstandard2.0")
+
+def modify_mcd_payloads(mcd_path, payload_values, level=DEFAULT_LEVEL):
+    """
+    Update LoadMass/LoadInertia in config/MachineSetupData for each axis in payload_values.
+    Only updates if payload is nonzero. The MCD is edited in memory and only the
+    modified member is recompressed, with its original formatting kept (see MCDXml).
+    """
+    try:
+        archive = MCDArchive.open(mcd_path)
+
+        msd_name = "config/MachineSetupData"
+        if msd_name not in archive:
+            print("❌ MachineSetupData not found in MCD")
+            return None
+
+        document = XmlDocument(archive.read(msd_name))
+        root = document.root
+
+        # Find all Stage components in order
+        stages = []
+        for mech_axis in MCDXml.MECHANICAL_AXES(root):
+            stage = MCDXml.LINEAR_STAGE.first(mech_axis)
+            if stage is None:
+                stage = MCDXml.ROTARY_STAGE.first(mech_axis)
+            if stage is not None:
+                stages.append(stage)
+
+        # Get payload values in order
+        payload_keys = list(payload_values.keys())
+        payload_vals = [payload_values[k] for k in payload_keys if float(payload_values[k]) != 0]
+
+        if not payload_vals:
+            print("No nonzero payloads to update.")
+            return None
+
+        # Update stages in order
+        updated = False
+        for i, payload in enumerate(payload_vals):
+            if i >= len(stages):
+                break
+            stage = stages[i]
+            # Try LoadMass first, then LoadInertia
+            load_mass = stage.find("LoadMass")
+            load_inertia = stage.find("LoadInertia")
+            if load_mass is not None:
+                load_mass.text = str(payload)
+                updated = True
+            elif load_inertia is not None:
+                load_inertia.text = str(payload)
+                updated = True
+
+        if not updated:
+            print("No LoadMass or LoadInertia fields updated.")
+            return None
+
+        # Save the modified MachineSetupData and repack the MCD
+        archive.replace(msd_name, document.serialize())
+        archive.write(mcd_path, level=level)
+        print(f"✅ Payloads updated and new MCD saved as: {mcd_path}")
+        return mcd_path
+
+    except Exception as e:
+        print(f"❌ Error modifying MCD payloads: {e}")
+        return None
+
+def modify_controller_name(mcd_path, mode="Loaded", level=DEFAULT_LEVEL):
+    """Modify the controller name in the MCD file"""
+    try:
+        archive = MCDArchive.open(mcd_path)
+
+        name_member = "config/Names"
+        if name_member in archive:
+            name_document = XmlDocument(archive.read(name_member))
+
+            # Find the ControllerName element
+            controller_name_elem = MCDXml.CONTROLLER_NAME.first(name_document.root)
+            if controller_name_elem is not None and controller_name_elem.text:
+                current_name = controller_name_elem.text.strip()
+                if mode.lower() == "no load":
+                    # If "No Load" not present, add it
+                    if re.search(r'no[\s\-]*load', current_name, flags=re.IGNORECASE):
+                        new_text = current_name
+                    else:
+                        new_text = current_name + " No Load"
+                else:  # mode == "Loaded"
+                    # Replace any "No Load" with "Loaded", or add "Loaded" if not present
+                    new_text = re.sub(r'[\s\-]*no[\s\-]*load[\s\-]*', ' Loaded', current_name, flags=re.IGNORECASE)
+                    if 'Loaded' not in new_text:
+                        new_text = new_text.strip() + ' Loaded'
+                controller_name_elem.text = new_text.strip()
+
+                # Save the modified Names file and repack the MCD
+                archive.replace(name_member, name_document.serialize())
+                archive.write(mcd_path, level=level)
+
+                print(f"✅ Controller name updated: '{current_name}' → '{new_text}'")
+                return mcd_path
+            else:
+                print("⚠️ ControllerName element not found in Names file")
+                return None
+        else:
+            print("⚠️ Names file not found in MCD")
+            return None
+
+    except Exception as e:
+        print(f"❌ Error modifying controller name: {e}")
+        return None
+
+def loaded_mcd_name(mcd_name):
+    """Returns the "Loaded" MCD name for a "No Load" MCD name."""
+    loaded_name = mcd_name.replace(" No Load", "").replace(" NoLoad", "").replace("No Load", "").replace("NoLoad", "")
+    return loaded_name.strip() + " Loaded"
+
+# --- Converter reuse ---
+
+# The idle initialized AerotechController; .NET work is serialised, so one is all a process needs.
+# It is built on CURRENT_DIR (where its templates live): callers point its output paths at their own folder.
+_idle_converter = None
+_converters_lock = threading.Lock()
+# Held while a converter is in use, so .NET calls from worker threads never run concurrently
+_dotnet_lock = threading.RLock()
+
+def _acquire_converter():
+    """Returns the idle initialized AerotechController, creating one if there is none."""
+    global _idle_converter
+    with _converters_lock:
+        converter, _idle_converter = _idle_converter, None
+    if converter is not None:
+        return converter
+
+    from GenerateMCD import AerotechController
+    converter = AerotechController(CURRENT_DIR, MS_DLL_PATH, CONFIG_MANAGER_PATH, None)
+    converter.initialize()
+    return converter
+
+def _release_converter(converter):
+    """Keeps a converter as the idle one."""
+    global _idle_converter
+    with _converters_lock:
+        _idle_converter = converter
+
+@contextlib.contextmanager
+def pooled_converter():
+    """
+    Yields the process's initialized AerotechController and keeps it for reuse afterwards.
+    Other threads wait until it is released, since the .NET converters are not thread-safe.
+    Callers set the output paths they need (see calculate_parameters).
+    """
+    with _dotnet_lock:
+        converter = _acquire_converter()
+        try:
+            yield converter
+        finally:
+            _release_converter(converter)
+
+def prewarm_converter():
+    """
+    Loads pythonnet and the Automation1 assemblies and keeps an initialized converter
+    ready, so the first calculation does not pay the CLR start-up cost.
+    Raises whatever GenerateMCD raises when .NET or the DLLs are unavailable.
+    """
+    with _dotnet_lock:
+        _release_converter(_acquire_converter())
+
+_calculation_cache = None
+_calculation_cache_lock = threading.Lock()
+
+def get_calculation_cache():
+    """Returns the shared CalculationCache, opened against the installed Automation1 DLLs."""
+    global _calculation_cache
+    with _calculation_cache_lock:
+        if _calculation_cache is None:
+            _calculation_cache = CalculationCache(dll_version=dll_version(MS_DLL_PATH))
+        return _calculation_cache
+
+def calculate_parameters(mcd_path, mcd_name, output_dir=CURRENT_DIR, use_cache=True):
+    """
+    Calculates the parameters of an MCD with GenerateMCD, reusing a pre-warmed converter when one is idle.
+    Machine setups that were calculated before are served from the CalculationCache without .NET.
+
+    Args:
+        mcd_path (str): MCD to read.
+        mcd_name (str): Name of the calculated MCD (written as output_dir/<mcd_name>.mcd).
+        output_dir (str): Folder for the calculated MCD.
+        use_cache (bool): Look up and record results in the calculation cache.
+
+    Returns:
+        tuple: (calculated MCD object or None for a cache hit, warnings, calculated MCD path)
+    """
+    calculated_path = os.path.join(output_dir, f"{mcd_name}.mcd")
+    if use_cache:
+        cache = get_calculation_cache()
+        # One SQLite connection is shared by the watch folder's worker threads
+        with _calculation_cache_lock:
+            warnings = cache.apply_cached(mcd_path, calculated_path)
+        if warnings is not None:
+            print("♻️ Identical machine setup calculated before - reused cached parameters")
+            return None, warnings, calculated_path
+
+    with pooled_converter() as mcd_converter:
+        # calculate_from_current_mcd writes to example_mcd_path, which the constructor derives from mcd_name
+        mcd_converter.mcd_name = mcd_name
+        mcd_converter.example_mcd_path = calculated_path
+        mcd_converter.example_json_output_path = os.path.join(output_dir, f"{mcd_name}.json")
+
+        read_from_file = mcd_converter.MachineControllerDefinition.GetMethod("ReadFromFile")
+        mcd_obj = read_from_file.Invoke(None, [mcd_path])
+        try:
+            calculated_mcd, warnings = mcd_converter.calculate_from_current_mcd(mcd_obj)
+        finally:
+            # The input definition is not needed once the calculated MCD has been written
+            release(mcd_obj)
+
+    if use_cache:
+        cache = get_calculation_cache()
+        with _calculation_cache_lock:
+            cache.store_result(mcd_path, calculated_path, [str(warning) for warning in warnings])
+    return calculated_mcd, warnings, calculated_path
+
+def process_mcd_file(mcd_path, payload_values, mcd_name=None, output_dir=CURRENT_DIR, backup=True, incremental=False,
+                     validate=True):
+    """
+    Runs the full pipeline on an MCD: backup, payload update, rename to "Loaded" and calculation.
+    The MCD at mcd_path is modified in place.
+
+    Args:
+        mcd_path (str): The "No Load" MCD to process.
+        payload_values (dict): Axis name -> payload, in axis order.
+        mcd_name (str): MCD name used to derive the "Loaded" name (defaults to the file name).
+        output_dir (str): Folder for the calculated MCD.
+        backup (bool): Record a version in the MCDBackupStore before modifying.
+        incremental (bool): If a calculated MCD from an earlier run exists, recalculate only the
+            axes whose machine setup changed (see IncrementalRecalc).
+        validate (bool): Check the calculated parameters against MCDValidation's default rules.
+
+    Returns:
+        dict: modified_mcd, calculated_mcd (path or None), warnings, violations and error for the run.
+    """
+    if mcd_name is None:
+        mcd_name = os.path.splitext(os.path.basename(mcd_path))[0]
+    result = {"modified_mcd": None, "calculated_mcd": None, "warnings": [], "violations": [], "error": None}
+
+    # Step 1: Record a versioned backup of the original MCD
+    if backup:
+        backup_store = MCDBackupStore.for_mcd(mcd_path)
+        version = backup_store.backup(mcd_path, label="before payload update")
+        print(f"💾 Backup created: version {version['version']} "
+              f"({version['new_objects']} new member(s), {version['bytes_written']} bytes) in {backup_store.root}")
+
+    # Step 2: Modify MCD with payload values
+    print("\n🔧 Modifying MCD payloads...")
+    modified_mcd = modify_mcd_payloads(mcd_path, payload_values)
+
+    if not modified_mcd:
+        print("❌ Failed to modify MCD payloads")
+        result["error"] = "Failed to modify MCD payloads"
+        return result
+
+    # Step 3: Update controller name from "No Load" to "Loaded"
+    print("\n📝 Updating controller name from 'No Load' to 'Loaded'...")
+    try:
+        updated_mcd = modify_controller_name(modified_mcd, "Loaded")
+        if updated_mcd:
+            print("✅ Controller name updated successfully")
+            modified_mcd = updated_mcd
+        else:
+            print("⚠️ Could not update controller name, continuing with original")
+    except Exception as e:
+        print(f"⚠️ Error updating controller name: {e}")
+        print("Continuing with original MCD...")
+    result["modified_mcd"] = modified_mcd
+
+    # Step 4: Calculate parameters using GenerateMCD
+    print("\n🧮 Calculating parameters...")
+    try:
+        name = loaded_mcd_name(mcd_name)
+        print(f"📝 Using MCD name: {name}")
+
+        calculated_path = os.path.join(output_dir, f"{name}.mcd")
+        if incremental and os.path.exists(calculated_path):
+            import IncrementalRecalc
+            recalc = IncrementalRecalc.recalculate(modified_mcd, calculated_path, calculated_path)
+            warnings = recalc["warnings"]
+            print(f"♻️ {recalc['mode'].title()} recalculation: {len(recalc['changed_axes'])} of "
+                  f"{recalc['total_axes']} axes in {recalc['elapsed_s']:.2f} s")
+        else:
+            calculated_obj, warnings, calculated_path = calculate_parameters(modified_mcd, name, output_dir)
+            # Free the .NET definition now rather than at the next Python GC
+            release(calculated_obj)
+        result["warnings"] = [str(warning) for warning in warnings]
+
+        if warnings:
+            print("⚠️ Warnings during calculation:")
+            for warning in warnings:
+                print(f"   - {warning}")
+
+        print("✅ Parameter calculation completed successfully!")
+        result["calculated_mcd"] = calculated_path
+
+    except Exception as e:
+        print(f"❌ Error during parameter calculation: {e}")
+        import traceback
+        print(traceback.format_exc())
+        result["error"] = str(e)
+        return result
+
+    # Step 5: Sanity-check the calculated parameters before the MCD ships
+    if validate:
+        import MCDValidation
+        print("\n🔍 Validating calculated parameters...")
+        try:
+            violations = MCDValidation.validate_mcd(result["calculated_mcd"])
+        except Exception as e:
+            print(f"⚠️ Could not validate {result['calculated_mcd']}: {e}")
+        else:
+            result["violations"] = violations
+            counts = MCDValidation.summarize(violations)
+            if violations:
+                MCDValidation.print_violations(violations)
+                print(f"{'❌' if counts['errors'] else '⚠️'} {counts['errors']} rule error(s), "
+                      f"{counts['warnings']} warning(s) in the calculated parameters")
+            else:
+                print("✅ Calculated parameters passed all validation rules")
+
+    return result
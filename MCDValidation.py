@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Validation - Vectorised sanity rules for calculated axis parameters
+Description: Checks calculated MCDs before they ship. Rules are declarative
+(plain dicts, loadable from JSON): value ranges, cross-parameter relations
+written as expressions ("DefaultAxisRampRate >= DefaultAxisSpeed / t"),
+required/forbidden bits of FaultMask and stability of the feedforward biquad
+(FeedforwardFilter00Coeff*). Each rule compiles to NumPy operations over a
+ParameterFrame - one row per (MCD, axis), one column per parameter - so a whole
+fleet of MCDs is validated in a single pass per rule. process_mcd_file runs the
+default rules on every calculated MCD.
+
+Usage:
+    python MCDValidation.py "PRO165LM XY-No Load.mcd"
+    python MCDValidation.py shipped/ --workers 4 --errors-only
+    python MCDValidation.py --index fleet_index.db --rules rules.json
+    python MCDValidation.py --list-rules
+"""
+
+import os
+import ast
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ParameterTable import ParameterTable
+
+ERROR = "error"
+WARNING = "warning"
+# MCDs per worker task when reading a folder
+CHUNK_SIZE = 32
+# Seconds an axis may take to ramp up to its default speed
+MAX_RAMP_TIME_S = 2.0
+
+# Axis fault bits (FaultMask, FaultAbortAxes, ...)
+FAULT_BITS = {
+    "PositionError": 0,
+    "OverCurrent": 1,
+    "CwEndOfTravelLimit": 2,
+    "CcwEndOfTravelLimit": 3,
+    "CwSoftwareLimit": 4,
+    "CcwSoftwareLimit": 5,
+    "Amplifier": 6,
+    "FeedbackInput0": 7,
+    "FeedbackInput1": 8,
+    "HallSensor": 9,
+    "MaxVelocityCommand": 10,
+    "EmergencyStop": 11,
+    "VelocityError": 12,
+}
+
+DEFAULT_RULES = [
+    {"name": "AverageCurrentThreshold", "type": "relation", "severity": ERROR,
+     "expression": "0 < AverageCurrentThreshold <= MaxCurrentClamp",
+     "message": "AverageCurrentThreshold must be positive and no more than MaxCurrentClamp"},
+    {"name": "BusOvervoltageThreshold", "type": "relation", "severity": ERROR,
+     "expression": "BusOvervoltageThreshold > CurrentLoopFeedforwardBusVoltage",
+     "message": "BusOvervoltageThreshold must be above the bus voltage"},
+    {"name": "BusOvervoltageRange", "type": "range", "severity": WARNING,
+     "parameter": "BusOvervoltageThreshold", "min": 0, "max": 800},
+    {"name": "DefaultAxisSpeed", "type": "relation", "severity": ERROR,
+     "expression": "0 < DefaultAxisSpeed <= MaxSpeedClamp",
+     "message": "DefaultAxisSpeed must be positive and no more than MaxSpeedClamp"},
+    {"name": "MaxJogSpeed", "type": "relation", "severity": WARNING,
+     "expression": "MaxJogSpeed <= MaxSpeedClamp"},
+    {"name": "RampTime", "type": "relation", "severity": WARNING,
+     "expression": "DefaultAxisRampRate >= DefaultAxisSpeed / t", "constants": {"t": MAX_RAMP_TIME_S},
+     "message": f"DefaultAxisRampRate takes more than {MAX_RAMP_TIME_S:g} s to reach DefaultAxisSpeed"},
+    {"name": "AbortDecelRate", "type": "relation", "severity": ERROR,
+     "expression": "AbortDecelRate >= DefaultAxisRampRate",
+     "message": "AbortDecelRate must stop the axis at least as fast as DefaultAxisRampRate"},
+    {"name": "PositionError", "type": "relation", "severity": ERROR,
+     "expression": "0 < InPositionDistance < PositionErrorThreshold"},
+    {"name": "CountsPerUnit", "type": "range", "severity": ERROR,
+     "parameter": "CountsPerUnit", "min": 1, "required": True},
+    {"name": "FaultMask", "type": "bitmask", "severity": ERROR, "parameter": "FaultMask",
+     "required_bits": ["PositionError", "OverCurrent", "Amplifier", "EmergencyStop"],
+     "message": "FaultMask must keep the position error, over current, amplifier and e-stop faults enabled"},
+    {"name": "FeedforwardFilter00", "type": "filter_stability", "severity": ERROR,
+     "prefix": "FeedforwardFilter00Coeff", "enable": "FeedforwardFilterSetup", "dc_gain_tolerance": 0.01},
+]
+
+# --- Parameter frame ---
+
+def _read_table(path):
+    """Worker: (path, axis, names, text) of one MCD's axis parameters, or (path, error)."""
+    try:
+        table = ParameterTable.from_mcd(path)
+    except Exception as e:
+        return path, f"{type(e).__name__}: {e}"
+    return path, table.axis, table.names, table.text
+
+def _read_chunk(paths):
+    return [_read_table(path) for path in paths]
+
+class ParameterFrame:
+    """
+    Numeric axis parameters of many MCDs as one matrix.
+
+    Args:
+        sources (list): Source labels (e.g. MCD paths).
+        source (array): Source index of each row.
+        axis (array): Axis index of each row.
+        names (list): Column (parameter) names.
+        values (array): rows x columns float64, NaN where a parameter is missing or not numeric.
+    """
+
+    def __init__(self, sources, source, axis, names, values):
+        self.sources = list(sources)
+        self.source = np.asarray(source, dtype=np.int64)
+        self.axis = np.asarray(axis, dtype=np.int64)
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=np.float64)
+        self._columns = {name: i for i, name in enumerate(self.names)}
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.axis)
+
+    def column(self, name):
+        """Returns a parameter's values for every row (all NaN if no row has it)."""
+        index = self._columns.get(name)
+        if index is None:
+            return np.full(len(self), np.nan)
+        return self.values[:, index]
+
+    def has(self, name):
+        return name in self._columns
+
+    @classmethod
+    def from_long(cls, sources, source, axis, names, numbers):
+        """
+        Pivots long-format rows (one per source, axis and parameter) into a frame.
+
+        Args:
+            sources (list): Source labels indexed by source.
+            source, axis, names, numbers (arrays): One entry per parameter value.
+        """
+        source = np.asarray(source, dtype=np.int64)
+        axis = np.asarray(axis, dtype=np.int64)
+        if len(source) == 0:
+            return cls(sources, [], [], [], np.empty((0, 0)))
+        columns, column_index = np.unique(np.asarray(names, dtype=object).astype(str), return_inverse=True)
+        row_keys, row_index = np.unique(source << 32 | (axis & 0xFFFFFFFF), return_inverse=True)
+        values = np.full((len(row_keys), len(columns)), np.nan)
+        values[row_index, column_index] = np.asarray(numbers, dtype=np.float64)
+        return cls(sources, row_keys >> 32, (row_keys & 0xFFFFFFFF).astype(np.int32), columns.tolist(), values)
+
+    @classmethod
+    def from_tables(cls, tables):
+        """Builds a frame from (label, ParameterTable) pairs."""
+        sources = [label for label, _ in tables]
+        if not tables:
+            return cls.from_long(sources, [], [], [], [])
+        return cls.from_long(sources,
+                             np.concatenate([np.full(len(table), i) for i, (_, table) in enumerate(tables)]),
+                             np.concatenate([table.axis for _, table in tables]),
+                             np.concatenate([table.names for _, table in tables]),
+                             np.concatenate([table.numeric for _, table in tables]))
+
+    @classmethod
+    def from_mcds(cls, paths, workers=None):
+        """Reads the axis parameters of MCD files (in a process pool when there are many)."""
+        paths = list(paths)
+        chunks = [paths[i:i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+        results = []
+        if len(chunks) <= 1 or workers == 1:
+            for chunk in chunks:
+                results.extend(_read_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for chunk_results in pool.map(_read_chunk, chunks):
+                    results.extend(chunk_results)
+
+        tables = []
+        errors = {}
+        for result in results:
+            if len(result) == 2:
+                errors[result[0]] = result[1]
+            else:
+                path, axis, names, text = result
+                tables.append((path, ParameterTable(axis, np.zeros(len(axis)), names, text)))
+        frame = cls.from_tables(tables)
+        frame.errors = errors
+        return frame
+
+    @classmethod
+    def from_fleet_index(cls, db_path):
+        """Builds a frame from the axis parameters of a FleetIndex database, without opening any MCD."""
+        connection = sqlite3.connect(db_path)
+        try:
+            sources = [row[0] for row in connection.execute("SELECT path FROM files ORDER BY id")]
+            ids = {file_id: i for i, (file_id,) in enumerate(connection.execute("SELECT id FROM files ORDER BY id"))}
+            rows = connection.execute("SELECT file_id, scope_index, name, number FROM parameters "
+                                      "WHERE scope = 'Axis'").fetchall()
+        finally:
+            connection.close()
+        if not rows:
+            return cls.from_long(sources, [], [], [], [])
+        file_id, axis, names, numbers = zip(*rows)
+        return cls.from_long(sources, [ids[i] for i in file_id], axis, names,
+                             [np.nan if number is None else number for number in numbers])
+
+# --- Rule compilation ---
+
+_BINARY_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+                     ast.Div: np.divide, ast.Pow: np.power, ast.Mod: np.mod}
+_COMPARISONS = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+                ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal}
+_FUNCTIONS = {"abs": np.abs, "sqrt": np.sqrt, "min": np.minimum, "max": np.maximum}
+
+def compile_expression(expression, constants=None):
+    """
+    Compiles a rule expression into a function of a ParameterFrame.
+
+    Names are parameter columns unless given in constants. Supports + - * / ** %,
+    chained comparisons, and/or/not, and abs(), sqrt(), min(), max().
+
+    Returns:
+        tuple: (function(frame) -> array, sorted parameter names used)
+    """
+    constants = constants or {}
+    parameters = set()
+
+    def build(node):
+        if isinstance(node, ast.Expression):
+            return build(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return lambda frame, value=float(node.value): value
+        if isinstance(node, ast.Name):
+            if node.id in constants:
+                return lambda frame, value=float(constants[node.id]): value
+            parameters.add(node.id)
+            return lambda frame, name=node.id: frame.column(name)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd, ast.Not)):
+            operand = build(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda frame: np.logical_not(operand(frame))
+            sign = -1.0 if isinstance(node.op, ast.USub) else 1.0
+            return lambda frame: sign * operand(frame)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            function = _BINARY_OPERATORS[type(node.op)]
+            left, right = build(node.left), build(node.right)
+            return lambda frame: function(left(frame), right(frame))
+        if isinstance(node, ast.BoolOp):
+            function = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            operands = [build(value) for value in node.values]
+            return lambda frame: function.reduce([np.broadcast_to(operand(frame), len(frame)) for operand in operands])
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARISONS for op in node.ops):
+            terms = [build(node.left)] + [build(comparator) for comparator in node.comparators]
+            functions = [_COMPARISONS[type(op)] for op in node.ops]
+
+            def compare(frame):
+                values = [term(frame) for term in terms]
+                result = np.ones(len(frame), dtype=bool)
+                for function, left, right in zip(functions, values, values[1:]):
+                    result &= function(left, right)
+                return result
+            return compare
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+                and not node.keywords):
+            function = _FUNCTIONS[node.func.id]
+            arguments = [build(argument) for argument in node.args]
+            return lambda frame: function(*[argument(frame) for argument in arguments])
+        raise ValueError(f"Unsupported syntax in rule expression '{expression}': {ast.dump(node)[:60]}")
+
+    function = build(ast.parse(expression, mode="eval"))
+    return function, sorted(parameters)
+
+class Rule:
+    """
+    A compiled rule: check(frame) returns a boolean array marking the rows that violate it.
+
+    Args:
+        spec (dict): The declarative rule (name, type, severity and the type's fields).
+        parameters (list): Parameters shown with each violation.
+        check (callable): frame -> violation mask.
+    """
+
+    def __init__(self, spec, parameters, check):
+        self.spec = spec
+        self.name = spec["name"]
+        self.severity = spec.get("severity", ERROR)
+        self.parameters = parameters
+        self.check = check
+        self.message = spec.get("message") or describe(spec)
+
+def describe(spec):
+    """Default message for a rule spec."""
+    kind = spec["type"]
+    if kind == "relation":
+        return f"{spec['expression']} does not hold"
+    if kind == "range":
+        low, high = spec.get("min"), spec.get("max")
+        bounds = f"[{'-inf' if low is None else low}, {'inf' if high is None else high}]"
+        return f"{spec['parameter']} outside {bounds}" + (" or missing" if spec.get("required") else "")
+    if kind == "bitmask":
+        return f"{spec['parameter']} bits not as required"
+    return f"{spec['prefix']} biquad is unstable or has a DC gain other than 1"
+
+def _bits(bits):
+    """Bit names or numbers -> integer mask."""
+    mask = 0
+    for bit in bits or ():
+        mask |= 1 << (FAULT_BITS[bit] if isinstance(bit, str) else int(bit))
+    return mask
+
+def _present(frame, names):
+    """Rows where every named parameter has a numeric value."""
+    present = np.ones(len(frame), dtype=bool)
+    for name in names:
+        present &= ~np.isnan(frame.column(name))
+    return present
+
+def compile_rule(spec):
+    """Compiles a declarative rule spec into a Rule. Raises ValueError for malformed specs."""
+    kind = spec.get("type")
+    if "name" not in spec:
+        raise ValueError(f"Rule without a name: {spec}")
+
+    if kind == "relation":
+        function, parameters = compile_expression(spec["expression"], spec.get("constants"))
+
+        def check(frame):
+            # A relation only applies to axes that have every parameter it mentions
+            with np.errstate(divide="ignore", invalid="ignore"):
+                holds = np.broadcast_to(function(frame), len(frame))
+            return _present(frame, parameters) & ~holds
+        return Rule(spec, parameters, check)
+
+    if kind == "range":
+        name = spec["parameter"]
+        low, high = spec.get("min"), spec.get("max")
+
+        def check(frame):
+            values = frame.column(name)
+            missing = np.isnan(values)
+            violation = np.zeros(len(frame), dtype=bool)
+            if low is not None:
+                violation |= values < low
+            if high is not None:
+                violation |= values > high
+            return violation | missing if spec.get("required") else violation
+        return Rule(spec, [name], check)
+
+    if kind == "bitmask":
+        name = spec["parameter"]
+        required, forbidden = _bits(spec.get("required_bits")), _bits(spec.get("forbidden_bits"))
+
+        def check(frame):
+            values = frame.column(name)
+            present = ~np.isnan(values)
+            mask = np.where(present, values, 0).astype(np.int64)
+            return present & (((mask & required) != required) | ((mask & forbidden) != 0))
+        return Rule(spec, [name], check)
+
+    if kind == "filter_stability":
+        prefix = spec["prefix"]
+        names = [prefix + suffix for suffix in ("N0", "N1", "N2", "D1", "D2")]
+        enable = spec.get("enable")
+        tolerance = spec.get("dc_gain_tolerance")
+
+        def check(frame):
+            n0, n1, n2, d1, d2 = (frame.column(name) for name in names)
+            applies = _present(frame, names)
+            if enable and frame.has(enable):
+                applies &= np.nan_to_num(frame.column(enable)) != 0
+            # Poles of z^2 + D1 z + D2 inside the unit circle (Jury criterion)
+            stable = (np.abs(d2) < 1) & (np.abs(d1) < 1 + d2)
+            violation = ~stable
+            if tolerance is not None:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    dc_gain = (n0 + n1 + n2) / (1 + d1 + d2)
+                violation |= ~(np.abs(dc_gain - 1) <= tolerance)
+            return applies & violation
+        return Rule(spec, ([enable] if enable else []) + names, check)
+
+    raise ValueError(f"Unknown rule type '{kind}' in rule '{spec['name']}'")
+
+def load_rules(path=None):
+    """Compiles the rules in a JSON file (a list of specs), or DEFAULT_RULES."""
+    specs = DEFAULT_RULES
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            specs = json.load(f)
+    return [compile_rule(spec) for spec in specs]
+
+# --- Validation ---
+
+def validate(frame, rules=None):
+    """
+    Runs every rule over every row of a frame.
+
+    Args:
+        frame (ParameterFrame): Axis parameters of one or more MCDs.
+        rules (list): Compiled rules (default: DEFAULT_RULES).
+
+    Returns:
+        list: Violation dicts of source, axis, rule, severity, message and values {parameter: value}.
+    """
+    rules = rules if rules is not None else load_rules()
+    violations = []
+    for rule in rules:
+        rows = np.flatnonzero(rule.check(frame))
+        if len(rows) == 0:
+            continue
+        columns = {name: frame.column(name)[rows] for name in rule.parameters}
+        for k, row in enumerate(rows):
+            violations.append({
+                "source": frame.sources[frame.source[row]],
+                "axis": int(frame.axis[row]),
+                "rule": rule.name,
+                "severity": rule.severity,
+                "message": rule.message,
+                "values": {name: (None if np.isnan(values[k]) else float(values[k])) for name, values in columns.items()},
+            })
+    violations.sort(key=lambda violation: (violation["source"], violation["axis"], violation["rule"]))
+    return violations
+
+def validate_mcd(mcd_path, rules=None):
+    """Validates a single MCD. Returns its violations."""
+    return validate(ParameterFrame.from_tables([(mcd_path, ParameterTable.from_mcd(mcd_path))]), rules)
+
+def summarize(violations):
+    """Returns counts of errors and warnings and of sources with errors."""
+    errors = [violation for violation in violations if violation["severity"] == ERROR]
+    return {"errors": len(errors), "warnings": len(violations) - len(errors),
+            "failed_sources": len({violation["source"] for violation in errors})}
+
+def print_violations(violations):
+    """Prints violations grouped by source."""
+    source = None
+    for violation in violations:
+        if violation["source"] != source:
+            source = violation["source"]
+            print(f"\n{os.path.basename(source)}")
+        icon = "❌" if violation["severity"] == ERROR else "⚠️"
+        values = ", ".join(f"{name}={value:.10g}" if value is not None else f"{name}=missing"
+                           for name, value in violation["values"].items())
+        print(f"   {icon} Axis {violation['axis']} {violation['rule']}: {violation['message']} ({values})")
+
+def _mcd_paths(paths, extension=".mcd"):
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, file_names in os.walk(path):
+                for file_name in sorted(file_names):
+                    if file_name.lower().endswith(extension):
+                        yield os.path.join(dir_path, file_name)
+        else:
+            yield path
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Validate calculated MCD parameters against sanity rules.")
+    parser.add_argument("paths", nargs="*", help="MCD files or folders of MCDs")
+    parser.add_argument("--index", metavar="DB", help="Validate every MCD in a FleetIndex database instead")
+    parser.add_argument("--rules", help="JSON file with rule specs (default: built-in rules)")
+    parser.add_argument("--workers", type=int, help="Worker processes for reading MCDs")
+    parser.add_argument("--errors-only", action="store_true", help="Hide warnings")
+    parser.add_argument("--list-rules", action="store_true", help="Print the rules and exit")
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError, KeyError, SyntaxError) as e:
+        print(f"❌ Invalid rules: {e}")
+        return 2
+    if args.list_rules:
+        for rule in rules:
+            print(f"{rule.name} [{rule.severity}]: {rule.message}")
+        return 0
+    if not args.paths and not args.index:
+        parser.error("give MCD paths or --index")
+
+    start = time.perf_counter()
+    if args.index:
+        frame = ParameterFrame.from_fleet_index(args.index)
+    else:
+        frame = ParameterFrame.from_mcds(_mcd_paths(args.paths), args.workers)
+    loaded = time.perf_counter()
+    violations = validate(frame, rules)
+    elapsed = time.perf_counter() - loaded
+
+    for path, error in frame.errors.items():
+        print(f"❌ Could not read {path}: {error}")
+    shown = [violation for violation in violations if violation["severity"] == ERROR or not args.errors_only]
+    print_violations(shown)
+    counts = summarize(violations)
+    print(f"\n📊 {len(frame.sources)} MCDs, {len(frame)} axes: {counts['errors']} errors, {counts['warnings']} warnings "
+          f"({counts['failed_sources']} MCDs failing) - read in {loaded - start:.2f} s, "
+          f"{len(rules)} rules in {elapsed * 1000:.1f} ms")
+    return 1 if counts["errors"] or frame.errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
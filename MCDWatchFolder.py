@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Watch Folder - Lights-out processing of "No Load" MCDs dropped into a folder
+Description: Headless service mode for the production line. Watches a directory
+(inotify on Linux, polling everywhere else) for "No Load" MCDs with a payload
+sidecar, waits until both files have stopped changing, then runs the
+MCDProcessing payload/rename/calculate pipeline on a bounded worker pool.
+Copies and payload edits of different files overlap; the .NET calculation
+step runs one file at a time (see MCDProcessing.pooled_converter).
+Finished files are recorded in a state file, with the hashes of the MCD and its
+sidecar, so restarts don't reprocess them but an edited sidecar does. A failed
+file is retried after the settle time, up to DEFAULT_MAX_ATTEMPTS times for the
+same content.
+
+A sidecar is a JSON file beside the MCD with the same base name, holding the
+payload per axis in axis order, either directly or under "payloads":
+    "PRO165LM XY-No Load.mcd"
+    "PRO165LM XY-No Load.json"  ->  {"payloads": {"X": 1.5, "Y": 0.8}}
+
+Usage:
+    python MCDWatchFolder.py <watch dir> [--output DIR] [--workers 2] [--settle 2.0] [--attempts 3] [--poll] [--once]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import shutil
+import select
+import struct
+import hashlib
+import argparse
+import tempfile
+import threading
+import zipfile
+import ctypes
+import ctypes.util
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import MCDProcessing
+
+STATE_FILE_NAME = ".mcd_watch_state.json"
+DEFAULT_SETTLE_S = 2.0
+DEFAULT_POLL_INTERVAL_S = 1.0
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 3
+
+NO_LOAD_PATTERN = re.compile(r'no[\s\-]*load', re.IGNORECASE)
+
+# inotify event flags (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+def is_no_load_mcd(file_name):
+    """Returns True for .mcd files whose name marks them as "No Load"."""
+    return file_name.lower().endswith(".mcd") and bool(NO_LOAD_PATTERN.search(file_name))
+
+def sidecar_path(mcd_path):
+    """Returns the payload sidecar path for an MCD."""
+    return os.path.splitext(mcd_path)[0] + ".json"
+
+def load_payloads(path):
+    """Reads a payload sidecar, returning {axis name: payload}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    payloads = data.get("payloads", data) if isinstance(data, dict) else None
+    if not isinstance(payloads, dict) or not payloads:
+        raise ValueError(f"{os.path.basename(path)} has no payload values")
+    return {str(axis): float(value) for axis, value in payloads.items()}
+
+def file_signature(path):
+    """Returns a (size, mtime_ns) signature, or None if the file is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def file_hash(path):
+    """Returns the SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class InotifyWatcher:
+    """Minimal inotify wrapper (via ctypes) reporting file names written or moved into a folder."""
+    def __init__(self, directory):
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds and returns the names of files that changed."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Fallback watcher that rescans the folder on an interval."""
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL_S):
+        self.directory = directory
+        self.interval = interval
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return set(os.listdir(self.directory))
+
+    def close(self):
+        pass
+
+def create_watcher(directory, force_polling=False):
+    """Returns an inotify watcher where available, otherwise a polling watcher."""
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(directory)
+
+class WatchState:
+    """Persistent record of processed files, keyed by MCD file name."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read watch state {path}: {e}")
+
+    def _same_content(self, file_name, sha256, sidecar_sha256):
+        entry = self.entries.get(file_name)
+        if entry is None or entry.get("sha256") != sha256 or entry.get("sidecar_sha256") != sidecar_sha256:
+            return None
+        return entry
+
+    def is_done(self, file_name, sha256, sidecar_sha256, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Returns True if this exact MCD and sidecar content was processed successfully,
+        or failed max_attempts times.
+        """
+        entry = self._same_content(file_name, sha256, sidecar_sha256)
+        if entry is None:
+            return False
+        return entry.get("status") == "done" or \
+            (entry.get("status") == "failed" and entry.get("attempts", 1) >= max_attempts)
+
+    def attempts(self, file_name, sha256, sidecar_sha256):
+        """Returns how many times this exact MCD and sidecar content has been tried."""
+        entry = self._same_content(file_name, sha256, sidecar_sha256)
+        return entry.get("attempts", 1) if entry is not None and entry.get("status") == "failed" else 0
+
+    def failed(self, file_name):
+        """Returns True if the latest attempt at a file failed."""
+        return self.entries.get(file_name, {}).get("status") == "failed"
+
+    def record(self, file_name, **fields):
+        """Updates a file's entry and saves the state atomically."""
+        with self._lock:
+            entry = self.entries.setdefault(file_name, {})
+            entry.update(fields, updated=datetime.now().isoformat(timespec="seconds"))
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"files": self.entries}, f, indent=2)
+            os.replace(temp_path, self.path)
+
+class MCDWatchFolder:
+    """Watches a folder and feeds settled "No Load" MCDs through MCDProcessing."""
+    def __init__(self, watch_dir, output_dir=None, workers=DEFAULT_WORKERS, settle_s=DEFAULT_SETTLE_S,
+                 force_polling=False, process=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            watch_dir (str): Folder operators drop "No Load" MCDs and sidecars into.
+            output_dir (str): Folder for working copies and calculated MCDs (default: <watch_dir>/processed).
+            workers (int): Maximum MCDs processed concurrently.
+            settle_s (float): How long an MCD and its sidecar must be unchanged before processing.
+            force_polling (bool): Use the polling watcher even where inotify is available.
+            process (callable): Pipeline override taking (mcd_path, payloads, mcd_name, output_dir).
+            max_attempts (int): Tries per MCD and sidecar content before a failure is final.
+        """
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.output_dir = os.path.abspath(output_dir or os.path.join(self.watch_dir, "processed"))
+        self.workers = max(1, workers)
+        self.settle_s = settle_s
+        self.force_polling = force_polling
+        self.process = process or self._process_with_pipeline
+        self.max_attempts = max(1, max_attempts)
+        self.state = WatchState(os.path.join(self.watch_dir, STATE_FILE_NAME))
+        # file name -> (signature, sidecar signature, time the signatures were last seen changing)
+        self._pending = {}
+        self._in_flight = set()
+        self._completed = queue.Queue()
+        self._stop = threading.Event()
+
+    # --- Discovery ---
+
+    def _note(self, file_name):
+        """Starts (or restarts) the settle timer for an MCD after any change to it or its sidecar."""
+        if file_name.lower().endswith(".json"):
+            base = os.path.splitext(file_name)[0]
+            candidates = [name for name in os.listdir(self.watch_dir) if os.path.splitext(name)[0] == base]
+            file_name = next((name for name in candidates if is_no_load_mcd(name)), None)
+            if file_name is None:
+                return
+        if not is_no_load_mcd(file_name) or file_name in self._in_flight:
+            return
+        path = os.path.join(self.watch_dir, file_name)
+        signatures = (file_signature(path), file_signature(sidecar_path(path)))
+        previous = self._pending.get(file_name)
+        if previous is None or previous[:2] != signatures:
+            self._pending[file_name] = (signatures[0], signatures[1], time.monotonic())
+
+    def _settled(self):
+        """Returns pending MCDs whose files have been unchanged for the settle time."""
+        ready = []
+        now = time.monotonic()
+        for file_name, (signature, sidecar_signature, changed_at) in list(self._pending.items()):
+            path = os.path.join(self.watch_dir, file_name)
+            current = (file_signature(path), file_signature(sidecar_path(path)))
+            if current[0] is None:
+                del self._pending[file_name]
+                continue
+            if current != (signature, sidecar_signature):
+                self._pending[file_name] = (current[0], current[1], now)
+                continue
+            if current[1] is None or now - changed_at < self.settle_s:
+                continue
+            if not zipfile.is_zipfile(path):
+                # Still being written (or not an MCD at all); keep waiting for a change
+                continue
+            ready.append(file_name)
+        return ready
+
+    # --- Processing ---
+
+    def _process_with_pipeline(self, mcd_path, payloads, mcd_name, output_dir):
+        result = MCDProcessing.process_mcd_file(mcd_path, payloads, mcd_name, output_dir, backup=False)
+        if result["error"]:
+            raise RuntimeError(result["error"])
+        return result["calculated_mcd"]
+
+    def _run_job(self, file_name, sha256, sidecar_sha256, attempt):
+        """Processes one MCD on a worker thread, working on a copy so the dropped file is untouched."""
+        source = os.path.join(self.watch_dir, file_name)
+        mcd_name = os.path.splitext(file_name)[0]
+        try:
+            payloads = load_payloads(sidecar_path(source))
+            os.makedirs(self.output_dir, exist_ok=True)
+            working = os.path.join(self.output_dir, file_name)
+            shutil.copyfile(source, working)
+            output = self.process(working, payloads, mcd_name, self.output_dir)
+            self.state.record(file_name, sha256=sha256, sidecar_sha256=sidecar_sha256, status="done",
+                              attempts=attempt, output=output, error=None)
+            print(f"✅ Processed {file_name} → {output}")
+        except Exception as e:
+            self.state.record(file_name, sha256=sha256, sidecar_sha256=sidecar_sha256, status="failed",
+                              attempts=attempt, output=None, error=str(e))
+            retry = f", retrying (attempt {attempt + 1}/{self.max_attempts})" if attempt < self.max_attempts else ""
+            print(f"❌ Failed to process {file_name}: {e}{retry}")
+        finally:
+            self._completed.put(file_name)
+
+    def _dispatch(self, pool):
+        """Submits settled MCDs while worker slots are free."""
+        for file_name in self._settled():
+            if len(self._in_flight) >= self.workers:
+                break
+            path = os.path.join(self.watch_dir, file_name)
+            del self._pending[file_name]
+            try:
+                sha256, sidecar_sha256 = file_hash(path), file_hash(sidecar_path(path))
+            except OSError:
+                # Removed since it settled; a new copy is noted when it appears
+                continue
+            if self.state.is_done(file_name, sha256, sidecar_sha256, self.max_attempts):
+                continue
+            attempt = self.state.attempts(file_name, sha256, sidecar_sha256) + 1
+            self._in_flight.add(file_name)
+            self.state.record(file_name, sha256=sha256, sidecar_sha256=sidecar_sha256, status="processing",
+                              attempts=attempt)
+            print(f"📥 Queued {file_name}")
+            pool.submit(self._run_job, file_name, sha256, sidecar_sha256, attempt)
+
+    def _collect_completed(self):
+        while True:
+            try:
+                file_name = self._completed.get_nowait()
+            except queue.Empty:
+                return
+            self._in_flight.discard(file_name)
+            if self.state.failed(file_name):
+                # Retried once it has been left alone for the settle time (see _dispatch for the limit)
+                self._note(file_name)
+
+    def stop(self):
+        """Asks a running watch loop to exit after in-flight jobs finish."""
+        self._stop.set()
+
+    def run(self, once=False):
+        """
+        Runs the watch loop.
+
+        Args:
+            once (bool): Process what is already in the folder, wait for it to finish and return.
+        """
+        os.makedirs(self.watch_dir, exist_ok=True)
+        watcher = None if once else create_watcher(self.watch_dir, self.force_polling)
+        print(f"👀 Watching {self.watch_dir} ({type(watcher).__name__ if watcher else 'single pass'}, "
+              f"{self.workers} worker(s)) → {self.output_dir}")
+
+        for file_name in os.listdir(self.watch_dir):
+            self._note(file_name)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                while not self._stop.is_set():
+                    self._collect_completed()
+                    self._dispatch(pool)
+                    if once:
+                        if not self._in_flight and not self._settled_pending_possible():
+                            break
+                        time.sleep(min(0.1, self.settle_s))
+                        continue
+                    for file_name in watcher.wait(min(self.settle_s / 2.0, DEFAULT_POLL_INTERVAL_S) or 0.1):
+                        self._note(file_name)
+            except KeyboardInterrupt:
+                print("\n⏹️ Stopping watch folder...")
+            finally:
+                if watcher:
+                    watcher.close()
+
+    def _settled_pending_possible(self):
+        """In single-pass mode, returns True while a pending MCD could still be dispatched."""
+        now = time.monotonic()
+        for file_name, (_, sidecar_signature, changed_at) in self._pending.items():
+            if sidecar_signature is None:
+                continue
+            if now - changed_at < self.settle_s or zipfile.is_zipfile(os.path.join(self.watch_dir, file_name)):
+                return True
+        return False
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Auto-process No Load MCDs dropped into a folder.")
+    parser.add_argument("watch_dir", help="Folder to watch")
+    parser.add_argument("--output", help="Output folder (default: <watch_dir>/processed)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum concurrent MCDs")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_S, help="Seconds files must be unchanged")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="Tries per MCD and sidecar content before a failure is final")
+    parser.add_argument("--poll", action="store_true", help="Force the polling watcher")
+    parser.add_argument("--once", action="store_true", help="Process the current contents and exit")
+    args = parser.parse_args()
+
+    MCDWatchFolder(args.watch_dir, args.output, args.workers, args.settle, args.poll,
+                   max_attempts=args.attempts).run(once=args.once)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MCD Xml - Pluggable XML parsing, compiled queries and format-preserving output for MCD members
+Description: Every MCD member is a small XML document written by .NET with a
+UTF-8 BOM, a double-quoted declaration and CRLF line endings. Parsing takes a
+backend argument: lxml (optional, see requirements.txt) or
+xml.etree.ElementTree. Without one, DEFAULT_BACKEND is used, which is read
+once at import from MCD_XML_BACKEND or is the fastest available backend. It
+never changes afterwards, so threads that parse MCDs cannot affect each other.
+Both backends return elements with the ElementTree API (find/findall/get/text),
+so callers do not care which one parsed an element. The hot queries are Query
+objects, compiled once per backend (lxml XPath, or ElementTree's cached
+ElementPath selectors) and dispatched on the element they are given.
+
+XmlDocument parses a member for editing and serialises it back byte for byte:
+when only element text changed, the new values are spliced into the original
+bytes, so the BOM, declaration, quoting, empty-element style and line endings
+are untouched. Structural or attribute edits fall back to re-serialising the
+root, still behind the original prolog and in the original line endings. Both
+backends write the same bytes there: empty elements as <Name /> like .NET, and
+the xsi/xsd declarations ElementTree's parser drops are put back.
+
+Usage:
+    python MCDXml.py check <mcd> [<mcd> ...]
+    python MCDXml.py benchmark [<mcd> ...] [--axes 32] [--repeat 20]
+"""
+
+import io
+import os
+import re
+import sys
+import time
+import operator
+import zipfile
+import argparse
+import tempfile
+import statistics
+import xml.etree.ElementTree as ET
+
+from SyntheticMCD import generate_mcd
+
+try:
+    from lxml import etree as _lxml
+except ImportError:
+    _lxml = None
+
+BACKENDS = ("lxml", "etree")
+ParseError = (ET.ParseError,) + ((_lxml.XMLSyntaxError,) if _lxml is not None else ())
+
+# Comments and processing instructions are dropped, as ElementTree's parser does
+_lxml_parser = (_lxml.XMLParser(resolve_entities=False, huge_tree=True, remove_comments=True, remove_pis=True)
+                if _lxml is not None else None)
+
+# What the Automation1 .NET writers put before the root element
+NET_PROLOG = b'\xef\xbb\xbf<?xml version="1.0" encoding="utf-8"?>\r\n'
+
+# Markup in document order; "name" is set for start tags only, so the Nth match is the Nth element
+_MARKUP = re.compile(rb"<!--.*?-->|<\?.*?\?>|<!\[CDATA\[.*?\]\]>|<![^>]*>"
+                     rb"|<(?P<name>[^\s/!?>]+)(?:[^>\"'/]+|\"[^\"]*\"|'[^']*'|/(?!>))*(?P<empty>/?)>", re.DOTALL)
+_ENCODING = re.compile(rb"^(?:\xef\xbb\xbf)?<\?xml[^>]*encoding=[\"']([A-Za-z0-9._-]+)[\"']")
+_XMLNS = re.compile(rb"\s(xmlns:[^\s=]+)\s*=\s*([\"'])(.*?)\2")
+_SHORT_EMPTY = re.compile(rb"(?<! )/>")
+_ASCII_COMPATIBLE = {"utf-8", "utf8", "ascii", "us-ascii", "iso-8859-1", "latin-1", "windows-1252", "cp1252"}
+
+# --- Backend selection ---
+
+def available_backends():
+    """Backends that can be used in this environment."""
+    return [name for name in BACKENDS if name != "lxml" or _lxml is not None]
+
+def resolve_backend(name=None):
+    """
+    Checks a backend name.
+
+    Args:
+        name (str): "lxml" or "etree"; None means DEFAULT_BACKEND.
+
+    Returns:
+        str: The backend to use.
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS or (name == "lxml" and _lxml is None):
+        raise ValueError(f"XML backend '{name}' is not available (available: {', '.join(available_backends())})")
+    return name
+
+def _default_backend():
+    name = os.environ.get("MCD_XML_BACKEND") or available_backends()[0]
+    if name not in available_backends():
+        # An unavailable MCD_XML_BACKEND must not stop every module that parses MCDs from importing
+        print(f"⚠️ XML backend '{name}' is not available; using etree")
+        return "etree"
+    return name
+
+DEFAULT_BACKEND = _default_backend()
+
+def backend_of(element):
+    """The backend that parsed an element."""
+    return "lxml" if _lxml is not None and isinstance(element, _lxml._Element) else "etree"
+
+def fromstring(data, backend=None):
+    """
+    Parses XML bytes.
+
+    Args:
+        data (bytes): The document.
+        backend (str): "lxml" or "etree"; None means DEFAULT_BACKEND.
+
+    Returns:
+        The root element.
+    """
+    if resolve_backend(backend) == "lxml":
+        return _lxml.fromstring(data, _lxml_parser)
+    return ET.fromstring(data)
+
+def parse(path, backend=None):
+    """Parses an XML file with the given backend (see fromstring), returning the root element."""
+    with open(path, "rb") as f:
+        return fromstring(f.read(), backend)
+
+def _elements(root):
+    """Every element under and including root, in document order (no comments or processing instructions)."""
+    if backend_of(root) == "lxml":
+        return list(root.iter(_lxml.Element))
+    return list(root.iter())
+
+# --- Compiled queries ---
+
+class Query:
+    """
+    An ElementPath query compiled once per backend and run with the backend of the element
+    it is given; the path must use the subset ElementTree and XPath agree on
+    (child/descendant steps, [@attr='value'] predicates).
+
+    Args:
+        path (str): e.g. ".//Axes/Axis".
+    """
+    def __init__(self, path):
+        self.path = path
+        self._compiled = {}
+
+    def _compile(self, backend):
+        compiled = self._compiled.get(backend)
+        if compiled is None:
+            if backend == "lxml":
+                compiled = _lxml.XPath(self.path)
+            else:
+                # ElementTree compiles a path on first use and caches the selector by path
+                compiled = operator.methodcaller("findall", self.path)
+            # Compiling twice from two threads is harmless; the last one stored wins
+            self._compiled[backend] = compiled
+        return compiled
+
+    def __call__(self, element):
+        """Returns every match under element."""
+        return self._compile(backend_of(element))(element)
+
+    def first(self, element):
+        """Returns the first match under element, or None."""
+        matches = self(element)
+        return matches[0] if matches else None
+
+AXES = Query(".//Axes/Axis")
+AXIS_PARAMETERS = Query("P")
+MECHANICAL_AXES = Query(".//MachineSetupConfiguration/MechanicalProducts/MechanicalProduct/MechanicalAxes/MechanicalAxis")
+LINEAR_STAGE = Query("./Stage/LinearStageComponent")
+ROTARY_STAGE = Query("./Stage/RotaryStageComponent")
+CONTROLLER_NAME = Query(".//ControllerName")
+
+# --- Format-preserving documents ---
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def tostring(root, prolog=NET_PROLOG, newline=b"\r\n", encoding="utf-8"):
+    """
+    Serialises an element from either backend the way the .NET writers lay out a member.
+
+    Args:
+        root: Element to serialise.
+        prolog (bytes): Written before the element (BOM and declaration).
+        newline (bytes): Line ending for the element's text and tails.
+        encoding (str): Output encoding.
+
+    Returns:
+        bytes: The serialised document.
+    """
+    if backend_of(root) == "lxml":
+        body = _lxml.tostring(root, encoding=encoding, xml_declaration=False, with_tail=False)
+        # "/>" only ends an empty element: lxml escapes ">" in text and attribute values
+        body = _SHORT_EMPTY.sub(b" />", body)
+    else:
+        body = ET.tostring(root, encoding="unicode").encode(encoding, "xmlcharrefreplace")
+    if newline != b"\n":
+        body = body.replace(b"\r\n", b"\n").replace(b"\n", newline)
+    return prolog + body
+
+class XmlDocument:
+    """
+    An XML member parsed for editing. Edit self.root with the ElementTree API, then call serialize().
+
+    Args:
+        data (bytes): The member as stored in the MCD.
+        backend (str): "lxml" or "etree"; None means DEFAULT_BACKEND.
+    """
+    def __init__(self, data, backend=None):
+        self.data = data
+        self.backend = resolve_backend(backend)
+        self.root = fromstring(data, self.backend)
+        self._elements = _elements(self.root)
+        self._original = [(element.text, element.tail, dict(element.attrib)) for element in self._elements]
+        match = _ENCODING.match(data)
+        self.encoding = match.group(1).decode("ascii").lower() if match else "utf-8"
+        self.newline = b"\r\n" if b"\r\n" in data else b"\n"
+
+    def text_edits(self):
+        """
+        Returns [(document index, element)] for elements whose text changed, or None when the
+        structure, attributes or tails changed (which needs a full re-serialisation).
+        """
+        elements = _elements(self.root)
+        if len(elements) != len(self._elements):
+            return None
+        edits = []
+        for index, (element, original, (text, tail, attrib)) in enumerate(zip(elements, self._elements,
+                                                                              self._original)):
+            if element is not original or element.tail != tail or dict(element.attrib) != attrib:
+                return None
+            if element.text != text:
+                edits.append((index, element))
+        return edits
+
+    def serialize(self):
+        """Returns the document as bytes, identical to the original except for the edits."""
+        edits = self.text_edits()
+        if edits is not None:
+            if not edits:
+                return self.data
+            spliced = self._splice(edits)
+            if spliced is not None:
+                return spliced
+        return self._rewrite()
+
+    def _splice(self, edits):
+        """Replaces the changed element text in the original bytes; None if the markup can't be matched."""
+        if self.encoding not in _ASCII_COMPATIBLE:
+            return None
+        starts = [match for match in _MARKUP.finditer(self.data) if match.group("name")]
+        if len(starts) != len(self._elements):
+            return None
+        pieces = []
+        position = 0
+        for index, element in edits:
+            match = starts[index]
+            name = match.group("name")
+            text = _escape(element.text or "").encode(self.encoding, "xmlcharrefreplace")
+            if match.group("empty"):
+                # <Name /> becomes <Name>text</Name>
+                pieces += [self.data[position:match.start()],
+                           self.data[match.start():match.end() - 2].rstrip(), b">", text, b"</", name, b">"]
+                position = match.end()
+                continue
+            if len(element):
+                end = self.data.find(b"<", match.end())
+            else:
+                closing = re.compile(b"</" + re.escape(name) + rb"\s*>").search(self.data, match.end())
+                end = closing.start() if closing else -1
+            if end < 0:
+                return None
+            pieces += [self.data[position:match.end()], text]
+            position = end
+        pieces.append(self.data[position:])
+        return b"".join(pieces)
+
+    def _rewrite(self):
+        """Serialises the root after the original prolog (BOM, declaration), in the original line endings."""
+        first = next((match for match in _MARKUP.finditer(self.data) if match.group("name")), None)
+        prolog = self.data[:first.start()] if first else b""
+        epilog = self.data[len(self.data.rstrip()):]
+        restored = self._restore_namespaces() if self.backend == "etree" else []
+        try:
+            return tostring(self.root, prolog, self.newline, self.encoding) + epilog
+        finally:
+            for element, attrib in restored:
+                element.attrib = attrib
+
+    def _restore_namespaces(self):
+        """
+        Puts the prefixed xmlns declarations of the original start tags back on the ElementTree
+        elements (its parser drops them, lxml keeps them), ahead of their attributes as lxml writes them.
+
+        Returns:
+            list: (element, attributes before) to undo it.
+        """
+        starts = [match for match in _MARKUP.finditer(self.data) if match.group("name")]
+        if len(starts) != len(self._elements):
+            return []
+        restored = []
+        for element, match in zip(self._elements, starts):
+            declarations = {name.decode(self.encoding): value.decode(self.encoding)
+                            for name, _, value in _XMLNS.findall(match.group())}
+            if declarations:
+                restored.append((element, element.attrib))
+                element.attrib = {**declarations, **element.attrib}
+        return restored
+
+# --- Check and benchmark ---
+
+def xml_members(mcd_path):
+    """Yields (member name, bytes) for every XML member of an MCD."""
+    with zipfile.ZipFile(mcd_path) as archive:
+        for info in archive.infolist():
+            data = archive.read(info)
+            if data.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+                yield info.filename, data
+
+def _shape(root):
+    return [element.tag for element in _elements(root)]
+
+def check(mcd_path, backend=None):
+    """
+    Round-trips every XML member of an MCD: unchanged, with every leaf value edited, with the
+    values restored, and through the full re-serialisation fallback.
+
+    Args:
+        mcd_path (str): MCD to check.
+        backend (str): "lxml" or "etree"; None means DEFAULT_BACKEND.
+
+    Returns:
+        list: (member, problem) for each member that did not round-trip.
+    """
+    problems = []
+    for name, data in xml_members(mcd_path):
+        document = XmlDocument(data, backend)
+        if document.serialize() != data:
+            problems.append((name, "unchanged document is not byte-identical"))
+            continue
+        leaves = [element for element in _elements(document.root) if not len(element)]
+        originals = [leaf.text for leaf in leaves]
+        for leaf in leaves:
+            leaf.text = (leaf.text or "") + "<~&>"
+        edited = fromstring(document.serialize(), document.backend)
+        if _shape(edited) != _shape(document.root) or \
+                [leaf.text for leaf in _elements(edited) if not len(leaf)] != [leaf.text for leaf in leaves]:
+            problems.append((name, "edited values did not read back"))
+        for leaf, text in zip(leaves, originals):
+            leaf.text = text
+        if document.serialize() != data:
+            problems.append((name, "restored document is not byte-identical"))
+        rewritten = document._rewrite()
+        if not rewritten.startswith(data[:data.find(b">") + 1]) or _shape(fromstring(rewritten, document.backend)) != _shape(document.root):
+            problems.append((name, "re-serialisation lost the prolog or elements"))
+    return problems
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def _set_payloads(document):
+    for axis in MECHANICAL_AXES(document.root):
+        stage = LINEAR_STAGE.first(axis)
+        if stage is None:
+            stage = ROTARY_STAGE.first(axis)
+        if stage is not None:
+            for field in ("LoadMass", "LoadInertia"):
+                element = stage.find(field)
+                if element is not None:
+                    element.text = "1.5"
+    return document.serialize()
+
+def _set_payloads_elementtree(data):
+    # The pre-MCDXml path: plain ElementTree, uncompiled paths, tree.write-style output
+    tree = ET.ElementTree(ET.fromstring(data))
+    for axis in tree.getroot().findall(MECHANICAL_AXES.path):
+        stage = axis.find(LINEAR_STAGE.path)
+        if stage is None:
+            stage = axis.find(ROTARY_STAGE.path)
+        if stage is not None:
+            for field in ("LoadMass", "LoadInertia"):
+                element = stage.find(field)
+                if element is not None:
+                    element.text = "1.5"
+    buffer = io.BytesIO()
+    tree.write(buffer, encoding="utf-8", xml_declaration=True)
+    return buffer.getvalue()
+
+def _read_parameters(root):
+    return sum(len(AXIS_PARAMETERS(axis)) for axis in AXES(root))
+
+def benchmark(mcd_paths, repeat=20):
+    """
+    Times parsing every XML member, the Parameters queries and a payload edit + serialise of
+    MachineSetupData, for the original ElementTree code path and each available backend.
+
+    Returns:
+        list: {"file", "path", "parse_ms", "query_ms", "edit_ms", "identical"} per file and code path,
+            where identical tells whether an unchanged round trip reproduced the member bytes.
+    """
+    results = []
+    for mcd_path in mcd_paths:
+        members = dict(xml_members(mcd_path))
+        parameters = members.get("config/Parameters")
+        setup = members.get("config/MachineSetupData")
+        for path in ["ElementTree (before)"] + available_backends():
+            if path == "ElementTree (before)":
+                backend = "etree"
+                parse_all = lambda: [ET.fromstring(data) for data in members.values()]
+                query = lambda root: sum(len(axis.findall("P")) for axis in root.findall(".//Axes/Axis"))
+                edit = (lambda: _set_payloads_elementtree(setup)) if setup else None
+                identical = all(_set_payloads_elementtree(data) == data for data in members.values()
+                                if b"MechanicalAxis" not in data)
+            else:
+                backend = path
+                parse_all = lambda: [fromstring(data, backend) for data in members.values()]
+                query = _read_parameters
+                edit = (lambda: _set_payloads(XmlDocument(setup, backend))) if setup else None
+                identical = all(XmlDocument(data, backend).serialize() == data for data in members.values())
+            root = fromstring(parameters, backend) if parameters else None
+            results.append({
+                "file": os.path.basename(mcd_path), "path": path,
+                "parse_ms": _time(parse_all, repeat) * 1000,
+                "query_ms": _time(lambda: query(root), repeat) * 1000 if root is not None else None,
+                "edit_ms": _time(edit, repeat) * 1000 if edit else None,
+                "identical": identical,
+            })
+    return results
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Check or benchmark MCD XML parsing and format-preserving output.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check_parser = commands.add_parser("check", help="Verify every XML member round-trips byte for byte")
+    check_parser.add_argument("mcds", nargs="+")
+    check_parser.add_argument("--backend", choices=BACKENDS, help="Parser backend (default: %(default)s)",
+                              default=DEFAULT_BACKEND)
+    bench = commands.add_parser("benchmark", help="Compare the ElementTree code path with the MCDXml backends")
+    bench.add_argument("mcds", nargs="*", help="MCDs to benchmark (default: the sample MCDs)")
+    bench.add_argument("--axes", type=int, default=32, help="Also benchmark a synthetic MCD with this many axes (0: none)")
+    bench.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        failed = 0
+        for mcd_path in args.mcds:
+            problems = check(mcd_path, args.backend)
+            failed += bool(problems)
+            print(f"{'❌' if problems else '✅'} {os.path.basename(mcd_path)}")
+            for member, problem in problems:
+                print(f"   {member}: {problem}")
+        return 1 if failed else 0
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    mcd_paths = args.mcds or [os.path.join(base_dir, name) for name in
+                              ("PRO165LM XY-No Load.mcd", "PRO165LM.mcd", "Uncalculated_PRO165.mcd")]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.axes:
+            mcd_paths.append(generate_mcd(os.path.join(temp_dir, f"Synthetic {args.axes}-Axis.mcd"), axes=args.axes,
+                                          rotary_every=4))
+        results = benchmark(mcd_paths, args.repeat)
+
+    print(f"Default backend: {DEFAULT_BACKEND}\n")
+    print(f"{'File':<28}{'Code path':<22}{'Parse (ms)':>11}{'Query (ms)':>11}{'Edit (ms)':>11}  Byte-identical")
+    for result in results:
+        cells = [f"{result[key]:>11.3f}" if result[key] is not None else f"{'-':>11}"
+                 for key in ("parse_ms", "query_ms", "edit_ms")]
+        print(f"{result['file'][:27]:<28}{result['path']:<22}{''.join(cells)}  {'yes' if result['identical'] else 'no'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@ sys.dont_write_bytecode = True
 #sys.path.append(r"K:\10. Released Software\Shared Python Programs\production-2.1")
 sys.path.append(r"C:\Users\tbates\Python\shared-python-programs\Generate MCD")
 from GenerateMCD import AerotechController
+import MCDJsonReader
+from SpecConversionCache import SpecConversionCache, generatemcd_converter, print_stats
 
 # --- Configuration ---
 # These paths are derived from the required directory structure.
@@ -48,7 +50,7 @@ def run_workflow_1(controller):
     print(f"\n✅ Success! Calculated MCD file saved to: {output_path}")
     return output_path
 
-def run_workflow_2(controller):
+def run_workflow_2(controller, spec_cache):
     """WF2: Creates a new, non-calculated MCD file from a predefined dictionary."""
     print("\n--- Running Workflow 2: JSON Specs -> Non-Calculated MCD ---")
     stage_type = 'PRO165'
@@ -61,12 +63,13 @@ def run_workflow_2(controller):
     print(f"Using example Stage: {stage_type} ({axis}-axis)")
     print(f"With specs: {specs_dict}")
 
-    _, output_path, _ = controller.convert_to_mcd(
-        specs_dict=specs_dict, 
-        stage_type=stage_type, 
-        axis=axis, 
-        workflow='wf2'
+    # Repeated stage/axis/option combinations are served from the spec conversion cache
+    output_path, warnings = spec_cache.convert_to_file(
+        stage_type, axis, specs_dict, controller.example_mcd_path
     )
+    for warning in warnings:
+        print(f"  Warning: {warning}")
+    print_stats(spec_cache.stats())
 
     print(f"\n✅ Success! Non-calculated MCD file saved to: {output_path}")
     return output_path
@@ -81,7 +84,8 @@ def run_workflow_3(controller, created_mcd_path):
     print(f"Using the MCD file generated previously: {created_mcd_path}")
     output_json_path = os.path.join(BASE_DIR, f"{os.path.basename(created_mcd_path).split('.')[0]}_converted.json")
     
-    controller.convert_to_json(created_mcd_path, output_json_path)
+    # Pure-Python conversion; no .NET round trip needed for a read-only export
+    MCDJsonReader.convert_to_json(created_mcd_path, output_json_path)
     print(f"\n✅ Success! MCD converted to JSON at: {output_json_path}")
 
 def run_workflow_4(controller):
@@ -127,6 +131,7 @@ if __name__ == "__main__":
 
     # Variable to store the path of a newly created MCD for WF3
     last_created_mcd = None
+    spec_cache = SpecConversionCache(converter=generatemcd_converter(controller))
 
     while True:
         choice = main_menu()
@@ -134,13 +139,14 @@ if __name__ == "__main__":
             if choice == '1':
                 last_created_mcd = run_workflow_1(controller)
             elif choice == '2':
-                last_created_mcd = run_workflow_2(controller)
+                last_created_mcd = run_workflow_2(controller, spec_cache)
             elif choice == '3':
                 run_workflow_3(controller, last_created_mcd)
             elif choice == '4':
                 run_workflow_4(controller)
             elif choice == '5':
                 print("Exiting demo.")
+                spec_cache.close()
                 break
             else:
                 print("Invalid option. Please try again.")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parameter Sync - Uploads only the changed parameters of a calculated MCD to a live controller
+Description: Reads the controller's current axis parameters over an existing
+a1.Controller connection, diffs them against config/Parameters of a calculated
+MCD by parameter id and writes only the values that differ, then reads them back
+to verify. Where the controller API offers batched parameter calls
+(runtime.parameters.get_axis_parameter_values / set_axis_parameter_values) reads
+and writes are grouped into as few calls as the batch limit allows; otherwise
+each parameter is accessed individually through runtime.parameters.axes.
+
+Only ControllerSimulator implements the batched calls. Real controllers, through
+the automation1 API, always take the per-parameter path, where each parameter is
+looked up under the category parameter_category() guesses and, failing that,
+under the other categories.
+
+The report compares the round trips and bytes used against a per-parameter read
+and write of the whole file.
+
+Usage:
+    python ParameterSync.py "PRO165LM XY Loaded.mcd" --dry-run
+    python ParameterSync.py "PRO165LM XY Loaded.mcd" --simulate-from "PRO165LM XY-No Load.mcd"
+"""
+
+import os
+import sys
+import math
+import argparse
+
+import MCDXml
+from MCDArchive import MCDArchive
+from ControllerConnection import connect, parameter_category, PARAMETER_CATEGORIES
+
+PARAMETERS_MEMBER = "config/Parameters"
+DEFAULT_BATCH_SIZE = 128
+# Parameters that identify the axis rather than configure it
+SKIPPED_PARAMETERS = {"AxisName"}
+
+# --- MCD parameters ---
+
+def read_mcd_parameters(mcd_path):
+    """
+    Reads config/Parameters of an MCD.
+
+    Returns:
+        tuple: ({axis index: {parameter id: (name, text)}}, size of the Parameters member in bytes)
+    """
+    data = MCDArchive.open(mcd_path).read(PARAMETERS_MEMBER)
+    root = MCDXml.fromstring(data)
+    parameters = {}
+    for axis in MCDXml.AXES(root):
+        axis_parameters = {}
+        for p in MCDXml.AXIS_PARAMETERS(axis):
+            if p.get("id") is not None and p.get("n"):
+                axis_parameters[int(p.get("id"))] = (p.get("n"), p.text or "")
+        parameters[int(axis.get("Index"))] = axis_parameters
+    return parameters, len(data)
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def values_equal(current, target, rel_tol=1e-9, abs_tol=1e-12):
+    """Compares a controller value with MCD text, numerically where both sides are numbers."""
+    current_number, target_number = _number(current), _number(target)
+    if current_number is not None and target_number is not None:
+        return math.isclose(current_number, target_number, rel_tol=rel_tol, abs_tol=abs_tol)
+    return str(current).strip() == str(target).strip()
+
+def _coerce(text):
+    """MCD text -> the value written to the controller."""
+    number = _number(text)
+    return text if number is None else number
+
+def _payload_size(name, value):
+    return len(f"{name}={value}")
+
+class ParameterChange:
+    """A parameter whose controller value differs from the MCD."""
+    def __init__(self, axis, parameter_id, name, current, target):
+        self.axis = axis
+        self.parameter_id = parameter_id
+        self.name = name
+        self.current = current
+        self.target = target
+
+    def __repr__(self):
+        return f"ParameterChange(axis={self.axis}, id={self.parameter_id}, {self.name}: {self.current!r} -> {self.target!r})"
+
+# --- Sync ---
+
+class ParameterSync:
+    """
+    Diff-based parameter upload to a connected controller.
+
+    Args:
+        controller: A started a1.Controller (or ControllerSimulator.Controller). Batched calls are
+            only used when the API has them, which today means the simulator; automation1
+            controllers are read and written one parameter at a time.
+        batch_size (int): Most parameters per batched call; the simulator's limit is used when it is smaller.
+    """
+
+    def __init__(self, controller, batch_size=DEFAULT_BATCH_SIZE):
+        self.controller = controller
+        self.parameters = controller.runtime.parameters
+        self.batched = (hasattr(self.parameters, "get_axis_parameter_values")
+                        and hasattr(self.parameters, "set_axis_parameter_values"))
+        config = getattr(controller, "config", None)
+        self.batch_size = min(batch_size, getattr(config, "max_batch_size", batch_size))
+        self.round_trips = 0
+        self.bytes_sent = 0
+        # Parameter name -> category it was found under, where that differs from the guess
+        self._categories = {}
+
+    def _chunks(self, items):
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _parameter(self, axis, name):
+        """
+        Returns the API object of an axis parameter (per-parameter path).
+
+        Looks under the category parameter_category() guesses first, then under the others.
+        Raises AttributeError if the parameter is in no category, and ValueError if the guessed
+        category itself does not exist, since the category table no longer matches the API.
+        """
+        axis_parameters = self.parameters.axes[axis]
+        guessed = self._categories.get(name) or parameter_category(name)
+        guessed_exists = False
+        for category_name in [guessed] + [c for c in PARAMETER_CATEGORIES if c != guessed]:
+            try:
+                category = getattr(axis_parameters, category_name)
+            except AttributeError:
+                continue
+            guessed_exists = guessed_exists or category_name == guessed
+            try:
+                parameter = getattr(category, name.lower())
+            except AttributeError:
+                continue
+            if category_name != guessed:
+                self._categories[name] = category_name
+            return parameter
+        if not guessed_exists:
+            raise ValueError(f"The controller has no parameter category '{guessed}' (looked up for {name}); "
+                             "update parameter_category in ControllerConnection")
+        raise AttributeError(f"Axis {axis} has no parameter '{name}'")
+
+    def read(self, requests):
+        """
+        Reads controller values.
+
+        Args:
+            requests (list): (axis index, parameter name) pairs.
+
+        Returns:
+            list: Values in request order (None where the controller has no such parameter).
+
+        Raises:
+            ValueError: On the per-parameter path, when a parameter's category does not exist.
+        """
+        values = []
+        if self.batched:
+            for chunk in self._chunks(requests):
+                self.round_trips += 1
+                self.bytes_sent += sum(len(name) + 2 for _, name in chunk)
+                values.extend(self.parameters.get_axis_parameter_values(chunk))
+            return values
+        for axis, name in requests:
+            self.round_trips += 1
+            self.bytes_sent += len(name) + 2
+            try:
+                values.append(self._parameter(axis, name).value)
+            except (AttributeError, KeyError):
+                values.append(None)
+        return values
+
+    def write(self, changes):
+        """Writes the target values of changes."""
+        items = [(change.axis, change.name, _coerce(change.target)) for change in changes]
+        if self.batched:
+            for chunk in self._chunks(items):
+                self.round_trips += 1
+                self.bytes_sent += sum(_payload_size(name, value) + 2 for _, name, value in chunk)
+                self.parameters.set_axis_parameter_values(chunk)
+            return
+        for axis, name, value in items:
+            self.round_trips += 1
+            self.bytes_sent += _payload_size(name, value)
+            self._parameter(axis, name).value = value
+
+    def plan(self, mcd_parameters):
+        """
+        Diffs the controller against MCD parameters.
+
+        Args:
+            mcd_parameters (dict): {axis index: {parameter id: (name, text)}} from read_mcd_parameters.
+
+        Returns:
+            tuple: (list of ParameterChange, number of parameters compared, list of (axis, name) missing on the controller)
+        """
+        axis_count = self.parameters.axes.count
+        self.round_trips += 1
+        entries = [(axis, parameter_id, name, text)
+                   for axis, axis_parameters in sorted(mcd_parameters.items()) if axis < axis_count
+                   for parameter_id, (name, text) in sorted(axis_parameters.items())
+                   if name not in SKIPPED_PARAMETERS]
+        current = self.read_known([(axis, name) for axis, _, name, _ in entries])
+
+        changes, missing = [], []
+        for (axis, parameter_id, name, text), value in zip(entries, current):
+            if value is None:
+                missing.append((axis, name))
+            elif not values_equal(value, text):
+                changes.append(ParameterChange(axis, parameter_id, name, value, text))
+        return changes, len(entries), missing
+
+    def read_known(self, requests):
+        """
+        Reads like read(), with None for names the controller does not know. A batched call fails
+        as a whole on an unknown name, so only a failing chunk is retried, split in halves until the
+        unknown names are isolated (about 2 log2(batch size) extra round trips per unknown name).
+        """
+        if not self.batched:
+            return self.read(requests)
+        values = []
+        for chunk in self._chunks(requests):
+            values.extend(self._read_chunk(chunk))
+        return values
+
+    def _read_chunk(self, chunk):
+        try:
+            return self.read(chunk)
+        except KeyError:
+            if len(chunk) == 1:
+                return [None]
+            middle = len(chunk) // 2
+            return self._read_chunk(chunk[:middle]) + self._read_chunk(chunk[middle:])
+
+    def verify(self, changes):
+        """Reads the changed parameters back. Returns the changes that did not take."""
+        current = self.read([(change.axis, change.name) for change in changes])
+        return [change for change, value in zip(changes, current) if not values_equal(value, change.target)]
+
+    def sync(self, mcd_path, dry_run=False, verify=True):
+        """
+        Uploads the parameters of mcd_path that differ on the controller.
+
+        Returns:
+            dict: changes, failed, missing, compared, round trips and bytes used, and the
+            per-parameter baseline (read and write every parameter individually).
+        """
+        self.round_trips = 0
+        self.bytes_sent = 0
+        mcd_parameters, member_size = read_mcd_parameters(mcd_path)
+
+        changes, compared, missing = self.plan(mcd_parameters)
+        failed = []
+        if changes and not dry_run:
+            self.write(changes)
+            if verify:
+                failed = self.verify(changes)
+
+        all_parameters = [(name, text) for axis_parameters in mcd_parameters.values()
+                          for name, text in axis_parameters.values() if name not in SKIPPED_PARAMETERS]
+        # Baseline: read every parameter, write every parameter, read every parameter back
+        baseline_round_trips = 1 + compared * (3 if verify else 2)
+        return {
+            "changes": changes,
+            "failed": failed,
+            "missing": missing,
+            "compared": compared,
+            "dry_run": dry_run,
+            "batched": self.batched,
+            "round_trips": self.round_trips,
+            "baseline_round_trips": baseline_round_trips,
+            "bytes_written": sum(_payload_size(c.name, _coerce(c.target)) for c in changes) if not dry_run else 0,
+            "baseline_bytes_written": sum(_payload_size(name, _coerce(text)) for name, text in all_parameters),
+            "bytes_sent": self.bytes_sent,
+            "parameters_member_bytes": member_size,
+        }
+
+def print_report(report):
+    """Prints a sync report."""
+    mode = "batched" if report["batched"] else "per-parameter"
+    print(f"📊 Compared {report['compared']} parameters ({mode} calls)")
+    for change in report["changes"]:
+        print(f"   🔧 Axis {change.axis} {change.name} (id {change.parameter_id}): {change.current} -> {change.target}")
+    for axis, name in report["missing"]:
+        print(f"   ⚠️ Axis {axis} has no parameter {name} on the controller")
+    if report["dry_run"]:
+        print(f"👀 Dry run: {len(report['changes'])} parameters would be written")
+    elif report["failed"]:
+        print(f"❌ {len(report['failed'])} of {len(report['changes'])} parameters did not verify:")
+        for change in report["failed"]:
+            print(f"   {change.name} on axis {change.axis}")
+    else:
+        print(f"✅ Wrote and verified {len(report['changes'])} parameters")
+    saved = report["baseline_round_trips"] - report["round_trips"]
+    print(f"⏱️ Round trips: {report['round_trips']} (per-parameter upload: {report['baseline_round_trips']}, saved {saved})")
+    print(f"💾 Bytes written: {report['bytes_written']} (all parameters: {report['baseline_bytes_written']}, "
+          f"Parameters file: {report['parameters_member_bytes']}), total request bytes {report['bytes_sent']}")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Upload only the changed parameters of a calculated MCD to a controller.")
+    parser.add_argument("mcd", help="Calculated MCD to upload")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the parameters that differ")
+    parser.add_argument("--no-verify", action="store_true", help="Do not read the written values back")
+    parser.add_argument("--connection", choices=("auto", "usb", "hyperwire"), default="auto")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--simulate-from", metavar="MCD",
+                        help="Use the controller simulator, loaded with the parameters of this MCD")
+    args = parser.parse_args()
+
+    if args.simulate_from or os.environ.get("MCD_CONTROLLER_SIMULATOR"):
+        import ControllerSimulator as a1
+        if args.simulate_from:
+            a1.configure(config=a1.SimulatorConfig.from_mcd(args.simulate_from))
+    else:
+        import automation1 as a1
+
+    try:
+        controller = connect(a1, args.connection)
+    except Exception as e:
+        print(f"❌ Could not connect to the controller: {e}")
+        return 1
+
+    sync = ParameterSync(controller, batch_size=args.batch_size)
+    try:
+        report = sync.sync(args.mcd, dry_run=args.dry_run, verify=not args.no_verify)
+    except Exception as e:
+        print(f"❌ Parameter sync failed: {e}")
+        return 1
+    print_report(report)
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
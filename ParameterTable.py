@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parameter Table - Columnar axis parameters and a vectorised diff
+Description: Holds the axis parameters of an MCD (config/Parameters) or of a
+live controller snapshot as parallel numpy columns (axis, id, name, text,
+numeric value) so two sets can be compared in one vectorised pass with numeric
+tolerances instead of a per-parameter Python loop. diff() returns rows in the
+format of MCDComparison.build_comparison_data, so the results can be shown in
+ComparisonDialog.
+"""
+
+import MCDXml
+
+import numpy as np
+
+from MCDArchive import MCDArchive
+
+PARAMETERS_MEMBER = "config/Parameters"
+# Parameters that identify the axis rather than configure it (also skipped by MCDComparison)
+SKIPPED_PARAMETERS = ("AxisName",)
+
+def _to_float(values):
+    """Object array -> float64 array, NaN where a value is not a number."""
+    numeric = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            numeric[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return numeric
+
+class ParameterTable:
+    """
+    Axis parameters as columns, one row per (axis, parameter id).
+
+    Args:
+        axis (array): Axis indices.
+        ids (array): Parameter ids.
+        names (array): Parameter names.
+        text (array): Values as strings (None where the source has no value).
+    """
+
+    def __init__(self, axis, ids, names, text):
+        self.axis = np.asarray(axis, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = np.asarray(names, dtype=object)
+        self.text = np.asarray(text, dtype=object)
+        self.numeric = _to_float(self.text)
+        self.keys = (self.axis << 32) | self.ids
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_parameters_xml(cls, data):
+        """Builds a table from config/Parameters bytes."""
+        axis, ids, names, text = [], [], [], []
+        for axis_element in MCDXml.AXES(MCDXml.fromstring(data)):
+            index = int(axis_element.get("Index"))
+            for p in MCDXml.AXIS_PARAMETERS(axis_element):
+                name = p.get("n")
+                if p.get("id") is None or not name or name in SKIPPED_PARAMETERS:
+                    continue
+                axis.append(index)
+                ids.append(int(p.get("id")))
+                names.append(name)
+                text.append(p.text or "")
+        return cls(axis, ids, names, text)
+
+    @classmethod
+    def from_mcd(cls, mcd_path):
+        """Builds a table from the config/Parameters member of an MCD file."""
+        return cls.from_parameters_xml(MCDArchive.open(mcd_path).read(PARAMETERS_MEMBER))
+
+    def with_values(self, values):
+        """Returns a table with the same rows and new values (e.g. a controller snapshot)."""
+        text = [None if value is None else str(value) for value in values]
+        return ParameterTable(self.axis, self.ids, self.names, text)
+
+    def select_axes(self, axes):
+        """Returns the rows of the given axis indices."""
+        mask = np.isin(self.axis, list(axes))
+        return ParameterTable(self.axis[mask], self.ids[mask], self.names[mask], self.text[mask])
+
+def compare(table1, table2, rel_tol=1e-9, abs_tol=1e-12):
+    """
+    Compares two parameter tables by (axis, parameter id) in one vectorised pass.
+
+    Values that are numbers on both sides match within rel_tol/abs_tol; other values
+    match when their text is equal.
+
+    Returns:
+        tuple: (rows of table1 present in both, matching rows of table2, status array for those rows,
+        rows only in table1, rows only in table2)
+    """
+    _, i1, i2 = np.intersect1d(table1.keys, table2.keys, assume_unique=True, return_indices=True)
+
+    text1, text2 = table1.text[i1], table2.text[i2]
+    n1, n2 = table1.numeric[i1], table2.numeric[i2]
+    both_numeric = ~np.isnan(n1) & ~np.isnan(n2)
+    match = np.where(both_numeric, np.isclose(n1, n2, rtol=rel_tol, atol=abs_tol), text1 == text2)
+
+    status = np.where(match, "Match", "Different").astype(object)
+    status[np.equal(text2, None)] = "File 1 Only"
+    status[np.equal(text1, None)] = "File 2 Only"
+
+    only1 = np.setdiff1d(np.arange(len(table1)), i1, assume_unique=True)
+    only2 = np.setdiff1d(np.arange(len(table2)), i2, assume_unique=True)
+    return i1, i2, status, only1, only2
+
+def _value(value):
+    return "N/A" if value is None else value
+
+def diff(table1, table2, rel_tol=1e-9, abs_tol=1e-12, include_matches=True):
+    """
+    Compares two parameter tables and returns rows for ComparisonDialog.
+
+    Returns:
+        list: dicts with axis, name, value1, value2 and status ("Match", "Different",
+        "File 1 Only" or "File 2 Only"), sorted by axis and name.
+    """
+    i1, i2, status, only1, only2 = compare(table1, table2, rel_tol, abs_tol)
+    if not include_matches:
+        keep = status != "Match"
+        i1, i2, status = i1[keep], i2[keep], status[keep]
+
+    rows = []
+    for a, n, v1, v2, s in zip(table1.axis[i1].tolist(), table1.names[i1], table1.text[i1], table2.text[i2], status):
+        rows.append((a, n, _value(v1), _value(v2), s))
+    for a, n, v in zip(table1.axis[only1].tolist(), table1.names[only1], table1.text[only1]):
+        rows.append((a, n, _value(v), "N/A", "File 1 Only"))
+    for a, n, v in zip(table2.axis[only2].tolist(), table2.names[only2], table2.text[only2]):
+        rows.append((a, n, "N/A", _value(v), "File 2 Only"))
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return [{"axis": f"Axis {a}", "name": n, "value1": v1, "value2": v2, "status": s} for a, n, v1, v2, s in rows]
+
+def summarize(status):
+    """Counts comparison statuses (an array from compare() or a list of diff() rows)."""
+    counts = {}
+    for value in status:
+        key = value["status"] if isinstance(value, dict) else value
+        counts[key] = counts.get(key, 0) + 1
+    return counts
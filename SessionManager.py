@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Session Manager - Concurrent multi-controller commissioning for a test cell
+Description: MCDPayloadUI handles one controller at a time. A SessionManager
+holds one ControllerSession per controller in the cell, each with its own
+connection, discovered axes, MCD, payloads, output folder and log, and runs
+their connect and payload/calculation jobs in parallel on a thread pool, so a
+cell of N controllers is commissioned in one pass. Output printed by a job goes
+to its own session log (see SessionOutput), and a failure in one session never
+stops the others. SessionDashboard shows every session in one window.
+
+Connections, payload edits and cache lookups overlap, but the GenerateMCD
+calculations do not: MCDProcessing serialises every .NET call behind one
+process-wide lock, since the converter is not thread-safe. With N sessions the
+calculations therefore take N times one calculation.
+
+A cell file lists the controllers:
+    {"controllers": [
+        {"name": "Cell A", "host": "192.168.1.16", "mcd": "A No Load.mcd", "payloads": {"X": 1.5, "Y": 0.8}},
+        {"name": "Cell B", "host": "192.168.1.17", "mcd": "B No Load.mcd"}
+    ]}
+Payloads default to the MCD's sidecar (see MCDWatchFolder).
+
+Usage:
+    python SessionManager.py cell.json [--output DIR] [--workers N]
+    python SessionManager.py cell.json --headless
+    python SessionManager.py cell.json --simulate --headless
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ControllerConnection import establish_connection
+
+IDLE = "idle"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Lines kept per session log
+LOG_LINES = 2000
+# Default bound on concurrent session jobs; threads start only as jobs need them
+MAX_WORKERS = 8
+
+class SessionOutput:
+    """
+    sys.stdout replacement that sends text printed on a session's worker thread to
+    that session's log, and everything else to the stream it replaced.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def bind(self, log):
+        """Routes the current thread's output to log (None to stop)."""
+        self._local.log = log
+
+    def write(self, text):
+        log = getattr(self._local, "log", None)
+        if log is None:
+            return self.stream.write(text)
+        log.write(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, "log", None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+_output = None
+_output_lock = threading.Lock()
+
+def session_output():
+    """Installs (once) and returns the SessionOutput wrapping sys.stdout."""
+    global _output
+    with _output_lock:
+        if _output is None or sys.stdout is not _output:
+            _output = SessionOutput(sys.stdout)
+            sys.stdout = _output
+        return _output
+
+class SessionLog:
+    """Thread-safe, bounded log of one session's output."""
+    def __init__(self, max_lines=LOG_LINES):
+        self.max_lines = max_lines
+        self.lines = []
+        self._partial = ""
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            parts = (self._partial + text).split("\n")
+            self._partial = parts.pop()
+            self.lines.extend(parts)
+            del self.lines[:-self.max_lines]
+
+    def text(self):
+        with self._lock:
+            return "\n".join(self.lines + ([self._partial] if self._partial else []))
+
+class ControllerSession:
+    """
+    One controller of the cell and its job.
+
+    Args:
+        name (str): Session name (also the name of its output folder).
+        host (str): Controller address; None for the local/USB controller.
+        mcd_path (str): The controller's "No Load" MCD.
+        payloads (dict): Axis name -> payload; defaults to the MCD's sidecar when it has one.
+        connection_type (str): "auto", "usb" or "hyperwire".
+    """
+
+    def __init__(self, name, host=None, mcd_path=None, payloads=None, connection_type="hyperwire"):
+        self.name = name
+        self.host = host
+        self.mcd_path = mcd_path
+        self.payloads = dict(payloads) if payloads else None
+        self.connection_type = connection_type
+        self.controller = None
+        self.axes = []
+        self.status = IDLE
+        self.error = None
+        self.result = None
+        self.elapsed_s = None
+        self.log = SessionLog()
+        self._lock = threading.Lock()
+
+    def _set(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+
+    def snapshot(self):
+        """Returns the session's state as a dict (safe to call from the UI thread)."""
+        with self._lock:
+            violations = (self.result or {}).get("violations", [])
+            return {"name": self.name, "host": self.host or "local", "axes": list(self.axes),
+                    "mcd": os.path.basename(self.mcd_path) if self.mcd_path else None,
+                    "payloads": dict(self.payloads or {}), "status": self.status, "error": self.error,
+                    "elapsed_s": self.elapsed_s,
+                    "calculated_mcd": (self.result or {}).get("calculated_mcd"),
+                    "violations": sum(1 for violation in violations if violation["severity"] == "error")}
+
+    def connect(self, api, topology_cache=None):
+        """Connects to the controller and discovers its axes (reusing a cached axis map when it still holds)."""
+        self._set(status=CONNECTING, error=None)
+        start = time.perf_counter()
+        try:
+            controller, axes = establish_connection(api, self.connection_type, host=self.host,
+                                                    topology_cache=topology_cache)
+        except Exception as e:
+            self._set(status=FAILED, error=str(e), elapsed_s=time.perf_counter() - start)
+            print(f"❌ Connection failed: {e}")
+            return False
+        self._set(controller=controller, axes=axes, status=CONNECTED, elapsed_s=time.perf_counter() - start)
+        print(f"✅ Connected to {controller.name} - axes: {', '.join(axes) or 'none'}")
+        if self.payloads is None and self.mcd_path:
+            self._load_sidecar()
+        return True
+
+    def _load_sidecar(self):
+        from MCDWatchFolder import load_payloads, sidecar_path
+        path = sidecar_path(self.mcd_path)
+        if os.path.exists(path):
+            try:
+                self._set(payloads=load_payloads(path))
+                print(f"📋 Payloads loaded from {os.path.basename(path)}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not read {os.path.basename(path)}: {e}")
+
+    def ordered_payloads(self):
+        """Payloads in the controller's axis order (axes without a payload get 0). Raises ValueError."""
+        payloads = self.payloads or {}
+        unknown = [axis for axis in payloads if axis not in self.axes]
+        if unknown:
+            raise ValueError(f"Payloads for axes the controller does not have: {', '.join(unknown)}")
+        if not any(float(value) != 0 for value in payloads.values()):
+            raise ValueError("No nonzero payloads set")
+        return {axis: float(payloads.get(axis, 0.0)) for axis in self.axes}
+
+    def process(self, output_dir):
+        """
+        Runs the payload/rename/calculate pipeline on a copy of the session's MCD in output_dir/<name>.
+        Safe to run for several sessions at once: the calculation waits for MCDProcessing's .NET lock.
+
+        Returns:
+            dict: The process_mcd_file result (None if the session could not start).
+        """
+        import MCDProcessing
+
+        start = time.perf_counter()
+        self._set(status=PROCESSING, error=None, result=None)
+        try:
+            if self.controller is None:
+                raise RuntimeError("Not connected")
+            if not self.mcd_path:
+                raise RuntimeError("No MCD selected")
+            payloads = self.ordered_payloads()
+            # Each session works on its own copy in its own folder, so sessions sharing an MCD never collide
+            session_dir = os.path.join(output_dir, _folder_name(self.name))
+            os.makedirs(session_dir, exist_ok=True)
+            working = os.path.join(session_dir, os.path.basename(self.mcd_path))
+            shutil.copyfile(self.mcd_path, working)
+            mcd_name = os.path.splitext(os.path.basename(self.mcd_path))[0]
+            result = MCDProcessing.process_mcd_file(working, payloads, mcd_name, session_dir, backup=False)
+        except Exception as e:
+            self._set(status=FAILED, error=str(e), elapsed_s=time.perf_counter() - start)
+            print(f"❌ {e}")
+            return None
+        status = FAILED if result["error"] else DONE
+        self._set(status=status, error=result["error"], result=result, elapsed_s=time.perf_counter() - start)
+        return result
+
+    def disconnect(self):
+        controller = self.controller
+        self._set(controller=None)
+        if controller is not None:
+            try:
+                controller.disconnect()
+            except Exception:
+                pass
+
+def _folder_name(name):
+    return "".join(c if c.isalnum() or c in " -_." else "_" for c in name).strip() or "session"
+
+class SessionManager:
+    """
+    Runs the jobs of several ControllerSessions concurrently.
+
+    Args:
+        api: The Automation1 API module (automation1 or ControllerSimulator).
+        output_dir (str): Root folder for per-session output.
+        workers (int): Concurrent jobs (default: one per session, at most MAX_WORKERS).
+        topology_cache (TopologyCache): Cached axis maps for faster reconnects.
+    """
+
+    def __init__(self, api, output_dir, workers=None, topology_cache=None):
+        self.api = api
+        self.output_dir = output_dir
+        self.workers = workers
+        self.topology_cache = topology_cache
+        self.sessions = []
+        self._pool = None
+        self._lock = threading.Lock()
+        self.output = session_output()
+
+    @classmethod
+    def from_cell_file(cls, path, api, output_dir=None, workers=None, topology_cache=None):
+        """Creates a manager with the sessions listed in a cell file."""
+        with open(path, "r", encoding="utf-8") as f:
+            cell = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        manager = cls(api, output_dir or os.path.join(base_dir, "cell_output"), workers, topology_cache)
+        for i, entry in enumerate(cell.get("controllers", [])):
+            mcd = entry.get("mcd")
+            manager.add(entry.get("name") or entry.get("host") or f"Controller {i + 1}", entry.get("host"),
+                        os.path.join(base_dir, mcd) if mcd else None, entry.get("payloads"),
+                        entry.get("connection", "hyperwire"))
+        return manager
+
+    def add(self, name, host=None, mcd_path=None, payloads=None, connection_type="hyperwire"):
+        """Adds a session. Raises ValueError if the name or host is already in the cell."""
+        with self._lock:
+            for session in self.sessions:
+                if session.name == name:
+                    raise ValueError(f"There is already a session named '{name}'")
+                if host and session.host == host:
+                    raise ValueError(f"{host} is already in the cell as '{session.name}'")
+            session = ControllerSession(name, host, mcd_path, payloads, connection_type)
+            self.sessions.append(session)
+        return session
+
+    def remove(self, name):
+        """Disconnects and removes a session that is not busy."""
+        session = self.get(name)
+        if session.status in (CONNECTING, PROCESSING):
+            raise RuntimeError(f"{name} is busy")
+        session.disconnect()
+        with self._lock:
+            self.sessions.remove(session)
+
+    def get(self, name):
+        for session in self.sessions:
+            if session.name == name:
+                return session
+        raise KeyError(f"No session named '{name}'")
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Sized up front, not from the current sessions, so ones added later still run in parallel
+                self._pool = ThreadPoolExecutor(max_workers=self.workers or MAX_WORKERS, thread_name_prefix="session")
+            return self._pool
+
+    def _submit(self, session, method, *args):
+        def job():
+            self.output.bind(session.log)
+            try:
+                return method(*args)
+            except Exception as e:
+                session._set(status=FAILED, error=str(e))
+                print(f"❌ {e}")
+            finally:
+                self.output.bind(None)
+        return self._executor().submit(job)
+
+    def connect_all(self, sessions=None):
+        """Connects every (or the given) not yet connected session in parallel. Returns the futures."""
+        sessions = sessions if sessions is not None else list(self.sessions)
+        return [self._submit(session, session.connect, self.api, self.topology_cache) for session in sessions
+                if session.controller is None and session.status not in (CONNECTING, PROCESSING)]
+
+    def process_all(self, sessions=None):
+        """Runs the pipeline of every (or the given) connected session in parallel. Returns the futures."""
+        sessions = sessions if sessions is not None else list(self.sessions)
+        return [self._submit(session, session.process, self.output_dir) for session in sessions
+                if session.controller is not None and session.status not in (CONNECTING, PROCESSING)]
+
+    def run(self):
+        """Connects and processes every session, each as soon as it is connected. Blocks until all finish."""
+        start = time.perf_counter()
+        futures = {}
+        for session in self.sessions:
+            futures[session.name] = self._submit(
+                session, lambda session=session: session.connect(self.api, self.topology_cache)
+                and session.process(self.output_dir))
+        wait(futures.values())
+        return {"sessions": [session.snapshot() for session in self.sessions],
+                "elapsed_s": time.perf_counter() - start}
+
+    def snapshot(self):
+        return [session.snapshot() for session in list(self.sessions)]
+
+    def close(self):
+        """Waits for running jobs and disconnects every controller."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        for session in self.sessions:
+            session.disconnect()
+
+def print_summary(sessions, elapsed_s):
+    """Prints one line per session."""
+    for session in sessions:
+        icon = {DONE: "✅", FAILED: "❌"}.get(session["status"], "⏳")
+        detail = session["calculated_mcd"] or session["error"] or session["status"]
+        checks = f", {session['violations']} rule error(s)" if session["violations"] else ""
+        elapsed = f"{session['elapsed_s']:.1f} s" if session["elapsed_s"] is not None else "-"
+        print(f"{icon} {session['name']} ({session['host']}, axes {', '.join(session['axes']) or '-'}): "
+              f"{detail} [{elapsed}{checks}]")
+    print(f"⏱️ Cell finished in {elapsed_s:.2f} s")
+
+# --- Dashboard ---
+
+def open_dashboard(parent, manager):
+    """Opens a SessionDashboard for a manager (imports tkinter only when a window is wanted)."""
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog, simpledialog, scrolledtext
+
+    class SessionDashboard(tk.Toplevel):
+        """Live table of the cell's sessions with the selected session's log."""
+        COLUMNS = (("name", "Controller", 140), ("host", "Host", 110), ("axes", "Axes", 110),
+                   ("mcd", "MCD", 200), ("payloads", "Payloads (kg)", 140), ("status", "Status", 90),
+                   ("elapsed", "Time", 60), ("result", "Result", 220))
+
+        def __init__(self):
+            super().__init__(parent)
+            self.title("Multi-Controller Session")
+            self.geometry("1150x650")
+            self.configure(bg='white')
+
+            buttons = ttk.Frame(self, padding="10")
+            buttons.pack(fill=tk.X)
+            for text, command in (("Add Controller", self.add_session), ("Remove", self.remove_session),
+                                  ("Set Payloads", self.edit_payloads), ("Connect All", self.connect_all),
+                                  ("Process All", self.process_all)):
+                ttk.Button(buttons, text=text, command=command).pack(side=tk.LEFT, padx=(0, 8))
+
+            frame = ttk.Frame(self, padding=(10, 0))
+            frame.pack(fill=tk.BOTH, expand=True)
+            self.tree = ttk.Treeview(frame, columns=[column for column, _, _ in self.COLUMNS], show="headings",
+                                     height=8)
+            for column, heading, width in self.COLUMNS:
+                self.tree.heading(column, text=heading)
+                self.tree.column(column, width=width, anchor=tk.W)
+            self.tree.tag_configure(DONE, background='#dff0d8')
+            self.tree.tag_configure(FAILED, background='#f2dede')
+            self.tree.tag_configure(PROCESSING, background='#fcf8e3')
+            self.tree.tag_configure(CONNECTING, background='#fcf8e3')
+            self.tree.pack(fill=tk.X)
+            self.tree.bind("<<TreeviewSelect>>", lambda event: self.show_log())
+
+            self.log = scrolledtext.ScrolledText(frame, height=18, font=('Courier', 10),
+                                                 bg='#3D4543', fg='#00ADEF')
+            self.log.pack(fill=tk.BOTH, expand=True, pady=10)
+            self._shown_log = None
+            self.protocol("WM_DELETE_WINDOW", self.on_close)
+            self.refresh()
+
+        def selected(self):
+            selection = self.tree.selection()
+            return selection[0] if selection else None
+
+        def refresh(self):
+            """Redraws the table and the selected log every 250 ms."""
+            sessions = manager.snapshot()
+            names = [session["name"] for session in sessions]
+            for item in self.tree.get_children():
+                if item not in names:
+                    self.tree.delete(item)
+            for session in sessions:
+                result = session["error"] or (os.path.basename(session["calculated_mcd"]) if session["calculated_mcd"] else "")
+                if session["violations"]:
+                    result += f" ({session['violations']} rule errors)"
+                values = (session["name"], session["host"], ", ".join(session["axes"]), session["mcd"] or "",
+                          ", ".join(f"{axis} {value:g}" for axis, value in session["payloads"].items()),
+                          session["status"], f"{session['elapsed_s']:.1f} s" if session["elapsed_s"] else "", result)
+                if self.tree.exists(session["name"]):
+                    self.tree.item(session["name"], values=values, tags=(session["status"],))
+                else:
+                    self.tree.insert("", tk.END, iid=session["name"], values=values, tags=(session["status"],))
+            self.show_log()
+            self._after = self.after(250, self.refresh)
+
+        def show_log(self):
+            """Shows the selected session's log if it changed."""
+            name = self.selected()
+            try:
+                text = manager.get(name).log.text() if name else ""
+            except KeyError:
+                text = ""
+            if (name, text) != self._shown_log:
+                self._shown_log = (name, text)
+                self.log.delete("1.0", tk.END)
+                self.log.insert(tk.END, text)
+                self.log.see(tk.END)
+
+        def add_session(self):
+            host = simpledialog.askstring("Add Controller", "Controller address (empty for local/USB):", parent=self)
+            if host is None:
+                return
+            mcd_path = filedialog.askopenfilename(parent=self, title="Select the controller's MCD",
+                                                  filetypes=[("MCD files", "*.mcd"), ("All files", "*.*")])
+            if not mcd_path:
+                return
+            name = simpledialog.askstring("Add Controller", "Session name:", parent=self,
+                                          initialvalue=host or os.path.splitext(os.path.basename(mcd_path))[0])
+            if not name:
+                return
+            try:
+                session = manager.add(name, host.strip() or None, mcd_path,
+                                      connection_type="hyperwire" if host.strip() else "auto")
+            except ValueError as e:
+                messagebox.showerror("Add Controller", str(e), parent=self)
+                return
+            manager.connect_all([session])
+
+        def remove_session(self):
+            name = self.selected()
+            if name:
+                try:
+                    manager.remove(name)
+                except RuntimeError as e:
+                    messagebox.showerror("Remove", str(e), parent=self)
+
+        def edit_payloads(self):
+            name = self.selected()
+            if not name:
+                return
+            session = manager.get(name)
+            if not session.axes:
+                messagebox.showinfo("Set Payloads", "Connect the controller to discover its axes first.", parent=self)
+                return
+            dialog = tk.Toplevel(self)
+            dialog.title(f"Payloads - {name}")
+            dialog.configure(bg='white')
+            variables = {}
+            for axis in session.axes:
+                row = ttk.Frame(dialog, padding=(10, 4))
+                row.pack(fill=tk.X)
+                ttk.Label(row, text=f"{axis}:", width=12).pack(side=tk.LEFT)
+                variables[axis] = tk.StringVar(value=str((session.payloads or {}).get(axis, 0.0)))
+                ttk.Entry(row, textvariable=variables[axis], width=12).pack(side=tk.LEFT)
+                ttk.Label(row, text="kg").pack(side=tk.LEFT, padx=5)
+
+            def apply():
+                try:
+                    payloads = {axis: float(variable.get()) for axis, variable in variables.items()}
+                except ValueError:
+                    messagebox.showerror("Set Payloads", "Payloads must be numbers.", parent=dialog)
+                    return
+                session._set(payloads=payloads)
+                dialog.destroy()
+            ttk.Button(dialog, text="OK", command=apply).pack(pady=10)
+
+        def connect_all(self):
+            manager.connect_all()
+
+        def process_all(self):
+            manager.process_all()
+
+        def on_close(self):
+            self.after_cancel(self._after)
+            self.destroy()
+
+    return SessionDashboard()
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Commission several controllers of a cell concurrently.")
+    parser.add_argument("cell", help="Cell file listing the controllers")
+    parser.add_argument("--output", help="Output folder (default: cell_output beside the cell file)")
+    parser.add_argument("--workers", type=int, help=f"Concurrent jobs (default: one per controller, up to {MAX_WORKERS})")
+    parser.add_argument("--headless", action="store_true", help="Run every session without the dashboard")
+    parser.add_argument("--simulate", action="store_true",
+                        help="Use the controller simulator, one simulated controller per host loaded from its MCD")
+    args = parser.parse_args()
+
+    if args.simulate or os.environ.get("MCD_CONTROLLER_SIMULATOR"):
+        import ControllerSimulator as a1
+    else:
+        import automation1 as a1
+
+    topology_cache = None
+    if not args.simulate:
+        from TopologyCache import shared_cache
+        topology_cache = shared_cache()
+    try:
+        manager = SessionManager.from_cell_file(args.cell, a1, args.output, args.workers, topology_cache)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read the cell file: {e}")
+        return 1
+    if args.simulate:
+        for session in manager.sessions:
+            if session.host and session.mcd_path:
+                a1.configure_host(session.host, config=a1.SimulatorConfig.from_mcd(session.mcd_path,
+                                                                                   controller_name=session.name))
+
+    if args.headless:
+        try:
+            summary = manager.run()
+        finally:
+            manager.close()
+        print_summary(summary["sessions"], summary["elapsed_s"])
+        return 1 if any(session["status"] != DONE for session in summary["sessions"]) else 0
+
+    import tkinter as tk
+    root = tk.Tk()
+    root.withdraw()
+    dashboard = open_dashboard(root, manager)
+    dashboard.protocol("WM_DELETE_WINDOW", root.destroy)
+    manager.connect_all()
+    root.mainloop()
+    manager.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
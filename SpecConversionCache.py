@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Spec Conversion Cache - Memoised (stage type, axis, options) -> non-calculated MCD conversion
+Description: Spec-to-MCD conversion (update the template's ConfiguredOptions, then
+ConvertToMcd) is rerun in full for every request, although most requests reuse
+a small set of option combinations. This cache sits in front of it with an
+in-memory LRU and an on-disk store, keyed by the normalised stage type, axis and
+options plus the template and Automation1 DLLs in use, and returns the MCD
+bytes and warnings of an earlier conversion without touching .NET.
+
+The disk tier is size-bounded: after each new conversion the least recently
+used entries (by last hit) are deleted until it fits max_disk_bytes.
+
+Hit/miss counts are kept per tier (memory, disk) for the session and
+cumulatively on disk, together with how many distinct combinations were seen,
+so the memory size can be chosen from real traffic. The cumulative totals in
+stats.json are written at most every STATS_FLUSH_INTERVAL_S seconds and by
+flush_stats()/close(), each time by an atomic replace.
+
+Usage:
+    python SpecConversionCache.py stats [--cache-dir .spec_mcd_cache]
+    python SpecConversionCache.py convert PRO165LM Z "Travel=-0100" "Feedback=-E1" "Cable Management=-CMS2" -o out.mcd
+    python SpecConversionCache.py clear
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(CURRENT_DIR, ".spec_mcd_cache")
+DEFAULT_MEMORY_ENTRIES = 64
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+STATS_FLUSH_INTERVAL_S = 30.0
+DEFAULT_TEMPLATE = os.path.join(CURRENT_DIR, "Template-iXC4e.json")
+KEY_VERSION = 1
+
+# --- Keys ---
+
+def normalise_spec(stage_type, axis, specs_dict):
+    """
+    Canonical form of a conversion request: stage type and axis upper-cased and stripped,
+    options stripped and sorted by name. Empty option values are kept since they select
+    the "none" choice of an option.
+    """
+    specs = {}
+    for name, value in (specs_dict or {}).items():
+        specs[str(name).strip()] = "" if value is None else str(value).strip()
+    return {
+        "stage_type": str(stage_type or "").strip().upper(),
+        "axis": str(axis or "").strip().upper(),
+        "specs": dict(sorted(specs.items())),
+    }
+
+def _file_digest(path):
+    """sha256 of a file's content, or "" if it does not exist."""
+    if not path or not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def environment_version(template_path=DEFAULT_TEMPLATE, dll_dir=None):
+    """Identifies the template JSON and Automation1 DLLs a conversion depends on."""
+    from CalculationCache import dll_version
+    import MCDProcessing
+
+    return hashlib.sha256(
+        f"{_file_digest(template_path)}:{dll_version(dll_dir or MCDProcessing.MS_DLL_PATH)}".encode("utf-8")
+    ).hexdigest()
+
+def _write_atomic(path, data):
+    """Writes bytes to path through a temporary file in the same folder, so readers never see a partial file."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def _new_counts():
+    return {"memory_hits": 0, "disk_hits": 0, "misses": 0, "first_seen": {}}
+
+def spec_key(stage_type, axis, specs_dict, environment=""):
+    """Cache key for a conversion request."""
+    canonical = json.dumps([KEY_VERSION, environment, normalise_spec(stage_type, axis, specs_dict)],
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# --- Conversion ---
+
+def generatemcd_converter(controller=None):
+    """
+    Returns a converter function (stage_type, axis, specs_dict) -> (MCD bytes, warnings) built on
+    GenerateMCD.AerotechController.convert_to_mcd. Uses the given initialized controller, or one
+    from MCDProcessing's pool.
+    """
+    import MCDProcessing
+
+    def convert_with(converter, stage_type, axis, specs_dict):
+        from ClrBridge import ClrBridge
+        mcd_obj, warnings = converter.convert_to_mcd(specs_dict=specs_dict, stage_type=stage_type,
+                                                     axis=axis, workflow="wf1")
+        return ClrBridge(converter).write_mcd(mcd_obj), [str(warning) for warning in warnings]
+
+    def convert(stage_type, axis, specs_dict):
+        if controller is not None:
+            return convert_with(controller, stage_type, axis, specs_dict)
+        with MCDProcessing.pooled_converter() as converter:
+            return convert_with(converter, stage_type, axis, specs_dict)
+
+    return convert
+
+class SpecConversionCache:
+    """
+    LRU + on-disk memoisation of spec-to-MCD conversion.
+
+    Args:
+        cache_dir (str): Folder for the on-disk store (<key>.mcd plus <key>.json metadata).
+        memory_entries (int): Entries kept in the in-memory LRU.
+        converter (callable): (stage_type, axis, specs_dict) -> (MCD bytes, warnings) for misses;
+            defaults to generatemcd_converter().
+        environment (str): Template/DLL identity mixed into the keys; defaults to environment_version().
+        max_disk_bytes (int): Upper bound on the on-disk store (MCD plus metadata bytes).
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_entries=DEFAULT_MEMORY_ENTRIES, converter=None,
+                 environment=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.converter = converter
+        self.environment = environment_version() if environment is None else environment
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.session = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        # Counts not yet added to stats.json
+        self._pending = _new_counts()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # GenerateMCD writes its working template to a fixed path, so misses convert one at a time
+        self._convert_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def close(self):
+        """Writes the outstanding statistics."""
+        self.flush_stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Disk store ---
+
+    def _paths(self, key):
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.mcd"), os.path.join(folder, f"{key}.json")
+
+    def _read_disk(self, key):
+        mcd_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(mcd_path, "rb") as f:
+                mcd_bytes = f.read()
+        except (OSError, ValueError):
+            return None
+        os.utime(meta_path)  # records the last use, which evict() orders by
+        return mcd_bytes, meta["warnings"]
+
+    def _write_disk(self, key, request, mcd_bytes, warnings):
+        mcd_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(mcd_path), exist_ok=True)
+        meta = dict(request, warnings=warnings, created=datetime.now().isoformat(timespec="seconds"))
+        # The MCD goes first: a metadata file only exists next to a complete MCD
+        _write_atomic(mcd_path, mcd_bytes)
+        _write_atomic(meta_path, json.dumps(meta, indent=2).encode("utf-8"))
+
+    def _disk_entries(self):
+        """Returns [(last use, bytes, mcd path, metadata path)] for every stored entry."""
+        entries = []
+        for folder_name in os.listdir(self.cache_dir):
+            folder = os.path.join(self.cache_dir, folder_name)
+            if not os.path.isdir(folder):
+                continue
+            for file_name in os.listdir(folder):
+                if not file_name.endswith(".mcd"):
+                    continue
+                mcd_path, meta_path = self._paths(file_name[:-len(".mcd")])
+                try:
+                    size = os.path.getsize(mcd_path)
+                    last_used = os.path.getmtime(mcd_path)
+                    if os.path.exists(meta_path):
+                        size += os.path.getsize(meta_path)
+                        last_used = os.path.getmtime(meta_path)
+                except OSError:
+                    continue  # removed by another process meanwhile
+                entries.append((last_used, size, mcd_path, meta_path))
+        return entries
+
+    def evict(self):
+        """Deletes least recently used disk entries until the store fits max_disk_bytes. Returns the count removed."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for _, size, mcd_path, meta_path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            # Metadata first, so a reader never finds metadata without its MCD
+            for path in (meta_path, mcd_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    # --- Lookup ---
+
+    def get_mcd(self, stage_type, axis, specs_dict):
+        """
+        Returns the non-calculated MCD for a spec, converting only on a miss.
+
+        Returns:
+            tuple: (MCD bytes, warnings list)
+        """
+        key = spec_key(stage_type, axis, specs_dict, self.environment)
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.session["memory_hits"] += 1
+                self._pending["memory_hits"] += 1
+                return self.memory[key]
+
+        cached = self._read_disk(key)
+        if cached is not None:
+            with self._lock:
+                self.session["disk_hits"] += 1
+                self._remember(key, cached)
+            self._record("disk_hits", key)
+            return cached
+
+        converter = self.converter or generatemcd_converter()
+        with self._convert_lock:
+            mcd_bytes, warnings = converter(stage_type, axis, specs_dict)
+        warnings = [str(warning) for warning in warnings]
+        self._write_disk(key, normalise_spec(stage_type, axis, specs_dict), mcd_bytes, warnings)
+        self.evict()
+        with self._lock:
+            self.session["misses"] += 1
+            self._remember(key, (mcd_bytes, warnings))
+        self._record("misses", key)
+        return mcd_bytes, warnings
+
+    def convert_to_file(self, stage_type, axis, specs_dict, output_path):
+        """Writes the MCD for a spec to output_path. Returns (output_path, warnings)."""
+        mcd_bytes, warnings = self.get_mcd(stage_type, axis, specs_dict)
+        with open(output_path, "wb") as f:
+            f.write(mcd_bytes)
+        return output_path, warnings
+
+    # --- Statistics ---
+
+    def _stats_path(self):
+        return os.path.join(self.cache_dir, "stats.json")
+
+    def _load_totals(self):
+        try:
+            with open(self._stats_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return _new_counts()
+
+    def _merged_totals(self):
+        """The cumulative totals on disk plus the pending counts."""
+        totals = self._load_totals()
+        for counter in ("memory_hits", "disk_hits", "misses"):
+            totals[counter] += self._pending[counter]
+        for key, seen in self._pending["first_seen"].items():
+            totals["first_seen"].setdefault(key, seen)
+        return totals
+
+    def _record(self, counter, key):
+        """
+        Counts a disk hit or miss. The totals are written once STATS_FLUSH_INTERVAL_S has passed
+        since the last write; memory hits are only counted, so the hot path does not touch the disk.
+        """
+        with self._lock:
+            self._pending[counter] += 1
+            self._pending["first_seen"].setdefault(key, time.time())
+            if time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL_S:
+                self._flush()
+
+    def _flush(self):
+        """Adds the pending counts to stats.json. Call with self._lock held."""
+        self._last_flush = time.monotonic()
+        pending = self._pending
+        if not (pending["memory_hits"] or pending["disk_hits"] or pending["misses"]):
+            return
+        totals = self._merged_totals()
+        _write_atomic(self._stats_path(), json.dumps(totals).encode("utf-8"))
+        self._pending = _new_counts()
+
+    def flush_stats(self):
+        """Adds the counts gathered since the last write to the cumulative totals."""
+        with self._lock:
+            self._flush()
+
+    def stats(self):
+        """
+        Returns session and cumulative hit rates, the number of distinct specs seen, and
+        the entries and bytes currently stored.
+        """
+        def rates(counts):
+            lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            hits = counts["memory_hits"] + counts["disk_hits"]
+            return dict(lookups=lookups, hit_rate=hits / lookups if lookups else 0.0,
+                        memory_hit_rate=counts["memory_hits"] / lookups if lookups else 0.0,
+                        **{k: counts[k] for k in ("memory_hits", "disk_hits", "misses")})
+
+        with self._lock:
+            totals = self._merged_totals()
+        entries = self._disk_entries()
+        return {
+            "session": rates(self.session),
+            "total": rates(totals),
+            "distinct_specs": len(totals["first_seen"]),
+            "memory_entries": len(self.memory),
+            "memory_capacity": self.memory_entries,
+            "stored_entries": len(entries),
+            "stored_bytes": sum(size for _, size, _, _ in entries),
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+
+    def clear(self):
+        """Empties the memory and disk tiers and resets the statistics."""
+        with self._lock:
+            self.memory.clear()
+            self.session = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+            self._pending = _new_counts()
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+def print_stats(stats):
+    """Prints the statistics returned by SpecConversionCache.stats()."""
+    for label in ("session", "total"):
+        s = stats[label]
+        print(f"📊 {label.title():<8} {s['lookups']} lookup(s), hit rate {s['hit_rate']:.1%} "
+              f"(memory {s['memory_hits']}, disk {s['disk_hits']}, misses {s['misses']})")
+    print(f"   {stats['distinct_specs']} distinct spec(s) seen; memory {stats['memory_entries']}/{stats['memory_capacity']}; "
+          f"disk {stats['stored_entries']} MCD(s), {stats['stored_bytes'] / 1024.0:.1f} of "
+          f"{stats['max_disk_bytes'] / 1048576.0:.0f} MiB")
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Memoised spec-to-MCD conversion.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-disk-mb", type=float, default=DEFAULT_MAX_DISK_BYTES / 1048576.0,
+                        help="Size limit of the on-disk store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show hit-rate statistics")
+    subparsers.add_parser("clear", help="Empty the cache")
+    convert_parser = subparsers.add_parser("convert", help="Convert a spec, using the cache")
+    convert_parser.add_argument("stage_type")
+    convert_parser.add_argument("axis")
+    convert_parser.add_argument("specs", nargs="*", help='Options as "Name=Value"')
+    convert_parser.add_argument("-o", "--output", required=True, help="Output .mcd path")
+    args = parser.parse_args()
+
+    cache = SpecConversionCache(args.cache_dir, max_disk_bytes=int(args.max_disk_mb * 1048576))
+    if args.command == "stats":
+        print_stats(cache.stats())
+    elif args.command == "clear":
+        cache.clear()
+        print("✅ Spec conversion cache cleared")
+    else:
+        specs = dict(spec.split("=", 1) if "=" in spec else (spec, "") for spec in args.specs)
+        start = time.perf_counter()
+        try:
+            _, warnings = cache.convert_to_file(args.stage_type, args.axis, specs, args.output)
+        except Exception as e:
+            print(f"❌ Conversion failed: {e}")
+            return 1
+        print(f"✅ {args.output} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        for warning in warnings:
+            print(f"   ⚠️ {warning}")
+        print_stats(cache.stats())
+    cache.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic MCD Generator - Builds realistic .mcd archives for benchmarking
+Description: Produces MCD zip files that follow the real Automation1 layouts
+(mcdInformation.xml, config/Names, config/MachineSetupData, config/Parameters,
+config/AxesSettings, config/HyperWireCard) with a configurable number of axes,
+parameters per axis and stage components. Output is deterministic for a given
+seed so benchmark runs are comparable.
+"""
+
+import os
+import sys
+import random
+import zipfile
+import argparse
+
+SOFTWARE_VERSION = "2.10.2.3124"
+
+# Real axis parameters (id, name, value) taken from a calculated PRO165LM axis.
+PARAMETER_TEMPLATE = (
+    (67, "AbortDecelRate", "1100"),
+    (29, "AverageCurrentThreshold", "4.197731"),
+    (0, "AxisName", "X"),
+    (532, "BusOvervoltageThreshold", "400"),
+    (4, "CountsPerUnit", "50000"),
+    (540, "CurrentLoopFeedforwardBackEmf", "21.28"),
+    (541, "CurrentLoopFeedforwardBusVoltage", "160"),
+    (539, "CurrentLoopFeedforwardGainLff", "1.33"),
+    (538, "CurrentLoopFeedforwardGainRff", "4.8"),
+    (21, "CurrentLoopGainK", "590"),
+    (20, "CurrentLoopGainKi", "3200"),
+    (398, "CurrentLoopSetup", "32"),
+    (66, "DefaultAxisRampRate", "1000"),
+    (65, "DefaultAxisSpeed", "80"),
+    (55, "EndOfTravelLimitSetup", "6"),
+    (22, "FaultMask", "1355165647"),
+    (44, "FeedbackInput0", "1"),
+    (46, "FeedbackInput1", "1"),
+    (390, "FeedforwardAdvance", "0.5"),
+    (463, "FeedforwardFilter00CoeffD1", "-1.564504"),
+    (464, "FeedforwardFilter00CoeffD2", "0.64366233"),
+    (460, "FeedforwardFilter00CoeffN0", "0.019789582"),
+    (461, "FeedforwardFilter00CoeffN1", "0.039579164"),
+    (462, "FeedforwardFilter00CoeffN2", "0.019789582"),
+    (499, "FeedforwardFilterSetup", "1"),
+    (7, "FeedforwardGainAff", "2.6"),
+    (496, "FeedforwardGainNormalizationFactor", "925500000"),
+    (72, "HomeRampRate", "500"),
+    (70, "HomeSpeed", "50"),
+    (36, "InPositionDistance", "0.0001"),
+    (109, "JoystickHighSpeed", "160"),
+    (108, "JoystickLowSpeed", "80"),
+    (35, "MaxCurrentClamp", "10"),
+    (92, "MaxJogSpeed", "80"),
+    (205, "MaxSpeedClamp", "2000"),
+    (500, "MotorPolePitch", "25"),
+    (28, "PositionErrorThreshold", "0.25"),
+    (47, "PrimaryEncoderMultiplicationFactor", "1000"),
+    (501, "PrimaryFeedbackResolution", "0.02"),
+    (43, "PrimaryFeedbackType", "2"),
+    (9, "ServoLoopFilter00CoeffN0", "0.019789582"),
+    (10, "ServoLoopFilter00CoeffN1", "0.039579164"),
+    (11, "ServoLoopFilter00CoeffN2", "0.019789582"),
+    (17, "ServoLoopFilter01CoeffD1", "-1.959942"),
+    (18, "ServoLoopFilter01CoeffD2", "0.98437285"),
+    (14, "ServoLoopFilter01CoeffN0", "0.9929678"),
+    (15, "ServoLoopFilter01CoeffN1", "-1.959942"),
+    (16, "ServoLoopFilter01CoeffN2", "0.99140507"),
+    (85, "ServoLoopFilter02CoeffD1", "-1.887509"),
+    (86, "ServoLoopFilter02CoeffD2", "0.9846444"),
+    (82, "ServoLoopFilter02CoeffN0", "0.99309"),
+    (83, "ServoLoopFilter02CoeffN1", "-1.887509"),
+    (84, "ServoLoopFilter02CoeffN2", "0.99155444"),
+    (178, "ServoLoopFilterSetup", "7"),
+    (486, "ServoLoopGainK", "10.5"),
+    (484, "ServoLoopGainKip", "30"),
+    (487, "ServoLoopGainKiv", "60"),
+    (489, "ServoLoopGainNormalizationFactor", "925500"),
+    (32, "VelocityErrorThreshold", "200"),
+)
+
+# Parameters whose values are varied per axis so files are not trivially identical
+VARIED_PARAMETERS = {
+    "AverageCurrentThreshold", "CurrentLoopGainK", "CurrentLoopGainKi", "FeedforwardGainAff",
+    "MaxCurrentClamp", "ServoLoopGainK", "ServoLoopGainKip", "ServoLoopGainKiv",
+}
+
+AXIS_LETTERS = "XYZUVWABC"
+
+def axis_name(index):
+    """Returns a realistic axis name for an axis index (X, Y, Z, ... then Axis9, Axis10, ...)."""
+    if index < len(AXIS_LETTERS):
+        return AXIS_LETTERS[index]
+    return f"Axis{index}"
+
+def _document(schema_version, data_xml, indent="\t"):
+    """Wraps a Data body in the standard Automation1 File/FileInformation envelope."""
+    return (
+        '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n'
+        f'<File SchemaVersion="{schema_version}">\n'
+        f'{indent}<FileInformation>\n'
+        f'{indent}{indent}<SoftwareVersion>{SOFTWARE_VERSION}</SoftwareVersion>\n'
+        f'{indent}{indent}<OldestCompatibleSoftwareVersion>1.0.0.0</OldestCompatibleSoftwareVersion>\n'
+        f'{indent}</FileInformation>\n'
+        f'{indent}<Data>\n'
+        f'{data_xml}'
+        f'{indent}</Data>\n'
+        '</File>'
+    )
+
+def _encode(text):
+    """Encodes member text the way Automation1 writes it: UTF-8 with BOM and CRLF line endings."""
+    return b"\xef\xbb\xbf" + text.replace("\n", "\r\n").encode("utf-8")
+
+def build_mcd_information():
+    """Builds the mcdInformation.xml member."""
+    return _document("1.0.0.0", "\t\t<ControllerType>DriveBased</ControllerType>\n")
+
+def build_names(controller_name):
+    """Builds the config/Names member."""
+    return _document("1.0.0.0", f"\t\t<ControllerName>{controller_name}</ControllerName>\n")
+
+def build_hyperwire_card():
+    """Builds the config/HyperWireCard member."""
+    return _document("1.0.0.0", "\t\t<Mode>AutoDetect</Mode>\n")
+
+def build_axes_settings(axes):
+    """Builds the config/AxesSettings member with one AxisSettings block per axis."""
+    blocks = []
+    for index in range(axes):
+        blocks.append(
+            "  <AxisSettings>\n"
+            f"    <Index>{index}</Index>\n"
+            "    <DecimalPlaces>4</DecimalPlaces>\n"
+            "    <Display>true</Display>\n"
+            "    <JogMode>Speed</JogMode>\n"
+            "    <JogDistance>NaN</JogDistance>\n"
+            "    <JogSpeed>NaN</JogSpeed>\n"
+            "  </AxisSettings>\n"
+        )
+    data = (
+        "    <SerializedSettings>\n"
+        '<ArrayOfAxisSettings xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xmlns:xsd="http://www.w3.org/2001/XMLSchema">\n'
+        f"{''.join(blocks)}"
+        "</ArrayOfAxisSettings></SerializedSettings>\n"
+    )
+    return _document("1.0", data, indent="  ")
+
+def build_parameters(axes, params_per_axis, rng):
+    """
+    Builds the config/Parameters member.
+    The first parameters come from the real template; any extra parameters
+    requested beyond the template are numbered synthetic entries.
+    """
+    axis_blocks = []
+    for index in range(axes):
+        lines = [f'\t\t\t\t<Axis Index="{index}">\n']
+        for count in range(params_per_axis):
+            if count < len(PARAMETER_TEMPLATE):
+                param_id, name, value = PARAMETER_TEMPLATE[count]
+                if name == "AxisName":
+                    value = axis_name(index)
+                elif name in VARIED_PARAMETERS:
+                    value = f"{float(value) * rng.uniform(0.9, 1.1):.6g}"
+            else:
+                extra = count - len(PARAMETER_TEMPLATE)
+                param_id, name = 1000 + extra, f"SyntheticParameter{extra:04d}"
+                value = f"{rng.uniform(0, 1000):.6g}"
+            lines.append(f'\t\t\t\t\t<P id="{param_id}" n="{name}">{value}</P>\n')
+        lines.append("\t\t\t\t</Axis>\n")
+        axis_blocks.append("".join(lines))
+    data = (
+        "\t\t<Parameters>\n"
+        "\t\t\t<System />\n"
+        "\t\t\t<Axes>\n"
+        f"{''.join(axis_blocks)}"
+        "\t\t\t</Axes>\n"
+        "\t\t\t<Tasks />\n"
+        "\t\t</Parameters>\n"
+    )
+    return _document("1.0.0.0", data)
+
+def _stage_component(rotary, rng, pad):
+    """Builds a Linear/Rotary stage component block at the given indentation."""
+    kind = "RotaryStageComponent" if rotary else "LinearStageComponent"
+    load_field = "LoadInertia" if rotary else "LoadMass"
+    carriage = f"{rng.uniform(1.5, 4.0):.2f}"
+    return (
+        f"{pad}<Stage>\n"
+        f"{pad}  <{kind}>\n"
+        f"{pad}    <Name>{'ADRS100' if rotary else 'PRO165LM'}</Name>\n"
+        f"{pad}    <IsCustom>false</IsCustom>\n"
+        f"{pad}    <DefaultSpeed>80</DefaultSpeed>\n"
+        f"{pad}    <DefaultRampRate>1000</DefaultRampRate>\n"
+        f"{pad}    <HomeSpeed>50</HomeSpeed>\n"
+        f"{pad}    <MaxSpeed>2000</MaxSpeed>\n"
+        f"{pad}    <CarriageMass>{carriage}</CarriageMass>\n"
+        f"{pad}    <{load_field}>0</{load_field}>\n"
+        f"{pad}    <MotorCount>1</MotorCount>\n"
+        f"{pad}    <NominalTravel>100</NominalTravel>\n"
+        f"{pad}  </{kind}>\n"
+        f"{pad}</Stage>\n"
+    )
+
+def _mechanical_axis(display_name, rotary, rng, pad):
+    """Builds a MechanicalAxis block (stage, motor and primary feedback)."""
+    return (
+        f"{pad}<MechanicalAxis>\n"
+        f"{pad}  <DisplayName>{display_name}</DisplayName>\n"
+        f"{_stage_component(rotary, rng, pad + '  ')}"
+        f"{pad}  <Motor>\n"
+        f"{pad}    <LinearMotorComponent>\n"
+        f"{pad}      <Name>BLMC</Name>\n"
+        f"{pad}      <Resistance>4.8</Resistance>\n"
+        f"{pad}      <Inductance>1.33</Inductance>\n"
+        f"{pad}      <BackEMFConstant>21.28</BackEMFConstant>\n"
+        f"{pad}    </LinearMotorComponent>\n"
+        f"{pad}  </Motor>\n"
+        f"{pad}  <PrimaryFeedback>\n"
+        f"{pad}    <Name>Standard</Name>\n"
+        f"{pad}    <DeviceType>IncrementalSineWaveEncoder</DeviceType>\n"
+        f"{pad}    <Resolution>20</Resolution>\n"
+        f"{pad}    <MultiplicationFactor>1000</MultiplicationFactor>\n"
+        f"{pad}  </PrimaryFeedback>\n"
+        f"{pad}  <NominalTravel>100</NominalTravel>\n"
+        f"{pad}</MechanicalAxis>\n"
+    )
+
+def _electrical_axis(display_name, channel, pad):
+    """Builds an ElectricalAxis block for an XC4e drive."""
+    return (
+        f"{pad}<ElectricalAxis>\n"
+        f"{pad}  <DisplayName>{display_name}</DisplayName>\n"
+        f"{pad}  <HyperWireCommunicationChannel>{channel}</HyperWireCommunicationChannel>\n"
+        f"{pad}  <DriveComponent>\n"
+        f"{pad}    <Type>XC4e</Type>\n"
+        f"{pad}    <BusVoltage>160</BusVoltage>\n"
+        f"{pad}    <PeakCurrent>10</PeakCurrent>\n"
+        f"{pad}    <ContinuousCurrent>5</ContinuousCurrent>\n"
+        f"{pad}    <ServoRate>TwentykHz</ServoRate>\n"
+        f"{pad}    <BusOvervoltageThreshold>400</BusOvervoltageThreshold>\n"
+        f"{pad}  </DriveComponent>\n"
+        f"{pad}</ElectricalAxis>\n"
+    )
+
+def _configured_options(options, pad):
+    """Builds a ConfiguredOptions block of KeyValuePair entries."""
+    pairs = "".join(
+        f"{pad}  <KeyValuePair>\n{pad}    <Key>{key}</Key>\n{pad}    <Value>{value}</Value>\n{pad}  </KeyValuePair>\n"
+        for key, value in options
+    )
+    return f"{pad}<ConfiguredOptions>\n{pairs}{pad}</ConfiguredOptions>\n"
+
+def build_machine_setup_data(axes, stage_components, rotary_every, rng):
+    """
+    Builds the config/MachineSetupData member.
+    One XC4e drive is created per axis and one mechanical product per stage
+    component; the first min(axes, stage_components) stages are wired to axes.
+    """
+    rotary = [rotary_every > 0 and (i + 1) % rotary_every == 0 for i in range(stage_components)]
+    stage_names = [f"PRO165LM ({i})" if i else "PRO165LM" for i in range(stage_components)]
+    drive_names = [f"XC4e ({i})" if i else "XC4e" for i in range(axes)]
+
+    electrical = []
+    for i in range(axes):
+        electrical.append(
+            "    <ElectricalProduct>\n"
+            "      <Name>XC4e</Name>\n"
+            f"      <DisplayName>{drive_names[i]}</DisplayName>\n"
+            "      <SerialNumber />\n"
+            f"{_configured_options((('Current', '-10'), ('Bus Voltage', '160V'), ('Multiplier', '-MX2')), '      ')}"
+            "      <ElectricalAxes>\n"
+            f"{_electrical_axis(drive_names[i], i, '        ')}"
+            "      </ElectricalAxes>\n"
+            "    </ElectricalProduct>\n"
+        )
+
+    mechanical = []
+    for i in range(stage_components):
+        mechanical.append(
+            "    <MechanicalProduct>\n"
+            f"      <Name>{'ADRS100' if rotary[i] else 'PRO165LM'}</Name>\n"
+            f"      <DisplayName>{stage_names[i]}</DisplayName>\n"
+            "      <SerialNumber />\n"
+            f"{_configured_options((('Travel', '-0100'), ('Feedback', '-E1'), ('Cable Management', '-CMS2')), '      ')}"
+            "      <MechanicalAxes>\n"
+            f"{_mechanical_axis(stage_names[i], rotary[i], rng, '        ')}"
+            "      </MechanicalAxes>\n"
+            "    </MechanicalProduct>\n"
+        )
+
+    axis_configs = []
+    for i in range(axes):
+        mech = _mechanical_axis(stage_names[i], rotary[i], rng, "      ") if i < stage_components else "      <MechanicalAxis />\n"
+        axis_configs.append(
+            "    <AxisConfiguration>\n"
+            f"      <Index>{i}</Index>\n"
+            f"{mech}"
+            f"{_electrical_axis(drive_names[i], i, '      ')}"
+            f"      <Name>{axis_name(i)}</Name>\n"
+            "      <FeedbackDeviceConnectionSetup>MechanicalPrimaryToElectricalPrimary</FeedbackDeviceConnectionSetup>\n"
+            "    </AxisConfiguration>\n"
+        )
+
+    data = (
+        "    <IsMachineSetupComplete>True</IsMachineSetupComplete>\n"
+        "    <PendingConfiguration>\n"
+        "<MachineSetupConfiguration>\n"
+        "  <ElectricalProducts />\n"
+        "  <MechanicalProducts />\n"
+        "  <Axes />\n"
+        "</MachineSetupConfiguration></PendingConfiguration>\n"
+        "    <Configuration>\n"
+        "<MachineSetupConfiguration>\n"
+        f"  <ElectricalProducts>\n{''.join(electrical)}  </ElectricalProducts>\n"
+        f"  <MechanicalProducts>\n{''.join(mechanical)}  </MechanicalProducts>\n"
+        f"  <Axes>\n{''.join(axis_configs)}  </Axes>\n"
+        "</MachineSetupConfiguration></Configuration>\n"
+    )
+    return _document("1.0", data, indent="  ").replace('standalone="yes"?>', '?>', 1)
+
+def generate_mcd(output_path, axes=2, params_per_axis=len(PARAMETER_TEMPLATE), stage_components=None,
+                 controller_name=None, rotary_every=0, seed=0):
+    """
+    Writes a synthetic .mcd archive and returns its path.
+
+    Args:
+        output_path (str): Destination .mcd path.
+        axes (int): Number of axes (1 to 32).
+        params_per_axis (int): Parameters written for each axis in config/Parameters.
+        stage_components (int): Number of stage components (defaults to one per axis).
+        controller_name (str): Name written to config/Names (defaults to a "No Load" name).
+        rotary_every (int): Make every Nth stage rotary (LoadInertia instead of LoadMass); 0 for none.
+        seed (int): Random seed for the per-axis value variation.
+    """
+    if not 1 <= axes <= 32:
+        raise ValueError(f"Axis count must be between 1 and 32, got {axes}")
+    if stage_components is None:
+        stage_components = axes
+    if controller_name is None:
+        controller_name = f"Synthetic {axes}-Axis No Load"
+
+    rng = random.Random(seed)
+    members = (
+        ("mcdInformation.xml", build_mcd_information()),
+        ("config/HyperWireCard", build_hyperwire_card()),
+        ("config/Names", build_names(controller_name)),
+        ("config/AxesSettings", build_axes_settings(axes)),
+        ("config/MachineSetupData", build_machine_setup_data(axes, stage_components, rotary_every, rng)),
+        ("config/Parameters", build_parameters(axes, params_per_axis, rng)),
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as mcd_zip:
+        for name, text in members:
+            info = zipfile.ZipInfo(name, date_time=(2025, 8, 25, 12, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            mcd_zip.writestr(info, _encode(text))
+    return output_path
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Generate synthetic MCD files for benchmarking.")
+    parser.add_argument("output", help="Output .mcd path")
+    parser.add_argument("--axes", type=int, default=2, help="Number of axes (1-32)")
+    parser.add_argument("--params", type=int, default=len(PARAMETER_TEMPLATE), help="Parameters per axis")
+    parser.add_argument("--stages", type=int, default=None, help="Number of stage components (default: one per axis)")
+    parser.add_argument("--rotary-every", type=int, default=0, help="Make every Nth stage rotary")
+    parser.add_argument("--name", default=None, help="Controller name written to config/Names")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    path = generate_mcd(args.output, args.axes, args.params, args.stages, args.name, args.rotary_every, args.seed)
+    print(f"✅ Synthetic MCD written: {path} ({os.path.getsize(path)} bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Topology Cache - Persistent axis maps so reconnecting skips axis discovery
+Description: Full axis discovery probes every axis status for the connected bit
+and reads the name of each connected axis, one round trip per name. The axis
+topology of a controller almost never changes between reconnects, so the
+discovered map (axis name -> index) is stored in SQLite keyed by the
+controller's identity (connection, name and serial number where the API reports
+one) together with a signature of its axis count and connected axes. On
+reconnect the cached map is validated with a single batched status read; full
+discovery only runs when the signature no longer matches. Where the API has
+batched parameter reads (ControllerSimulator), the cached axis names are also
+confirmed with one more round trip, so renamed axes are rediscovered. Through
+automation1 that would cost a round trip per axis, so there a rename without a
+change in which axes are connected is not detected; run `clear` after renaming
+axes. The map holds only names and indices, so changed axis parameters never
+make it stale.
+
+Usage:
+    python TopologyCache.py list [--db .topology_cache.db]
+    python TopologyCache.py clear
+    python TopologyCache.py benchmark [--axes 32] [--connected 8] [--latency-ms 2]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+from ControllerConnection import connected_axis_indices, discover_axes, probe_range
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".topology_cache.db")
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topologies (
+    identity TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    axes TEXT NOT NULL,
+    discovered_at TEXT NOT NULL,
+    last_used TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def controller_identity(controller, connection=None):
+    """Identity a topology is cached under: connection (host or type), controller name and serial number."""
+    serial = getattr(controller, "serial_number", None)
+    return "|".join(str(part) for part in (connection or "default", controller.name, serial or ""))
+
+def topology_signature(axis_count, connected):
+    """Checksum of the axis count and the connected axis indices."""
+    text = json.dumps([axis_count, sorted(connected)], separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def axis_names_unchanged(controller, axes):
+    """
+    Confirms a cached axis map's names with one batched AxisName read. Returns True without
+    reading when the API has no batched reads (automation1).
+    """
+    parameters = controller.runtime.parameters
+    if not hasattr(parameters, "get_axis_parameter_values") or not axes:
+        return True
+    names = parameters.get_axis_parameter_values([(index, "AxisName") for index in axes.values()])
+    return list(names) == list(axes)
+
+class TopologyCache:
+    """SQLite-backed axis maps, shared safely between threads (MCDPayloadUI, SessionManager)."""
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def discover(self, controller, api, connection=None):
+        """
+        Returns the controller's axis map, from the cache when one batched status read confirms it.
+
+        Args:
+            controller: A started controller.
+            api: The Automation1 API module (automation1 or ControllerSimulator).
+            connection (str): Host or connection type, part of the identity.
+
+        Returns:
+            dict: Axis name -> axis index for every real (non-virtual) axis, in index order.
+        """
+        identity = controller_identity(controller, connection)
+        axis_count = controller.runtime.parameters.axes.count
+        connected = connected_axis_indices(controller, api, probe_range(axis_count))
+        signature = topology_signature(axis_count, connected)
+        now = datetime.now().isoformat(timespec="seconds")
+
+        with self._lock:
+            row = self.connection.execute("SELECT signature, axes FROM topologies WHERE identity = ?",
+                                          (identity,)).fetchone()
+        if row is not None and row["signature"] == signature:
+            cached = {name: index for name, index in json.loads(row["axes"])}
+            if axis_names_unchanged(controller, cached):
+                with self._lock, self.connection:
+                    self.connection.execute("UPDATE topologies SET last_used = ?, hits = hits + 1 WHERE identity = ?",
+                                            (now, identity))
+                    self.hits += 1
+                return cached
+
+        # Changed, renamed or unknown controller: the status read above already found the connected axes
+        axes = {controller.runtime.parameters.axes[index].identification.axisname.value: index for index in connected}
+        with self._lock:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO topologies (identity, signature, axes, discovered_at, last_used, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)", (identity, signature, json.dumps(list(axes.items())), now, now))
+            self.misses += 1
+        return axes
+
+    def invalidate(self, controller=None, connection=None):
+        """Forgets one controller's topology, or every topology."""
+        with self._lock, self.connection:
+            if controller is None:
+                self.connection.execute("DELETE FROM topologies")
+            else:
+                self.connection.execute("DELETE FROM topologies WHERE identity = ?",
+                                        (controller_identity(controller, connection),))
+
+    def entries(self):
+        """Returns every cached topology."""
+        with self._lock:
+            return [dict(row) for row in self.connection.execute("SELECT * FROM topologies ORDER BY identity")]
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_cache():
+    """Returns the process-wide TopologyCache at DEFAULT_DB_PATH."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TopologyCache()
+        return _shared
+
+def benchmark(axis_count=32, connected=8, latency_s=0.002, reconnects=5, db_path=":memory:"):
+    """
+    Measures reconnects against the controller simulator with full discovery and with the cache.
+
+    Returns:
+        dict: Mean seconds and round trips per discovery for "full", "cached" and the first (cold) cached run.
+    """
+    import ControllerSimulator as a1
+    a1.configure(axis_count=axis_count, connected_axes=range(connected), latency_s=latency_s)
+    results = {}
+    with TopologyCache(db_path) as cache:
+        for mode in ("full", "cold", "cached"):
+            runs = 1 if mode == "cold" else reconnects
+            elapsed = round_trips = 0
+            for _ in range(runs):
+                controller = a1.Controller.connect()
+                controller.start()
+                before = controller.round_trips.total
+                start = time.perf_counter()
+                axes = discover_axes(controller, a1) if mode == "full" else cache.discover(controller, a1)
+                elapsed += time.perf_counter() - start
+                round_trips += controller.round_trips.total - before
+            results[mode] = {"seconds": elapsed / runs, "round_trips": round_trips / runs, "axes": len(axes)}
+    return results
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Inspect or benchmark the controller axis topology cache.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Cache database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show cached topologies")
+    commands.add_parser("clear", help="Forget every cached topology")
+    bench = commands.add_parser("benchmark", help="Compare full discovery with cached reconnects (simulator)")
+    bench.add_argument("--axes", type=int, default=32)
+    bench.add_argument("--connected", type=int, default=8)
+    bench.add_argument("--latency-ms", type=float, default=2.0)
+    bench.add_argument("--reconnects", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        results = benchmark(args.axes, args.connected, args.latency_ms / 1000, args.reconnects)
+        print(f"{'Discovery':<12}{'Round trips':>12}{'Time (ms)':>12}")
+        for mode, label in (("full", "Full"), ("cold", "Cache miss"), ("cached", "Cache hit")):
+            result = results[mode]
+            print(f"{label:<12}{result['round_trips']:>12.0f}{result['seconds'] * 1000:>12.1f}")
+        return 0
+
+    with TopologyCache(args.db) as cache:
+        if args.command == "clear":
+            cache.invalidate()
+            print("♻️ Topology cache cleared")
+            return 0
+        entries = cache.entries()
+        if not entries:
+            print("No cached topologies.")
+        for entry in entries:
+            axes = ", ".join(f"{name}={index}" for name, index in json.loads(entry["axes"]))
+            print(f"{entry['identity']}: {axes} (discovered {entry['discovered_at']}, {entry['hits']} hits)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared pytest fixtures: a stand-in for the GenerateMCD converter, so the pipeline
+(MCDProcessing, MCDWatchFolder, SessionManager) can be tested without .NET.
+"""
+
+import sys
+import time
+import types
+import shutil
+import threading
+
+import pytest
+
+import MCDProcessing
+from CalculationCache import CalculationCache
+
+class FakeConverter:
+    """Mimics the AerotechController calls calculate_parameters makes; records how many run at once."""
+    # How many were constructed (the real ones are initialized .NET objects)
+    created = 0
+
+    def __init__(self, tracker, base_dir):
+        FakeConverter.created += 1
+        self.tracker = tracker
+        self.base_dir = base_dir
+        self.mcd_name = None
+        self.example_mcd_path = None
+        self.example_json_output_path = None
+
+        class _ReadFromFile:
+            @staticmethod
+            def Invoke(_, args):
+                return args[0]
+
+        class _Definition:
+            @staticmethod
+            def GetMethod(name):
+                return _ReadFromFile
+
+        self.MachineControllerDefinition = _Definition
+
+    def initialize(self):
+        pass
+
+    def calculate_from_current_mcd(self, mcd_path):
+        with self.tracker.lock:
+            self.tracker.active += 1
+            self.tracker.peak = max(self.tracker.peak, self.tracker.active)
+            self.tracker.calls += 1
+        try:
+            time.sleep(self.tracker.delay_s)
+            # The "calculated" MCD is the input with its members unchanged
+            shutil.copyfile(mcd_path, self.example_mcd_path)
+            return None, []
+        finally:
+            with self.tracker.lock:
+                self.tracker.active -= 1
+
+class ConverterTracker:
+    def __init__(self, delay_s=0.05):
+        self.lock = threading.Lock()
+        self.delay_s = delay_s
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+@pytest.fixture
+def fake_converter(monkeypatch, tmp_path):
+    """Replaces GenerateMCD with FakeConverter and the calculation cache with an empty one. Yields the tracker."""
+    tracker = ConverterTracker()
+    monkeypatch.setattr(MCDProcessing, "_idle_converter", None)
+    monkeypatch.setattr(FakeConverter, "created", 0)
+    monkeypatch.setitem(sys.modules, "GenerateMCD", types.SimpleNamespace(
+        AerotechController=lambda base_dir, *args: FakeConverter(tracker, base_dir)))
+    cache = CalculationCache(str(tmp_path / "calc_cache.db"))
+    monkeypatch.setattr(MCDProcessing, "_calculation_cache", cache)
+    yield tracker
+    cache.close()
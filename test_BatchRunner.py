@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for BatchRunner - outputs mirror the input folders, so same-named MCDs do not collide,
+and every folder is calculated by the worker's one converter.
+
+Usage:
+    python -m pytest test_BatchRunner.py
+"""
+
+import os
+import json
+import shutil
+
+from conftest import FakeConverter
+from BatchRunner import _collect_paths, input_root, process_job
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+def test_same_named_mcds_get_separate_outputs(tmp_path, fake_converter):
+    for i, line in enumerate(("Line A", os.path.join("Line B", "Rework"))):
+        folder = tmp_path / "in" / line
+        folder.mkdir(parents=True)
+        shutil.copyfile(SAMPLE_MCD, folder / "Unit No Load.mcd")
+        (folder / "Unit No Load.json").write_text(json.dumps({"payloads": {"X": 1.0 + i, "Y": 0.5}}))
+
+    paths = _collect_paths([str(tmp_path / "in")], "process")
+    options = {"output_dir": str(tmp_path / "out"), "input_root": input_root(paths)}
+    outputs = [process_job(path, options)["output"] for path in paths]
+
+    assert options["input_root"] == str(tmp_path / "in")
+    assert sorted(os.path.relpath(output, tmp_path / "out") for output in outputs) == [
+        os.path.join("Line A", "Unit Loaded.mcd"), os.path.join("Line B", "Rework", "Unit Loaded.mcd")]
+    assert fake_converter.calls == 2
+
+def test_folders_share_one_converter(tmp_path, fake_converter):
+    for i in range(5):
+        folder = tmp_path / "in" / f"Line {i}"
+        folder.mkdir(parents=True)
+        shutil.copyfile(SAMPLE_MCD, folder / "Unit No Load.mcd")
+        # Distinct payloads, so every job is a calculation rather than a cache hit
+        (folder / "Unit No Load.json").write_text(json.dumps({"payloads": {"X": 1.0 + i}}))
+
+    paths = _collect_paths([str(tmp_path / "in")], "process")
+    options = {"output_dir": str(tmp_path / "out"), "input_root": input_root(paths)}
+    for path in paths:
+        process_job(path, options)
+
+    assert fake_converter.calls == 5
+    assert FakeConverter.created == 1
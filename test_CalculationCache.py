@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for CalculationCache - a machine setup calculated before is served from the cache,
+producing the same MCD as the calculation, with the input's axis names rather than the cached ones.
+
+Usage:
+    python -m pytest test_CalculationCache.py
+"""
+
+import os
+
+import MCDXml
+import MCDProcessing
+from MCDArchive import MCDArchive
+from CalculationCache import (CalculationCache, MACHINE_SETUP_MEMBER, PARAMETERS_MEMBER, fingerprint_mcd,
+                              machine_setup, volatile_fields, apply_volatile_fields)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+# What the .NET calculation wrote for the sample: MachineSetupData is rewritten in a newer schema
+CALCULATED_MCD = os.path.join(BASE_DIR, "Recalculated_Demo.mcd")
+
+def _renamed_copy(path, names):
+    """Writes a copy of the sample MCD with its AxisConfiguration names replaced."""
+    archive = MCDArchive.open(SAMPLE_MCD)
+    document = MCDXml.XmlDocument(archive.read(MACHINE_SETUP_MEMBER))
+    for axis, name in zip(document.root.iter("AxisConfiguration"), names):
+        axis.find("Name").text = name
+    archive.replace(MACHINE_SETUP_MEMBER, document.serialize())
+    archive.write(str(path))
+    return str(path)
+
+def _axis_names(mcd_path):
+    root = MCDXml.fromstring(MCDArchive.open(mcd_path).read(PARAMETERS_MEMBER))
+    return [parameter.text for parameter in root.iter("P") if parameter.get("n") == "AxisName"]
+
+def test_hit_uses_input_axis_names(tmp_path):
+    renamed = _renamed_copy(tmp_path / "renamed.mcd", ["A", "B"])
+    assert fingerprint_mcd(renamed) == fingerprint_mcd(SAMPLE_MCD)
+
+    with CalculationCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.apply_cached(SAMPLE_MCD, str(tmp_path / "miss.mcd")) is None
+        cache.store_result(SAMPLE_MCD, SAMPLE_MCD, ["warning"])
+        assert cache.apply_cached(renamed, str(tmp_path / "hit.mcd")) == ["warning"]
+        assert cache.stats()["hits"] == 1
+
+    assert _axis_names(SAMPLE_MCD) == ["X", "Y"]
+    assert _axis_names(str(tmp_path / "hit.mcd")) == ["A", "B"]
+
+def test_renamed_axes_skip_the_converter(tmp_path, fake_converter):
+    renamed = _renamed_copy(tmp_path / "renamed.mcd", ["U", "V"])
+    MCDProcessing.calculate_parameters(SAMPLE_MCD, "first", str(tmp_path))
+    calculated, warnings, calculated_path = MCDProcessing.calculate_parameters(renamed, "second", str(tmp_path))
+
+    assert fake_converter.calls == 1
+    assert calculated is None and warnings == []
+    assert _axis_names(calculated_path) == ["U", "V"]
+
+def test_hit_matches_the_calculation(tmp_path):
+    renamed = _renamed_copy(tmp_path / "renamed.mcd", ["A", "B"])
+    with CalculationCache(str(tmp_path / "cache.db")) as cache:
+        cache.store_result(SAMPLE_MCD, CALCULATED_MCD, [])
+        cache.apply_cached(SAMPLE_MCD, str(tmp_path / "hit.mcd"))
+        cache.apply_cached(renamed, str(tmp_path / "renamed hit.mcd"))
+
+    # Same input: every member is what the calculation (the miss) wrote
+    calculated = MCDArchive.open(CALCULATED_MCD)
+    hit = MCDArchive.open(str(tmp_path / "hit.mcd"))
+    assert sorted(hit.names()) == sorted(calculated.names())
+    for name in calculated.names():
+        assert hit.read(name) == calculated.read(name), name
+
+    # Renamed input: the calculated setup, with only the volatile fields from the input
+    renamed_hit = MCDArchive.open(str(tmp_path / "renamed hit.mcd"))
+    setup = renamed_hit.read(MACHINE_SETUP_MEMBER)
+    assert b"2.11.0.3195" in setup and b"MotorWiringType" in setup
+    assert volatile_fields(machine_setup(renamed_hit)) == volatile_fields(machine_setup(renamed))
+    assert apply_volatile_fields(setup, volatile_fields(machine_setup(calculated))) == \
+        calculated.read(MACHINE_SETUP_MEMBER)
+    assert _axis_names(str(tmp_path / "renamed hit.mcd")) == ["A", "B"]
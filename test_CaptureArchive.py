@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for CaptureArchive - encoder_captures selects the constant-velocity samples chunk by
+chunk and keeps at most max_samples per axis.
+
+Usage:
+    python -m pytest test_CaptureArchive.py
+"""
+
+import numpy as np
+
+from CaptureArchive import CaptureWriter, CaptureArchive, encoder_captures
+from EncoderStreaming import SINE_SIGNAL, COSINE_SIGNAL, VELOCITY_SIGNAL
+
+SAMPLES = 10000
+
+def _write(path):
+    rng = np.random.default_rng(0)
+    theta = np.linspace(0, 60 * np.pi, SAMPLES)
+    # Ramp up, constant velocity, ramp down
+    velocity = np.minimum(np.minimum(np.arange(SAMPLES), SAMPLES - 1 - np.arange(SAMPLES)) / 1000.0, 2.0)
+    with CaptureWriter(str(path), ["X"], [SINE_SIGNAL, COSINE_SIGNAL, VELOCITY_SIGNAL], chunk_samples=777) as writer:
+        for start in range(0, SAMPLES, 1000):
+            window = slice(start, start + 1000)
+            writer.append({"X": {SINE_SIGNAL: 0.5 * np.sin(theta[window]) + rng.normal(0, 0.001, 1000),
+                                 COSINE_SIGNAL: 0.5 * np.cos(theta[window]),
+                                 VELOCITY_SIGNAL: velocity[window]}})
+    return velocity
+
+def test_selects_peak_velocity_samples_across_chunks(tmp_path):
+    velocity = _write(tmp_path / "x.capture")
+    archive = CaptureArchive(str(tmp_path / "x.capture"))
+    sine, cosine = encoder_captures(archive, max_samples=None)["X"]
+
+    mask = np.isclose(velocity, velocity.max())
+    np.testing.assert_array_equal(sine, archive.read("X", SINE_SIGNAL)[mask])
+    np.testing.assert_array_equal(cosine, archive.read("X", COSINE_SIGNAL)[mask])
+
+def test_thins_to_max_samples(tmp_path):
+    _write(tmp_path / "x.capture")
+    archive = CaptureArchive(str(tmp_path / "x.capture"))
+    every_sine, _ = encoder_captures(archive, max_samples=None)["X"]
+    sine, cosine = encoder_captures(archive, max_samples=1000)["X"]
+
+    assert 0 < len(sine) == len(cosine) <= 1000
+    # Evenly spaced through the selection, not just its start
+    stride = int(np.ceil(len(every_sine) / 1000))
+    np.testing.assert_array_equal(sine, every_sine[::stride])
+
+    all_sine, _ = encoder_captures(archive, constant_velocity=False, max_samples=None)["X"]
+    assert len(all_sine) == SAMPLES
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for ConverterServer - the handshake key is random, private and stable, and a
+server that fails to start leaves its output in the log.
+
+Usage:
+    python -m pytest test_ConverterServer.py
+"""
+
+import os
+import stat
+
+import pytest
+
+import ConverterServer
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv("MCD_CONVERTER_HOME", str(tmp_path / "state"))
+    monkeypatch.delenv("MCD_CONVERTER_AUTHKEY", raising=False)
+    return tmp_path / "state"
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file modes")
+def test_key_file_is_random_private_and_stable(home, tmp_path, monkeypatch):
+    key = ConverterServer._authkey()
+    path = home / ConverterServer.KEY_FILE_NAME
+    assert len(key) == 32
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert ConverterServer._authkey() == key
+
+    monkeypatch.setenv("MCD_CONVERTER_HOME", str(tmp_path / "other"))
+    assert ConverterServer._authkey() != key
+
+
+def test_environment_key_overrides_file(home, monkeypatch):
+    monkeypatch.setenv("MCD_CONVERTER_AUTHKEY", "from-env")
+    assert ConverterServer._authkey() == b"from-env"
+    assert not (home / ConverterServer.KEY_FILE_NAME).exists()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX file modes")
+def test_key_readable_by_others_is_rejected(home):
+    ConverterServer._authkey()
+    os.chmod(home / ConverterServer.KEY_FILE_NAME, 0o644)
+    with pytest.raises(PermissionError):
+        ConverterServer._authkey()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="Unix socket address")
+def test_failed_start_is_logged(home, tmp_path, monkeypatch):
+    # A nonexistent script makes the interpreter exit at once with an error on stderr
+    monkeypatch.setattr(ConverterServer, "__file__", str(tmp_path / "missing_server.py"))
+    with pytest.raises(RuntimeError) as error:
+        ConverterServer.connect(str(tmp_path / "converter.sock"), timeout_s=30)
+    log_path = home / ConverterServer.LOG_FILE_NAME
+    log = log_path.read_text(encoding="utf-8")
+    assert "missing_server.py" in log
+    assert str(log_path) in str(error.value)
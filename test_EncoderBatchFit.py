@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for EncoderBatchFit - the batched fit recovers the offsets, amplitudes and quadrature
+error that synthetic captures were generated with, independently of the per-axis reference.
+
+Usage:
+    python -m pytest test_EncoderBatchFit.py
+"""
+
+import numpy as np
+import pytest
+
+from EncoderBatchFit import (IDEAL_LISSAJOUS_AMPLITUDE, calculate_gains, lissajous_capture,
+                             benchmark_captures, reference_gains)
+
+# (centre x, centre y, amplitude x, amplitude y, quadrature error in degrees)
+ERRORS = [(0.02, -0.01, 0.45, 0.55, -8.0), (0.0, 0.0, 0.5, 0.5, 0.0),
+          (-0.03, 0.025, 0.6, 0.38, 3.3), (0.01, 0.0, 0.4, 0.42, 7.0)]
+
+# The 3rd harmonic biases the fitted amplitudes by about 1%
+@pytest.mark.parametrize("noise, harmonic, gain_tolerance", [(0.0, 0.0, 0.005), (0.003, 0.01, 0.02)])
+def test_recovers_generated_errors(noise, harmonic, gain_tolerance):
+    rng = np.random.default_rng(1)
+    captures = {i: lissajous_capture(8000 + 500 * i, *errors, noise=noise, harmonic=harmonic, rng=rng)
+                for i, errors in enumerate(ERRORS)}
+    results = calculate_gains(captures)
+
+    for i, (center_x, center_y, amplitude_x, amplitude_y, phase) in enumerate(ERRORS):
+        result = results[i]
+        assert result["SineOffset(mV)"] == pytest.approx(center_x * 1000.0, abs=0.5)
+        assert result["CosineOffset(mV)"] == pytest.approx(center_y * 1000.0, abs=0.5)
+        assert result["SineGain"] == pytest.approx(IDEAL_LISSAJOUS_AMPLITUDE / amplitude_x, rel=gain_tolerance)
+        assert result["CosineGain"] == pytest.approx(IDEAL_LISSAJOUS_AMPLITUDE / amplitude_y, rel=gain_tolerance)
+        # The correction cancels the generated quadrature error; with unequal amplitudes the
+        # phase model of calculate_final_gains leaves up to ~10% of it
+        assert result["Phase(degrees)"] == pytest.approx(-phase, abs=0.1 * abs(phase) + 0.1)
+
+def test_batch_matches_per_axis_search():
+    captures = benchmark_captures(axes=3, samples=3000, seed=2)
+    batch = calculate_gains(captures)
+    for axis, capture in captures.items():
+        reference = reference_gains(*capture)
+        for key, value in reference.items():
+            assert batch[axis][key] == pytest.approx(value, abs=1e-9)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for EncoderStreaming - the ring buffer keeps the most recent samples across
+wrap-around, the incremental fit converges on the synthetic truth, and controller
+frames never pass on a point twice.
+
+Usage:
+    python -m pytest test_EncoderStreaming.py
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from EncoderStreaming import (SINE_SIGNAL, COSINE_SIGNAL, VELOCITY_SIGNAL, RingBuffer, StreamingTuner,
+                              controller_frames, synthetic_frames, synthetic_truth)
+
+def _block(start, stop):
+    return np.vstack((np.arange(start, stop), -np.arange(start, stop)))
+
+def test_ring_buffer_wraps():
+    buffer = RingBuffer(5)
+    buffer.extend(_block(0, 3))
+    assert len(buffer) == 3
+    buffer.extend(_block(3, 7))
+    assert len(buffer) == 5 and buffer.total == 7
+    np.testing.assert_array_equal(buffer.latest(), _block(2, 7))
+    np.testing.assert_array_equal(buffer.latest(2), _block(5, 7))
+    np.testing.assert_array_equal(buffer.latest(50), _block(2, 7))
+
+def test_ring_buffer_block_larger_than_capacity():
+    buffer = RingBuffer(5)
+    buffer.extend(_block(0, 3))
+    buffer.extend(_block(3, 15))
+    np.testing.assert_array_equal(buffer.latest(), _block(10, 15))
+    # Later writes continue from the slot the large block left off at
+    buffer.extend(_block(15, 17))
+    np.testing.assert_array_equal(buffer.latest(), _block(12, 17))
+
+def test_fit_converges_on_synthetic_truth():
+    axes = ["X", "Y", "Z"]
+    tuner = StreamingTuner(axes)
+    assert tuner.consume(synthetic_frames(axes, frames=200))
+    truth = synthetic_truth(axes)
+    for axis, result in tuner.results().items():
+        ellipse, expected = result["ellipse"], truth[axis]
+        # Converged well before the full 100000-sample move
+        assert result["samples"] < 50000
+        assert ellipse.center_x == pytest.approx(expected.center_x, abs=1e-3)
+        assert ellipse.center_y == pytest.approx(expected.center_y, abs=1e-3)
+        assert ellipse.amplitude_x == pytest.approx(expected.amplitude_x, rel=1e-3)
+        assert ellipse.amplitude_y == pytest.approx(expected.amplitude_y, rel=1e-3)
+        assert ellipse.phase_deg == pytest.approx(expected.phase_deg, abs=0.1)
+        assert len(result["sine"]) == result["samples"]
+
+class FakeDataCollection:
+    """Continuous collection whose get_results returns the latest window, overlapping the previous one."""
+
+    def __init__(self, windows):
+        self.windows = iter(windows)
+        self.stopped = False
+
+    def start(self, mode, config):
+        pass
+
+    def get_results(self, config, points):
+        start, stop = next(self.windows)
+        values = np.arange(start, stop, dtype=float)
+        return SimpleNamespace(system=SimpleNamespace(get=lambda signal: SimpleNamespace(points=list(values))),
+                               axis=SimpleNamespace(get=lambda signal, axis: SimpleNamespace(points=list(values))))
+
+    def stop(self):
+        self.stopped = True
+
+class FakeConfiguration:
+    def __init__(self, points, frequency):
+        self.system = SimpleNamespace(add=lambda signal: None)
+        self.axis = SimpleNamespace(add=lambda signal, axis: None)
+
+def test_controller_frames_skip_repeated_points():
+    api = SimpleNamespace(DataCollectionConfiguration=FakeConfiguration,
+                          DataCollectionFrequency=SimpleNamespace(Frequency1kHz=1),
+                          DataCollectionMode=SimpleNamespace(Continuous=1),
+                          SystemDataSignal=SimpleNamespace(DataCollectionSampleTime="time"),
+                          AxisDataSignal=SimpleNamespace(**{s: s for s in (SINE_SIGNAL, COSINE_SIGNAL, VELOCITY_SIGNAL)}))
+    # The second poll repeats 3 points, the third returns nothing new
+    collection = FakeDataCollection([(0, 5), (2, 8), (3, 8), (8, 10)])
+    controller = SimpleNamespace(runtime=SimpleNamespace(data_collection=collection))
+
+    frames = controller_frames(controller, api, ["X"], 1.0, frame_points=5, poll_s=0)
+    received = [next(frames)["X"][SINE_SIGNAL] for _ in range(3)]
+    frames.close()
+
+    assert [list(points) for points in received] == [[0, 1, 2, 3, 4], [5, 6, 7], [8, 9]]
+    assert collection.stopped
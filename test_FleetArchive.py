@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for FleetArchive - the shipped (.NET-written) samples round trip and stay compact,
+and a unit rolled back on failure leaves no trace in later units of its family.
+
+Usage:
+    python -m pytest test_FleetArchive.py
+"""
+
+import os
+
+import pytest
+
+from FleetArchive import FleetArchive, _member_contents
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = ["PRO165LM XY-No Load.mcd", "PRO165LM.mcd", "Recalculated_Demo.mcd", "Uncalculated_PRO165.mcd"]
+
+def _read(name):
+    with open(os.path.join(BASE_DIR, name), "rb") as f:
+        return f.read()
+
+def test_exact_mode_is_byte_exact_and_no_larger_than_the_files(tmp_path):
+    with FleetArchive(str(tmp_path / "fleet.db")) as archive:
+        for name in SAMPLES:
+            archive.add(name, _read(name))
+        for name in SAMPLES:
+            assert archive.reconstruct(name) == _read(name)
+        stats = archive.stats()
+    # Each sample is the base of its own family: stored about once, plus the zip skeletons
+    assert stats["stored"] <= 1.1 * stats["size"]
+
+def test_redeflate_mode_keeps_contents_and_uses_deltas(tmp_path):
+    with FleetArchive(str(tmp_path / "fleet.db"), exact=False) as archive:
+        for name in SAMPLES:
+            archive.add(name, _read(name), family="PRO165")
+        for name in SAMPLES:
+            assert _member_contents(archive.reconstruct(name)) == _member_contents(_read(name))
+        stats = archive.stats()
+    assert stats["stored"] <= 0.7 * stats["size"]
+
+def test_rolled_back_family_is_not_reused(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "fleet.db")
+    with FleetArchive(db_path, exact=False) as archive:
+        reconstruct = archive.reconstruct
+        monkeypatch.setattr(archive, "reconstruct", lambda name: _read(SAMPLES[1]))
+        with pytest.raises(ValueError):
+            archive.add("first", _read(SAMPLES[0]), family="PRO165")
+        monkeypatch.setattr(archive, "reconstruct", reconstruct)
+        assert archive.families() == []
+
+        archive.add("second", _read(SAMPLES[2]), family="PRO165")
+    with FleetArchive(db_path) as reopened:
+        assert _member_contents(reopened.reconstruct("second")) == _member_contents(_read(SAMPLES[2]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for FleetIndex - rescans skip unchanged files, re-parse edited ones and drop deleted
+ones, and the parameter, version and option queries find the indexed values.
+
+Usage:
+    python -m pytest test_FleetIndex.py
+"""
+
+import os
+import shutil
+
+import pytest
+
+from MCDArchive import MCDArchive
+from FleetIndex import FleetIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = ["PRO165LM XY-No Load.mcd", "PRO165LM.mcd", "Recalculated_Demo.mcd"]
+
+@pytest.fixture
+def fleet(tmp_path):
+    folder = tmp_path / "fleet"
+    (folder / "line2").mkdir(parents=True)
+    paths = []
+    for i, name in enumerate(SAMPLES):
+        path = str((folder / "line2" if i else folder) / name)
+        shutil.copyfile(os.path.join(BASE_DIR, name), path)
+        paths.append(path)
+    with FleetIndex(str(tmp_path / "fleet.db")) as index:
+        yield index, str(folder), paths
+
+def _set_gain(path, old, new):
+    archive = MCDArchive.open(path)
+    data = archive.read("config/Parameters")
+    archive.replace("config/Parameters", data.replace(f'n="CurrentLoopGainK">{old}<'.encode(),
+                                                      f'n="CurrentLoopGainK">{new}<'.encode()))
+    archive.write(path)
+
+def test_rescan_is_incremental(fleet):
+    index, folder, paths = fleet
+    assert index.scan(folder, workers=1)["added"] == 3
+
+    stats = index.scan(folder, workers=1)
+    assert (stats["unchanged"], stats["added"], stats["updated"]) == (3, 0, 0)
+
+    ids = {row["path"]: row["id"] for row in index.query("SELECT id, path FROM files")}
+    # A new mtime with the same content is hashed but not re-parsed
+    os.utime(paths[1], ns=(0, os.stat(paths[1]).st_mtime_ns + 10 ** 9))
+    _set_gain(paths[2], 590, 700)
+    os.remove(paths[0])
+    stats = index.scan(folder, workers=1)
+    assert (stats["unchanged"], stats["updated"], stats["removed"], stats["failed"]) == (1, 1, 1, 0)
+
+    rows = {row["path"]: row["id"] for row in index.query("SELECT id, path FROM files")}
+    assert sorted(rows) == sorted(paths[1:])
+    assert rows[paths[1]] == ids[paths[1]]
+    assert index.parameter_values(paths[2])[1]["CurrentLoopGainK"] == "700"
+    # The deleted file's parameter and option rows went with it
+    assert index.query("SELECT COUNT(*) AS n FROM parameters p LEFT JOIN files f ON f.id = p.file_id "
+                       "WHERE f.id IS NULL") == [{"n": 0}]
+
+def test_queries(fleet):
+    index, folder, paths = fleet
+    index.scan(folder, workers=1)
+    _set_gain(paths[2], 590, 700)
+    index.scan(folder, workers=1)
+
+    above = index.files_where_parameter("CurrentLoopGainK", ">", 600)
+    assert [(row["path"], row["axis_name"], row["value"]) for row in above] == [(paths[2], "X", "700"), (paths[2], "Y", "700")]
+    assert {row["path"] for row in index.files_where_parameter("CurrentLoopGainK", "=", "590")} == {paths[0]}
+    with pytest.raises(ValueError):
+        index.files_where_parameter("CurrentLoopGainK", "LIKE", 600)
+
+    assert [row["path"] for row in index.files_with_software_version("2.10.2.3124")] == [paths[0]]
+    multiplier = index.files_with_option("Multiplier", "-MX1")
+    assert [(row["path"], row["product"]) for row in multiplier] == [(paths[1], "iXC4e")]
+    assert {row["path"] for row in index.files_with_option("Bus Voltage")} == set(paths)
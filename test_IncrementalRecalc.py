@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for IncrementalRecalc - Axis blocks are merged and mapped back by index, and an MCD
+written by the .NET calculation is a valid base for the next incremental run.
+
+Usage:
+    python -m pytest test_IncrementalRecalc.py
+"""
+
+import os
+
+import pytest
+
+import MCDXml
+from MCDArchive import MCDArchive
+from IncrementalRecalc import (MACHINE_SETUP_MEMBER, PARAMETERS_MEMBER, axis_blocks, merge_axis_blocks,
+                               map_reduced_blocks, recalculate)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+# What the .NET calculation wrote for the sample
+CALCULATED_MCD = os.path.join(BASE_DIR, "Recalculated_Demo.mcd")
+
+PARAMETERS = ('<Parameters>\r\n<Axes>\r\n<Axis Index="0">\r\n<P n="A">1</P>\r\n</Axis>\r\n'
+              '<Axis Index="1" />\r\n<Axis Index="2">\r\n<P n="A">3</P>\r\n</Axis>\r\n</Axes>\r\n</Parameters>')
+
+def test_merge_replaces_only_the_given_blocks():
+    merged = merge_axis_blocks(PARAMETERS, {1: '<Axis Index="1">\r\n<P n="A">2</P>\r\n</Axis>'})
+    assert merged == PARAMETERS.replace('<Axis Index="1" />', '<Axis Index="1">\r\n<P n="A">2</P>\r\n</Axis>')
+    assert axis_blocks(merged)[2] == axis_blocks(PARAMETERS)[2]
+    with pytest.raises(ValueError):
+        merge_axis_blocks(PARAMETERS, {5: '<Axis Index="5" />'})
+
+def test_map_reduced_blocks():
+    kept = {2: '<Axis Index="2">c</Axis>', 5: '<Axis Index="5">f</Axis>'}
+    assert map_reduced_blocks(kept, [2, 5]) == kept
+    # Reduced axes renumbered from 0 are mapped back in order
+    renumbered = {0: '<Axis Index="0">c</Axis>', 1: '<Axis Index="1">f</Axis>'}
+    assert map_reduced_blocks(renumbered, [5, 2]) == kept
+    with pytest.raises(ValueError):
+        map_reduced_blocks({0: '<Axis Index="0">c</Axis>'}, [2, 5])
+
+class FakeCalculator:
+    """Stands in for .NET: every axis of the MCD it is given gets a block holding its LoadMass."""
+    def __init__(self):
+        self.axes = []
+
+    def __call__(self, mcd_bytes):
+        archive = MCDArchive.from_bytes(mcd_bytes)
+        root = MCDXml.fromstring(archive.read(MACHINE_SETUP_MEMBER))
+        masses = [axis.findtext(".//LoadMass") for axis in MCDXml.MECHANICAL_AXES(root)]
+        self.axes.append(len(masses))
+        blocks = "".join(f'<Axis Index="{i}"><P n="Mass">{mass}</P></Axis>' for i, mass in enumerate(masses))
+        archive.replace(PARAMETERS_MEMBER, f"\ufeff<Parameters><Axes>{blocks}</Axes></Parameters>".encode("utf-8"))
+        return archive.to_bytes(), ["calculated"]
+
+def _with_load_mass(path, axis, mass):
+    archive = MCDArchive.open(SAMPLE_MCD)
+    document = MCDXml.XmlDocument(archive.read(MACHINE_SETUP_MEMBER))
+    MCDXml.MECHANICAL_AXES(document.root)[axis].find(".//LoadMass").text = mass
+    archive.replace(MACHINE_SETUP_MEMBER, document.serialize())
+    archive.write(str(path))
+    return str(path)
+
+def test_unchanged_after_a_dotnet_calculation(tmp_path):
+    calculator = FakeCalculator()
+    result = recalculate(SAMPLE_MCD, CALCULATED_MCD, str(tmp_path / "out.mcd"), calculator)
+
+    assert result["mode"] == "unchanged" and calculator.axes == []
+    output, calculated = MCDArchive.open(str(tmp_path / "out.mcd")), MCDArchive.open(CALCULATED_MCD)
+    for name in (PARAMETERS_MEMBER, MACHINE_SETUP_MEMBER):
+        assert output.read(name) == calculated.read(name)
+
+def test_only_the_changed_axis_is_recalculated(tmp_path):
+    changed = _with_load_mass(tmp_path / "changed.mcd", 1, "2.5")
+    calculator = FakeCalculator()
+    result = recalculate(changed, CALCULATED_MCD, str(tmp_path / "out.mcd"), calculator)
+
+    assert (result["mode"], result["changed_axes"], result["warnings"]) == ("incremental", [1], ["calculated"])
+    assert calculator.axes == [1]
+    output, calculated = MCDArchive.open(str(tmp_path / "out.mcd")), MCDArchive.open(CALCULATED_MCD)
+    blocks = axis_blocks(output.read(PARAMETERS_MEMBER).decode("utf-8-sig"))
+    assert blocks[0] == axis_blocks(calculated.read(PARAMETERS_MEMBER).decode("utf-8-sig"))[0]
+    assert blocks[1] == '<Axis Index="1"><P n="Mass">2.5</P></Axis>'
+    # The calculated setup schema is kept, with the new payload
+    setup = output.read(MACHINE_SETUP_MEMBER)
+    assert b"MotorWiringType" in setup
+    assert MCDXml.MECHANICAL_AXES(MCDXml.fromstring(setup))[1].findtext(".//LoadMass") == "2.5"
+
+def test_shared_change_is_a_full_recalculation(tmp_path):
+    archive = MCDArchive.open(SAMPLE_MCD)
+    document = MCDXml.XmlDocument(archive.read(MACHINE_SETUP_MEMBER))
+    document.root.find(".//ConfiguredOptions/KeyValuePair/Value").text = "Changed"
+    archive.replace(MACHINE_SETUP_MEMBER, document.serialize())
+    archive.write(str(tmp_path / "options.mcd"))
+
+    calculator = FakeCalculator()
+    result = recalculate(str(tmp_path / "options.mcd"), CALCULATED_MCD, str(tmp_path / "out.mcd"), calculator)
+    assert result["mode"] == "full" and calculator.axes == [2]
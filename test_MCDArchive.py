@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDArchive - in-place rewrites keep the MCD readable and its permissions intact.
+
+Usage:
+    python -m pytest test_MCDArchive.py
+"""
+
+import os
+import stat
+import shutil
+import zipfile
+
+import pytest
+
+import MCDArchive as MCDArchiveModule
+from MCDArchive import MCDArchive
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_rewrite_keeps_permissions(tmp_path):
+    path = str(tmp_path / "sample.mcd")
+    shutil.copyfile(SAMPLE_MCD, path)
+    os.chmod(path, 0o644)
+
+    archive = MCDArchive.open(path)
+    archive.replace("config/Names", archive.read("config/Names") + b" ")
+    archive.write(path)
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert zipfile.ZipFile(path).testzip() is None
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+def test_new_file_uses_umask(tmp_path, monkeypatch):
+    # The umask is read once at import, so writes never change it under other threads
+    monkeypatch.setattr(MCDArchiveModule, "_UMASK", 0o027)
+    path = str(tmp_path / "new.mcd")
+    MCDArchive.open(SAMPLE_MCD).write(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
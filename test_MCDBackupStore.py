@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDBackupStore - versions restore with identical members, unchanged members are
+stored once, and same-named MCDs from different folders keep separate versions.
+
+Usage:
+    python -m pytest test_MCDBackupStore.py
+"""
+
+import os
+import shutil
+
+from MCDArchive import MCDArchive
+from MCDBackupStore import MCDBackupStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+def _contents(path):
+    archive = MCDArchive.open(path)
+    return [(name, archive.read(name)) for name in archive.names()]
+
+def _copy(folder):
+    folder.mkdir(exist_ok=True)
+    path = str(folder / "unit.mcd")
+    shutil.copyfile(SAMPLE_MCD, path)
+    return path
+
+def test_backup_and_restore(tmp_path):
+    path = _copy(tmp_path / "unit")
+    store = MCDBackupStore.for_mcd(path)
+    original = _contents(path)
+    first = store.backup(path, label="original")
+
+    archive = MCDArchive.open(path)
+    archive.replace("config/Names", archive.read("config/Names") + b" ")
+    archive.write(path)
+    store.backup(path)
+
+    assert [manifest["label"] for manifest in store.versions(path)] == ["original", None]
+    restored = store.restore(path, first["version"], str(tmp_path / "restored.mcd"))
+    assert _contents(restored) == original
+    # Without an output path the latest version goes back over the source
+    os.remove(path)
+    assert store.restore(path) == path
+    assert dict(_contents(path))["config/Names"] == dict(original)["config/Names"] + b" "
+
+def test_unchanged_members_are_stored_once(tmp_path):
+    path = _copy(tmp_path / "unit")
+    store = MCDBackupStore.for_mcd(path)
+    first = store.backup(path)
+    assert first["new_objects"] == len(first["members"])
+
+    assert store.backup(path)["new_objects"] == 0
+    archive = MCDArchive.open(path)
+    archive.replace("config/Names", archive.read("config/Names") + b" ")
+    archive.write(path)
+    assert store.backup(path)["new_objects"] == 1
+    assert store.stats()["objects"] == len(first["members"]) + 1
+
+def test_same_name_in_different_folders(tmp_path):
+    store = MCDBackupStore(str(tmp_path / "store"))
+    first, second = _copy(tmp_path / "a"), _copy(tmp_path / "b")
+    archive = MCDArchive.open(second)
+    archive.replace("config/Names", b"<Names />")
+    archive.write(second)
+
+    store.backup(first)
+    store.backup(second)
+    assert [manifest["source"] for manifest in store.versions(first)] == [first]
+    assert [manifest["source"] for manifest in store.versions(second)] == [second]
+    restored = store.restore(first, output_path=str(tmp_path / "a.mcd"))
+    assert _contents(restored) == _contents(first)
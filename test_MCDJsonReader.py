@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDJsonReader - the JSON matches .NET ConvertToJson output, without "$type" hints
+unless MCDJsonWriter asks for them.
+
+Usage:
+    python -m pytest test_MCDJsonReader.py
+"""
+
+import os
+import glob
+import json
+
+import pytest
+
+import MCDJsonReader
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCDS = sorted(glob.glob(os.path.join(BASE_DIR, "*.mcd")))
+
+def test_matches_dotnet_output():
+    mcd_path = os.path.join(BASE_DIR, "Uncalculated_PRO165.mcd")
+    assert MCDJsonReader.validate(mcd_path, os.path.join(BASE_DIR, "Uncalculated_PRO165_converted.json")) == []
+
+@pytest.mark.parametrize("mcd_path", SAMPLE_MCDS, ids=os.path.basename)
+def test_output_has_no_type_hints(mcd_path, tmp_path):
+    output = MCDJsonReader.convert_to_json(mcd_path, str(tmp_path / "converted.json"))
+    with open(output, "r", encoding="utf-8") as f:
+        text = f.read()
+    assert MCDJsonReader.TYPE_KEY not in text
+
+    hinted = MCDJsonReader.mcd_to_json(mcd_path, type_hints=True)
+    assert MCDJsonReader.strip_types(hinted) == json.loads(text)
+
+def test_type_hints_name_the_stage_component():
+    hinted = MCDJsonReader.mcd_to_json(os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd"), type_hints=True)
+    stages = [axis["Stage"] for product in hinted["MechanicalProducts"] for axis in product["MechanicalAxes"]
+              if "Stage" in axis]
+    assert stages and all(stage[MCDJsonReader.TYPE_KEY].endswith("StageComponent") for stage in stages)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDJsonWriter - a non-calculated MCD written from JSON reproduces the
+MachineSetupData of the MCD the JSON came from, byte for byte apart from SoftwareVersion.
+
+Usage:
+    python -m pytest test_MCDJsonWriter.py
+"""
+
+import os
+import re
+
+import pytest
+
+import MCDJsonReader
+import MCDJsonWriter
+from MCDArchive import MCDArchive
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_MCD = os.path.join(BASE_DIR, "Uncalculated_PRO165.mcd")
+SOFTWARE_VERSION = re.compile(rb"<SoftwareVersion>[^<]*</SoftwareVersion>")
+
+def _machine_setup(mcd_path):
+    return SOFTWARE_VERSION.sub(b"<SoftwareVersion />", MCDArchive.open(mcd_path).read("config/MachineSetupData"))
+
+@pytest.mark.parametrize("source", ["reader", "dotnet"])
+def test_round_trip_reproduces_machine_setup(source, tmp_path):
+    if source == "reader":
+        data = MCDJsonReader.mcd_to_json(SOURCE_MCD, type_hints=True)
+    else:
+        data = MCDJsonWriter.load_json_lenient(os.path.join(BASE_DIR, "Uncalculated_PRO165_converted.json"))
+    output = MCDJsonWriter.write_mcd(data, str(tmp_path / "written.mcd"))
+    assert _machine_setup(output) == _machine_setup(SOURCE_MCD)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDValidation - relations, required ranges, FaultMask bits and biquad checks flag
+the rows that break them, and rule expressions reject syntax they do not support.
+
+Usage:
+    python -m pytest test_MCDValidation.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import MCDValidation
+from MCDValidation import ParameterFrame, compile_expression, compile_rule, validate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _frame(axes):
+    """A one-source frame with one row per {parameter: value} dict."""
+    rows = [(axis, name, value) for axis, parameters in enumerate(axes) for name, value in parameters.items()]
+    axis, names, numbers = zip(*rows)
+    return ParameterFrame.from_long(["unit.mcd"], np.zeros(len(rows)), axis, names, numbers)
+
+def _flagged(spec, axes):
+    return np.flatnonzero(compile_rule(spec).check(_frame(axes))).tolist()
+
+def test_sample_mcd_passes_the_default_rules():
+    assert MCDValidation.validate_mcd(os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")) == []
+
+def test_relation_violation():
+    spec = {"name": "RampTime", "type": "relation", "expression": "DefaultAxisRampRate >= DefaultAxisSpeed / t",
+            "constants": {"t": 2.0}}
+    # The last axis has no ramp rate, so the relation does not apply to it
+    axes = [{"DefaultAxisRampRate": 50, "DefaultAxisSpeed": 100}, {"DefaultAxisRampRate": 10, "DefaultAxisSpeed": 100},
+            {"DefaultAxisSpeed": 100}]
+    assert _flagged(spec, axes) == [1]
+
+    violations = validate(_frame(axes), [compile_rule(spec)])
+    assert [(violation["axis"], violation["values"]) for violation in violations] == [
+        (1, {"DefaultAxisRampRate": 10.0, "DefaultAxisSpeed": 100.0})]
+    assert violations[0]["message"] == "DefaultAxisRampRate >= DefaultAxisSpeed / t does not hold"
+
+def test_missing_required_range():
+    spec = {"name": "CountsPerUnit", "type": "range", "parameter": "CountsPerUnit", "min": 1, "required": True}
+    axes = [{"CountsPerUnit": 1000}, {"CountsPerUnit": 0.5}, {"AxisType": 0}]
+    assert _flagged(spec, axes) == [1, 2]
+    assert _flagged(dict(spec, required=False), axes) == [1]
+
+def test_fault_mask_bits():
+    spec = {"name": "FaultMask", "type": "bitmask", "parameter": "FaultMask",
+            "required_bits": ["PositionError", "EmergencyStop"], "forbidden_bits": [12]}
+    required = (1 << MCDValidation.FAULT_BITS["PositionError"]) | (1 << MCDValidation.FAULT_BITS["EmergencyStop"])
+    axes = [{"FaultMask": required | 0b10}, {"FaultMask": 1}, {"FaultMask": required | 1 << 12}, {"AxisType": 0}]
+    assert _flagged(spec, axes) == [1, 2]
+
+def test_biquad_stability_and_dc_gain():
+    spec = MCDValidation.DEFAULT_RULES[-1]
+    prefix = spec["prefix"]
+
+    def biquad(n0, n1, n2, d1, d2, enabled=1):
+        values = dict(zip([prefix + suffix for suffix in ("N0", "N1", "N2", "D1", "D2")], (n0, n1, n2, d1, d2)))
+        values[spec["enable"]] = enabled
+        return values
+
+    axes = [biquad(0.25, 0.5, 0.25, 0, 0),       # stable, unity DC gain
+            biquad(1, 0, 0.21, 0.5, -1.2),       # pole outside the unit circle
+            biquad(0.5, 0.5, 0.5, 0, 0),         # DC gain 1.5
+            biquad(1, 0, 0.21, 0.5, -1.2, 0)]    # unstable but disabled
+    assert _flagged(spec, axes) == [1, 2]
+    assert _flagged(dict(spec, dc_gain_tolerance=None), axes) == [1]
+
+@pytest.mark.parametrize("expression", ["DefaultAxisSpeed.real > 0", "open('x') == 1", "[MaxJogSpeed] > 0",
+                                        "MaxJogSpeed if MaxJogSpeed else 1", "abs(MaxJogSpeed, key=1) > 0"])
+def test_unsupported_syntax_is_rejected(expression):
+    with pytest.raises(ValueError, match="Unsupported syntax"):
+        compile_expression(expression)
+
+def test_expression_functions():
+    function, parameters = compile_expression("max(abs(A), sqrt(B)) <= 2 * C and not A == 0", {"C": 2.0})
+    assert parameters == ["A", "B"]
+    frame = _frame([{"A": -3, "B": 4}, {"A": 0, "B": 1}, {"A": 1, "B": 25}])
+    assert function(frame).tolist() == [True, False, False]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for MCDWatchFolder - parallel workers never run .NET calculations concurrently, an edited
+sidecar is reprocessed and failed files are retried.
+
+Usage:
+    python -m pytest test_MCDWatchFolder.py
+"""
+
+import os
+import json
+import shutil
+
+from MCDWatchFolder import MCDWatchFolder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+def test_calculations_are_serialised(tmp_path, fake_converter):
+    watch_dir = tmp_path / "watch"
+    watch_dir.mkdir()
+    for i in range(4):
+        shutil.copyfile(SAMPLE_MCD, watch_dir / f"Unit {i} No Load.mcd")
+        # Different payloads so no file is served from the calculation cache
+        (watch_dir / f"Unit {i} No Load.json").write_text(json.dumps({"payloads": {"X": 1.0 + i, "Y": 0.5}}))
+
+    service = MCDWatchFolder(str(watch_dir), str(tmp_path / "out"), workers=4, settle_s=0)
+    service.run(once=True)
+
+    states = service.state.entries
+    assert sorted(entry["status"] for entry in states.values()) == ["done"] * 4
+    assert fake_converter.calls == 4
+    assert fake_converter.peak == 1
+
+class FlakyProcess:
+    """Pipeline stand-in that fails the first `failures` calls."""
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, mcd_path, payloads, mcd_name, output_dir):
+        self.calls.append(payloads)
+        if len(self.calls) <= self.failures:
+            raise OSError("file is locked")
+        return mcd_path
+
+def _drop(watch_dir, payloads):
+    watch_dir.mkdir(exist_ok=True)
+    shutil.copyfile(SAMPLE_MCD, watch_dir / "Unit No Load.mcd")
+    (watch_dir / "Unit No Load.json").write_text(json.dumps({"payloads": payloads}))
+
+def _run(watch_dir, process, **kwargs):
+    service = MCDWatchFolder(str(watch_dir), process=process, settle_s=0, **kwargs)
+    service.run(once=True)
+    return service.state.entries["Unit No Load.mcd"]
+
+def test_edited_sidecar_is_reprocessed(tmp_path):
+    process = FlakyProcess()
+    _drop(tmp_path, {"X": 1.0})
+    assert _run(tmp_path, process)["status"] == "done"
+    # A restart with the same files does nothing
+    _run(tmp_path, process)
+    assert len(process.calls) == 1
+
+    (tmp_path / "Unit No Load.json").write_text(json.dumps({"payloads": {"X": 2.0}}))
+    assert _run(tmp_path, process)["status"] == "done"
+    assert process.calls == [{"X": 1.0}, {"X": 2.0}]
+
+def test_failures_are_retried(tmp_path):
+    process = FlakyProcess(failures=1)
+    _drop(tmp_path, {"X": 1.0})
+    entry = _run(tmp_path, process)
+    assert (entry["status"], entry["attempts"], len(process.calls)) == ("done", 2, 2)
+
+def test_retries_stop_at_max_attempts(tmp_path):
+    process = FlakyProcess(failures=10)
+    _drop(tmp_path, {"X": 1.0})
+    entry = _run(tmp_path, process, max_attempts=3)
+    assert (entry["status"], entry["attempts"], len(process.calls)) == ("failed", 3, 3)
+    _run(tmp_path, process, max_attempts=3)
+    assert len(process.calls) == 3
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for ParameterSync - the per-parameter path real controllers use finds parameters
+outside the guessed category, and fails loudly when a category does not exist; batched reads
+retry only the chunk an unknown name is in.
+
+Usage:
+    python -m pytest test_ParameterSync.py
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import ControllerSimulator
+from ParameterSync import ParameterSync, read_mcd_parameters
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+class FakeController:
+    """automation1-style controller without batched calls: axes -> categories -> parameters with .value."""
+    def __init__(self, categories):
+        axis = SimpleNamespace(**{category: SimpleNamespace(**{name.lower(): SimpleNamespace(value=value)
+                                                               for name, value in parameters.items()})
+                                  for category, parameters in categories.items()})
+        self.runtime = SimpleNamespace(parameters=SimpleNamespace(axes=_Axes([axis])))
+
+class _Axes:
+    def __init__(self, axes):
+        self._axes = axes
+        self.count = len(axes)
+
+    def __getitem__(self, index):
+        return self._axes[index]
+
+def test_parameter_outside_guessed_category_is_found():
+    # parameter_category guesses "protection" for AverageCurrentThreshold
+    controller = FakeController({"protection": {}, "motion": {"AverageCurrentThreshold": 3.0}})
+    sync = ParameterSync(controller)
+    assert not sync.batched
+    assert sync.read([(0, "AverageCurrentThreshold"), (0, "NoSuchParameter")]) == [3.0, None]
+
+    changes, compared, missing = sync.plan({0: {29: ("AverageCurrentThreshold", "4.5")}})
+    assert [(c.name, c.current, c.target) for c in changes] == [("AverageCurrentThreshold", 3.0, "4.5")]
+    assert (compared, missing) == (1, [])
+    sync.write(changes)
+    assert controller.runtime.parameters.axes[0].motion.averagecurrentthreshold.value == 4.5
+
+def test_missing_category_raises():
+    controller = FakeController({"motion": {"DefaultAxisSpeed": 80}})
+    with pytest.raises(ValueError, match="servoloop"):
+        ParameterSync(controller).read([(0, "ServoLoopGainK")])
+
+def test_simulator_sync_uses_batches(monkeypatch):
+    monkeypatch.setattr(ControllerSimulator, "_config", ControllerSimulator.SimulatorConfig.from_mcd(SAMPLE_MCD))
+    controller = ControllerSimulator.Controller.connect()
+    controller.start()
+    controller.runtime.parameters.axes[0].motion.defaultaxisspeed.value = 10
+
+    report = ParameterSync(controller).sync(SAMPLE_MCD)
+    assert report["batched"]
+    assert [(c.axis, c.name) for c in report["changes"]] == [(0, "DefaultAxisSpeed")]
+    assert report["failed"] == [] and report["missing"] == []
+
+def test_unknown_names_cost_a_few_round_trips(monkeypatch):
+    monkeypatch.setattr(ControllerSimulator, "_config", ControllerSimulator.SimulatorConfig.from_mcd(SAMPLE_MCD))
+    controller = ControllerSimulator.Controller.connect()
+    controller.start()
+    sync = ParameterSync(controller)
+    mcd_parameters, _ = read_mcd_parameters(SAMPLE_MCD)
+    requests = [(0, name) for name, _ in list(mcd_parameters[0].values())[:64]]
+    requests[10] = (0, "NoSuchParameter")
+    requests[50] = (0, "AnotherUnknown")
+
+    values = sync.read_known(requests)
+    assert values[10] is None and values[50] is None
+    assert values[:10] == sync.read(requests[:10])
+    assert sum(value is None for value in values) == 2
+    # Bisecting the failing chunk, not one call per parameter
+    sync.round_trips = 0
+    sync.read_known(requests)
+    assert sync.round_trips < 30
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for ParameterTable - diff() applies the numeric tolerances, reports parameters present on
+one side only, and orders rows by axis number and name.
+
+Usage:
+    python -m pytest test_ParameterTable.py
+"""
+
+from ParameterTable import ParameterTable, diff, summarize
+
+def _table(rows):
+    """rows: (axis, id, name, text) tuples."""
+    return ParameterTable(*zip(*rows)) if rows else ParameterTable([], [], [], [])
+
+def test_numeric_tolerances():
+    mcd = _table([(0, 1, "Gain", "1.0"), (0, 2, "Mode", "Auto"), (0, 3, "Speed", "10")])
+    live = _table([(0, 1, "Gain", "1.0000000001"), (0, 2, "Mode", "auto"), (0, 3, "Speed", "10.5")])
+
+    assert [row["status"] for row in diff(mcd, live)] == ["Match", "Different", "Different"]
+    # Text compares exactly; numbers within the tolerance match
+    assert [row["status"] for row in diff(mcd, live, rel_tol=0.1)] == ["Match", "Different", "Match"]
+    assert [row["status"] for row in diff(mcd, live, rel_tol=0, abs_tol=0)] == ["Different"] * 3
+
+def test_one_sided_rows():
+    mcd = _table([(0, 1, "Gain", "1"), (0, 2, "Limit", "5"), (1, 1, "Gain", "2")])
+    # A snapshot has the same rows, with None where the controller has no such parameter
+    snapshot = mcd.select_axes([0]).with_values(["1", None])
+    live = _table([(0, 1, "Gain", "1"), (0, 4, "Extra", "7")])
+
+    rows = diff(mcd, snapshot)
+    assert [(row["axis"], row["name"], row["value2"], row["status"]) for row in rows] == [
+        ("Axis 0", "Gain", "1", "Match"), ("Axis 0", "Limit", "N/A", "File 1 Only"),
+        ("Axis 1", "Gain", "N/A", "File 1 Only")]
+    rows = diff(mcd, live, include_matches=False)
+    assert summarize(rows) == {"File 1 Only": 2, "File 2 Only": 1}
+    assert [(row["name"], row["value1"], row["value2"]) for row in rows if row["status"] == "File 2 Only"] == \
+        [("Extra", "N/A", "7")]
+
+def test_rows_ordered_by_axis_number_then_name():
+    mcd = _table([(10, 1, "B", "1"), (2, 2, "Z", "1"), (2, 1, "A", "1"), (0, 1, "M", "1")])
+    live = _table([(10, 1, "B", "2"), (3, 1, "C", "1")])
+
+    assert [(row["axis"], row["name"]) for row in diff(mcd, live)] == [
+        ("Axis 0", "M"), ("Axis 2", "A"), ("Axis 2", "Z"), ("Axis 3", "C"), ("Axis 10", "B")]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for SessionManager - sessions run in parallel, including ones added later, but their
+.NET calculations run one at a time.
+
+Usage:
+    python -m pytest test_SessionManager.py
+"""
+
+import os
+import threading
+
+import ControllerSimulator
+from SessionManager import SessionManager, DONE, FAILED
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_MCD = os.path.join(BASE_DIR, "PRO165LM XY-No Load.mcd")
+
+def test_calculations_are_serialised(tmp_path, monkeypatch, fake_converter):
+    monkeypatch.setattr(ControllerSimulator, "_host_configs", {})
+    manager = SessionManager(ControllerSimulator, str(tmp_path / "cell"), workers=4)
+    for i in range(4):
+        host = f"192.168.1.{16 + i}"
+        ControllerSimulator.configure_host(host, config=ControllerSimulator.SimulatorConfig.from_mcd(SAMPLE_MCD))
+        # Different payloads so no session is served from the calculation cache
+        manager.add(f"Cell {i}", host, SAMPLE_MCD, {"X": 1.0 + i, "Y": 0.5})
+
+    result = manager.run()
+    manager.close()
+
+    assert [session["status"] for session in result["sessions"]] == [DONE] * 4, \
+        [session["error"] for session in result["sessions"]]
+    assert fake_converter.calls == 4
+    assert fake_converter.peak == 1
+
+def test_sessions_added_later_run_in_parallel(tmp_path):
+    manager = SessionManager(ControllerSimulator, str(tmp_path / "cell"))
+    manager.add("Cell 0")
+    # The pool is created for the one session in the cell file...
+    manager._submit(manager.get("Cell 0"), lambda: None).result()
+    # ...then three controllers are added from the dashboard
+    for i in range(1, 4):
+        manager.add(f"Cell {i}")
+
+    barrier = threading.Barrier(4, timeout=5)
+    futures = [manager._submit(session, barrier.wait) for session in manager.sessions]
+    for future in futures:
+        future.result()
+    manager.close()
+
+    assert not barrier.broken
+    assert all(session.status != FAILED for session in manager.sessions)
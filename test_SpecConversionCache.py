@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for SpecConversionCache - hits skip the converter, the disk tier stays within its
+size limit by evicting the least recently used entries, and statistics are written in batches.
+
+Usage:
+    python -m pytest test_SpecConversionCache.py
+"""
+
+import os
+import json
+import time
+
+import SpecConversionCache as spec_cache_module
+from SpecConversionCache import SpecConversionCache
+
+ENTRY_BYTES = 1000
+
+class CountingConverter:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, stage_type, axis, specs_dict):
+        self.calls.append((stage_type, axis, dict(specs_dict)))
+        return stage_type.encode("ascii").ljust(ENTRY_BYTES, b"."), ["warning"]
+
+def _cache(tmp_path, converter, **options):
+    return SpecConversionCache(str(tmp_path / "cache"), converter=converter, environment="test", **options)
+
+def test_hits_skip_the_converter(tmp_path):
+    converter = CountingConverter()
+    with _cache(tmp_path, converter) as cache:
+        first = cache.get_mcd("PRO165LM", "x", {"Travel": "-0100 "})
+        assert cache.get_mcd("pro165lm", "X", {"Travel": "-0100"}) == first
+    with _cache(tmp_path, converter) as cache:
+        assert cache.get_mcd("PRO165LM", "X", {"Travel": "-0100"}) == first
+        assert cache.session == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+    assert len(converter.calls) == 1
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    converter = CountingConverter()
+    # Room for two entries (MCD plus its metadata) but not three
+    with _cache(tmp_path, converter, memory_entries=0, max_disk_bytes=3 * ENTRY_BYTES) as cache:
+        for stage_type in ("A", "B", "A", "C"):  # the disk hit on A makes B the least recently used
+            cache.get_mcd(stage_type, "X", {})
+            time.sleep(0.05)  # file times can be as coarse as the kernel tick
+        assert cache.stats()["stored_entries"] == 2
+        assert cache.stats()["stored_bytes"] <= 3 * ENTRY_BYTES
+
+        cache.get_mcd("A", "X", {})
+        cache.get_mcd("B", "X", {})
+    assert [call[0] for call in converter.calls] == ["A", "B", "C", "B"]
+
+def test_stats_are_batched_and_atomic(tmp_path, monkeypatch):
+    monkeypatch.setattr(spec_cache_module, "STATS_FLUSH_INTERVAL_S", 3600.0)
+    stats_path = tmp_path / "cache" / "stats.json"
+    with _cache(tmp_path, CountingConverter()) as cache:
+        cache.get_mcd("A", "X", {})
+        cache.get_mcd("A", "X", {})
+        cache.get_mcd("B", "X", {})
+        assert not stats_path.exists()
+        assert cache.stats()["total"]["lookups"] == 3
+
+    totals = json.loads(stats_path.read_text(encoding="utf-8"))
+    assert (totals["memory_hits"], totals["disk_hits"], totals["misses"]) == (1, 0, 2)
+    assert len(totals["first_seen"]) == 2
+    assert not [name for name in os.listdir(tmp_path / "cache") if name.endswith(".tmp")]
+
+    with _cache(tmp_path, CountingConverter()) as cache:
+        cache.get_mcd("A", "X", {})
+        assert cache.stats()["total"]["disk_hits"] == 1
+    assert json.loads(stats_path.read_text(encoding="utf-8"))["disk_hits"] == 1
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for TopologyCache - reconnects reuse the cached axis map until the connected axes
+or (where the API can read them in one batch) the axis names change.
+
+Usage:
+    python -m pytest test_TopologyCache.py
+"""
+
+import ControllerSimulator
+from TopologyCache import TopologyCache
+
+def _discover(cache):
+    controller = ControllerSimulator.Controller.connect()
+    controller.start()
+    return cache.discover(controller, ControllerSimulator)
+
+def test_renamed_axes_are_rediscovered(monkeypatch):
+    config = ControllerSimulator.SimulatorConfig(axis_count=8, connected_axes=(0, 1, 2))
+    monkeypatch.setattr(ControllerSimulator, "_config", config)
+    with TopologyCache(":memory:") as cache:
+        assert _discover(cache) == {"X": 0, "Y": 1, "Z": 2}
+        assert _discover(cache) == {"X": 0, "Y": 1, "Z": 2}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        config.axis_names[1] = "Gantry"
+        assert _discover(cache) == {"X": 0, "Gantry": 1, "Z": 2}
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        config.connected_axes = {0, 1}
+        assert _discover(cache) == {"X": 0, "Gantry": 1}
+        assert _discover(cache) == {"X": 0, "Gantry": 1}
+        assert (cache.hits, cache.misses) == (2, 3)